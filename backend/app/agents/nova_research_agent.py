@@ -11,7 +11,7 @@ import json
 import asyncio
 from typing import List, Dict, Any, Optional
 from strands_agents import Agent
-from strands_agents.models import OpenAIModel
+from app.services.model_client_factory import get_model
 from strands_tools import tavily_search
 from app.tools.web_browser_tool import web_browser_tool, webpage_comparator_tool
 import logging
@@ -33,9 +33,9 @@ class NovaResearchAgent:
             openai_api_key = os.getenv("OPENAI_API_KEY")
         
         # Initialize the model
-        self.model = OpenAIModel(
+        self.model = get_model(
             api_key=openai_api_key,
-            model="gpt-4o-mini"
+            model_id="gpt-4o-mini"
         )
         
         # Combine search and browsing tools
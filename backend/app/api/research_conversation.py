@@ -9,7 +9,7 @@ import uuid
 import logging
 from datetime import datetime
 from strands import Agent
-from strands.models.openai import OpenAIModel
+from app.services.model_client_factory import get_model
 from app.services.strands_session_service import StrandsSessionService
 from app.tools.tavily_search_tool import tavily_search, get_all_search_results, clear_search_results
 from app.tools.use_llm_wrapper import use_llm_fixed
@@ -154,10 +154,7 @@ def perform_conversation_research(session_id: str, message: str, is_continuation
                 model_id = "gpt-4o-mini"
             
             # Create OpenAI model configuration
-            openai_model = OpenAIModel(
-                client_args={
-                    "api_key": os.getenv("OPENAI_API_KEY"),
-                },
+            openai_model = get_model(
                 model_id=model_id,
                 params=model_params
             )
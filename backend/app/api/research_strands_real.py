@@ -1,7 +1,7 @@
 """
 Research API using Strands Agents with Real Tools - Fixed version
 """
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Header, Query
 from fastapi.responses import StreamingResponse
 import asyncio
 from typing import Dict, Any, List, Optional
@@ -10,8 +10,9 @@ import asyncio
 import uuid
 import logging
 from datetime import datetime
+from collections import Counter
 from strands import Agent
-from strands.models.openai import OpenAIModel
+from app.services.model_client_factory import get_model
 from app.services.strands_session_service import StrandsSessionService
 from strands_tools import handoff_to_user
 from app.tools.tavily_search_tool import tavily_search, get_all_search_results, get_last_search_results, clear_search_results
@@ -20,6 +21,10 @@ from app.tools.research_synthesis_tool import research_synthesis
 from app.tools.research_verifier_tool import research_verifier
 from app.tools.simple_browser_tool import browse_and_capture, browse_multiple_sites, get_captured_screenshots, clear_screenshots
 from app.services.shared_state_service import SharedStateService
+from app.services.research_journal import ResearchSessionRegistry
+from app.services.research_scheduler import AdmissionError, PRIORITY_NORMAL, get_research_scheduler
+from app.services.link_checker import get_link_checker
+from app.core.config import settings
 from app.tools.use_llm_wrapper import use_llm_fixed, use_llm_with_model
 import os
 import json
@@ -29,8 +34,8 @@ from duckduckgo_search import DDGS
 router = APIRouter(prefix="/research", tags=["research-strands-real"])
 logger = logging.getLogger(__name__)
 
-# Store active research sessions
-research_sessions: Dict[str, Dict[str, Any]] = {}
+# Store active research sessions; mutations are journaled for delta streams
+research_sessions: Dict[str, Dict[str, Any]] = ResearchSessionRegistry()
 SESSION_SERVICE = StrandsSessionService()
 SHARED_STATE = SharedStateService()
 
@@ -246,6 +251,8 @@ class ResearchStartRequest(BaseModel):
     tone: Optional[str] = None
     model_provider: Optional[str] = None
     model_id: Optional[str] = None
+    user_id: Optional[str] = None  # fairness key for the research scheduler
+    priority: Optional[int] = None  # lower runs first
 
 class ResearchStatusResponse(BaseModel):
     session_id: str
@@ -260,21 +267,30 @@ class ResearchStatusResponse(BaseModel):
     requires_approval: Optional[bool] = False
     approval_message: Optional[str] = None
 
-def perform_strands_research(session_id: str, query: str, require_approval: bool = False):
+def _session_idle(session_id: str, session: Dict[str, Any]) -> bool:
+    """True when a session has no queued/running job and can be pruned"""
+    if session.get('status') not in TERMINAL_STATUSES:
+        return False
+    return get_research_scheduler().job_for_session(session_id) is None
+
+def perform_strands_research(
+    session_id: str,
+    query: str,
+    require_approval: bool = False,
+    user_id: Optional[str] = None,
+    priority: Optional[int] = None
+):
     """
     Perform research using Strands Agent with real tools and proper streaming
-    Run in a thread with its own event loop to avoid context issues
+    Queued on the research scheduler's worker pool; each worker thread keeps
+    its own event loop to avoid context issues. Raises AdmissionError when
+    the queue is full. Returns the scheduled job.
     """
-    def _run_research():
-        # Create a new event loop for this thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
+    async def _run_research():
         try:
-            # Run the async function in the new loop
-            loop.run_until_complete(_async_research_impl())
+            await _async_research_impl()
         finally:
-            loop.close()
+            research_sessions.prune(settings.RESEARCH_MAX_SESSIONS, _session_idle)
     
     async def _async_research_impl():
         session = research_sessions[session_id]
@@ -333,10 +349,7 @@ def perform_strands_research(session_id: str, query: str, require_approval: bool
             tool_input_buffers: Dict[str, Dict[str, Any]] = {}
             
             # Create OpenAI model configuration with higher token limit for deep analysis
-            openai_model = OpenAIModel(
-                client_args={
-                    "api_key": os.getenv("OPENAI_API_KEY"),
-                },
+            openai_model = get_model(
                 model_id="gpt-4o-mini",
                 params={
                     "max_tokens": 8000,  # Increased for deeper analysis
@@ -604,9 +617,10 @@ def perform_strands_research(session_id: str, query: str, require_approval: bool
                                     if len(new_shots) > prev_count:
                                         latest = new_shots[-1]
                                         # Attach OCR text to the matching source if possible
-                                        for s in session['sources']:
+                                        # Assign through the list so the change is journaled
+                                        for i, s in enumerate(session['sources']):
                                             if s.get('url') == top_url:
-                                                s['content'] = (latest.get('ocr_text') or '')[:1500]
+                                                session['sources'][i] = {**s, 'content': (latest.get('ocr_text') or '')[:1500]}
                                                 break
                                         # Push a lightweight screenshot event for UI (if it chooses to render)
                                         session.setdefault('events', []).append({
@@ -1605,9 +1619,28 @@ START NOW with Step 1 - Call use_llm_fixed FIRST for deep analysis of: {query}""
             session['status'] = 'error'
             session['error'] = str(e)
     
-    # Run the research in a separate thread to avoid event loop conflicts
-    thread = threading.Thread(target=_run_research)
-    thread.start()
+    # Run the research on the worker pool to avoid event loop conflicts
+    scheduler = get_research_scheduler()
+    job = scheduler.submit(
+        session_id,
+        _run_research,
+        user_id=user_id or 'anonymous',
+        priority=PRIORITY_NORMAL if priority is None else priority
+    )
+    position = scheduler.position(job.job_id)
+    if position:
+        research_sessions[session_id].setdefault('events', []).append({'type': 'queued', 'position': position, 'ts': datetime.now().isoformat()})
+    return job
+
+def _check_admission(user_id: Optional[str]):
+    """Refuse up front, before touching the session, when the queue is full"""
+    reason = get_research_scheduler().admission_error(user_id or 'anonymous')
+    if reason:
+        raise HTTPException(status_code=429, detail=reason)
+
+def _queue_position(session_id: str) -> Optional[int]:
+    job = get_research_scheduler().job_for_session(session_id)
+    return get_research_scheduler().position(job.job_id) if job else None
 
 def extract_domain(url: str) -> str:
     """Extract domain from URL"""
@@ -1626,6 +1659,7 @@ def extract_domain(url: str) -> str:
 async def start_research(request: ResearchStartRequest, background_tasks: BackgroundTasks):
     """Start a research session using Strands Agent with real tools"""
     session_id = request.session_id or str(uuid.uuid4())
+    _check_admission(request.user_id)
     
     # Initialize or reuse session (preserve context on explicit same session_id)
     if session_id in research_sessions:
@@ -1690,14 +1724,20 @@ async def start_research(request: ResearchStartRequest, background_tasks: Backgr
         logger.info(f"Session {session_id} context: messages={ctx.get('total_messages')} agents_used={ctx.get('agents_used')}")
     except Exception:
         pass
-    # Start research in a thread (not using background_tasks to avoid event loop issues)
-    perform_strands_research(session_id, request.query, request.require_approval)
+    # Start research on the worker pool (not using background_tasks to avoid event loop issues)
+    try:
+        job = perform_strands_research(session_id, request.query, request.require_approval, request.user_id, request.priority)
+    except AdmissionError as e:
+        research_sessions[session_id]['status'] = 'error'
+        research_sessions[session_id]['error'] = str(e)
+        raise HTTPException(status_code=429, detail=str(e))
     
     logger.info(f"Started Strands research session {session_id} for query: {request.query}")
     
     return {
         'session_id': session_id,
         'status': 'started',
+        'queue_position': get_research_scheduler().position(job.job_id),
         'message': 'Research started successfully'
     }
 
@@ -1715,6 +1755,7 @@ async def continue_research(request: ResearchStartRequest):
     session_id = request.session_id
     if session_id not in research_sessions:
         raise HTTPException(status_code=404, detail=f"Session not found: {session_id}")
+    _check_admission(request.user_id)
 
     # Reset/prepare minimal fields for a new pass while keeping history
     session = research_sessions[session_id]
@@ -1764,11 +1805,17 @@ async def continue_research(request: ResearchStartRequest):
     session['query'] = effective_query or user_q or prev_goal
     
     # Kick off another research pass without approval by default unless specified
-    perform_strands_research(session_id, effective_query, request.require_approval or False)
+    try:
+        job = perform_strands_research(session_id, effective_query, request.require_approval or False, request.user_id, request.priority)
+    except AdmissionError as e:
+        session['status'] = 'error'
+        session['error'] = str(e)
+        raise HTTPException(status_code=429, detail=str(e))
 
     return {
         'session_id': session_id,
         'status': 'continued',
+        'queue_position': get_research_scheduler().position(job.job_id),
         'message': 'Research continuation started successfully'
     }
 
@@ -1818,6 +1865,7 @@ async def get_research_status(session_id: str):
         "error": session.get('error'),
         "requires_approval": session.get('requires_approval', False),
         "approval_message": session.get('approval_message'),
+        "queue_position": _queue_position(clean_session_id),
         "messages": messages
     }
     
@@ -1862,49 +1910,114 @@ async def clear_all_sessions():
         logger.error(f"Failed to clear sessions: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to clear sessions: {str(e)}")
 
+TERMINAL_STATUSES = ('completed', 'error', 'cancelled')
+# Step changes made through aliases are only found by refresh(), so streams
+# re-check at least this often even without a wakeup
+STREAM_REFRESH_INTERVAL = 1.0
+STREAM_HEARTBEAT_INTERVAL = 15.0
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+
 @router.get("/stream-strands-real/{session_id}")
 async def stream_research(session_id: str):
     """Server-Sent Events stream for research session.
-    Emits periodic JSON snapshots to drive live UI without polling.
+    Emits a JSON snapshot whenever the session changes; the journal's
+    version tells us when, so unchanged sessions are never re-serialized.
     """
     if session_id not in research_sessions:
         raise HTTPException(status_code=404, detail=f"Session not found: {session_id}")
 
     async def event_gen():
-        last_serialized = None
+        last_version = None
         while True:
             session = research_sessions.get(session_id)
             if not session:
                 break
-            payload = {
-                'session_id': session_id,
-                'status': session.get('status'),
-                'progress': session.get('progress'),
-                'steps': session.get('steps', []),
-                'content': session.get('content', ''),
-                'sources': session.get('sources', []),
-                'sources_all': session.get('sources_all', []),
-                'thoughts': session.get('thoughts', []),
-                'timestamp': session.get('timestamp'),
-                'error': session.get('error')
-            }
-            import json
-            data_str = json.dumps(payload, ensure_ascii=False)
-            # Send only if changed or every 1s
-            if data_str != last_serialized:
-                yield f"data: {data_str}\n\n"
-                last_serialized = data_str
+            session.refresh()
+            journal = session.journal
+            if journal.version != last_version:
+                last_version = journal.version
+                snapshot = session.snapshot()['data']
+                payload = {'session_id': session_id, **snapshot}
+                yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
             # Stop when session completes or errors
-            if session.get('status') in ('completed', 'error', 'cancelled'):
+            if session.get('status') in TERMINAL_STATUSES:
                 break
-            await asyncio.sleep(1.0)
+            await journal.wait(last_version, STREAM_REFRESH_INTERVAL)
 
-    return StreamingResponse(event_gen(), media_type='text/event-stream')
+    return StreamingResponse(event_gen(), media_type='text/event-stream', headers=SSE_HEADERS)
+
+@router.get("/snapshot-strands-real/{session_id}")
+async def get_research_snapshot(session_id: str):
+    """Snapshot of the streamed fields plus the journal cursor it reflects.
+    Pass the cursor to stream-delta-strands-real to continue from here.
+    """
+    session = research_sessions.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail=f"Session not found: {session_id}")
+    snapshot = session.snapshot()
+    return {'session_id': session_id, 'cursor': snapshot['cursor'], **snapshot['data']}
+
+@router.get("/stream-delta-strands-real/{session_id}")
+async def stream_research_deltas(
+    session_id: str,
+    cursor: Optional[int] = Query(None, description="Journal cursor from a snapshot or earlier patch"),
+    last_event_id: Optional[str] = Header(None)
+):
+    """Incremental SSE stream for research session.
+    Sends a snapshot event when the client has no usable cursor, then patch
+    events carrying only the journaled changes (JSON Patch ops, plus "append"
+    for content growth). Each event's SSE id is its cursor, so a reconnecting
+    EventSource resumes where it left off.
+    """
+    if session_id not in research_sessions:
+        raise HTTPException(status_code=404, detail=f"Session not found: {session_id}")
+    if cursor is None and last_event_id and last_event_id.isdigit():
+        cursor = int(last_event_id)
+
+    async def event_gen():
+        position = cursor
+        idle = 0.0
+        while True:
+            session = research_sessions.get(session_id)
+            if not session:
+                break
+            journal = session.journal
+            version = journal.version
+            session.refresh()
+            deltas = journal.since(position) if position is not None else None
+            if deltas is None:
+                snapshot = session.snapshot()
+                position = snapshot['cursor']
+                event = {'type': 'snapshot', 'session_id': session_id, 'cursor': position, 'data': snapshot['data']}
+                yield f"id: {position}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+                idle = 0.0
+            elif deltas:
+                position = deltas[-1]['seq']
+                ops = [{k: v for k, v in delta.items() if k != 'seq'} for delta in deltas]
+                event = {'type': 'patch', 'cursor': position, 'ops': ops}
+                yield f"id: {position}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+                idle = 0.0
+            elif idle >= STREAM_HEARTBEAT_INTERVAL:
+                yield "data: {\"type\":\"heartbeat\"}\n\n"
+                idle = 0.0
+            if session.get('status') in TERMINAL_STATUSES and position == journal.seq:
+                break
+            if not await journal.wait(version, STREAM_REFRESH_INTERVAL):
+                idle += STREAM_REFRESH_INTERVAL
+
+    return StreamingResponse(event_gen(), media_type='text/event-stream', headers=SSE_HEADERS)
 
 @router.get("/stream-events-strands-real/{session_id}")
 async def stream_research_events(session_id: str):
     """Typed SSE event stream for research session (phase/tool/content/sources).
-    Sends heartbeat events if no new events are available to keep the connection alive.
+    Wakes as soon as an event is appended and sends heartbeat events while
+    idle to keep the connection alive.
     """
     if session_id not in research_sessions:
         raise HTTPException(status_code=404, detail=f"Session not found: {session_id}")
@@ -1915,29 +2028,21 @@ async def stream_research_events(session_id: str):
             session = research_sessions.get(session_id)
             if not session:
                 break
+            version = session.journal.version
             events = session.get('events', [])
             # Flush any pending events
-            flushed = False
             while last_idx < len(events):
-                import json
                 evt = events[last_idx]
                 yield f"data: {json.dumps(evt, ensure_ascii=False)}\n\n"
                 last_idx += 1
-                flushed = True
-            if not flushed:
-                # Heartbeat to keep the stream alive
-                yield "data: {\"type\":\"heartbeat\"}\n\n"
             # Stop when complete and nothing left to flush
-            if session.get('status') in ('completed', 'error', 'cancelled') and last_idx >= len(events):
+            if session.get('status') in TERMINAL_STATUSES and last_idx >= len(events):
                 break
-            await asyncio.sleep(1.0)
+            if not await session.journal.wait(version, STREAM_HEARTBEAT_INTERVAL):
+                # Heartbeat to keep the stream alive
+                yield "data: {\"type\":\"heartbeat\"}\n\n"
 
-    headers = {
-        "Cache-Control": "no-cache",
-        "Connection": "keep-alive",
-        "X-Accel-Buffering": "no",
-    }
-    return StreamingResponse(event_gen(), media_type='text/event-stream', headers=headers)
+    return StreamingResponse(event_gen(), media_type='text/event-stream', headers=SSE_HEADERS)
 
 @router.post("/verify-strands-real/{session_id}")
 async def verify_research(session_id: str):
@@ -1993,7 +2098,12 @@ async def approve_research(session_id: str, approval: Dict[str, Any], background
         session['content'] = ''
         
         # Restart research with enhanced query (directly, not using background_tasks)
-        perform_strands_research(session_id, enhanced_query, False)  # Don't ask for approval again
+        try:
+            perform_strands_research(session_id, enhanced_query, False, approval.get('user_id'))  # Don't ask for approval again
+        except AdmissionError as e:
+            session['status'] = 'error'
+            session['error'] = str(e)
+            raise HTTPException(status_code=429, detail=str(e))
         
         return {
             'session_id': session_id,
@@ -2009,6 +2119,11 @@ async def approve_research(session_id: str, approval: Dict[str, Any], background
             'message': 'Research cancelled by user'
         }
 
+@router.get("/scheduler-stats-strands-real")
+async def research_scheduler_stats():
+    """Queue depth, run/wait times and worker utilization of the research scheduler"""
+    return get_research_scheduler().get_stats()
+
 @router.get("/health-strands-real")
 async def health_check():
     """Health check for Strands research with real tools"""
@@ -2023,6 +2138,7 @@ async def health_check():
         'status': 'healthy',
         'service': 'research-strands-real',
         'active_sessions': len(research_sessions),
+        'scheduler': get_research_scheduler().get_stats(),
         'backend': 'Strands Agents SDK',
         'tools_available': tools_available,
         'api_keys_configured': {
@@ -2146,11 +2262,10 @@ async def model_test(req: Dict[str, Any]):
     try:
         if provider == 'openai':
             from strands import Agent
-            from strands.models.openai import OpenAIModel
             key_ok = bool(os.getenv('OPENAI_API_KEY'))
             if not key_ok:
                 return { 'ok': False, 'provider': provider, 'model_id': model_id, 'reason': 'OPENAI_API_KEY missing' }
-            model = OpenAIModel(model_id=model_id, params={ 'temperature': 0.1, 'max_tokens': 64 })
+            model = get_model(model_id=model_id, params={ 'temperature': 0.1, 'max_tokens': 64 })
             agent = Agent(model=model, system_prompt='You are a ping utility.')
             text = agent('Respond with OK only.')
             ok = isinstance(text, str) and ('OK' in text.upper())
@@ -2287,46 +2402,66 @@ async def cancel_research(session_id: str):
     sess.setdefault('events', []).append({'type': 'cancel_requested', 'ts': datetime.now().isoformat()})
     return { 'status': 'ok', 'message': 'Cancellation requested' }
 
+def _session_link_urls(session: Dict[str, Any]) -> List[str]:
+    """Source URLs of a session, one per source (duplicates included)"""
+    return [s.get('url') for s in (session.get('sources') or []) if isinstance(s, dict) and s.get('url')]
+
+async def _check_session_links(session: Dict[str, Any], urls: List[str]):
+    """Yield a link_status event per distinct URL as results arrive, recording each on the session"""
+    async for status in get_link_checker().check_many(urls):
+        event = {
+            'type': 'link_status',
+            'url': status.url,
+            'ok': status.ok,
+            'status_code': status.status_code,
+            'error': status.error,
+            'cached': status.cached,
+            'ts': datetime.now().isoformat()
+        }
+        session.setdefault('events', []).append(event)
+        yield event
+
 @router.post("/check-links-strands-real/{session_id}")
 async def check_links(session_id: str):
-    """Check all source links for validity and emit link_status events."""
+    """Check all source links for validity and emit link_status events.
+    Links are checked concurrently; each event is appended as soon as its
+    result is known, so stream-events clients see them live.
+    """
     if session_id not in research_sessions:
         raise HTTPException(status_code=404, detail=f"Session not found: {session_id}")
     session = research_sessions[session_id]
-    sources = session.get('sources') or []
-    if not sources:
+    if not session.get('sources'):
         return { 'checked': 0 }
-    import requests as _req
+    # checked and ok count source links, as before; a URL shared by several sources is fetched once
+    urls = _session_link_urls(session)
+    per_url = Counter(urls)
     ok = 0
-    total = 0
-    for s in sources:
-        url = s.get('url')
-        if not url:
-            continue
-        total += 1
-        status_code = None
-        is_ok = False
-        try:
-            resp = _req.head(url, allow_redirects=True, timeout=5)
-            status_code = resp.status_code
-            is_ok = 200 <= status_code < 400
-            if not is_ok:
-                # Try GET fallback
-                resp = _req.get(url, allow_redirects=True, timeout=8)
-                status_code = resp.status_code
-                is_ok = 200 <= status_code < 400
-        except Exception:
-            is_ok = False
-        if is_ok:
-            ok += 1
-        session.setdefault('events', []).append({
-            'type': 'link_status',
-            'url': url,
-            'ok': bool(is_ok),
-            'status_code': status_code,
-            'ts': datetime.now().isoformat()
-        })
-    return { 'checked': total, 'ok': ok }
+    unique = 0
+    async for event in _check_session_links(session, urls):
+        unique += 1
+        if event['ok']:
+            ok += per_url[event['url']]
+    return { 'checked': len(urls), 'unique_checked': unique, 'ok': ok }
+
+@router.get("/check-links-stream-strands-real/{session_id}")
+async def check_links_stream(session_id: str):
+    """Same as check-links, but streams each link_status event over SSE as it arrives"""
+    if session_id not in research_sessions:
+        raise HTTPException(status_code=404, detail=f"Session not found: {session_id}")
+    session = research_sessions[session_id]
+
+    async def event_gen():
+        urls = _session_link_urls(session)
+        per_url = Counter(urls)
+        ok = 0
+        unique = 0
+        async for event in _check_session_links(session, urls):
+            unique += 1
+            ok += per_url[event['url']] if event['ok'] else 0
+            yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        yield f"data: {json.dumps({'type': 'link_check_done', 'checked': len(urls), 'unique_checked': unique, 'ok': ok})}\n\n"
+
+    return StreamingResponse(event_gen(), media_type='text/event-stream', headers=SSE_HEADERS)
 
 @router.get("/session-debug-strands-real/{session_id}")
 async def session_debug(session_id: str):
@@ -945,7 +945,7 @@ async def stream_swarm_events(
             yield f"data: {json.dumps(event_data)}\n\n"
         
         # Stream new events as they occur
-        last_index = len(global_event_bus.event_history)
+        last_index = global_event_bus.total_events
         keepalive_counter = 0
         
         while True:
@@ -953,9 +953,9 @@ async def stream_swarm_events(
             keepalive_counter += 1
             
             # Check for new events
-            current_events = global_event_bus.event_history
-            if len(current_events) > last_index:
-                for event in current_events[last_index:]:
+            current_events, next_index = global_event_bus.get_events_since(last_index)
+            if current_events:
+                for event in current_events:
                     event_data = {
                         'id': event.id,
                         'type': event.type,
@@ -964,7 +964,7 @@ async def stream_swarm_events(
                         'timestamp': event.timestamp
                     }
                     yield f"data: {json.dumps(event_data)}\n\n"
-                last_index = len(current_events)
+                last_index = next_index
                 keepalive_counter = 0
             
             # Send keepalive every 30 seconds
@@ -1127,7 +1127,7 @@ async def stream_swarm_events_test():
             yield f"data: {json.dumps(event_data)}\n\n"
         
         # Stream new events as they occur
-        last_index = len(global_event_bus.event_history)
+        last_index = global_event_bus.total_events
         keepalive_counter = 0
         
         while True:
@@ -1135,10 +1135,10 @@ async def stream_swarm_events_test():
             keepalive_counter += 1
             
             # Check for new events
-            current_events = global_event_bus.event_history
-            if len(current_events) > last_index:
-                logger.info(f"[TEST] Sending {len(current_events) - last_index} new events")
-                for event in current_events[last_index:]:
+            current_events, next_index = global_event_bus.get_events_since(last_index)
+            if current_events:
+                logger.info(f"[TEST] Sending {len(current_events)} new events")
+                for event in current_events:
                     event_data = {
                         'id': event.id,
                         'type': event.type,
@@ -1147,7 +1147,7 @@ async def stream_swarm_events_test():
                         'timestamp': event.timestamp
                     }
                     yield f"data: {json.dumps(event_data)}\n\n"
-                last_index = len(current_events)
+                last_index = next_index
                 keepalive_counter = 0
             
             # Send keepalive every 10 seconds for testing
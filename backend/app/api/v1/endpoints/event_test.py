@@ -44,6 +44,18 @@ async def test_event_system():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/listener-stats")
+async def get_listener_stats():
+    """Per-listener latency, timeout and error counters for the global event bus"""
+    return {
+        "max_concurrency": global_event_bus.max_concurrency,
+        "listener_timeout": global_event_bus.listener_timeout,
+        "total_events": global_event_bus.total_events,
+        "history_size": len(global_event_bus.event_history),
+        "listeners": global_event_bus.get_listener_stats()
+    }
+
+
 @router.post("/emit")
 async def emit_test_event(event_type: str, data: dict):
     """Emit a test event"""
@@ -9,6 +9,7 @@ from datetime import datetime
 
 from app.services.event_bus import event_bus
 from app.services.agent_memory_store import get_memory_store
+from app.services.pending_interactions import get_pending_interactions
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -34,6 +35,22 @@ class HumanResponseModel(BaseModel):
     response_text: Optional[str] = None
     timestamp: str
 
+def _response_payload(interaction_type: Optional[str], response: HumanResponseModel) -> Dict[str, Any]:
+    """What the waiting agent receives; every field when the type isn't known here"""
+    payload: Dict[str, Any] = {"timestamp": response.timestamp}
+    if interaction_type in (None, "question"):
+        payload["answer"] = response.response_text or ""
+    if interaction_type in (None, "approval"):
+        payload.update({
+            "response": response.response_type,
+            "instructions": response.response_text,
+            "approved": response.response_type == "approve",
+        })
+    if interaction_type in (None, "handoff"):
+        payload["instructions"] = response.response_text or ""
+        payload["continue"] = response.response_type == "approve"
+    return payload
+
 # Event listeners for human interactions
 async def handle_human_question(event):
     """Handle human question events"""
@@ -97,6 +114,15 @@ event_bus.on("human.approval.needed", handle_approval_request)
 event_bus.on("human.handoff.requested", handle_handoff_request)
 logger.info("✅ Human-in-the-loop event handlers registered successfully!")
 
+@router.get("/stats")
+async def get_human_loop_stats() -> Dict[str, Any]:
+    """How approval decisions were reached, and what is waiting on a human"""
+    from app.services.approval_classifier import get_approval_classifier
+    return {
+        "approval_classifier": get_approval_classifier().get_stats(),
+        "pending_interactions": get_pending_interactions().get_stats(),
+    }
+
 @router.get("/human-interactions/{execution_id}")
 async def get_human_interactions(execution_id: str) -> List[HumanInteractionModel]:
     """Get all human interactions for an execution"""
@@ -142,6 +168,9 @@ async def submit_human_response(response: HumanResponseModel, background_tasks:
         interaction_id = response.interaction_id
         
         if interaction_id not in _pending_interactions:
+            # The asking agent may be waiting in another API process
+            if get_pending_interactions().resolve(interaction_id, _response_payload(None, response)):
+                return {"status": "success", "message": "Response relayed"}
             raise HTTPException(status_code=404, detail="Interaction not found")
         
         interaction = _pending_interactions[interaction_id]
@@ -156,12 +185,16 @@ async def submit_human_response(response: HumanResponseModel, background_tasks:
         # Mark interaction as responded
         interaction["status"] = "responded"
         
+        # Wake the waiting agent
+        payload = _response_payload(interaction["type"], response)
+        get_pending_interactions().resolve(interaction_id, payload)
+        
         # Emit appropriate response event based on interaction type
         if interaction["type"] == "question":
             await event_bus.emit(
                 f"human.response.{interaction_id}",
                 {
-                    "answer": response.response_text or "",
+                    "answer": payload["answer"],
                     "timestamp": response.timestamp
                 },
                 source="human"
@@ -171,21 +204,21 @@ async def submit_human_response(response: HumanResponseModel, background_tasks:
             await event_bus.emit(
                 f"human.approval.response.{interaction_id}",
                 {
-                    "response": response.response_type,
-                    "instructions": response.response_text,
-                    "approved": response.response_type == "approve",
+                    "response": payload["response"],
+                    "instructions": payload["instructions"],
+                    "approved": payload["approved"],
                     "timestamp": response.timestamp
                 },
                 source="human"
             )
             
         elif interaction["type"] == "handoff":
-            if response.response_type == "approve":
+            if payload["continue"]:
                 # Continue with instructions
                 await event_bus.emit(
                     f"human.handoff.continue.{interaction_id}",
                     {
-                        "instructions": response.response_text or "",
+                        "instructions": payload["instructions"],
                         "timestamp": response.timestamp
                     },
                     source="human"
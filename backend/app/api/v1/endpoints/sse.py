@@ -5,7 +5,7 @@ import asyncio
 import structlog
 from datetime import datetime
 import uuid
-from typing import AsyncGenerator, Dict, Any, List, Optional
+from typing import AsyncGenerator, Dict, Any, List, Optional, Tuple
 from collections import defaultdict
 import time
 
@@ -20,23 +20,35 @@ except ImportError:
 from app.config import settings
 from app.services.swarm_service import SwarmService
 from app.services.enhanced_swarm_service import EnhancedSwarmService
+from app.services.sse_broadcaster import ExecutionStream, SSEBroadcaster, Subscriber
 from app.schemas.swarm import SwarmExecutionRequest
 from app.core.security import get_current_user
 
 logger = structlog.get_logger()
 router = APIRouter()
 
+TERMINAL_STATUSES = ("completed", "failed", "stopped")
+
+
 class SSEManager:
-    """FIXED SSE manager for ZERO-LATENCY real-time streaming like ChatGPT"""
+    """SSE manager fanning each execution out to many independent subscribers"""
 
     def __init__(self):
-        self.execution_queues: Dict[str, asyncio.Queue] = {}
+        self.broadcaster = SSEBroadcaster(
+            capacity=settings.SSE_RING_BUFFER_SIZE,
+            max_spilled_tokens=settings.SSE_MAX_SPILLED_TOKENS
+        )
         self.active_connections: Dict[str, int] = defaultdict(int)
         self.execution_status: Dict[str, str] = {}
         self.redis_client: Optional[redis.Redis] = None
         self.redis_enabled = False
         self._redis_initialized = False
 
+    async def _ensure_redis(self):
+        if not self._redis_initialized:
+            self._redis_initialized = True
+            await self._init_redis()
+
     async def _init_redis(self):
         """Initialize Redis connection if available"""
         if not REDIS_AVAILABLE:
@@ -58,75 +70,111 @@ class SSEManager:
             logger.warning(f"Redis not available, using memory queues: {e}")
             self.redis_enabled = False
 
-    async def add_connection(self, execution_id: str) -> asyncio.Queue:
-        """Add a new connection for an execution - IMMEDIATE"""
-        if execution_id not in self.execution_queues:
-            # CRITICAL: Use unbounded queue for zero blocking
-            self.execution_queues[execution_id] = asyncio.Queue(maxsize=0)
+    async def _get_stream(self, execution_id: str) -> ExecutionStream:
+        """Get the ring for an execution, continuing sequence numbers from Redis"""
+        stream = self.broadcaster.get_stream(execution_id)
+        if stream is not None:
+            return stream
+
+        start_seq = 0
+        await self._ensure_redis()
+        if self.redis_enabled and self.redis_client:
+            try:
+                start_seq = await self.redis_client.llen(f"sse:events:{execution_id}")
+            except Exception as e:
+                logger.warning(f"Failed to read cached event count: {e}")
+        # Another coroutine may have created the stream while we awaited Redis
+        return self.broadcaster.ensure_stream(execution_id, start_seq)
+
+    async def add_connection(
+        self,
+        execution_id: str,
+        last_event_id: Optional[int] = None
+    ) -> Tuple[Subscriber, List[Tuple[int, dict]]]:
+        """Subscribe a new connection and return it with any backlog to replay.
+
+        Frames still in the ring are delivered through the subscriber; anything
+        older is read from the Redis cache.
+        """
+        await self._get_stream(execution_id)
+        subscriber, first_seq = self.broadcaster.subscribe(execution_id, last_event_id)
+
+        backlog: List[Tuple[int, dict]] = []
+        after = last_event_id + 1 if last_event_id is not None and last_event_id >= 0 else 0
+        if after < first_seq:
+            backlog = await self.get_cached_events(execution_id, after, first_seq)
 
         self.active_connections[execution_id] += 1
-        logger.info(f"IMMEDIATE SSE connection for {execution_id}, total: {self.active_connections[execution_id]}")
-        return self.execution_queues[execution_id]
+        logger.info(f"SSE connection for {execution_id}, total: {self.active_connections[execution_id]}")
+        return subscriber, backlog
 
-    async def remove_connection(self, execution_id: str):
+    async def remove_connection(self, execution_id: str, subscriber: Subscriber):
         """Remove a connection for an execution"""
+        subscriber.close()
         self.active_connections[execution_id] -= 1
         if self.active_connections[execution_id] <= 0:
             self.active_connections.pop(execution_id, None)
-            # Clean up queue after short delay to allow final events
-            asyncio.create_task(self._cleanup_queue_delayed(execution_id))
+            # Keep the ring briefly so reconnecting clients can resume from memory
+            delay = 5 if self.get_status(execution_id) in TERMINAL_STATUSES else 300
+            asyncio.create_task(self._cleanup_stream_delayed(execution_id, delay))
 
         logger.info(f"SSE connection removed for {execution_id}, remaining: {self.active_connections.get(execution_id, 0)}")
 
-    async def _cleanup_queue_delayed(self, execution_id: str):
-        """Clean up queue after a delay"""
-        await asyncio.sleep(5)  # REDUCED cleanup delay for faster cleanup
-        if execution_id in self.execution_queues and self.active_connections.get(execution_id, 0) == 0:
-            del self.execution_queues[execution_id]
-            logger.info(f"Cleaned up queue for {execution_id}")
+    async def _cleanup_stream_delayed(self, execution_id: str, delay: float):
+        """Drop the ring for an execution once nobody has watched it for a while"""
+        await asyncio.sleep(delay)
+        stream = self.broadcaster.get_stream(execution_id)
+        if stream is None or self.active_connections.get(execution_id, 0) > 0:
+            return
+        finished = self.get_status(execution_id) in TERMINAL_STATUSES
+        if finished or time.time() - stream.last_publish >= delay:
+            if self.broadcaster.remove_stream(execution_id):
+                logger.info(f"Cleaned up event buffer for {execution_id}")
 
     async def broadcast_event(self, execution_id: str, event: dict):
-        """CRITICAL FIX: Broadcast event with ZERO delay"""
-        # Initialize Redis if not done yet
-        if not self._redis_initialized:
-            await self._init_redis()
-            self._redis_initialized = True
+        """Publish an event to the execution ring and wake every subscriber"""
+        stream = await self._get_stream(execution_id)
+        seq = stream.publish(event)
 
         # Store in Redis for replay capability (non-blocking)
         if self.redis_enabled and self.redis_client:
-            asyncio.create_task(self._cache_event_async(execution_id, event))
+            asyncio.create_task(self._cache_event_async(execution_id, seq, event))
 
-        # CRITICAL: IMMEDIATE broadcast to queue with zero delay
-        if execution_id in self.execution_queues:
-            queue = self.execution_queues[execution_id]
-            try:
-                # IMMEDIATE non-blocking put for zero latency
-                queue.put_nowait(event)
-                logger.debug(f"IMMEDIATE event sent for {execution_id}: {event.get('type')}")
-            except asyncio.QueueFull:
-                # This shouldn't happen with unbounded queue, but handle it
-                logger.warning(f"Queue full for {execution_id}, creating new immediate queue")
-                self.execution_queues[execution_id] = asyncio.Queue(maxsize=0)
-                self.execution_queues[execution_id].put_nowait(event)
-
-    async def _cache_event_async(self, execution_id: str, event: dict):
+    async def _cache_event_async(self, execution_id: str, seq: int, event: dict):
         """Cache event in Redis asynchronously"""
         try:
             event_key = f"sse:events:{execution_id}"
-            await self.redis_client.rpush(event_key, json.dumps(event))
+            await self.redis_client.rpush(event_key, json.dumps({"id": seq, "event": event}))
             await self.redis_client.expire(event_key, 1800)  # 30 minutes
         except Exception as e:
             logger.warning(f"Failed to cache event in Redis: {e}")
 
-    async def get_cached_events(self, execution_id: str) -> List[dict]:
-        """Get cached events from Redis"""
+    async def get_cached_events(
+        self,
+        execution_id: str,
+        start_seq: int = 0,
+        end_seq: Optional[int] = None
+    ) -> List[Tuple[int, dict]]:
+        """Get cached (seq, event) pairs from Redis with start_seq <= seq < end_seq"""
+        await self._ensure_redis()
         if not self.redis_enabled or not self.redis_client:
             return []
 
         try:
             event_key = f"sse:events:{execution_id}"
-            events = await self.redis_client.lrange(event_key, 0, -1)
-            return [json.loads(event) for event in events]
+            # Entries are appended in sequence order, so the list index is a
+            # good lower bound for the seq we are looking for
+            raw_events = await self.redis_client.lrange(event_key, max(0, start_seq - 16), -1)
+            events = []
+            for raw in raw_events:
+                entry = json.loads(raw)
+                if not isinstance(entry, dict) or "id" not in entry or "event" not in entry:
+                    continue
+                seq = entry["id"]
+                if seq >= start_seq and (end_seq is None or seq < end_seq):
+                    events.append((seq, entry["event"]))
+            events.sort(key=lambda item: item[0])
+            return events
         except Exception as e:
             logger.warning(f"Failed to get cached events: {e}")
             return []
@@ -138,10 +186,25 @@ class SSEManager:
     def set_status(self, execution_id: str, status: str):
         """Set execution status"""
         self.execution_status[execution_id] = status
+        if status in TERMINAL_STATUSES and not self.active_connections.get(execution_id):
+            asyncio.create_task(self._cleanup_stream_delayed(execution_id, 5))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-execution buffer and subscriber statistics"""
+        return self.broadcaster.stats()
 
 # Global SSE manager
 sse_manager = SSEManager()
 
+
+def _parse_last_event_id(value: Optional[str]) -> Optional[int]:
+    """Event ids are per-execution sequence numbers; ignore anything else"""
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
 @router.get("/events/{execution_id}")
 async def stream_execution_events(
     request: Request,
@@ -149,9 +212,13 @@ async def stream_execution_events(
 ):
     """FIXED SSE streaming for ZERO-LATENCY real-time experience"""
 
+    last_event_id = _parse_last_event_id(
+        request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+    )
+
     async def event_generator() -> AsyncGenerator[Dict[str, Any], None]:
-        """Generate SSE events with ZERO delay - maximum responsiveness"""
-        queue = await sse_manager.add_connection(execution_id)
+        """Generate SSE events from this connection's own cursor into the execution ring"""
+        subscriber, backlog = await sse_manager.add_connection(execution_id, last_event_id)
 
         try:
             # Send IMMEDIATE connection confirmation
@@ -160,27 +227,26 @@ async def stream_execution_events(
                     "type": "connection_established",
                     "execution_id": execution_id,
                     "timestamp": datetime.utcnow().isoformat(),
-                    "message": "Real-time connection established"
+                    "message": "Real-time connection established",
+                    "resumed_from": last_event_id
                 }),
                 event="message",
                 retry=500  # FASTER retry on disconnect
             )
 
-            # Check for cached events and replay them IMMEDIATELY
-            cached_events = await sse_manager.get_cached_events(execution_id)
-            if cached_events:
-                logger.info(f"Replaying {len(cached_events)} cached events IMMEDIATELY for {execution_id}")
-                for event in cached_events:
+            # Replay events that already left the in-memory ring from Redis
+            if backlog:
+                logger.info(f"Replaying {len(backlog)} cached events for {execution_id}")
+                for seq, event in backlog:
                     yield ServerSentEvent(
                         data=json.dumps(event),
                         event="message",
-                        id=str(int(time.time() * 1000000))  # Microsecond precision
+                        id=str(seq)
                     )
-                    # NO DELAY - send cached events as fast as possible
 
             # Check execution status
             status = sse_manager.get_status(execution_id)
-            if status in ["completed", "failed", "stopped"]:
+            if status in TERMINAL_STATUSES:
                 logger.info(f"Execution {execution_id} already {status}")
                 yield ServerSentEvent(
                     data=json.dumps({
@@ -192,52 +258,39 @@ async def stream_execution_events(
                     event="message"
                 )
 
-            # CRITICAL FIX: Main event loop optimized for ZERO-LATENCY streaming
-            last_heartbeat = time.time()
-            heartbeat_interval = 25  # Reduced heartbeat interval
+            heartbeat_interval = 25
+            finished = False
 
-            while True:
-                # IMMEDIATE disconnect check
+            while not finished:
                 if await request.is_disconnected():
                     logger.info(f"Client disconnected from {execution_id}")
                     break
 
-                try:
-                    # CRITICAL: Use MINIMAL timeout for maximum responsiveness
-                    event = await asyncio.wait_for(queue.get(), timeout=0.001)  # 1ms timeout!
+                # Sleep until the broadcaster publishes, heartbeat if it stays quiet
+                batch = await subscriber.next_batch(timeout=heartbeat_interval)
+                if not batch:
+                    yield ServerSentEvent(
+                        data=json.dumps({
+                            "type": "heartbeat",
+                            "timestamp": datetime.utcnow().isoformat()
+                        }),
+                        event="heartbeat"
+                    )
+                    continue
 
-                    # IMMEDIATE event transmission with zero processing delay
+                for seq, event in batch:
                     yield ServerSentEvent(
                         data=json.dumps(event),
                         event="message",
-                        id=str(int(time.time() * 1000000)),  # Microsecond precision ID
+                        id=str(seq),
                         retry=500  # Fast retry
                     )
 
-                    # Reset heartbeat timer
-                    last_heartbeat = time.time()
-
-                    # IMMEDIATE completion check
                     if event.get("type") in ["execution_completed", "execution_failed", "execution_stopped"]:
                         logger.info(f"Execution {execution_id} finished with {event.get('type')}")
-                        # Very brief delay then close
-                        await asyncio.sleep(0.1)
+                        finished = True
                         break
 
-                except asyncio.TimeoutError:
-                    # Only send heartbeat if it's been a while
-                    current_time = time.time()
-                    if current_time - last_heartbeat > heartbeat_interval:
-                        yield ServerSentEvent(
-                            data=json.dumps({
-                                "type": "heartbeat",
-                                "timestamp": datetime.utcnow().isoformat()
-                            }),
-                            event="heartbeat"
-                        )
-                        last_heartbeat = current_time
-                    continue
-
         except asyncio.CancelledError:
             logger.info(f"SSE stream cancelled for {execution_id}")
             raise
@@ -252,7 +305,7 @@ async def stream_execution_events(
                 event="error"
             )
         finally:
-            await sse_manager.remove_connection(execution_id)
+            await sse_manager.remove_connection(execution_id, subscriber)
 
     # Return EventSourceResponse optimized for ZERO-LATENCY streaming
     return EventSourceResponse(
@@ -394,6 +447,11 @@ async def stop_execution_stream(
 
     return {"stopped": stopped, "execution_id": execution_id}
 
+@router.get("/stats")
+async def get_sse_stats():
+    """Ring buffer and per-subscriber lag statistics for every execution"""
+    return sse_manager.get_stats()
+
 @router.options("/events/{execution_id}")
 async def options_events(execution_id: str):
     """CORS preflight with optimized headers"""
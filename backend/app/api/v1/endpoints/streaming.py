@@ -17,6 +17,7 @@ from app.services.enhanced_swarm_service import EnhancedSwarmService
 from app.services.realtime_swarm_service import RealtimeSwarmService
 from app.services.strands_session_service import get_strands_session_service
 from app.services.shared_state_service import SharedStateService
+from app.services.token_coalescer import CoalescePolicy, TokenBatch, TokenCoalescer
 from fastapi.responses import StreamingResponse
 import io
 import zipfile
@@ -33,10 +34,118 @@ _live_sse_sessions: Dict[str, Dict[str, Any]] = {}
 _services_by_session: Dict[str, Any] = {}
 logger = structlog.get_logger()
 
+class SessionWatcher:
+    """Lets a long-poll sleep until its session gets a new chunk or update"""
+
+    def __init__(self, notifier: "SessionNotifier", session_id: str):
+        self.notifier = notifier
+        self.session_id = session_id
+        self.event = asyncio.Event()
+
+    async def __aenter__(self) -> "SessionWatcher":
+        await self.notifier.register(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.notifier.unregister(self)
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait for a notification; returns False on timeout"""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.event.clear()
+
+
+class SessionNotifier:
+    """In-process fan-out of session change notifications to waiting pollers"""
+
+    def __init__(self):
+        self.watchers: Dict[str, set] = {}
+
+    def watch(self, session_id: str) -> SessionWatcher:
+        return SessionWatcher(self, session_id)
+
+    async def register(self, watcher: SessionWatcher):
+        self.watchers.setdefault(watcher.session_id, set()).add(watcher)
+
+    async def unregister(self, watcher: SessionWatcher):
+        watchers = self.watchers.get(watcher.session_id)
+        if watchers is not None:
+            watchers.discard(watcher)
+            if not watchers:
+                self.watchers.pop(watcher.session_id, None)
+
+    def notify(self, session_id: str):
+        for watcher in self.watchers.get(session_id, ()):
+            watcher.event.set()
+
+
+class RedisSessionNotifier(SessionNotifier):
+    """Session notifier bridged over Redis pub/sub so any instance can wake a poller"""
+
+    CHANNEL_PREFIX = "stream_notify:"
+
+    def __init__(self, storage: "RedisSessionStorage"):
+        super().__init__()
+        self.storage = storage
+        self.pubsub = None
+        self.reader_task: Optional[asyncio.Task] = None
+
+    def channel(self, session_id: str) -> str:
+        return f"{self.CHANNEL_PREFIX}{session_id}"
+
+    async def register(self, watcher: SessionWatcher):
+        first = watcher.session_id not in self.watchers
+        await super().register(watcher)
+        if not first:
+            return
+        try:
+            await self.storage._ensure_initialized()
+            if self.pubsub is None:
+                self.pubsub = self.storage.redis.pubsub()
+            await self.pubsub.subscribe(self.channel(watcher.session_id))
+            if self.reader_task is None or self.reader_task.done():
+                self.reader_task = asyncio.create_task(self._reader_loop())
+        except Exception as e:
+            # Pollers still wake on local appends and on their own timeout
+            logger.warning(f"Redis notify subscribe failed for {watcher.session_id[:8]}: {e}")
+
+    async def unregister(self, watcher: SessionWatcher):
+        await super().unregister(watcher)
+        if watcher.session_id in self.watchers or self.pubsub is None:
+            return
+        try:
+            await self.pubsub.unsubscribe(self.channel(watcher.session_id))
+        except Exception as e:
+            logger.warning(f"Redis notify unsubscribe failed for {watcher.session_id[:8]}: {e}")
+
+    async def _reader_loop(self):
+        """Single reader per process dispatching pub/sub messages to local watchers"""
+        prefix_len = len(self.CHANNEL_PREFIX)
+        while self.watchers:
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message and message.get("type") == "message":
+                    self.notify(message["channel"][prefix_len:])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Redis notify reader error: {e}")
+                await asyncio.sleep(1.0)
+
+
 # Session storage interface
 class SessionStorage:
     """Abstract session storage interface"""
 
+    def watch(self, session_id: str) -> SessionWatcher:
+        """Async context manager whose wait() returns when the session changes"""
+        raise NotImplementedError
+
     async def get(self, session_id: str) -> Optional[Dict]:
         raise NotImplementedError
 
@@ -59,6 +168,10 @@ class InMemorySessionStorage(SessionStorage):
     def __init__(self):
         self.sessions: Dict[str, Dict] = {}
         self.cleanup_task = None
+        self.notifier = SessionNotifier()
+
+    def watch(self, session_id: str) -> SessionWatcher:
+        return self.notifier.watch(session_id)
 
     async def get(self, session_id: str) -> Optional[Dict]:
         session = self.sessions.get(session_id)
@@ -77,9 +190,11 @@ class InMemorySessionStorage(SessionStorage):
         # Start cleanup task if not running
         if not self.cleanup_task:
             self.cleanup_task = asyncio.create_task(self._cleanup_loop())
+        self.notifier.notify(session_id)
 
     async def delete(self, session_id: str):
         self.sessions.pop(session_id, None)
+        self.notifier.notify(session_id)
 
     async def append_chunk(self, session_id: str, chunk: Dict):
         try:
@@ -108,6 +223,7 @@ class InMemorySessionStorage(SessionStorage):
                 # Update metrics safely
                 if "metrics" in session:
                     session["metrics"]["chunk_count"] = len(session["chunks"])
+                self.notifier.notify(session_id)
             else:
                 logger.warning(f"❌ Session {session_id[:8]} not found when appending chunk type={chunk.get('type', 'unknown')}")
                 logger.warning(f"❌ Available sessions: {list(self.sessions.keys())[:5]}")
@@ -201,6 +317,18 @@ class RedisSessionStorage(SessionStorage):
     def __init__(self):
         self.redis = None
         self._initialized = False
+        self.notifier = RedisSessionNotifier(self)
+
+    def watch(self, session_id: str) -> SessionWatcher:
+        return self.notifier.watch(session_id)
+
+    async def _notify(self, session_id: str):
+        """Wake local pollers immediately and pollers on other instances via pub/sub"""
+        self.notifier.notify(session_id)
+        try:
+            await self.redis.publish(self.notifier.channel(session_id), "1")
+        except Exception as e:
+            logger.warning(f"Failed to publish session update for {session_id[:8]}: {e}")
 
     async def _ensure_initialized(self):
         """Lazy initialization of Redis connection"""
@@ -232,6 +360,10 @@ class RedisSessionStorage(SessionStorage):
         return None
 
     async def set(self, session_id: str, data: Dict, ttl: int = 300):
+        await self._write_session(session_id, data, ttl)
+        await self._notify(session_id)
+
+    async def _write_session(self, session_id: str, data: Dict, ttl: int = 300):
         await self._ensure_initialized()
 
         key = f"stream_session:{session_id}"
@@ -253,6 +385,7 @@ class RedisSessionStorage(SessionStorage):
 
         await self.redis.delete(key)
         await self.redis.delete(chunks_key)
+        await self._notify(session_id)
 
     async def append_chunk(self, session_id: str, chunk: Dict):
         await self._ensure_initialized()
@@ -271,10 +404,12 @@ class RedisSessionStorage(SessionStorage):
             if session_data and "metrics" in session_data:
                 chunk_count = await self.redis.llen(chunks_key)
                 session_data["metrics"]["chunk_count"] = chunk_count
-                await self.set(session_id, session_data)
+                await self._write_session(session_id, session_data)
         except Exception as e:
             logger.warning(f"Failed to update chunk count for session {session_id}: {e}")
 
+        await self._notify(session_id)
+
     async def get_chunks(self, session_id: str, offset: int = 0, limit: int = 100) -> List[Dict]:
         """Get chunks with pagination"""
         await self._ensure_initialized()
@@ -290,11 +425,122 @@ class RedisSessionStorage(SessionStorage):
         return []
 
 
+class RedisStreamSessionStorage(RedisSessionStorage):
+    """Redis Streams session storage: O(1) chunk appends and cursor-based reads
+
+    Chunks live in a capped stream whose entry ids are ``0-<n>`` for the n-th
+    chunk, so an integer poll offset maps directly onto a stream id. The chunk
+    count is kept with HINCRBY in a small hash instead of rewriting the
+    session JSON on every token.
+    """
+
+    # Atomically number, store and announce a chunk in a single round trip
+    APPEND_SCRIPT = """
+local n = redis.call('HINCRBY', KEYS[2], 'chunk_count', 1)
+redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[2], '0-' .. n, 'data', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+redis.call('EXPIRE', KEYS[3], ARGV[3])
+redis.call('PUBLISH', ARGV[4], '1')
+return n
+"""
+
+    def __init__(self, max_chunks: int = 10000, ttl: int = 300):
+        super().__init__()
+        self.max_chunks = max_chunks
+        self.ttl = ttl
+        self._append_script = None
+
+    async def _ensure_initialized(self):
+        await super()._ensure_initialized()
+        if self._append_script is None:
+            self._append_script = self.redis.register_script(self.APPEND_SCRIPT)
+
+    @staticmethod
+    def _keys(session_id: str):
+        # Hash tag keeps a session's keys in one cluster slot for the script
+        tag = f"{{{session_id}}}"
+        return f"stream_session:{tag}", f"stream_events:{tag}", f"stream_meta:{tag}"
+
+    async def get(self, session_id: str) -> Optional[Dict]:
+        await self._ensure_initialized()
+
+        session_key, _, meta_key = self._keys(session_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.get(session_key)
+            pipe.hget(meta_key, "chunk_count")
+            pipe.expire(session_key, self.ttl)
+            data, chunk_count, _ = await pipe.execute()
+
+        if not data:
+            return None
+        session = json.loads(data)
+        if "metrics" in session:
+            session["metrics"]["chunk_count"] = int(chunk_count or 0)
+        return session
+
+    async def _write_session(self, session_id: str, data: Dict, ttl: int = 300):
+        await self._ensure_initialized()
+
+        session_key, _, _ = self._keys(session_id)
+        data["created_at"] = datetime.utcnow().isoformat()
+        data["last_accessed"] = datetime.utcnow().isoformat()
+        # Chunks are stored in the stream, never inside the session document
+        payload = {k: v for k, v in data.items() if k != "chunks"}
+        await self.redis.setex(session_key, ttl, json.dumps(payload))
+
+    async def delete(self, session_id: str):
+        await self._ensure_initialized()
+
+        await self.redis.delete(*self._keys(session_id))
+        await self._notify(session_id)
+
+    async def append_chunk(self, session_id: str, chunk: Dict):
+        await self._ensure_initialized()
+
+        session_key, events_key, meta_key = self._keys(session_id)
+        await self._append_script(
+            keys=[events_key, meta_key, session_key],
+            args=[json.dumps(chunk), self.max_chunks, self.ttl, self.notifier.channel(session_id)]
+        )
+        # Remote pollers were woken by the script's PUBLISH
+        self.notifier.notify(session_id)
+
+    async def get_chunks(self, session_id: str, offset: int = 0, limit: int = 100) -> List[Dict]:
+        """Get chunks with pagination; offset n starts at stream id 0-(n+1)"""
+        chunks, _ = await self.get_chunks_after(session_id, f"0-{max(offset, 0)}", limit)
+        return chunks
+
+    async def get_chunks_after(self, session_id: str, last_id: str = "0-0", limit: int = 100):
+        """Get up to ``limit`` chunks strictly after stream id ``last_id``.
+
+        Returns the chunks and the id to pass as ``last_id`` on the next call.
+        """
+        await self._ensure_initialized()
+
+        _, events_key, meta_key = self._keys(session_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.xrange(events_key, min=f"({last_id}", max="+", count=limit)
+            pipe.expire(events_key, self.ttl)
+            pipe.expire(meta_key, self.ttl)
+            entries, _, _ = await pipe.execute()
+
+        if not entries:
+            return [], last_id
+        return [json.loads(fields["data"]) for _, fields in entries], entries[-1][0]
+
+
 # Initialize appropriate storage based on environment
 def get_session_storage() -> SessionStorage:
     """Factory function to get appropriate session storage"""
-    if hasattr(settings, 'REDIS_URL') and settings.REDIS_URL:
+    backend = getattr(settings, 'STREAMING_STORAGE_BACKEND', 'redis')
+    if backend != 'memory' and hasattr(settings, 'REDIS_URL') and settings.REDIS_URL:
         try:
+            if backend == 'redis_streams':
+                return RedisStreamSessionStorage(
+                    max_chunks=settings.STREAMING_MAX_CHUNKS,
+                    ttl=settings.STREAMING_SESSION_TTL
+                )
             return RedisSessionStorage()
         except Exception as e:
             logger.warning(f"Failed to initialize Redis storage, falling back to in-memory: {e}")
@@ -307,6 +553,25 @@ storage = get_session_storage()
 logger.info(f"STORAGE DEBUG: Using {storage.__class__.__name__}")
 
 
+def _create_token_coalescer(sink, session_id: str) -> TokenCoalescer:
+    """Per-session coalescer using the configured flush latency"""
+    policy = CoalescePolicy.from_latency_ms(
+        getattr(settings, 'STREAMING_COALESCE_LATENCY_MS', 30),
+        max_tokens=getattr(settings, 'STREAMING_COALESCE_MAX_TOKENS', 64)
+    )
+    return TokenCoalescer(sink, policy, name=session_id)
+
+
+async def _accumulate_agent_text(storage: SessionStorage, session_id: str, agent: str, text: str):
+    """Append text to the agent's entry in session["accumulated"]"""
+    session = await storage.get(session_id)
+    if session:
+        accumulated = session.get("accumulated", {})
+        accumulated[agent] = accumulated.get(agent, "") + text
+        session["accumulated"] = accumulated
+        await storage.set(session_id, session)
+
+
 @router.post("/streaming/start/sse")
 async def start_streaming_sse(
     payload: SwarmExecutionRequest,
@@ -634,6 +899,25 @@ async def start_streaming(
     # Temporary buffer for ordering chunks per agent
     agent_chunk_buffers = {}
     agent_expected_sequence = {}
+
+    async def write_tokens(batch: TokenBatch):
+        """One delta chunk and one accumulator update per coalesced batch"""
+        event = {
+            "type": "delta",
+            "agent": batch.agent,
+            "content": batch.text,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        if "sequence" in batch.last_meta:
+            event["sequence"] = batch.last_meta["sequence"]
+        if batch.count > 1:
+            event["coalesced"] = batch.count
+        if batch.tag:
+            event["is_tool_result"] = True
+        await storage.append_chunk(session_id, event)
+        await _accumulate_agent_text(storage, session_id, batch.agent, batch.text)
+
+    token_coalescer = _create_token_coalescer(write_tokens, session_id)
     
     # Callback handler for streaming
     async def stream_callback(**kwargs):
@@ -646,6 +930,8 @@ async def start_streaming(
             # Only log important events, not every token
             if event_type not in ["text_generation"]:
                 logger.info(f"🔄 STREAM CALLBACK: type={event_type}, agent={agent}")
+                # Buffered text must land before any event that follows it
+                await token_coalescer.flush()
 
             event = None
 
@@ -716,22 +1002,16 @@ async def start_streaming(
                     
                     agent_chunk_buffers[agent][sequence] = chunk_event
                     
-                    # Flush consecutive chunks in order
+                    # Hand consecutive chunks to the coalescer in order
                     expected_seq = agent_expected_sequence[agent]
                     while expected_seq in agent_chunk_buffers[agent]:
                         ordered_event = agent_chunk_buffers[agent].pop(expected_seq)
-                        await storage.append_chunk(session_id, ordered_event)
-                        
-                        # Also accumulate the text
-                        session = await storage.get(session_id)
-                        if session:
-                            accumulated = session.get("accumulated", {})
-                            if agent not in accumulated:
-                                accumulated[agent] = ""
-                            accumulated[agent] += ordered_event.get("content", "")
-                            session["accumulated"] = accumulated
-                            await storage.set(session_id, session)
-                        
+                        await token_coalescer.add(
+                            agent,
+                            ordered_event["content"],
+                            {"sequence": expected_seq},
+                            tag=bool(ordered_event.get("is_tool_result"))
+                        )
                         expected_seq += 1
                     
                     agent_expected_sequence[agent] = expected_seq
@@ -739,26 +1019,7 @@ async def start_streaming(
                 
                 elif chunk:
                     # Fallback for chunks without sequence numbers
-                    event = {
-                        "type": "delta", 
-                        "agent": agent,
-                        "content": chunk,
-                        "timestamp": datetime.utcnow().isoformat()
-                    }
-                    if data.get("is_tool_result"):
-                        event["is_tool_result"] = True
-                    
-                    # Also accumulate text for the agent
-                    session = await storage.get(session_id)
-                    if session:
-                        accumulated = session.get("accumulated", {})
-                        if agent not in accumulated:
-                            accumulated[agent] = ""
-                        accumulated[agent] += chunk
-                        session["accumulated"] = accumulated
-                        await storage.set(session_id, session)
-                    
-                    await storage.append_chunk(session_id, event)
+                    await token_coalescer.add(agent, chunk, tag=bool(data.get("is_tool_result")))
                     return
 
             elif event_type == "agent_completed" and agent:
@@ -767,7 +1028,13 @@ async def start_streaming(
                     remaining_sequences = sorted(agent_chunk_buffers[agent].keys())
                     for seq in remaining_sequences:
                         remaining_event = agent_chunk_buffers[agent].pop(seq)
-                        await storage.append_chunk(session_id, remaining_event)
+                        await token_coalescer.add(
+                            agent,
+                            remaining_event["content"],
+                            {"sequence": seq},
+                            tag=bool(remaining_event.get("is_tool_result"))
+                        )
+                    await token_coalescer.flush(agent)
                     # Clean up agent buffers
                     del agent_chunk_buffers[agent]
                     if agent in agent_expected_sequence:
@@ -1374,7 +1641,9 @@ async def start_streaming(
                     existing_agents=existing_agents
                 )
 
-            # No buffering needed - all chunks sent immediately
+            # Write out text still waiting in the coalescer before the final session update
+            await token_coalescer.close()
+            logger.info(f"Token coalescer stats for {session_id}: {token_coalescer.get_stats()}")
 
             # Update status and store result
             session = await storage.get(session_id)
@@ -1507,6 +1776,7 @@ async def start_streaming(
 
         except Exception as e:
             logger.error(f"Execution error for session {session_id}: {e}")
+            await token_coalescer.close()
 
             session = await storage.get(session_id)
             if session:
@@ -1590,6 +1860,15 @@ async def stop_execution(session_id: str):
         except Exception as svc_err:
             logger.error(f"Stop: error stopping service for {execution_id}: {svc_err}")
 
+        # Release agents waiting on a human answer for this run
+        try:
+            from app.services.pending_interactions import get_pending_interactions
+            interactions = get_pending_interactions()
+            for scope in {session_id, execution_id}:
+                stopped_any = interactions.cancel_execution(scope) > 0 or stopped_any
+        except Exception as e:
+            logger.debug(f"Stop: could not cancel pending interactions for {session_id}: {e}")
+
         # Cancel any live SSE stream
         try:
             live = getattr(streaming_module, '_live_sse_sessions', {}).get(session_id)
@@ -1779,26 +2058,31 @@ async def poll_stream(
 
         logger.info(f"Validated params: offset={offset}, limit={limit}, timeout={timeout}")
 
-        # Long polling implementation
-        start_time = asyncio.get_event_loop().time()
-        end_time = start_time + timeout
+        # Long polling implementation: register the watcher before checking so
+        # an append landing between the check and the wait still wakes us
+        loop = asyncio.get_event_loop()
+        end_time = loop.time() + timeout
         chunks = []
 
-        while asyncio.get_event_loop().time() < end_time:
-            # Get chunks with pagination
-            chunks = await storage.get_chunks(session_id, offset, limit)
+        async with storage.watch(session_id) as watcher:
+            while True:
+                # Get chunks with pagination
+                chunks = await storage.get_chunks(session_id, offset, limit)
 
-            if chunks:
-                logger.info(f"Got {len(chunks)} chunks at offset {offset}")
-                break
+                if chunks:
+                    logger.info(f"Got {len(chunks)} chunks at offset {offset}")
+                    break
 
-            # Check if execution is complete
-            session = await storage.get(session_id)
-            if not session or session.get("status") in ["complete", "error", "stopped"]:
-                break
+                # Check if execution is complete
+                session = await storage.get(session_id)
+                if not session or session.get("status") in ["complete", "error", "stopped"]:
+                    break
 
-            # Small delay before next check
-            await asyncio.sleep(0.05)
+                remaining = end_time - loop.time()
+                if remaining <= 0:
+                    break
+                # Sleep until append_chunk/set/delete notifies this session
+                await watcher.wait(remaining)
 
         # Refresh session for latest status
         session = await storage.get(session_id)
@@ -2738,6 +3022,41 @@ async def update_shared_state(session_id: str, request: Dict[str, Any]):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/sessions/{session_id}/shared-state/stream")
+async def stream_shared_state(session_id: str, request: Request):
+    """SSE feed of shared state: a versioned snapshot, then each change as it happens."""
+    shared = SharedStateService()
+
+    async def event_generator():
+        async with shared.subscribe(session_id) as subscription:
+            # Subscribe before the snapshot so no change falls in between;
+            # changes at or below the snapshot version are skipped
+            snapshot = shared.get_all(session_id)
+            version = snapshot["version"]
+            yield f"event: snapshot\ndata: {json.dumps({'session_id': session_id, **snapshot}, default=str)}\n\n"
+            while True:
+                if await request.is_disconnected():
+                    break
+                change = await subscription.get(timeout=15.0)
+                if change is None:
+                    yield ": heartbeat\n\n"
+                    continue
+                if change["version"] <= version:
+                    continue
+                version = change["version"]
+                yield f"event: change\ndata: {json.dumps(change, default=str)}\n\n"
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+
 @router.post("/streaming/continue/sse")
 async def continue_streaming_sse(
     payload: Dict[str, Any],
@@ -3207,12 +3526,23 @@ async def execute_swarm_with_context(
         
         # Get Strands service once outside the callback to capture in closure
         strands_service = get_strands_session_service()
+
+        # Token text is only accumulated here (agent_done carries it), so
+        # batches need just one accumulator update each
+        async def accumulate_tokens(batch: TokenBatch):
+            await _accumulate_agent_text(storage, session_id, batch.agent, batch.text)
+
+        token_coalescer = _create_token_coalescer(accumulate_tokens, session_id)
         
         # Create a callback that saves events to storage
         async def streaming_callback(**kwargs):
             event_type = kwargs.get("type", "unknown")
             agent = kwargs.get("agent")
             data = kwargs.get("data", {})
+
+            if event_type not in ("token", "text_generation"):
+                # Accumulated text must be complete before agent_completed reads it
+                await token_coalescer.flush()
             
             # Create event based on type
             event = {
@@ -3241,40 +3571,22 @@ async def execute_swarm_with_context(
                 # Handle token events from coordinator
                 content = kwargs.get("content", "") or data.get("content", "")
                 if content:
-                    logger.info(f"🔄 Processing token event for {agent}: {content[:20]}...")
                     event["type"] = "delta"
                     event["content"] = content
                     if agent:
                         event["agent"] = agent
                     # Accumulate tokens for the agent
-                    session = await storage.get(session_id)
-                    if session:
-                        accumulated = session.get("accumulated", {})
-                        if agent not in accumulated:
-                            accumulated[agent] = ""
-                        accumulated[agent] += content
-                        session["accumulated"] = accumulated
-                        await storage.set(session_id, session)
-                        logger.info(f"✅ Token accumulated, total: {len(accumulated[agent])} chars")
+                    await token_coalescer.add(agent, content)
             elif event_type == "text_generation":
                 # Handle text generation events from Strands
                 chunk = data.get("chunk", "") or data.get("text", "")
                 if chunk:
-                    logger.info(f"🔄 Processing text_generation event for {agent}: {chunk[:50]}...")
                     event["type"] = "delta"
                     event["content"] = chunk
                     if agent:
                         event["agent"] = agent
                     # Also accumulate text for the agent
-                    session = await storage.get(session_id)
-                    if session:
-                        accumulated = session.get("accumulated", {})
-                        if agent not in accumulated:
-                            accumulated[agent] = ""
-                        accumulated[agent] += chunk
-                        session["accumulated"] = accumulated
-                        await storage.set(session_id, session)
-                        logger.info(f"✅ Accumulated {len(accumulated[agent])} chars for {agent}")
+                    await token_coalescer.add(agent, chunk)
                 
             # Handle direct agent_done event from coordinator
             if event_type == "agent_done":
@@ -3475,6 +3787,8 @@ async def execute_swarm_with_context(
             except Exception as seq_error:
                 logger.error(f"❌ Sequential execution failed: {seq_error}", exc_info=True)
                 raise
+            finally:
+                await token_coalescer.close()
         
             # Save final result
             session = await storage.get(session_id)
@@ -4,13 +4,24 @@ Streaming optimization module to handle chunk aggregation
 from typing import Dict, List, Optional
 from datetime import datetime
 import asyncio
+import time
+
+from app.services.token_coalescer import CoalescePolicy, TokenBuffer
+
 
 class StreamingOptimizer:
-    """Optimizes streaming by aggregating chunks when needed"""
+    """
+    Optimizes streaming by aggregating chunks when needed
+
+    Pull-style front end to the shared TokenBuffer: add_chunk returns an
+    aggregated delta once the policy says the buffer is due. Push-style
+    callers should use TokenCoalescer directly.
+    """
     
-    def __init__(self):
-        self.pending_chunks: Dict[str, List[str]] = {}
-        self.last_flush: Dict[str, datetime] = {}
+    def __init__(self, policy: Optional[CoalescePolicy] = None):
+        self.policy = policy or CoalescePolicy(max_latency=0.5, max_tokens=10)
+        self.pending_chunks: Dict[str, TokenBuffer] = {}
+        self.last_flush: Dict[str, float] = {}
         
     async def should_aggregate(self, session_id: str, chunk_count: int) -> bool:
         """Determine if we should aggregate chunks"""
@@ -21,25 +32,15 @@ class StreamingOptimizer:
         """Add a chunk to pending buffer"""
         key = f"{session_id}:{agent}"
         
-        if key not in self.pending_chunks:
-            self.pending_chunks[key] = []
-            self.last_flush[key] = datetime.utcnow()
-        
-        self.pending_chunks[key].append(content)
-        
-        # Check if we should flush
-        should_flush = False
+        buffer = self.pending_chunks.get(key)
+        if buffer is None:
+            buffer = self.pending_chunks[key] = TokenBuffer(agent)
+            self.last_flush[key] = time.monotonic()
+        buffer.add(content)
         
-        # Flush if we have accumulated enough content
-        if len(self.pending_chunks[key]) >= 10:  # Every 10 chunks
-            should_flush = True
-        
-        # Flush if enough time has passed
-        time_since_flush = (datetime.utcnow() - self.last_flush[key]).total_seconds()
-        if time_since_flush > 0.5:  # Every 500ms
-            should_flush = True
-        
-        if should_flush:
+        # Flush on size, or once enough time has passed since the last flush; there is
+        # no timer here, so a chunk arriving after a quiet period goes out at once
+        if buffer.full(self.policy) or time.monotonic() - self.last_flush[key] > self.policy.max_latency:
             return await self.flush_chunks(session_id, agent)
         
         return None
@@ -48,21 +49,17 @@ class StreamingOptimizer:
         """Flush pending chunks as an aggregated chunk"""
         key = f"{session_id}:{agent}"
         
-        if key not in self.pending_chunks or not self.pending_chunks[key]:
+        buffer = self.pending_chunks.get(key)
+        if not buffer:
             return None
-        
-        # Combine all pending chunks
-        combined_content = "".join(self.pending_chunks[key])
-        
-        # Clear the buffer
-        self.pending_chunks[key] = []
-        self.last_flush[key] = datetime.utcnow()
+        batch = buffer.take()
+        self.last_flush[key] = time.monotonic()
         
         # Return aggregated chunk
         return {
             "type": "delta",
             "agent": agent,
-            "content": combined_content,
+            "content": batch.text,
             "aggregated": True,
             "timestamp": datetime.utcnow().isoformat()
         }
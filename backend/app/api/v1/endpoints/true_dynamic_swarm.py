@@ -90,7 +90,7 @@ async def stream_true_swarm_events(
         yield f"data: {json.dumps({'type': 'connected', 'message': 'True Dynamic Swarm event stream connected', 'features': ['session_coordination', 'auto_agent_spawning', 'shared_memory']})}\n\n"
         
         # Stream events from global event bus with enhanced filtering
-        last_index = len(global_event_bus.event_history)
+        last_index = global_event_bus.total_events
         keepalive_counter = 0
         
         while True:
@@ -98,10 +98,10 @@ async def stream_true_swarm_events(
             keepalive_counter += 1
             
             # Check for new events
-            current_events = global_event_bus.event_history
-            if len(current_events) > last_index:
-                logger.info(f"🔄 EventSource: Found {len(current_events) - last_index} new events")
-                for event in current_events[last_index:]:
+            current_events, next_index = global_event_bus.get_events_since(last_index)
+            if current_events:
+                logger.info(f"🔄 EventSource: Found {len(current_events)} new events")
+                for event in current_events:
                     # Enhanced event data for true dynamic swarm
                     event_data = {
                         'id': event.id,
@@ -120,7 +120,7 @@ async def stream_true_swarm_events(
                     logger.info(f"📤 EventSource: Sending event {event.type} from {event.source}")
                     yield f"data: {json.dumps(event_data)}\n\n"
                     
-                last_index = len(current_events)
+                last_index = next_index
                 keepalive_counter = 0
             
             # Send enhanced keepalive with system status
@@ -1,17 +1,24 @@
 """
 WebSocket Gateway: Lightweight real-time streaming endpoint
 Subscribes to Redis EventHub and pushes frames to browser
+
+Any number of viewers can watch the same execution. They share one upstream
+EventHub subscription per execution (ExecutionChannel) which fans frames out
+to each viewer's buffers; each viewer's writer sleeps until frames arrive.
 """
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
-from typing import Optional, Dict, Any, Set
+from typing import Optional, Dict, Any, List, Tuple
 import asyncio
 import json
 import logging
 from collections import deque
 import time
 
-from app.services.event_hub import get_event_hub, FrameType
+from app.services.event_hub import get_event_hub, FrameType, EventHub, parse_stream_id
+from app.services.frame_codec import (
+    FORMAT_JSON, FORMAT_MSGPACK, CompactFrameEncoder, coalesce_token_frames, negotiate_format
+)
 
 logger = logging.getLogger(__name__)
 
@@ -20,51 +27,130 @@ router = APIRouter()
 
 class ClientConnection:
     """Manages a single WebSocket client connection with backpressure"""
-    
-    def __init__(self, websocket: WebSocket, exec_id: str, buffer_size: int = 100):
+
+    def __init__(self, websocket: WebSocket, exec_id: str, buffer_size: int = 100,
+                 batch: bool = False, max_batch: int = 200, wire_format: str = FORMAT_JSON):
         self.websocket = websocket
         self.exec_id = exec_id
         self.buffer_size = buffer_size
+        # batch=True: every write is one JSON array message holding all ready frames
+        self.batch = batch
+        self.max_batch = max_batch
+        # Compact formats always send one message per write and intern IDs per connection
+        self.wire_format = negotiate_format(wire_format)
+        self.encoder = (
+            CompactFrameEncoder(use_msgpack=self.wire_format == FORMAT_MSGPACK)
+            if self.wire_format != FORMAT_JSON else None
+        )
+        # Clients that opted into batching or a compact format get adjacent
+        # tokens from one agent merged into a single frame
+        self.coalesce = batch or self.encoder is not None
         self.token_buffer = deque(maxlen=buffer_size)  # Ring buffer for tokens
-        self.control_queue = asyncio.Queue()  # Unbounded for control frames
+        self.control_queue = deque()  # Unbounded for control frames
         self.last_seq_per_agent: Dict[str, int] = {}
-        self.seen_message_ids: Set[str] = set()  # Track seen Redis message IDs
+        # Set whenever frames are queued; the writer waits on it instead of polling
+        self._wakeup = asyncio.Event()
+        # While joining a running channel, live frames are parked here
+        self.pending: Optional[List[Tuple[str, str, Dict[str, Any]]]] = None
+        # Per-stream IDs this viewer already has (or didn't ask for)
+        self.skip_until: Dict[str, Tuple[int, int]] = {}
         self.connected = True
         self.stats = {
             "tokens_sent": 0,
             "tokens_dropped": 0,
             "control_sent": 0,
+            "messages_sent": 0,
+            "bytes_sent": 0,
+            "send_time_total": 0.0,
+            "send_time_max": 0.0,
             "connect_time": time.time()
         }
-    
-    async def send_frame(self, frame: Dict[str, Any]):
+
+    def enqueue(self, frame: Dict[str, Any]):
         """
-        Send frame to client with backpressure handling
+        Queue frame for the writer with backpressure handling
         Control frames always sent, token frames may be dropped if buffer full
         """
         if not self.connected:
             return
-        
-        frame_type = frame.get("frame_type", FrameType.TOKEN)
-        
-        try:
-            if frame_type == FrameType.CONTROL:
-                # Control frames get priority - never drop
-                await self.control_queue.put(frame)
-                self.stats["control_sent"] += 1
+
+        if frame.get("frame_type", FrameType.TOKEN) == FrameType.CONTROL:
+            # Control frames get priority - never drop
+            self.control_queue.append(frame)
+        else:
+            # Token frames use ring buffer - old ones dropped if full
+            if len(self.token_buffer) >= self.buffer_size:
+                self.stats["tokens_dropped"] += 1
+                logger.debug(f"Dropping token frame for {self.exec_id}, buffer full")
+            self.token_buffer.append(frame)
+        self._wakeup.set()
+
+    def deliver(self, key: str, msg_id: str, frame: Dict[str, Any]):
+        """Fan-out entry point for frames from the shared upstream"""
+        if self.pending is not None:
+            self.pending.append((key, msg_id, frame))
+            return
+        skip = self.skip_until.get(key)
+        if skip is not None:
+            if parse_stream_id(msg_id) <= skip:
+                return
+            del self.skip_until[key]
+        self.enqueue(frame)
+
+    async def send_frame(self, frame: Dict[str, Any]):
+        """Queue a frame (kept for callers of the original async API)"""
+        self.enqueue(frame)
+
+    def _take_ready_frames(self) -> List[Dict[str, Any]]:
+        """Control frames first, then in-order token frames, up to max_batch"""
+        frames = []
+        while self.control_queue and len(frames) < self.max_batch:
+            frames.append(self.control_queue.popleft())
+        self.stats["control_sent"] += len(frames)
+
+        while self.token_buffer and len(frames) < self.max_batch:
+            frame = self.token_buffer.popleft()
+
+            # Check sequence ordering per agent
+            agent_id = frame.get("agent_id")
+            seq = frame.get("seq", 0)
+            if agent_id:
+                last_seq = self.last_seq_per_agent.get(agent_id, 0)
+                if seq > last_seq:
+                    self.last_seq_per_agent[agent_id] = seq
+                    frames.append(frame)
+                    self.stats["tokens_sent"] += 1
+                else:
+                    logger.warning(f"Out of order frame dropped: agent={agent_id}, seq={seq}, last={last_seq}")
+        if self.coalesce:
+            frames = coalesce_token_frames(frames)
+        return frames
+
+    async def _send(self, frames: List[Dict[str, Any]]):
+        started = time.perf_counter()
+        if self.encoder is not None:
+            payload = self.encoder.encode(frames)
+            if isinstance(payload, bytes):
+                await self.websocket.send_bytes(payload)
             else:
-                # Token frames use ring buffer - old ones dropped if full
-                if len(self.token_buffer) >= self.buffer_size:
-                    self.stats["tokens_dropped"] += 1
-                    logger.debug(f"Dropping token frame for {self.exec_id}, buffer full")
-                
-                self.token_buffer.append(frame)
-                self.stats["tokens_sent"] += 1
-                
-        except Exception as e:
-            logger.error(f"Error queueing frame: {e}")
-            self.connected = False
-    
+                await self.websocket.send_text(payload)
+            self.stats["messages_sent"] += 1
+            self.stats["bytes_sent"] += len(payload)
+        elif self.batch:
+            payload = json.dumps(frames, separators=(",", ":"))
+            await self.websocket.send_text(payload)
+            self.stats["messages_sent"] += 1
+            self.stats["bytes_sent"] += len(payload)
+        else:
+            for frame in frames:
+                payload = json.dumps(frame, separators=(",", ":"))
+                await self.websocket.send_text(payload)
+                self.stats["bytes_sent"] += len(payload)
+            self.stats["messages_sent"] += len(frames)
+        elapsed = time.perf_counter() - started
+        self.stats["send_time_total"] += elapsed
+        self.stats["send_time_max"] = max(self.stats["send_time_max"], elapsed)
+
     async def writer_task(self):
         """
         Background task that writes frames to WebSocket
@@ -72,52 +158,24 @@ class ClientConnection:
         """
         try:
             while self.connected:
-                # First, send any control frames (priority)
-                try:
-                    control_frame = self.control_queue.get_nowait()
-                    await self.websocket.send_json(control_frame)
-                    logger.debug(f"Sent control frame: {control_frame.get('type')}")
-                except asyncio.QueueEmpty:
-                    pass
-                
-                # Then batch send token frames
-                if self.token_buffer:
-                    # Send up to 10 token frames at once
-                    batch_size = min(10, len(self.token_buffer))
-                    batch = []
-                    
-                    for _ in range(batch_size):
-                        if self.token_buffer:
-                            frame = self.token_buffer.popleft()
-                            
-                            # Check sequence ordering per agent
-                            agent_id = frame.get("agent_id")
-                            seq = frame.get("seq", 0)
-                            
-                            if agent_id:
-                                last_seq = self.last_seq_per_agent.get(agent_id, 0)
-                                if seq > last_seq:
-                                    self.last_seq_per_agent[agent_id] = seq
-                                    batch.append(frame)
-                                else:
-                                    logger.warning(f"Out of order frame dropped: agent={agent_id}, seq={seq}, last={last_seq}")
-                    
-                    # Send batch
-                    if batch:
-                        for frame in batch:
-                            await self.websocket.send_json(frame)
-                        logger.debug(f"Sent {len(batch)} token frames")
-                
-                # Small sleep to prevent busy loop
-                await asyncio.sleep(0.01)
-                
+                await self._wakeup.wait()
+                self._wakeup.clear()
+
+                # Everything queued since the last write goes out together
+                while self.connected:
+                    frames = self._take_ready_frames()
+                    if not frames:
+                        break
+                    await self._send(frames)
+                    logger.debug(f"Sent {len(frames)} frames")
+
         except WebSocketDisconnect:
             logger.info(f"WebSocket disconnected for {self.exec_id}")
             self.connected = False
         except Exception as e:
             logger.error(f"Writer task error: {e}")
             self.connected = False
-    
+
     async def reader_task(self):
         """
         Background task that reads client messages
@@ -127,134 +185,239 @@ class ClientConnection:
             while self.connected:
                 message = await self.websocket.receive_text()
                 data = json.loads(message)
-                
+
                 # Handle client commands
                 if data.get("type") == "ping":
                     await self.websocket.send_json({"type": "pong", "ts": time.time()})
                 elif data.get("type") == "get_stats":
                     await self.websocket.send_json({
                         "type": "stats",
-                        "data": self.stats
+                        "data": self.get_stats()
                     })
-                    
+
         except WebSocketDisconnect:
             self.connected = False
         except Exception as e:
             logger.debug(f"Reader task ended: {e}")
             self.connected = False
-    
+        finally:
+            # Let the writer notice the disconnect
+            self._wakeup.set()
+
     def get_stats(self) -> Dict[str, Any]:
         """Get connection statistics"""
+        messages = self.stats["messages_sent"]
         return {
             **self.stats,
             "uptime": time.time() - self.stats["connect_time"],
             "buffer_usage": len(self.token_buffer),
-            "control_queue_size": self.control_queue.qsize()
+            "control_queue_size": len(self.control_queue),
+            "avg_send_ms": (self.stats["send_time_total"] / messages * 1000) if messages else 0.0,
+            "max_send_ms": self.stats["send_time_max"] * 1000
+        }
+
+
+class ExecutionChannel:
+    """
+    One upstream EventHub subscription per execution, fanned out to viewers
+
+    The upstream starts from the first viewer's start position. A later
+    viewer that asks for history replays it from Redis up to the channel's
+    current position while live frames for it are parked, then switches to
+    the shared feed.
+    """
+
+    STREAMS = ["token", "control"]
+
+    def __init__(self, hub: EventHub, exec_id: str):
+        self.hub = hub
+        self.exec_id = exec_id
+        self.viewers: List[ClientConnection] = []
+        # Last Redis ID the upstream delivered, per stream key
+        self.last_ids: Dict[str, str] = {}
+        # Where the upstream started, per stream key ("$" resolved to a concrete ID)
+        self.start_ids: Dict[str, str] = {}
+        self._started = asyncio.Event()
+        self._upstream: Optional[asyncio.Task] = None
+        self.stats = {
+            "frames_in": 0,
+            "frames_fanned_out": 0,
+            "viewers_total": 0,
+            "created_at": time.time()
+        }
+
+    async def add_viewer(self, client: ClientConnection, start_from: str):
+        self.stats["viewers_total"] += 1
+        if self._upstream is None or self._upstream.done():
+            self.viewers.append(client)
+            self._started.clear()
+            self._upstream = asyncio.create_task(self._run_upstream(start_from))
+            return
+
+        # Joining a running channel: park live frames while we line up
+        client.pending = []
+        self.viewers.append(client)
+        skip: Dict[str, str] = {}
+        try:
+            if start_from == "$":
+                # The upstream may still be replaying history this viewer didn't ask for
+                for stream in self.STREAMS:
+                    key = f"exec.{self.exec_id}.{stream}"
+                    skip[key] = await self.hub.last_stream_id(key)
+            else:
+                # History requested: replay from Redis up to the shared position,
+                # which is the upstream's start for streams it hasn't delivered on yet
+                await self._started.wait()
+                skip = {**self.start_ids, **self.last_ids}
+                after = "0-0" if start_from in ("0", "0-0") else start_from
+                for key, upto in skip.items():
+                    upto_id = parse_stream_id(upto)
+                    async for msg_id, frame in self.hub.replay(key, after):
+                        if parse_stream_id(msg_id) > upto_id:
+                            break
+                        client.enqueue(frame)
+        finally:
+            client.skip_until = {key: parse_stream_id(msg_id) for key, msg_id in skip.items()}
+            pending, client.pending = client.pending, None
+            for key, msg_id, frame in pending:
+                client.deliver(key, msg_id, frame)
+
+    def remove_viewer(self, client: ClientConnection) -> bool:
+        """Detach a viewer; returns True when the channel has no viewers left"""
+        if client in self.viewers:
+            self.viewers.remove(client)
+        if not self.viewers and self._upstream is not None:
+            self._upstream.cancel()
+        return not self.viewers
+
+    async def _run_upstream(self, start_from: str):
+        try:
+            # Pin the start position so late viewers know what the upstream will cover
+            start_ids = {}
+            for stream in self.STREAMS:
+                key = f"exec.{self.exec_id}.{stream}"
+                if start_from == "$":
+                    start_ids[key] = await self.hub.last_stream_id(key)
+                else:
+                    start_ids[key] = "0-0" if start_from in ("0", "0-0") else start_from
+            self.start_ids = start_ids
+            self._started.set()
+            async for key, msg_id, frame in self.hub.subscribe_entries(
+                self.exec_id,
+                streams=self.STREAMS,
+                start_ids=start_ids
+            ):
+                self.last_ids[key] = msg_id
+                self.stats["frames_in"] += 1
+                for client in self.viewers:
+                    client.deliver(key, msg_id, frame)
+                self.stats["frames_fanned_out"] += len(self.viewers)
+        except asyncio.CancelledError:
+            self._started.set()
+            raise
+        except Exception as e:
+            logger.error(f"WebSocket upstream error for {self.exec_id}: {e}")
+            self._started.set()
+            # Send error frame
+            for client in self.viewers:
+                client.enqueue({
+                    "frame_type": FrameType.CONTROL,
+                    "type": "error",
+                    "error": str(e),
+                    "ts": time.time()
+                })
+
+    def get_stats(self) -> Dict[str, Any]:
+        viewer_stats = [client.get_stats() for client in self.viewers]
+        messages = sum(v["messages_sent"] for v in viewer_stats)
+        send_total = sum(v["send_time_total"] for v in viewer_stats)
+        return {
+            **self.stats,
+            "viewers": len(self.viewers),
+            "upstream_running": self._upstream is not None and not self._upstream.done(),
+            "tokens_dropped": sum(v["tokens_dropped"] for v in viewer_stats),
+            "avg_send_ms": (send_total / messages * 1000) if messages else 0.0,
+            "max_send_ms": max((v["max_send_ms"] for v in viewer_stats), default=0.0),
+            "connections": viewer_stats
         }
 
 
-# Track active connections
-active_connections: Dict[str, ClientConnection] = {}
+# Active executions and their viewers
+channels: Dict[str, ExecutionChannel] = {}
 
 
 @router.websocket("/ws/{execution_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
     execution_id: str,
-    start_from: Optional[str] = Query(None, description="Start position: $ for new, 0 for all, None for smart")
+    start_from: Optional[str] = Query(None, description="Start position: $ for new, 0 for all, None for smart"),
+    batch: bool = Query(False, description="Send each write as a JSON array of frames"),
+    wire_format: str = Query(FORMAT_JSON, alias="format", description="json, compact or msgpack")
 ):
     """
     WebSocket endpoint for real-time streaming
     Subscribes to exec.{id}.* streams and forwards to client
-    
+
     Features:
+    - Multiple viewers per execution sharing one upstream subscription
     - Per-client ring buffer with backpressure
     - Control frame priority (never dropped)
     - Token frame batching and potential dropping
     - Per-agent sequence ordering
+    - Optional compact wire format (see app.services.frame_codec)
     """
-    
+
     await websocket.accept()
     logger.info(f"WebSocket connected: execution_id={execution_id}")
-    
-    # Check if there's already an active connection for this execution
-    if execution_id in active_connections:
-        logger.warning(f"Closing existing connection for execution_id={execution_id}")
-        old_client = active_connections[execution_id]
-        old_client.connected = False
-        # Give it a moment to clean up
-        await asyncio.sleep(0.1)
-    
+
     # Create client connection
-    client = ClientConnection(websocket, execution_id)
-    active_connections[execution_id] = client
-    
-    # Get event hub
-    hub = get_event_hub()
-    
+    client = ClientConnection(websocket, execution_id, batch=batch, wire_format=wire_format)
+
+    channel = channels.get(execution_id)
+    if channel is None:
+        channel = channels[execution_id] = ExecutionChannel(get_event_hub(), execution_id)
+
     # Create tasks
     writer_task = asyncio.create_task(client.writer_task())
     reader_task = asyncio.create_task(client.reader_task())
-    
+
     # Send initial connection event
-    await client.send_frame({
+    client.enqueue({
         "frame_type": FrameType.CONTROL,
         "type": "connected",
         "exec_id": execution_id,
+        "viewers": len(channel.viewers) + 1,
+        "format": client.wire_format,
         "ts": time.time()
     })
-    
-    # Determine start position
-    # If there's an existing connection being replaced, start from new messages only
-    # Otherwise use the provided start_from or default to new messages
-    if start_from is None:
-        start_position = "$"  # Default to new messages only
-    else:
-        start_position = start_from
-    
+
+    # Default to new messages only
+    start_position = "$" if start_from is None else start_from
     logger.info(f"Starting subscription from position: {start_position}")
-    
+
     try:
-        # Subscribe to event streams and forward to client
-        async for frame in hub.subscribe(
-            execution_id,
-            streams=["token", "control"],
-            start_id=start_position
-        ):
-            if not client.connected:
-                break
-                
-            # Forward frame to client
-            await client.send_frame(frame)
-            
+        await channel.add_viewer(client, start_position)
+        # Runs until the client goes away or the writer fails
+        await asyncio.wait({writer_task, reader_task}, return_when=asyncio.FIRST_COMPLETED)
+
     except WebSocketDisconnect:
         logger.info(f"Client disconnected: {execution_id}")
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
-        
-        # Send error frame
-        await client.send_frame({
-            "frame_type": FrameType.CONTROL,
-            "type": "error",
-            "error": str(e),
-            "ts": time.time()
-        })
     finally:
         # Cleanup
         client.connected = False
+        if channel.remove_viewer(client) and channels.get(execution_id) is channel:
+            del channels[execution_id]
         writer_task.cancel()
         reader_task.cancel()
-        
+
         # Wait for tasks to complete
         await asyncio.gather(writer_task, reader_task, return_exceptions=True)
-        
-        # Remove from active connections
-        if execution_id in active_connections:
-            del active_connections[execution_id]
-        
+
         # Log final stats
         logger.info(f"WebSocket closed for {execution_id}: {client.get_stats()}")
-        
+
         try:
             await websocket.close()
         except:
@@ -263,11 +426,13 @@ async def websocket_endpoint(
 
 @router.get("/ws/stats")
 async def get_websocket_stats():
-    """Get statistics for all active WebSocket connections"""
+    """Get statistics for all active executions and their WebSocket viewers"""
     return {
-        "active_connections": len(active_connections),
-        "connections": {
-            exec_id: conn.get_stats()
-            for exec_id, conn in active_connections.items()
-        }
-    }
\ No newline at end of file
+        "active_executions": len(channels),
+        "active_connections": sum(len(channel.viewers) for channel in channels.values()),
+        "executions": {
+            exec_id: channel.get_stats()
+            for exec_id, channel in channels.items()
+        },
+        "event_hub": get_event_hub().get_stats()
+    }
@@ -60,6 +60,9 @@ class Settings(BaseSettings):
     EXECUTION_TIMEOUT: float = 900.0
     NODE_TIMEOUT: float = 300.0
     
+    # Strands session metadata: "json" (session_<id>/metadata.json) or "sqlite" (WAL database)
+    STRANDS_METADATA_BACKEND: str = "json"
+    
     # Enhanced Swarm Service
     USE_ENHANCED_SWARM: bool = True
     
@@ -67,6 +70,10 @@ class Settings(BaseSettings):
     WS_MESSAGE_QUEUE_SIZE: int = 100
     WS_HEARTBEAT_INTERVAL: int = 30
     
+    # SSE Broadcaster Settings
+    SSE_RING_BUFFER_SIZE: int = 2000  # Events kept in memory per execution
+    SSE_MAX_SPILLED_TOKENS: int = 200  # Token frames held for a lagging subscriber
+    
     # Rate Limiting
     RATE_LIMIT_REQUESTS: int = 100
     RATE_LIMIT_PERIOD: int = 60
@@ -25,6 +25,31 @@ class Settings(BaseSettings):
     STREAMING_SESSION_TTL: int = 300  # 5 minutes
     STREAMING_MAX_POLL_TIMEOUT: int = 30  # seconds
     STREAMING_CLEANUP_INTERVAL: int = 60  # seconds
+    STREAMING_STORAGE_BACKEND: str = "redis"  # redis, redis_streams or memory
+    STREAMING_MAX_CHUNKS: int = 10000  # Approximate cap per session stream
+    STREAMING_COALESCE_LATENCY_MS: int = 30  # Max time a token waits before being written
+    STREAMING_COALESCE_MAX_TOKENS: int = 64  # Write early once this many tokens are buffered
+    
+    # Research job scheduler
+    RESEARCH_MAX_WORKERS: int = 4  # Concurrent research runs per process
+    RESEARCH_MAX_QUEUE: int = 50  # Jobs waiting across all users before new ones are refused
+    RESEARCH_MAX_QUEUED_PER_USER: int = 5
+    RESEARCH_MAX_RUNNING_PER_USER: int = 2
+    RESEARCH_MAX_SESSIONS: int = 500  # Finished sessions kept in memory
+    
+    # Python REPL worker pool
+    REPL_MIN_WORKERS: int = 1  # Kept warm from startup
+    REPL_MAX_WORKERS: int = 4
+    REPL_MAX_RUNS_PER_WORKER: int = 50  # Recycle a worker after this many runs
+    REPL_MEMORY_LIMIT_MB: int = 512  # Address space cap per worker (POSIX only)
+    
+    # Shared LLM clients
+    MODEL_MAX_CONCURRENCY: int = 32  # In-flight model requests across all models
+    MODEL_MAX_CONCURRENCY_PER_MODEL: int = 16
+    MODEL_REQUESTS_PER_MINUTE: int = 500  # Per model; match the provider's RPM limit
+    MODEL_MAX_RATE_WAIT_SECONDS: float = 30.0  # Then the request is reported as throttled
+    MODEL_MAX_CONNECTIONS: int = 64  # Per client (API key and base URL)
+    MODEL_MAX_KEEPALIVE_CONNECTIONS: int = 32
     
     # Rate Limiting
     RATE_LIMIT_REQUESTS_PER_MINUTE: int = 60
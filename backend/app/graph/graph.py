@@ -2,6 +2,7 @@
 
 import asyncio
 import time
+from collections import deque
 from typing import Dict, Set, List, Optional, Any, Union
 from dataclasses import dataclass, field
 from enum import Enum
@@ -62,16 +63,21 @@ class Graph:
         nodes: Dict[str, GraphNode],
         edges: List[GraphEdge],
         entry_points: Set[str],
-        max_parallel: int = 10
+        max_parallel: int = 10,
+        node_timeout: Optional[float] = None
     ):
         self.nodes = nodes
         self.edges = edges
         self.entry_points = entry_points
         self.max_parallel = max_parallel
+        # Default per-node timeout in seconds; node.metadata["timeout"] overrides
+        self.node_timeout = node_timeout
         
         # Build adjacency lists for efficient traversal
         self.adjacency_list = self._build_adjacency_list()
         self.reverse_adjacency_list = self._build_reverse_adjacency_list()
+        self.incoming_edges = self._build_incoming_edges()
+        self.dependents = self._build_dependents()
         
         # Execution state
         self.execution_order: List[GraphNode] = []
@@ -93,6 +99,22 @@ class Graph:
             rev_adj[edge.to_node].append(edge.from_node)
         return rev_adj
         
+    def _build_incoming_edges(self) -> Dict[str, List[GraphEdge]]:
+        """Index edges by target node so condition checks don't scan every edge."""
+        incoming = {node_id: [] for node_id in self.nodes}
+        for edge in self.edges:
+            incoming[edge.to_node].append(edge)
+        return incoming
+        
+    def _build_dependents(self) -> Dict[str, List[str]]:
+        """Map each node to the nodes that list it as a dependency."""
+        dependents = {node_id: [] for node_id in self.nodes}
+        for node_id, node in self.nodes.items():
+            for dep in node.dependencies:
+                if dep in dependents:
+                    dependents[dep].append(node_id)
+        return dependents
+        
     def _topological_sort(self) -> List[str]:
         """
         Perform topological sort to determine execution levels.
@@ -150,7 +172,8 @@ class Graph:
         self,
         node: GraphNode,
         task: Any,
-        context: Dict[str, Any]
+        context: Dict[str, Any],
+        timeout: Optional[float] = None
     ) -> NodeResult:
         """
         Execute a single node.
@@ -159,6 +182,7 @@ class Graph:
             node: Node to execute
             task: Original task/input
             context: Execution context with results from dependencies
+            timeout: Optional wall-clock limit in seconds
             
         Returns:
             NodeResult from execution
@@ -172,17 +196,18 @@ class Graph:
             
             # Execute the agent/executor
             if hasattr(node.executor, 'invoke_async'):
-                result = await node.executor.invoke_async(node_input)
+                invocation = node.executor.invoke_async(node_input)
             elif hasattr(node.executor, 'invoke'):
                 # Run sync method in thread pool
-                result = await asyncio.get_event_loop().run_in_executor(
+                invocation = asyncio.get_event_loop().run_in_executor(
                     None, node.executor.invoke, node_input
                 )
             else:
                 # Direct callable
-                result = await asyncio.get_event_loop().run_in_executor(
+                invocation = asyncio.get_event_loop().run_in_executor(
                     None, node.executor, node_input
                 )
+            result = await asyncio.wait_for(invocation, timeout)
                 
             execution_time = (time.time() - start_time) * 1000
             
@@ -199,11 +224,42 @@ class Graph:
             node.mark_completed(node_result)
             return node_result
             
+        except asyncio.TimeoutError:
+            logger.error(f"Node {node.node_id} timed out after {timeout}s")
+            node.mark_failed(f"Timed out after {timeout}s")
+            return node.result
         except Exception as e:
             logger.error(f"Error executing node {node.node_id}: {e}")
             node.mark_failed(str(e))
             return node.result
             
+    async def _run_node(
+        self,
+        node: GraphNode,
+        task: Any,
+        context: Dict[str, Any],
+        semaphore: asyncio.Semaphore,
+        max_retries: int
+    ) -> NodeResult:
+        """
+        Execute a node under the shared parallelism limit, retrying failures.
+        
+        node.metadata may override "timeout" (seconds) and "max_retries".
+        """
+        timeout = node.metadata.get("timeout", self.node_timeout)
+        retries = node.metadata.get("max_retries", max_retries)
+        
+        async with semaphore:
+            result = await self._execute_node(node, task, context, timeout)
+            attempt = 0
+            while result.status == NodeStatus.FAILED and attempt < retries:
+                attempt += 1
+                logger.info(f"Retrying node {node.node_id} (attempt {attempt}/{retries})")
+                result = await self._execute_node(node, task, context, timeout)
+            if attempt:
+                result.metadata["retries"] = attempt
+            return result
+            
     def _build_node_input(
         self,
         node: GraphNode,
@@ -257,10 +313,9 @@ class Graph:
             True if node should execute, False if it should be skipped
         """
         # Check all incoming edges for conditions
-        for edge in self.edges:
-            if edge.to_node == node.node_id:
-                if not edge.should_traverse(graph_state):
-                    return False
+        for edge in self.incoming_edges.get(node.node_id, ()):
+            if not edge.should_traverse(graph_state):
+                return False
         return True
         
     async def execute_async(
@@ -271,6 +326,10 @@ class Graph:
         """
         Execute the graph asynchronously with parallel node execution.
         
+        Nodes start as soon as all of their dependencies have resolved
+        (completed, failed or skipped) rather than waiting for a whole level,
+        with at most max_parallel nodes running at once.
+        
         Args:
             task: Input task or prompt
             max_retries: Maximum retries for failed nodes
@@ -282,57 +341,69 @@ class Graph:
         results = {}
         graph_state = {"results": results, "task": task}
         
-        # Reset all nodes
+        # Reset all nodes and per-run state
         for node in self.nodes.values():
             node.reset()
-            
-        # Get execution levels for parallel processing
-        execution_levels = self._get_execution_levels()
-        logger.info(f"Execution plan has {len(execution_levels)} levels")
+        self.execution_order = []
+        self.completed_nodes = set()
+        self.failed_nodes = set()
+        self.skipped_nodes = set()
         
-        # Execute level by level
-        for level_idx, level_nodes in enumerate(execution_levels):
-            logger.info(f"Executing level {level_idx + 1} with {len(level_nodes)} nodes in parallel")
-            
-            # Filter nodes based on conditions
-            nodes_to_execute = []
-            for node_id in level_nodes:
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        pending_deps = {node_id: len(node.dependencies) for node_id, node in self.nodes.items()}
+        depth: Dict[str, int] = {}
+        ready = deque(node_id for node_id, count in pending_deps.items() if count == 0)
+        running: Dict[asyncio.Task, str] = {}
+        
+        def resolve(node_id: str):
+            """Release dependents of a node that finished, failed or was skipped."""
+            for dependent in self.dependents[node_id]:
+                pending_deps[dependent] -= 1
+                if pending_deps[dependent] == 0:
+                    ready.append(dependent)
+        
+        while ready or running:
+            # Start (or skip) every node whose dependencies have all resolved
+            while ready:
+                node_id = ready.popleft()
                 node = self.nodes[node_id]
+                depth[node_id] = 1 + max((depth.get(dep, 0) for dep in node.dependencies), default=0)
                 if self._should_execute_node(node, graph_state):
-                    nodes_to_execute.append(node)
+                    node_task = asyncio.create_task(
+                        self._run_node(node, task, results, semaphore, max_retries)
+                    )
+                    running[node_task] = node_id
                 else:
                     node.mark_skipped("Conditional edge not satisfied")
                     self.skipped_nodes.add(node_id)
                     logger.info(f"Skipping node {node_id} due to conditions")
+                    resolve(node_id)
                     
-            # Execute nodes in parallel
-            if nodes_to_execute:
-                tasks = [
-                    self._execute_node(node, task, results)
-                    for node in nodes_to_execute
-                ]
-                
-                # Use semaphore to limit parallelism
-                semaphore = asyncio.Semaphore(self.max_parallel)
-                
-                async def bounded_execute(node_task):
-                    async with semaphore:
-                        return await node_task
-                        
-                bounded_tasks = [bounded_execute(t) for t in tasks]
-                node_results = await asyncio.gather(*bounded_tasks, return_exceptions=True)
+            if not running:
+                break
                 
-                # Process results
-                for node, result in zip(nodes_to_execute, node_results):
-                    if isinstance(result, Exception):
-                        logger.error(f"Node {node.node_id} failed with exception: {result}")
-                        self.failed_nodes.add(node.node_id)
-                    elif result.status == NodeStatus.COMPLETED:
-                        results[node.node_id] = result
-                        self.completed_nodes.add(node.node_id)
+            done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+            for node_task in done:
+                node_id = running.pop(node_task)
+                node = self.nodes[node_id]
+                try:
+                    result = node_task.result()
+                except Exception as e:
+                    logger.error(f"Node {node_id} failed with exception: {e}")
+                    self.failed_nodes.add(node_id)
+                else:
+                    if result.status == NodeStatus.COMPLETED:
+                        results[node_id] = result
+                        self.completed_nodes.add(node_id)
                         self.execution_order.append(node)
                     elif result.status == NodeStatus.FAILED:
-                        self.failed_nodes.add(node.node_id)
+                        self.failed_nodes.add(node_id)
+                resolve(node_id)
+                
+        unreached = [node_id for node_id, count in pending_deps.items() if count > 0]
+        if unreached:
+            # No progress possible - might indicate a cycle or unreachable nodes
+            logger.warning(f"Cannot make progress. Remaining nodes: {set(unreached)}")
                         
         # Determine overall status
         if self.failed_nodes:
@@ -354,7 +425,7 @@ class Graph:
             execution_time_ms=execution_time,
             accumulated_tokens=total_tokens,
             metadata={
-                "execution_levels": len(execution_levels),
+                "execution_levels": max(depth.values(), default=0),
                 "max_parallel": self.max_parallel
             }
         )
@@ -44,10 +44,36 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Strands Tool Registry initialization failed (non-critical): {e}")
     
+    # Resolve every tool once so wrapping one is a lookup
+    try:
+        import asyncio
+        from app.services.tool_catalog import get_tool_catalog
+        await asyncio.to_thread(get_tool_catalog().build)
+    except Exception as e:
+        logger.warning(f"Tool catalog build failed (non-critical): {e}")
+    
+    # Start the Python REPL workers so the first code run doesn't pay for it
+    try:
+        from app.services.repl_pool import get_repl_pool
+        get_repl_pool().start()
+        logger.info("✅ Python REPL worker pool started")
+    except Exception as e:
+        logger.warning(f"Python REPL worker pool failed to start (non-critical): {e}")
+    
+    # Relay human answers between API processes when Redis is configured
+    from app.services.pending_interactions import get_pending_interactions
+    if await get_pending_interactions().start_bridge():
+        logger.info("✅ Pending interaction bridge subscribed")
+    
     yield
     
     # Shutdown
     logger.info("Shutting down Strands Swarm API")
+    await get_pending_interactions().stop_bridge()
+    from app.services.repl_pool import shutdown_repl_pool
+    shutdown_repl_pool()
+    from app.services.model_client_factory import shutdown_model_clients
+    shutdown_model_clients()
     await close_db()
 
 
@@ -176,6 +202,20 @@ async def readiness_check():
     return {"status": "ready"}
 
 
+@app.get("/model-stats")
+async def model_stats():
+    """Per-model latency, time to first token and token counts of the shared model clients"""
+    from app.services.model_client_factory import get_model_client_factory
+    return get_model_client_factory().get_stats()
+
+
+@app.get("/tool-catalog-stats")
+async def tool_catalog_stats():
+    """Resolved tools, lookup hits and wrapper reuse of the tool catalog"""
+    from app.services.tool_catalog import get_tool_catalog
+    return get_tool_catalog().get_stats()
+
+
 # Serve static frontend files in production
 from pathlib import Path
 from fastapi.staticfiles import StaticFiles
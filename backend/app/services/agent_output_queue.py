@@ -1,18 +1,36 @@
 """
 Agent Output Queue Manager
 
-Manages sequential output streaming from parallel agents to prevent UI chaos.
-Agents can compute in parallel but their outputs are queued and streamed one at a time.
+Manages output streaming from parallel agents to prevent UI chaos.
+Agents can compute in parallel while their outputs are sequenced according
+to an ordering policy before reaching the UI callback.
+
+Each execution gets its own queue. Producers append to a per-agent
+asyncio.Queue and set a wakeup event; the stream task wakes only when there
+is something to do, picks what to send synchronously (no awaits, so no lock
+is needed on the event loop) and calls the UI callback outside that step.
 """
 import asyncio
 import logging
-from typing import Dict, List, Optional, Callable
+import re
+from typing import Dict, List, Optional, Callable, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime
-from collections import deque
+from enum import Enum
 
 logger = logging.getLogger(__name__)
 
+# End of a sentence: terminal punctuation and the whitespace after it, or a newline
+_SENTENCE_END = re.compile(r"[.!?]\s+|\n")
+
+
+class OrderingPolicy(str, Enum):
+    """How output from concurrently running agents is sequenced"""
+    SEQUENTIAL = "sequential"  # one agent at a time, in registration order
+    SENTENCE = "sentence"  # agents take turns, switching only at sentence ends
+    PARALLEL = "parallel"  # forward each agent's output as soon as it arrives
+
+
 @dataclass
 class QueuedOutput:
     """Represents a queued output from an agent"""
@@ -20,238 +38,273 @@ class QueuedOutput:
     chunk: str
     timestamp: datetime
     execution_id: str
-    
+
+
 @dataclass
 class AgentOutputBuffer:
     """Buffers output from a single agent"""
     agent_name: str
     execution_id: str
-    chunks: deque = field(default_factory=deque)
+    chunks: asyncio.Queue = field(default_factory=asyncio.Queue)
     is_complete: bool = False
     is_streaming: bool = False
+    completion_sent: bool = False
+    carry: str = ""  # text held back until a sentence end (SENTENCE policy)
+
+    def drain(self) -> str:
+        parts = []
+        while True:
+            try:
+                parts.append(self.chunks.get_nowait())
+            except asyncio.QueueEmpty:
+                return "".join(parts)
+
+    @property
+    def finished(self) -> bool:
+        return self.is_complete and self.chunks.empty() and not self.carry
+
 
 class AgentOutputQueue:
     """
-    Manages output streaming from multiple agents.
-    
+    Sequences output from the agents of one execution.
+
     Key features:
-    - Agents can add chunks to their buffers at any time
-    - Only one agent streams at a time to the UI
-    - Automatic switching when an agent completes
+    - add_chunk never waits on UI delivery
+    - The stream task sleeps until a chunk arrives or an agent completes
+    - Ordering is controlled by OrderingPolicy
     """
-    
-    def __init__(self):
+
+    def __init__(self, execution_id: str = "", policy: OrderingPolicy = OrderingPolicy.SEQUENTIAL):
+        self.execution_id = execution_id
+        self.policy = OrderingPolicy(policy)
         self.agent_buffers: Dict[str, AgentOutputBuffer] = {}
-        self.streaming_queue: deque = deque()  # Queue of agent names waiting to stream
+        self.streaming_queue: List[str] = []  # Agent names in registration order
         self.current_streaming_agent: Optional[str] = None
         self.global_callback: Optional[Callable] = None
-        self._lock: Optional[asyncio.Lock] = None
+        self._wakeup = asyncio.Event()
         self._stream_task: Optional[asyncio.Task] = None
-        
+        self._turn = 0  # round-robin cursor for SENTENCE
+
     def set_global_callback(self, callback: Callable):
         """Set the global callback for streaming output to UI"""
         self.global_callback = callback
-        logger.info("Global callback set for output queue")
-        
-    async def _get_lock(self) -> asyncio.Lock:
-        """Get or create the lock in the current event loop context"""
-        try:
-            current_loop = asyncio.get_running_loop()
-        except RuntimeError:
-            # No running loop, create a new lock
-            self._lock = asyncio.Lock()
-            return self._lock
-            
-        # Check if we have a lock and if it's bound to the current loop
-        if self._lock is not None:
-            try:
-                # Try to check if the lock is bound to the current loop
-                lock_loop = self._lock._loop if hasattr(self._lock, '_loop') else None
-                if lock_loop is not None and lock_loop != current_loop:
-                    # Lock is bound to a different loop, recreate it
-                    self._lock = asyncio.Lock()
-            except:
-                # If there's any issue checking, recreate the lock
-                self._lock = asyncio.Lock()
-        else:
-            # No lock exists, create one
-            self._lock = asyncio.Lock()
-            
-        return self._lock
-        
-    async def add_agent(self, agent_name: str, execution_id: str):
+        logger.info(f"Global callback set for output queue {self.execution_id}")
+
+    def _register(self, agent_name: str, execution_id: Optional[str]) -> AgentOutputBuffer:
+        buffer = self.agent_buffers.get(agent_name)
+        if buffer is None:
+            buffer = AgentOutputBuffer(agent_name=agent_name, execution_id=execution_id or self.execution_id)
+            self.agent_buffers[agent_name] = buffer
+            self.streaming_queue.append(agent_name)
+            logger.info(f"Added agent {agent_name} to output queue")
+        # A completed agent gets no more output, so there is nothing to wake a new task
+        if buffer.is_complete:
+            return buffer
+        if self._stream_task is None or self._stream_task.done():
+            self._stream_task = asyncio.create_task(self._stream_loop())
+        return buffer
+
+    async def add_agent(self, agent_name: str, execution_id: Optional[str] = None):
         """Register a new agent for output queueing"""
-        lock = await self._get_lock()
-        async with lock:
-            if agent_name not in self.agent_buffers:
-                self.agent_buffers[agent_name] = AgentOutputBuffer(
-                    agent_name=agent_name,
-                    execution_id=execution_id
-                )
-                self.streaming_queue.append(agent_name)
-                logger.info(f"Added agent {agent_name} to output queue")
-                
-                # Start streaming if this is the first agent
-                if not self.current_streaming_agent and not self._stream_task:
-                    self._stream_task = asyncio.create_task(self._stream_loop())
-    
-    async def add_chunk(self, agent_name: str, chunk: str, execution_id: str):
+        self._register(agent_name, execution_id)
+        self._wakeup.set()
+
+    async def add_chunk(self, agent_name: str, chunk: str, execution_id: Optional[str] = None):
         """Add a chunk from an agent to its buffer"""
-        try:
-            lock = await self._get_lock()
-            async with lock:
-                # Auto-register agent if not exists
-                if agent_name not in self.agent_buffers:
-                    logger.info(f"Auto-registering agent {agent_name} in add_chunk")
-                    # Don't use await here since we're already in the lock
-                    self.agent_buffers[agent_name] = AgentOutputBuffer(
-                        agent_name=agent_name,
-                        execution_id=execution_id
-                    )
-                    self.streaming_queue.append(agent_name)
-                    
-                    # Start streaming if this is the first agent
-                    if not self.current_streaming_agent and not self._stream_task:
-                        logger.info(f"Starting stream loop for first agent: {agent_name}")
-                        self._stream_task = asyncio.create_task(self._stream_loop())
-                    else:
-                        logger.debug(f"Stream loop already running or current agent exists")
-                    
-                buffer = self.agent_buffers.get(agent_name)
-                if buffer and not buffer.is_complete:
-                    buffer.chunks.append(chunk)
-                    logger.debug(f"Added chunk ({len(chunk)} chars) from {agent_name}, buffer now has {len(buffer.chunks)} chunks")
-        except Exception as e:
-            logger.error(f"Error in add_chunk for {agent_name}: {e}", exc_info=True)
-    
+        buffer = self._register(agent_name, execution_id)
+        if buffer.is_complete:
+            return
+        buffer.chunks.put_nowait(chunk)
+        self._wakeup.set()
+
     async def mark_agent_complete(self, agent_name: str):
         """Mark an agent as complete"""
-        lock = await self._get_lock()
-        async with lock:
-            if agent_name in self.agent_buffers:
-                self.agent_buffers[agent_name].is_complete = True
-                logger.info(f"Agent {agent_name} marked as complete")
-                
-                # If this was the current streaming agent, switch to next
-                if self.current_streaming_agent == agent_name:
-                    self.current_streaming_agent = None
-    
+        buffer = self.agent_buffers.get(agent_name)
+        if buffer is not None:
+            buffer.is_complete = True
+            logger.info(f"Agent {agent_name} marked as complete")
+            self._wakeup.set()
+
+    async def wait_idle(self):
+        """Wait until every registered agent has completed and its output has been delivered"""
+        task = self._stream_task
+        if task is not None and not task.done():
+            await asyncio.shield(task)
+
+    async def close(self):
+        """Stop the stream task without delivering what is left"""
+        if self._stream_task is not None and not self._stream_task.done():
+            self._stream_task.cancel()
+            try:
+                await self._stream_task
+            except asyncio.CancelledError:
+                pass
+        self._stream_task = None
+
     async def _stream_loop(self):
-        """Main streaming loop - streams one agent at a time"""
-        logger.info("Starting output queue stream loop")
+        """Deliver output as producers wake the loop; exits once every agent is done"""
+        logger.info(f"Starting output queue stream loop {self.execution_id}")
         while True:
+            await self._wakeup.wait()
+            # Clear before collecting so anything added during delivery wakes us again
+            self._wakeup.clear()
             try:
-                lock = await self._get_lock()
-                async with lock:
-                    # Find next agent to stream
-                    if not self.current_streaming_agent:
-                        # Find next agent with chunks to stream
-                        for agent_name in list(self.streaming_queue):
-                            buffer = self.agent_buffers.get(agent_name)
-                            if buffer and (buffer.chunks or not buffer.is_complete):
-                                self.current_streaming_agent = agent_name
-                                buffer.is_streaming = True
-                                logger.info(f"Now streaming agent: {agent_name}")
-                                break
-                    
-                    # Stream chunks from current agent
-                    if self.current_streaming_agent:
-                        buffer = self.agent_buffers.get(self.current_streaming_agent)
-                        if buffer and buffer.chunks:
-                            # Stream up to 5 chunks at once for smoother output
-                            chunks_to_stream = []
-                            for _ in range(min(5, len(buffer.chunks))):
-                                if buffer.chunks:
-                                    chunks_to_stream.append(buffer.chunks.popleft())
-                            
-                            # Send chunks to callback
-                            if chunks_to_stream and self.global_callback:
-                                combined_chunk = "".join(chunks_to_stream)
-                                logger.info(f"Sending {len(combined_chunk)} chars from {self.current_streaming_agent} to callback")
-                                await self._send_to_callback(
-                                    self.current_streaming_agent,
-                                    combined_chunk,
-                                    buffer.execution_id
-                                )
-                            elif chunks_to_stream and not self.global_callback:
-                                logger.warning(f"Have chunks to stream but no global callback set!")
-                        
-                        # Check if agent is done
-                        if buffer and buffer.is_complete and not buffer.chunks:
-                            logger.info(f"Agent {self.current_streaming_agent} finished streaming")
-                            self.streaming_queue.remove(self.current_streaming_agent)
-                            self.current_streaming_agent = None
-                            
-                            # Send completion event
-                            if self.global_callback:
-                                await self._send_completion(buffer.agent_name, buffer.execution_id)
-                    
-                    # Exit if no more agents
-                    if not self.streaming_queue and not self.current_streaming_agent:
-                        logger.info("No more agents to stream, exiting stream loop")
-                        break
-                
-                # Small delay to prevent CPU spinning
-                await asyncio.sleep(0.05)
-                
+                for buffer, text in self._collect():
+                    if text is None:
+                        logger.info(f"Agent {buffer.agent_name} finished streaming")
+                        await self._send_completion(buffer.agent_name, buffer.execution_id)
+                    else:
+                        await self._send_to_callback(buffer.agent_name, text, buffer.execution_id)
             except Exception as e:
                 logger.error(f"Error in stream loop: {e}", exc_info=True)
-                await asyncio.sleep(0.1)
-    
+
+            if not self.streaming_queue:
+                logger.info("No more agents to stream, exiting stream loop")
+                return
+
+    def _collect(self) -> List[Tuple[AgentOutputBuffer, Optional[str]]]:
+        """
+        Pick what to deliver next, in delivery order; a None text means the
+        agent's completion. Synchronous, so it runs without interleaving.
+        """
+        if self.policy is OrderingPolicy.PARALLEL:
+            return self._collect_parallel()
+        if self.policy is OrderingPolicy.SENTENCE:
+            return self._collect_sentences()
+        return self._collect_sequential()
+
+    def _finish(self, buffer: AgentOutputBuffer, actions: list):
+        buffer.is_streaming = False
+        buffer.completion_sent = True
+        self.streaming_queue.remove(buffer.agent_name)
+        if self.current_streaming_agent == buffer.agent_name:
+            self.current_streaming_agent = None
+        actions.append((buffer, None))
+
+    def _collect_parallel(self):
+        actions = []
+        for name in list(self.streaming_queue):
+            buffer = self.agent_buffers[name]
+            text = buffer.drain()
+            if text:
+                actions.append((buffer, text))
+            if buffer.finished:
+                self._finish(buffer, actions)
+        return actions
+
+    def _collect_sequential(self):
+        actions = []
+        while self.streaming_queue:
+            buffer = self.agent_buffers[self.streaming_queue[0]]
+            if self.current_streaming_agent != buffer.agent_name:
+                self.current_streaming_agent = buffer.agent_name
+                buffer.is_streaming = True
+                logger.info(f"Now streaming agent: {buffer.agent_name}")
+            text = buffer.drain()
+            if text:
+                actions.append((buffer, text))
+            if not buffer.finished:
+                break
+            # Head agent is done: announce it and move straight on to the next one
+            self._finish(buffer, actions)
+        return actions
+
+    def _collect_sentences(self):
+        actions = []
+        order = self.streaming_queue[self._turn:] + self.streaming_queue[:self._turn]
+        last_spoke = None
+        for name in order:
+            buffer = self.agent_buffers[name]
+            buffer.carry += buffer.drain()
+            if buffer.is_complete and buffer.chunks.empty():
+                text, buffer.carry = buffer.carry, ""
+                if not text.strip():
+                    # Trailing whitespace alone isn't worth a turn
+                    text = ""
+            else:
+                # Hold back the unfinished sentence until its end arrives
+                cut = 0
+                for match in _SENTENCE_END.finditer(buffer.carry):
+                    cut = match.end()
+                text, buffer.carry = buffer.carry[:cut], buffer.carry[cut:]
+            if text:
+                actions.append((buffer, text))
+                last_spoke = name
+            if buffer.finished:
+                self._finish(buffer, actions)
+        # Start the next pass with the agent after the last one that spoke
+        if last_spoke is not None:
+            position = order.index(last_spoke) + 1
+            remaining = [name for name in order[position:] + order[:position] if name in self.streaming_queue]
+            self._turn = self.streaming_queue.index(remaining[0]) if remaining else 0
+        elif self._turn >= len(self.streaming_queue):
+            self._turn = 0
+        return actions
+
+    async def _invoke(self, **kwargs):
+        result = self.global_callback(**kwargs)
+        if asyncio.iscoroutine(result):
+            await result
+
     async def _send_to_callback(self, agent_name: str, chunk: str, execution_id: str):
         """Send chunk to the global callback"""
-        if self.global_callback:
-            try:
-                if asyncio.iscoroutinefunction(self.global_callback):
-                    await self.global_callback(
-                        type="text_generation",
-                        agent=agent_name,
-                        data={"chunk": chunk},
-                        execution_id=execution_id
-                    )
-                else:
-                    self.global_callback(
-                        type="text_generation",
-                        agent=agent_name,
-                        data={"chunk": chunk},
-                        execution_id=execution_id
-                    )
-            except Exception as e:
-                logger.error(f"Error sending chunk to callback: {e}")
-    
+        if not self.global_callback:
+            logger.warning(f"Have chunks to stream but no global callback set!")
+            return
+        try:
+            await self._invoke(
+                type="text_generation",
+                agent=agent_name,
+                data={"chunk": chunk},
+                execution_id=execution_id
+            )
+        except Exception as e:
+            logger.error(f"Error sending chunk to callback: {e}")
+
     async def _send_completion(self, agent_name: str, execution_id: str):
         """Send completion event for an agent"""
-        if self.global_callback:
-            try:
-                if asyncio.iscoroutinefunction(self.global_callback):
-                    await self.global_callback(
-                        type="agent_completed",
-                        agent=agent_name,
-                        data={"completed": True},
-                        execution_id=execution_id
-                    )
-                else:
-                    self.global_callback(
-                        type="agent_completed",
-                        agent=agent_name,
-                        data={"completed": True},
-                        execution_id=execution_id
-                    )
-            except Exception as e:
-                logger.error(f"Error sending completion to callback: {e}")
-
-# Global instance
-_output_queue: Optional[AgentOutputQueue] = None
-
-def get_output_queue() -> AgentOutputQueue:
-    """Get or create the global output queue"""
-    global _output_queue
-    if not _output_queue:
-        _output_queue = AgentOutputQueue()
-    return _output_queue
-
-def reset_output_queue():
-    """Reset the global output queue"""
-    global _output_queue
-    _output_queue = AgentOutputQueue()
-    return _output_queue
\ No newline at end of file
+        if not self.global_callback:
+            return
+        try:
+            await self._invoke(
+                type="agent_completed",
+                agent=agent_name,
+                data={"completed": True},
+                execution_id=execution_id
+            )
+        except Exception as e:
+            logger.error(f"Error sending completion to callback: {e}")
+
+
+# One queue per execution
+_output_queues: Dict[str, AgentOutputQueue] = {}
+_DEFAULT_EXECUTION = "default"
+
+
+def get_output_queue(
+    execution_id: str = _DEFAULT_EXECUTION,
+    policy: OrderingPolicy = OrderingPolicy.SEQUENTIAL
+) -> AgentOutputQueue:
+    """Get or create the output queue for an execution"""
+    queue = _output_queues.get(execution_id)
+    if queue is None:
+        queue = _output_queues[execution_id] = AgentOutputQueue(execution_id, policy)
+    return queue
+
+
+def reset_output_queue(
+    execution_id: str = _DEFAULT_EXECUTION,
+    policy: OrderingPolicy = OrderingPolicy.SEQUENTIAL
+) -> AgentOutputQueue:
+    """Replace an execution's output queue with a fresh one"""
+    old = _output_queues.pop(execution_id, None)
+    if old is not None and old._stream_task is not None:
+        old._stream_task.cancel()
+    return get_output_queue(execution_id, policy)
+
+
+def release_output_queue(execution_id: str):
+    """Forget an execution's queue once the execution has finished"""
+    queue = _output_queues.pop(execution_id, None)
+    if queue is not None and queue._stream_task is not None and not queue._stream_task.done():
+        queue._stream_task.cancel()
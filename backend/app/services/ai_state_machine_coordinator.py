@@ -16,12 +16,12 @@ import os
 # Optional strands imports
 try:
     from strands import Agent
-    from strands.models.openai import OpenAIModel
+    from app.services.model_client_factory import get_model
     STRANDS_AVAILABLE = True
 except ImportError:
     STRANDS_AVAILABLE = False
     Agent = None
-    OpenAIModel = None
+    get_model = None
 
 from app.services.event_hub import TokenFrame, ControlFrame, ControlType, get_event_hub
 from app.tools.tool_registry import ToolRegistry
@@ -575,8 +575,8 @@ Output only the JSON object. No commentary.
                 logger.warning("No OpenAI API key found, using fallback")
                 return self.create_fallback_dynamic_state_machine(task)
             
-            model = OpenAIModel(
-                client_args={"api_key": api_key},
+            model = get_model(
+                api_key=api_key,
                 model_id="gpt-4o-mini",
                 params={"temperature": 0.3, "max_tokens": 16000}  # Maximum for complex workflows
             )
@@ -332,10 +332,10 @@ CRITICAL: Output ONLY valid JSON. NO trailing commas. NO markdown. NO explanatio
         try:
             # Create a Strands agent for streaming with OpenAI
             from strands import Agent
-            from strands.models.openai import OpenAIModel
+            from app.services.model_client_factory import get_model
 
             # Create OpenAI model instance
-            openai_model = OpenAIModel(
+            openai_model = get_model(
                 model_id="gpt-4o-mini",
                 temperature=0.7
             )
@@ -516,10 +516,10 @@ If no changes needed, return empty operations array: "operations": []"""
         try:
             # Create a Strands agent for streaming with OpenAI
             from strands import Agent
-            from strands.models.openai import OpenAIModel
+            from app.services.model_client_factory import get_model
 
             # Create OpenAI model instance
-            openai_model = OpenAIModel(
+            openai_model = get_model(
                 model_id="gpt-4o-mini",
                 temperature=0.3
             )
@@ -0,0 +1,286 @@
+"""
+Approval classifier for HumanLoopAgent tasks
+
+Decides whether a task needs human approval before an agent starts on it,
+cheapest tier first:
+
+1. rule  - deterministic checks: explicit requires_approval metadata on the
+           task, tools marked requires_approval in the tool settings
+           (GlobalApprovalManager), clearly high-risk operations (shell
+           commands, deleting data, installing packages, production
+           deploys), and tasks with no risk signal at all.
+2. cache - earlier LLM verdicts, keyed on a normalized task fingerprint.
+3. llm   - a short YES/NO model call, for tasks that only carry weak risk
+           signals ("run", "file", "database", ...). Concurrent identical
+           questions share one call.
+4. fallback - when the model is unavailable; ambiguous tasks then ask.
+
+get_stats() shows how often each tier decided.
+"""
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TIER_RULE = "rule"
+TIER_CACHE = "cache"
+TIER_LLM = "llm"
+TIER_FALLBACK = "fallback"
+
+# Operations that always warrant a human look
+_HIGH_RISK = [
+    ("shell command", re.compile(r"\b(sudo|rm\s+-rf?|chmod|chown|mkfs|kill\s+-9)\b|\b(run|execute)\s+(an?\s+|the\s+)?(shell|bash|terminal|system)\s+(command|script)s?\b")),
+    # Only destructive targets: "drop the users table" and "delete the log files" ask, while
+    # "remove duplicate records from the results list" is left to the later tiers
+    ("data deletion", re.compile(r"\b(delete|remove|drop|truncate|wipe|purge|erase)\b.{0,40}\b(files?|director(y|ies)|folders?|tables?|databases?|db|schemas?|collections?|buckets?|branch(es)?|repos(itory|itories)?|accounts?|prod|production)\b")),
+    ("package install", re.compile(r"\b(pip3?|npm|apt(-get)?|brew|yarn|conda|gem|cargo)\s+install\b|\binstall(ing)?\s+(the\s+)?(packages?|dependenc(y|ies)|librar(y|ies))\b")),
+    ("production change", re.compile(r"\b(deploy|push|release|migrate)\b.{0,20}\b(to|in|on)\s+(prod|production|live)\b")),
+    ("irreversible action", re.compile(r"\b(irreversibl[ey]|permanently|force[- ]push|git\s+push\s+(-f|--force))\b")),
+    ("payment or messaging", re.compile(r"\b(transfer|send|wire)\s+(money|funds|payments?)\b|\bsend\s+(an?\s+)?(emails?|sms|text messages?)\s+to\b")),
+]
+
+# Words that make a task worth a closer look but say nothing on their own
+_WEAK_RISK = re.compile(
+    r"\b(execute|executing|run|running|script|command|shell|terminal|install|deploy|delete|remove|"
+    r"modify|overwrite|write\s+to|save\s+to|files?|director(y|ies)|database|sql|api\s+calls?|"
+    r"http|request|endpoint|credentials?|password|secret|aws|cloud|server)\b"
+)
+
+_URL = re.compile(r"https?://\S+")
+_QUOTED = re.compile(r"\"[^\"]*\"|'[^']*'|`[^`]*`")
+_NUMBER = re.compile(r"\b\d+(\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+_DECISION_PROMPT = """You are an intelligent decision agent that determines when human approval is needed for CRITICAL tasks only.
+
+ONLY require human approval for HIGH-RISK operations:
+1. Executing system commands or shell scripts
+2. Making network requests or API calls to external services
+3. File system operations (creating, deleting, modifying files)
+4. Database operations or data manipulation
+5. Installing packages or dependencies
+6. Running code or scripts
+7. Making irreversible changes
+
+DO NOT require approval for:
+- Basic text generation (writing documentation, code snippets)
+- Analysis and planning tasks
+- Information processing and formatting
+- Creating text-based content
+- Regular development tasks like writing code
+- Reviewing or analyzing existing content
+
+The human-in-the-loop should be for CRITICAL decisions, not routine tasks.
+
+Respond with ONLY "YES" if human approval is needed for critical operations, or "NO" if the agent can proceed independently.
+
+DEFAULT: When in doubt, answer NO (let agents work autonomously)."""
+
+
+def task_fingerprint(task: str, role: str = "") -> str:
+    """Cache key of a task: case-folded, with URLs, quoted text and numbers masked"""
+    text = _URL.sub("<url>", task or "")
+    text = _QUOTED.sub("<str>", text)
+    text = _NUMBER.sub("<n>", text.casefold())
+    text = _SPACE.sub(" ", text).strip()[:500]
+    return hashlib.sha1(f"{role.casefold()}|{text}".encode()).hexdigest()
+
+
+@dataclass
+class ApprovalDecision:
+    """Whether a task needs approval, and which tier decided"""
+    needs_approval: bool
+    tier: str
+    reason: str
+
+
+class ApprovalClassifier:
+    """Layered approval decisions: rules, then cached LLM verdicts, then the LLM"""
+
+    def __init__(self, cache_ttl: float = 3600.0, cache_size: int = 2048, llm_timeout: float = 15.0):
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.llm_timeout = llm_timeout
+        self._cache: "OrderedDict[str, Tuple[float, bool]]" = OrderedDict()  # fingerprint -> (expires_at, verdict)
+        self._cache_lock = threading.Lock()
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+
+        self.decisions: Dict[str, int] = {TIER_RULE: 0, TIER_CACHE: 0, TIER_LLM: 0, TIER_FALLBACK: 0}
+        self.approvals_required = 0
+        self.coalesced = 0
+        self.llm_calls = 0
+        self._llm_latencies: Deque[float] = deque(maxlen=200)
+
+    # ------------------------------------------------------------------
+    # Tiers
+    # ------------------------------------------------------------------
+
+    def classify_by_rules(
+        self,
+        task: str,
+        tools: Iterable[str] = (),
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> Optional[ApprovalDecision]:
+        """Deterministic verdict, or None when the task is ambiguous"""
+        metadata = metadata or {}
+        if isinstance(metadata.get("requires_approval"), bool):
+            needs = metadata["requires_approval"]
+            return ApprovalDecision(needs, TIER_RULE, f"task metadata sets requires_approval={needs}")
+        if metadata.get("skip_approval") is True:
+            return ApprovalDecision(False, TIER_RULE, "task metadata sets skip_approval")
+
+        text = (task or "").casefold()
+        from app.services.tool_approval_manager import approval_manager
+        gated = [tool for tool in tools if approval_manager.requires_approval(tool)]
+        for tool in gated:
+            names = {tool.casefold(), tool.replace("_", " ").casefold()}
+            display = approval_manager.tool_settings.get(tool, {}).get("name")
+            if display:
+                names.add(display.casefold())
+            if any(re.search(rf"\b{re.escape(name)}\b", text) for name in names):
+                return ApprovalDecision(True, TIER_RULE, f"task uses {tool}, which requires approval")
+
+        for label, pattern in _HIGH_RISK:
+            if pattern.search(text):
+                return ApprovalDecision(True, TIER_RULE, f"high-risk operation: {label}")
+
+        # Gated tools the task doesn't name are still stopped at call time by tool approval
+        if not _WEAK_RISK.search(text):
+            return ApprovalDecision(False, TIER_RULE, "no risk signal in task")
+        return None
+
+    def _cached(self, fingerprint: str) -> Optional[bool]:
+        with self._cache_lock:
+            entry = self._cache.get(fingerprint)
+            if entry is None:
+                return None
+            expires_at, verdict = entry
+            if expires_at < time.time():
+                del self._cache[fingerprint]
+                return None
+            self._cache.move_to_end(fingerprint)
+            return verdict
+
+    def _store(self, fingerprint: str, verdict: bool):
+        with self._cache_lock:
+            self._cache[fingerprint] = (time.time() + self.cache_ttl, verdict)
+            self._cache.move_to_end(fingerprint)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    async def _ask_llm(self, task: str, agent_name: str, role: str) -> Optional[bool]:
+        """YES/NO from the model; None when it is unavailable or fails"""
+        from app.services.model_client_factory import get_model, openai_api_key
+
+        api_key = openai_api_key()
+        if not api_key:
+            return None
+        try:
+            from strands import Agent
+
+            decision_agent = Agent(
+                name="approval_decision_agent",
+                system_prompt=_DECISION_PROMPT,
+                model=get_model(api_key=api_key, model_id="gpt-4o-mini", params={"max_tokens": 5, "temperature": 0}),
+                callback_handler=None,
+            )
+            prompt = f"""Task to analyze: "{task}"
+
+Agent: {agent_name} ({role})
+
+Should this task require human approval before proceeding? Answer YES or NO."""
+            started = time.monotonic()
+            result = await asyncio.wait_for(decision_agent.invoke_async(prompt), self.llm_timeout)
+            self._llm_latencies.append(time.monotonic() - started)
+            return "YES" in str(result).strip().upper()
+        except Exception as e:
+            logger.error(f"AI approval decision failed: {e}")
+            return None
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    async def classify(
+        self,
+        task: str,
+        tools: Iterable[str] = (),
+        metadata: Optional[Dict[str, Any]] = None,
+        agent_name: str = "agent",
+        role: str = "",
+    ) -> ApprovalDecision:
+        decision = self.classify_by_rules(task, tools, metadata)
+        if decision is None:
+            decision = await self._classify_ambiguous(task, agent_name, role)
+        self.decisions[decision.tier] += 1
+        if decision.needs_approval:
+            self.approvals_required += 1
+        return decision
+
+    async def _classify_ambiguous(self, task: str, agent_name: str, role: str) -> ApprovalDecision:
+        fingerprint = task_fingerprint(task, role)
+        verdict = self._cached(fingerprint)
+        if verdict is not None:
+            return ApprovalDecision(verdict, TIER_CACHE, "cached model verdict for a matching task")
+
+        loop = asyncio.get_running_loop()
+        key = (loop, fingerprint)
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            verdict = await asyncio.shield(future)
+        else:
+            future = self._inflight[key] = loop.create_future()
+            try:
+                self.llm_calls += 1
+                verdict = await self._ask_llm(task, agent_name, role)
+                if verdict is not None:
+                    self._store(fingerprint, verdict)
+                future.set_result(verdict)
+            except BaseException:
+                future.cancel()
+                raise
+            finally:
+                self._inflight.pop(key, None)
+
+        if verdict is None:
+            # Conservative: only ambiguous tasks get here
+            return ApprovalDecision(True, TIER_FALLBACK, "model unavailable for an ambiguous task")
+        return ApprovalDecision(verdict, TIER_LLM, "model verdict")
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = sum(self.decisions.values())
+        latencies = sorted(self._llm_latencies)
+        with self._cache_lock:
+            cache_entries = len(self._cache)
+        return {
+            "decisions": total,
+            "by_tier": dict(self.decisions),
+            "share_by_tier": {tier: round(count / total, 3) for tier, count in self.decisions.items()} if total else {},
+            "model_calls": self.llm_calls,
+            "model_call_avoided": round(1 - self.llm_calls / total, 3) if total else 0.0,
+            "approvals_required": self.approvals_required,
+            "coalesced": self.coalesced,
+            "cache_entries": cache_entries,
+            "avg_llm_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+        }
+
+
+_classifier: Optional[ApprovalClassifier] = None
+_classifier_lock = threading.Lock()
+
+
+def get_approval_classifier() -> ApprovalClassifier:
+    """Get or create the process-wide approval classifier"""
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None:
+            _classifier = ApprovalClassifier()
+        return _classifier
@@ -16,6 +16,7 @@ from app.services.event_bus import event_bus
 from app.services.event_aware_agent import EventAwareAgent, AgentCapabilities
 from app.services.human_loop_agent import HumanLoopAgent
 from app.services.agent_memory_store import get_memory_store
+from app.services.pending_interactions import get_pending_interactions
 
 logger = logging.getLogger(__name__)
 
@@ -465,21 +466,18 @@ class ControlledSwarmService:
         """Generate dynamic agent capabilities using AI analysis"""
         try:
             from strands import Agent
-            from strands.models.openai import OpenAIModel
-            import os
-            from dotenv import load_dotenv
+            from app.services.model_client_factory import get_model, openai_api_key
             import json
             
-            load_dotenv()
-            api_key = os.getenv("OPENAI_API_KEY")
+            api_key = openai_api_key()
             
             if not api_key:
                 logger.warning("No OpenAI API key - using fallback capabilities")
                 return self._fallback_capabilities(role)
             
             # Create AI capability generator
-            model = OpenAIModel(
-                client_args={"api_key": api_key},
+            model = get_model(
+                api_key=api_key,
                 model_id="gpt-4o-mini",
                 params={"max_tokens": 300, "temperature": 0.2}
             )
@@ -669,20 +667,17 @@ Be specific and relevant to the role. Don't be generic.""",
         """Generate AI-driven system prompt for the specific role"""
         try:
             from strands import Agent
-            from strands.models.openai import OpenAIModel
-            import os
-            from dotenv import load_dotenv
+            from app.services.model_client_factory import get_model, openai_api_key
             
-            load_dotenv()
-            api_key = os.getenv("OPENAI_API_KEY")
+            api_key = openai_api_key()
             
             if not api_key:
                 logger.warning("No OpenAI API key - using fallback system prompt")
                 return self._fallback_system_prompt(role)
             
             # Create AI prompt generator
-            model = OpenAIModel(
-                client_args={"api_key": api_key},
+            model = get_model(
+                api_key=api_key,
                 model_id="gpt-4o-mini",
                 params={"max_tokens": 400, "temperature": 0.3}
             )
@@ -1119,6 +1114,8 @@ Complete your assigned task efficiently and professionally."""
         
         if execution_id in self.active_executions:
             self.active_executions[execution_id]["status"] = "stopped"
+            # Release agents parked on a human approval or question
+            get_pending_interactions().cancel_execution(execution_id)
             # Notify frontend via callback so polling exits promptly
             try:
                 cb = self.active_executions[execution_id].get("callback")
@@ -10,9 +10,10 @@ from enum import Enum
 import uuid
 import time
 import logging
-from collections import defaultdict
+from collections import defaultdict, deque
 
-from app.services.event_hub import get_event_hub, ControlFrame, ControlType
+from app.services.event_hub import EventHub, get_event_hub, ControlFrame, ControlType, TokenFrame
+from app.services.token_coalescer import CoalescePolicy, TokenBatch, TokenCoalescer
 from app.services.agent_runtime import AgentRuntime, AgentContext
 
 logger = logging.getLogger(__name__)
@@ -92,17 +93,87 @@ class ExecutionDAG:
         }
 
 
+class DAGRunState:
+    """
+    Scheduling state for a single DAG execution
+    Tracks remaining dependency counts so readiness updates are O(1) per edge
+    """
+    
+    def __init__(self, exec_id: str, dag: ExecutionDAG):
+        self.exec_id = exec_id
+        self.dag = dag
+        self.running: Dict[asyncio.Task, str] = {}
+        self.completed_nodes: Set[str] = {
+            node_id for node_id, node in dag.nodes.items() if node.state == NodeState.COMPLETED
+        }
+        self.failed_nodes: Set[str] = set()
+        
+        # Dependencies still outstanding per pending node
+        self.pending_deps: Dict[str, int] = {}
+        self.ready: deque = deque()
+        self.unfinished = 0
+        for node_id, node in dag.nodes.items():
+            if node.state != NodeState.PENDING:
+                continue
+            self.unfinished += 1
+            remaining = len(node.dependencies - self.completed_nodes)
+            self.pending_deps[node_id] = remaining
+            if remaining == 0:
+                self.ready.append(node_id)
+    
+    def mark_completed(self, node_id: str):
+        """Record completion and queue dependents whose last dependency this was"""
+        self.completed_nodes.add(node_id)
+        self.unfinished -= 1
+        for dependent_id in self.dag.edges.get(node_id, ()):
+            if dependent_id not in self.pending_deps:
+                continue
+            self.pending_deps[dependent_id] -= 1
+            if (self.pending_deps[dependent_id] == 0
+                    and self.dag.nodes[dependent_id].state == NodeState.PENDING):
+                self.ready.append(dependent_id)
+    
+    def mark_failed(self, node_id: str):
+        """Record failure and skip everything downstream of it"""
+        self.failed_nodes.add(node_id)
+        self.unfinished -= 1
+        to_skip = [node_id]
+        
+        while to_skip:
+            current = to_skip.pop()
+            
+            # Get nodes that depend on this one
+            for dependent_id in self.dag.edges.get(current, ()):
+                dependent = self.dag.nodes.get(dependent_id)
+                if dependent and dependent.state == NodeState.PENDING:
+                    dependent.state = NodeState.SKIPPED
+                    self.unfinished -= 1
+                    to_skip.append(dependent_id)
+                    logger.info(f"Skipped node {dependent_id} due to failed dependency")
+
+
 class DAGOrchestrator:
     """
     Orchestrates agent execution based on DAG
     Single writer to EventHub - prevents conflicts
+    Each execute_dag call keeps its own DAGRunState, so one orchestrator can
+    drive many DAGs concurrently.
     """
     
-    def __init__(self, max_parallel: int = 5):
+    def __init__(
+        self,
+        max_parallel: int = 5,
+        hub: Optional[EventHub] = None,
+        coalesce_tokens: bool = True,
+        token_policy: Optional[CoalescePolicy] = None
+    ):
         self.max_parallel = max_parallel
-        self.hub = get_event_hub()
+        self.hub = hub or get_event_hub()
+        # Token frames are merged per node before publishing unless disabled
+        self.coalesce_tokens = coalesce_tokens
+        self.token_policy = token_policy or CoalescePolicy()
         self.agents: Dict[str, AgentRuntime] = {}
-        self._running_tasks: Dict[str, asyncio.Task] = {}
+        self._executions: Dict[str, DAGRunState] = {}
     
     def register_agent(self, agent: AgentRuntime):
         """Register an agent runtime"""
@@ -132,109 +203,101 @@ class DAGOrchestrator:
             }
         ))
         
-        completed_nodes: Set[str] = set()
-        failed_nodes: Set[str] = set()
+        state = DAGRunState(exec_id, dag)
+        self._executions[exec_id] = state
         
         try:
-            while not dag.is_complete():
-                # Get nodes ready to execute
-                ready_nodes = dag.get_ready_nodes(completed_nodes)
-                
-                # Limit parallel execution
-                can_start = min(
-                    len(ready_nodes),
-                    self.max_parallel - len(self._running_tasks)
-                )
-                
-                # Start execution for ready nodes
-                for node in ready_nodes[:can_start]:
-                    if node.node_id not in self._running_tasks:
-                        task = asyncio.create_task(
-                            self._execute_node(exec_id, node, dag)
-                        )
-                        self._running_tasks[node.node_id] = task
-                        node.state = NodeState.RUNNING
-                        node.started_at = time.time()
-                        
-                        logger.info(f"Started node: {node.node_id}")
-                
-                # Wait for at least one task to complete
-                if self._running_tasks:
-                    done, pending = await asyncio.wait(
-                        self._running_tasks.values(),
-                        return_when=asyncio.FIRST_COMPLETED
+            while state.unfinished > 0:
+                # Start ready nodes up to the parallel limit
+                while state.ready and len(state.running) < self.max_parallel:
+                    node = dag.nodes[state.ready.popleft()]
+                    if node.state != NodeState.PENDING:
+                        continue
+                    task = asyncio.create_task(
+                        self._execute_node(exec_id, node, dag)
                     )
+                    state.running[task] = node.node_id
+                    node.state = NodeState.RUNNING
+                    node.started_at = time.time()
                     
-                    # Process completed tasks
-                    for task in done:
-                        # Find which node completed
-                        for node_id, node_task in list(self._running_tasks.items()):
-                            if node_task == task:
-                                del self._running_tasks[node_id]
-                                node = dag.nodes[node_id]
-                                
-                                try:
-                                    await task
-                                    node.state = NodeState.COMPLETED
-                                    node.completed_at = time.time()
-                                    completed_nodes.add(node_id)
-                                    logger.info(f"Completed node: {node_id}")
-                                    
-                                except Exception as e:
-                                    node.state = NodeState.FAILED
-                                    node.error = str(e)
-                                    node.completed_at = time.time()
-                                    failed_nodes.add(node_id)
-                                    logger.error(f"Failed node {node_id}: {e}")
-                                    
-                                    # Mark dependent nodes as skipped
-                                    self._skip_dependents(dag, node_id)
-                                
-                                break
-                else:
+                    logger.info(f"Started node: {node.node_id}")
+                
+                if not state.running:
                     # No tasks running and no ready nodes - might be stuck
-                    if not dag.is_complete():
-                        logger.warning("DAG execution stuck - no ready nodes")
-                        break
+                    logger.warning("DAG execution stuck - no ready nodes")
+                    break
                 
-                # Small delay to prevent busy loop
-                await asyncio.sleep(0.01)
+                # Wait for at least one task to complete
+                done, _ = await asyncio.wait(
+                    state.running.keys(),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                # Process completed tasks
+                for task in done:
+                    node_id = state.running.pop(task)
+                    node = dag.nodes[node_id]
+                    
+                    try:
+                        task.result()
+                        node.state = NodeState.COMPLETED
+                        node.completed_at = time.time()
+                        state.mark_completed(node_id)
+                        logger.info(f"Completed node: {node_id}")
+                        
+                    except Exception as e:
+                        node.state = NodeState.FAILED
+                        node.error = str(e)
+                        node.completed_at = time.time()
+                        logger.error(f"Failed node {node_id}: {e}")
+                        
+                        # Mark dependent nodes as skipped
+                        state.mark_failed(node_id)
             
             # Publish session end
             await self.hub.publish_control(ControlFrame(
                 exec_id=exec_id,
                 type=ControlType.SESSION_END,
                 payload={
-                    "completed": len(completed_nodes),
-                    "failed": len(failed_nodes),
+                    "completed": len(state.completed_nodes),
+                    "failed": len(state.failed_nodes),
                     "statistics": dag.get_statistics()
                 }
             ))
             
             logger.info(f"DAG execution complete: {dag.get_statistics()}")
             
-            # Clear running tasks dict for next execution
-            self._running_tasks.clear()
-            
             return {
                 "exec_id": exec_id,
-                "success": len(failed_nodes) == 0,
-                "completed_nodes": list(completed_nodes),
-                "failed_nodes": list(failed_nodes),
+                "success": len(state.failed_nodes) == 0,
+                "completed_nodes": list(state.completed_nodes),
+                "failed_nodes": list(state.failed_nodes),
                 "statistics": dag.get_statistics()
             }
             
-        except Exception as e:
-            logger.error(f"DAG execution error: {e}")
+        except BaseException as e:
+            if not isinstance(e, asyncio.CancelledError):
+                logger.error(f"DAG execution error: {e}")
             
             # Cancel running tasks
-            for task in self._running_tasks.values():
+            for task in state.running:
                 task.cancel()
             
-            # Clear the dict after cancelling
-            self._running_tasks.clear()
-            
             raise
+        
+        finally:
+            self._executions.pop(exec_id, None)
+    
+    def get_active_executions(self) -> Dict[str, Dict[str, int]]:
+        """Running/ready/unfinished node counts for each in-flight DAG"""
+        return {
+            exec_id: {
+                "running": len(state.running),
+                "ready": len(state.ready),
+                "unfinished": state.unfinished
+            }
+            for exec_id, state in self._executions.items()
+        }
     
     async def _execute_node(
         self,
@@ -274,16 +337,44 @@ class DAGOrchestrator:
         ))
         
         result_text = ""
+
+        async def publish_tokens(batch: TokenBatch):
+            last = batch.last_meta["frame"]
+            await self.hub.publish_token(TokenFrame(
+                exec_id=last.exec_id,
+                agent_id=last.agent_id,
+                seq=last.seq,
+                text=batch.text,
+                ts=last.ts,
+                final=last.final
+            ))
+
+        coalescer = None
+        if self.coalesce_tokens:
+            coalescer = TokenCoalescer(publish_tokens, self.token_policy, name=node.node_id)
         
         try:
             # Stream from agent and publish to hub
             async for frame in agent.stream(context):
                 # Publish frame to hub
                 if frame.frame_type == "token":
-                    await self.hub.publish_token(frame)
                     result_text += frame.text
+                    if coalescer is None:
+                        await self.hub.publish_token(frame)
+                        continue
+                    if frame.text:
+                        await coalescer.add(frame.agent_id, frame.text, {"frame": frame})
+                    if frame.final:
+                        await coalescer.flush()
+                        if not frame.text:
+                            await self.hub.publish_token(frame)
                 else:
+                    if coalescer is not None:
+                        await coalescer.flush()
                     await self.hub.publish_control(frame)
+
+            if coalescer is not None:
+                await coalescer.close()
             
             # Store result
             node.result = result_text
@@ -302,6 +393,8 @@ class DAGOrchestrator:
             
         except Exception as e:
             logger.error(f"Node execution error {node.node_id}: {e}")
+            if coalescer is not None:
+                await coalescer.close()
             
             # Publish error
             await self.hub.publish_control(ControlFrame(
@@ -325,21 +418,6 @@ class DAGOrchestrator:
             if parent_node:
                 return parent_node.result
         return None
-    
-    def _skip_dependents(self, dag: ExecutionDAG, failed_node_id: str):
-        """Mark all dependent nodes as skipped"""
-        to_skip = [failed_node_id]
-        
-        while to_skip:
-            node_id = to_skip.pop()
-            
-            # Get nodes that depend on this one
-            for dependent_id in dag.edges.get(node_id, []):
-                dependent = dag.nodes.get(dependent_id)
-                if dependent and dependent.state == NodeState.PENDING:
-                    dependent.state = NodeState.SKIPPED
-                    to_skip.append(dependent_id)
-                    logger.info(f"Skipped node {dependent_id} due to failed dependency")
 
 
 def build_simple_dag(tasks: List[Dict[str, Any]]) -> ExecutionDAG:
@@ -15,7 +15,7 @@ logger = logging.getLogger(__name__)
 class DynamicAgentFactory:
     """Create agents on-the-fly based on needs"""
     
-    def __init__(self, human_loop_enabled: bool = True, execution_id: str = None, callback_handler=None, agent_timeout: float = None, timeout_provider=None, max_concurrent_agents: int = None):
+    def __init__(self, human_loop_enabled: bool = True, execution_id: str = None, callback_handler=None, agent_timeout: float = None, timeout_provider=None, max_concurrent_agents: int = None, channel=None):
         logger.info(f"🏭 DynamicAgentFactory __init__ called with callback_handler type={type(callback_handler).__name__}, is_callable={callable(callback_handler) if callback_handler else False}")
         self.human_loop_enabled = human_loop_enabled
         self.execution_id = execution_id
@@ -23,6 +23,7 @@ class DynamicAgentFactory:
         self.agent_timeout = agent_timeout or 120.0  # Default 120s if not provided
         self.timeout_provider = timeout_provider  # Callable to get agent-specific timeout
         self.max_concurrent_agents = max_concurrent_agents  # Optional cap
+        self.channel = channel  # ExecutionChannel scoping this factory's events, if any
         logger.info(f"🏭 self.callback_handler after assignment: type={type(self.callback_handler).__name__}, is_callable={callable(self.callback_handler) if self.callback_handler else False}")
         self.memory_store = get_memory_store() if human_loop_enabled else None
         # No more hardcoded agent templates - everything is AI-driven now
@@ -36,6 +37,13 @@ class DynamicAgentFactory:
     
     def _register_handlers(self):
         """Register event handlers for agent management"""
+        if self.channel is not None:
+            # Only this execution's events; its swarm owns agent.needed
+            self.channel.on("specialist.needed", self._handle_specialist_needed)
+            self.channel.on("task.complete", self._cleanup_agents)
+            self.channel.on("agent.completed", self._on_agent_completed)
+            self.channel.on("agent_completed", self._on_agent_completed)
+            return
         event_bus.on("agent.needed", self._handle_agent_needed)
         event_bus.on("specialist.needed", self._handle_specialist_needed)
         event_bus.on("task.complete", self._cleanup_agents)
@@ -263,20 +271,17 @@ class DynamicAgentFactory:
         """Use AI to create a fully dynamic agent template based on specific needs"""
         try:
             from strands import Agent
-            from strands.models.openai import OpenAIModel
-            import os
-            from dotenv import load_dotenv
+            from app.services.model_client_factory import get_model, openai_api_key
             
-            load_dotenv()
-            api_key = os.getenv("OPENAI_API_KEY")
+            api_key = openai_api_key()
             
             if not api_key:
                 logger.warning("No OpenAI API key - using minimal fallback")
                 return self._minimal_fallback_template(role, requirements)
             
             # Create AI template generator with enhanced capabilities
-            model = OpenAIModel(
-                client_args={"api_key": api_key},
+            model = get_model(
+                api_key=api_key,
                 model_id="gpt-4o-mini", 
                 params={"max_tokens": 600, "temperature": 0.2}
             )
@@ -485,19 +490,16 @@ Return ONLY the JSON array, no other text."""
         """Initialize the AI role analyzer"""
         try:
             from strands import Agent
-            from strands.models.openai import OpenAIModel
-            import os
-            from dotenv import load_dotenv
+            from app.services.model_client_factory import get_model, openai_api_key
             
-            load_dotenv()
-            api_key = os.getenv("OPENAI_API_KEY")
+            api_key = openai_api_key()
             
             if not api_key:
                 logger.warning("No OpenAI API key - AI role analysis disabled")
                 return
             
-            model = OpenAIModel(
-                client_args={"api_key": api_key},
+            model = get_model(
+                api_key=api_key,
                 model_id="gpt-4o-mini",
                 params={"max_tokens": 500, "temperature": 0.1}
             )
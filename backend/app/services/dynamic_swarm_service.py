@@ -16,7 +16,7 @@ import time
 import re
 from strands import Agent, tool
 from strands.multiagent import Swarm
-from strands.models.openai import OpenAIModel
+from app.services.model_client_factory import get_model
 from strands_tools import swarm as swarm_tool  # For dynamic swarm creation
 
 logger = structlog.get_logger()
@@ -64,8 +64,8 @@ class DynamicSwarmService:
         agents = []
         
         # Create base model configuration
-        model = OpenAIModel(
-            client_args={"api_key": os.getenv("OPENAI_API_KEY")},
+        model = get_model(
+            api_key=os.getenv("OPENAI_API_KEY"),
             model_id="gpt-4o-mini",
             params={"temperature": 0.7, "max_tokens": 4000}
         )
@@ -3,13 +3,13 @@ Dynamic Tool Wrapper for Strands Agents
 Wraps existing tools from strands-tools without requiring @tool decorator
 """
 import asyncio
+import inspect
 import json
 import os
 from typing import Dict, Any, List, Callable, Optional
 import structlog
 from strands import tool
 import importlib
-import inspect
 import sys
 from pathlib import Path
 
@@ -22,6 +22,8 @@ except ImportError:
     def get_tool_schema(tool_name: str):
         return None
 
+from app.services.tool_catalog import ToolEntry, get_tool_catalog
+
 logger = structlog.get_logger()
 
 class DynamicToolWrapper:
@@ -32,60 +34,48 @@ class DynamicToolWrapper:
         self.wrapped_tools = {}
         self.tool_instances = {}
         
-    def create_visible_wrapper(self, tool_name: str, tool_func: Callable, agent_name: str) -> Callable:
+    def create_visible_wrapper(self, tool_name: str, tool_func: Callable, agent_name: str,
+                               entry: Optional[ToolEntry] = None) -> Callable:
         """Create a wrapper that adds visibility to any tool"""
+        return self.build_unbound_wrapper(tool_name, tool_func, agent_name, entry).__get__(self, type(self))
 
-        # Get the correct tool schema to build proper function signature
-        tool_schema = get_tool_schema(tool_name)
-
-        if tool_schema:
-            # Extract parameter information from schema
-            params = tool_schema.get('parameters', {})
-            properties = params.get('properties', {})
-            required = params.get('required', [])
-
-            # Create parameter objects for the function signature
-            sig_params = []
-            for param_name, param_info in properties.items():
-                # Determine if parameter has a default value
-                if param_name in required:
-                    # Required parameter - no default
-                    param = inspect.Parameter(
-                        param_name,
-                        inspect.Parameter.POSITIONAL_OR_KEYWORD,
-                        annotation=str
-                    )
-                else:
-                    # Optional parameter - use default if specified
-                    default_value = param_info.get('default', None)
-                    param = inspect.Parameter(
-                        param_name,
-                        inspect.Parameter.POSITIONAL_OR_KEYWORD,
-                        default=default_value,
-                        annotation=str
-                    )
-                sig_params.append(param)
-
-            # Create the new signature
-            new_signature = inspect.Signature(sig_params)
-
+    @staticmethod
+    def build_unbound_wrapper(tool_name: str, tool_func: Callable, agent_name: str,
+                              entry: Optional[ToolEntry] = None) -> Callable:
+        """Strands tool for tool_name that takes its DynamicToolWrapper as self
+
+        It holds no callback handler, so one instance can be shared by every
+        execution; binding it (tool.__get__(wrapper)) reuses its spec and
+        input model and reports through that wrapper's handler.
+        """
+
+        # Schema, signature and call style are worked out once per tool
+        if entry is None or entry.func is not tool_func:
+            entry = ToolEntry.compile(tool_name, tool_func)
+        tool_schema = entry.schema
+        new_signature = entry.signature
+
+        if new_signature is not None:
             # Create a wrapper function with the correct signature
-            async def _base_wrapped(*args, **kwargs):
+            async def _base_wrapped(self, *args, **kwargs):
                 # Convert args to kwargs using parameter names
                 bound_args = new_signature.bind(*args, **kwargs)
                 bound_args.apply_defaults()
                 actual_params = dict(bound_args.arguments)
 
                 # Execute the tool with proper parameters
-                return await self._execute_tool(tool_name, tool_func, agent_name, actual_params)
+                return await self._execute_tool(tool_name, tool_func, agent_name, actual_params, entry)
 
-            # Apply the correct signature to the wrapper
-            _base_wrapped.__signature__ = new_signature
+            # Apply the correct signature to the wrapper; Strands skips self in the tool spec
+            _base_wrapped.__signature__ = new_signature.replace(parameters=[
+                inspect.Parameter("self", inspect.Parameter.POSITIONAL_OR_KEYWORD),
+                *new_signature.parameters.values(),
+            ])
 
         else:
             # Fallback if no schema available - use simple kwargs
-            async def _base_wrapped(**kwargs):
-                return await self._execute_tool(tool_name, tool_func, agent_name, kwargs)
+            async def _base_wrapped(self, **kwargs):
+                return await self._execute_tool(tool_name, tool_func, agent_name, kwargs, entry)
 
         # Set function name and doc
         _base_wrapped.__name__ = tool_name
@@ -103,10 +93,12 @@ class DynamicToolWrapper:
 
         return visible_tool
 
-    async def _execute_tool(self, tool_name: str, tool_func: Callable, agent_name: str, actual_params: Dict[str, Any]):
+    async def _execute_tool(self, tool_name: str, tool_func: Callable, agent_name: str, actual_params: Dict[str, Any],
+                            entry: Optional[ToolEntry] = None):
         """Execute a tool with proper error handling and logging"""
         current_tool_name = tool_name
-        current_tool_func = tool_func
+        if entry is None or entry.func is not tool_func:
+            entry = ToolEntry.compile(tool_name, tool_func)
 
         # Emit tool call for UI
         if self.callback_handler:
@@ -131,26 +123,11 @@ class DynamicToolWrapper:
                     "input": params or {}
                 }
 
-            # Determine call signature
-            call_target = current_tool_func
-            is_async = asyncio.iscoroutinefunction(call_target)
-            if not is_async and hasattr(current_tool_func, '__call__'):
-                call_attr = current_tool_func.__call__
-                call_target = call_attr
-                is_async = asyncio.iscoroutinefunction(call_attr)
-
-            try:
-                sig = inspect.signature(call_target)
-            except Exception:
-                sig = None
-
-            if sig:
-                params = list(sig.parameters.values())
-            else:
-                params = []
+            call_target = entry.call_target
+            is_async = entry.is_async
 
             # If first param is named 'tool', adapt to ToolUse API
-            if params and params[0].name == 'tool':
+            if entry.tool_use_api:
                 tool_use = _build_tool_use(actual_params if isinstance(actual_params, dict) else {})
                 if is_async:
                     result = await call_target(tool=tool_use)
@@ -201,123 +178,19 @@ class DynamicToolWrapper:
         """Wrap a tool from strands-tools package"""
 
         try:
-            # First try to load from strands registry (for ALL dynamic tools)
-            try:
-                from app.tools.strands_tool_registry import get_dynamic_tools
-                import asyncio
-
-                # Get or create event loop
-                try:
-                    loop = asyncio.get_running_loop()
-                except RuntimeError:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-
-                # Get the registry
-                registry = loop.run_until_complete(get_dynamic_tools())
-                if registry and hasattr(registry, 'tools') and tool_name in registry.tools:
-                    tool_obj = registry.tools[tool_name]
-                    if hasattr(tool_obj, 'handler'):
-                        logger.info(f"✅ Loaded tool {tool_name} from strands registry")
-                        return self.create_visible_wrapper(tool_name, tool_obj.handler, agent_name)
-            except Exception as e:
-                logger.debug(f"Could not load {tool_name} from strands registry: {e}")
-
-            # Fallback: Check local tools directory
-            if tool_name == 'tavily_search':
-                try:
-                    from tools.tavily_search_tool import tavily_search
-                    logger.info(f"✅ Loaded tool {tool_name} from tools.tavily_search_tool")
-                    return self.create_visible_wrapper(tool_name, tavily_search, agent_name)
-                except ImportError:
-                    pass
-
-            # Prefer app.tools implementations first (stable call signatures)
-            app_tool_modules = [
-                'app.tools.python_repl_tool',
-                'app.tools.file_tools',
-                'app.tools.web_tools',
-                'app.tools.system_tools',
-                'app.tools.strands_tavily_search',  # Add this for tavily_search
-                'app.tools.tavily_search_tool',  # And this one
-            ]
-
-            for module_name in app_tool_modules:
-                try:
-                    module = importlib.import_module(module_name)
-                    if hasattr(module, tool_name):
-                        tool_func = getattr(module, tool_name)
-                        logger.info(f"✅ Loaded tool {tool_name} from {module_name}")
-                        return self.create_visible_wrapper(tool_name, tool_func, agent_name)
-                except ImportError:
-                    continue
-
-            # Try to import from strands_agents_tools
-            try:
-                import types
-                module = importlib.import_module('strands_tools')
-                if hasattr(module, tool_name):
-                    obj = getattr(module, tool_name)
-                    # Some distributions expose a submodule named after the tool
-                    if isinstance(obj, types.ModuleType) and hasattr(obj, tool_name):
-                        obj = getattr(obj, tool_name)
-                    if callable(obj):
-                        logger.info(f"✅ Loaded tool {tool_name} from strands_agents_tools")
-                        return self.create_visible_wrapper(tool_name, obj, agent_name)
-            except ImportError:
-                pass
-
-            # Try specific modules
-            tool_modules = {
-                'file_read': 'strands_tools',
-                'file_write': 'strands_tools',
-                'editor': 'strands_tools',
-                'http_request': 'strands_tools',
-                'python_repl': 'strands_tools',
-                'shell': 'strands_tools',
-                'calculator': 'strands_tools',
-                'current_time': 'strands_tools',
-                'sleep': 'strands_tools',
-                'environment': 'strands_tools',
-                'system_info': 'strands_tools',
-                'journal': 'strands_tools',
-                'handoff_to_user': 'strands_tools',
-                'stop': 'strands_tools',
-                'think': 'strands_tools',
-                'batch': 'strands_tools',
-                'workflow': 'strands_tools',
-                'use_llm': 'strands_tools',
-                'memory': 'strands_tools',
-                'mem0_memory': 'strands_tools',
-                'generate_image': 'strands_tools',
-                'image_reader': 'strands_tools',
-                'speak': 'strands_tools',
-                'diagram': 'strands_tools',
-                'use_aws': 'strands_tools',
-                'retrieve': 'strands_tools',
-                'task_planner': 'strands_tools',
-                'agent_todo': 'strands_tools',
-                'recursive_executor': 'strands_tools',
-            }
-
-            if tool_name in tool_modules:
-                module_name = tool_modules[tool_name]
-                try:
-                    module = importlib.import_module(module_name)
-                    if hasattr(module, tool_name):
-                        obj = getattr(module, tool_name)
-                        if isinstance(obj, types.ModuleType) and hasattr(obj, tool_name):
-                            obj = getattr(obj, tool_name)
-                        if callable(obj):
-                            logger.info(f"✅ Loaded tool {tool_name} from {module_name}")
-                            return self.create_visible_wrapper(tool_name, obj, agent_name)
-                except ImportError as e:
-                    logger.warning(f"Could not import {module_name}: {e}")
-
-            # (already tried app.tools above)
-
-            logger.warning(f"Tool {tool_name} not found in available modules")
-            return None
+            # Resolved once per process by the tool catalog (registry, tools/, app.tools, strands_tools)
+            catalog = get_tool_catalog()
+            entry = catalog.resolve(tool_name)
+            if entry is None:
+                logger.warning(f"Tool {tool_name} not found in available modules")
+                return None
+
+            # The cached tool is shared across executions; binding it supplies this wrapper's callback handler
+            unbound = catalog.get_wrapper(tool_name, agent_name)
+            if unbound is None:
+                unbound = self.build_unbound_wrapper(tool_name, entry.func, agent_name, entry)
+                catalog.put_wrapper(tool_name, agent_name, unbound)
+            return unbound.__get__(self, type(self))
 
         except Exception as e:
             logger.error(f"Error wrapping tool {tool_name}: {e}")
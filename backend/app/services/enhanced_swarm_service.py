@@ -14,7 +14,7 @@ import structlog
 
 # Strands imports
 from strands import Agent
-from strands.models.openai import OpenAIModel
+from app.services.model_client_factory import get_model
 from strands import tool
 
 # Import tool approval hook
@@ -147,10 +147,8 @@ If a tool fails, check:
 """
 
         # Create OpenAI model for Strands
-        self.model = OpenAIModel(
-            client_args={
-                "api_key": os.getenv("OPENAI_API_KEY"),
-            },
+        self.model = get_model(
+            api_key=os.getenv("OPENAI_API_KEY"),
             model_id=model,
             params={
                 "temperature": temperature,
@@ -837,7 +835,7 @@ def create_handoff_to_agent_tool(
                         tools.append(fr)
                         added.add("file_read")
                 elif tname == "python_repl":
-                    tools.append(create_python_repl_tool(agent_name, callback_handler))
+                    tools.append(create_python_repl_tool(agent_name, callback_handler, execution_id))
                     added.add(tname)
                 else:
                     if not STRICT:
@@ -1205,8 +1203,16 @@ def create_file_tools(agent_name: str, callback_handler: Optional[Callable] = No
     return file_write, file_read
 
 
-def create_python_repl_tool(agent_name: str, callback_handler: Optional[Callable] = None):
-    """Create Python REPL tool with visible status updates"""
+def create_python_repl_tool(agent_name: str, callback_handler: Optional[Callable] = None,
+                            execution_id: Optional[str] = None):
+    """Create Python REPL tool with visible status updates
+
+    The REPL namespace is scoped to the execution, so agents with the same
+    name in different executions never share variables.
+    """
+    from app.services.execution_channels import current_execution_id
+    repl_session = f"{execution_id or current_execution_id.get() or uuid.uuid4().hex}:{agent_name}"
+
     @tool
     async def python_repl(code: str, persist_state: bool = True) -> dict:
         """Execute Python code in a sandboxed environment.
@@ -1252,8 +1258,20 @@ def create_python_repl_tool(agent_name: str, callback_handler: Optional[Callable
             # Import and use the actual Python REPL tool
             from app.tools.python_repl_tool import python_repl as repl_tool
             
-            # Execute the code
-            result = await repl_tool(code=code, persist_state=persist_state)
+            async def stream_output(stream: str, chunk: str):
+                await callback_handler(
+                    type="tool_output",
+                    agent=agent_name,
+                    data={"tool": "python_repl", "stream": stream, "chunk": chunk}
+                )
+
+            # Execute the code; each agent of each execution keeps its own namespace in the worker pool
+            result = await repl_tool(
+                code=code,
+                persist_state=persist_state,
+                session_id=repl_session,
+                on_output=stream_output if callback_handler else None,
+            )
             
             # Send execution result notification
             if callback_handler:
@@ -1413,7 +1431,7 @@ class EnhancedSwarmService:
                                 continue
                             # Python REPL
                             if tname == "python_repl":
-                                resolved_tools.append(create_python_repl_tool(agent_cfg.name, callback_handler))
+                                resolved_tools.append(create_python_repl_tool(agent_cfg.name, callback_handler, execution_id))
                                 added.add("python_repl")
                                 continue
                             # Optional fallback to dynamic wrapper when NOT strict
@@ -1772,7 +1790,7 @@ class EnhancedSwarmService:
                                         added_tools.add("file_read")
                                         logger.info(f"✅ Added file_read to coordinator")
                             elif tool_name == "python_repl":
-                                tool = create_python_repl_tool("coordinator", callback_handler)
+                                tool = create_python_repl_tool("coordinator", callback_handler, execution_id)
                                 all_tools.append(tool)
                                 added_tools.add(tool_name)
                                 logger.info(f"✅ Added python_repl to coordinator")
@@ -2100,6 +2118,12 @@ class EnhancedSwarmService:
         finally:
             if execution_id in self.active_executions:
                 del self.active_executions[execution_id]
+            # Python REPL namespaces of this execution's agents
+            try:
+                from app.services.repl_pool import get_repl_pool
+                get_repl_pool().drop_sessions(f"{execution_id}:")
+            except Exception as e:
+                logger.debug(f"Could not drop REPL sessions for {execution_id}: {e}")
 
     async def stop_execution(self, execution_id: str) -> bool:
         """Mark execution as stopped so cooperative loops can exit."""
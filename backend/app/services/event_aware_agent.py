@@ -7,6 +7,7 @@ import logging
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 from app.services.event_bus import event_bus, SwarmEvent
+from app.services.pending_interactions import InteractionCancelled, get_pending_interactions
 
 logger = logging.getLogger(__name__)
 
@@ -140,12 +141,9 @@ class EventAwareAgent:
         # Use Strands SDK to actually process the task
         try:
             from strands import Agent
-            from strands.models.openai import OpenAIModel
-            import os
-            from dotenv import load_dotenv
+            from app.services.model_client_factory import get_model, openai_api_key
             
-            load_dotenv()
-            api_key = os.getenv("OPENAI_API_KEY")
+            api_key = openai_api_key()
             
             if not api_key:
                 logger.warning("No OpenAI API key - using simulation mode")
@@ -153,8 +151,8 @@ class EventAwareAgent:
                 return f"{self.role} processed: {self.current_task}"
             
             # Create a real Strands agent to do the work
-            model = OpenAIModel(
-                client_args={"api_key": api_key},
+            model = get_model(
+                api_key=api_key,
                 model_id="gpt-4o-mini",
                 params={"max_tokens": 2000, "temperature": 0.7}
             )
@@ -316,12 +314,9 @@ class EventAwareAgent:
         # Let the AI agent decide what to do next based on its output
         try:
             from strands import Agent
-            from strands.models.openai import OpenAIModel
-            import os
-            from dotenv import load_dotenv
+            from app.services.model_client_factory import get_model, openai_api_key
             
-            load_dotenv()
-            api_key = os.getenv("OPENAI_API_KEY")
+            api_key = openai_api_key()
             
             if not api_key:
                 logger.warning("No OpenAI API key - using fallback logic")
@@ -329,8 +324,8 @@ class EventAwareAgent:
                 return
             
             # Create a decision agent
-            model = OpenAIModel(
-                client_args={"api_key": api_key},
+            model = get_model(
+                api_key=api_key,
                 model_id="gpt-4o-mini",
                 params={"max_tokens": 1000, "temperature": 0.3}
             )
@@ -664,6 +659,8 @@ Create more agents when:
     async def ask_human(self, question: str) -> str:
         """Ask human for input"""
         question_id = str(uuid.uuid4())
+        interactions = get_pending_interactions()
+        interactions.register(question_id, kind="question", ttl=300)
         
         await event_bus.emit(
             "human.question",
@@ -677,14 +674,11 @@ Create more agents when:
         )
         
         # Wait for response
-        response_event = await event_bus.wait_for_event(
-            f"human.response.{question_id}",
-            timeout=300  # 5 minutes
-        )
-        
-        if response_event:
-            return response_event.data.get("answer", "No response")
-        return "No response received"
+        try:
+            response_data = await interactions.wait(question_id, timeout=300)  # 5 minutes
+        except (InteractionCancelled, asyncio.TimeoutError):
+            return "No response received"
+        return (response_data or {}).get("answer", "No response")
     
     async def handoff_to(self, target_agent: str, reason: str, context: dict = None):
         """Hand off task to another agent"""
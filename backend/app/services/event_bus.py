@@ -5,8 +5,9 @@ import asyncio
 import time
 import uuid
 import threading
-from typing import Dict, List, Callable, Any, Optional, Set
-from collections import defaultdict
+from typing import Deque, Dict, List, Callable, Any, Optional, Set, Tuple
+from collections import defaultdict, deque
+from itertools import islice
 from dataclasses import dataclass, field
 import logging
 import json
@@ -31,25 +32,112 @@ class SwarmEvent:
             "timestamp": self.timestamp
         }
 
+class _PatternTrie:
+    """Segment trie over listener patterns ("a.b", "a.b.*", "*")
+
+    Resolves the listeners for a concrete event type in one walk over its
+    segments instead of re-splitting and probing every prefix on each emit.
+    """
+
+    __slots__ = ("children", "exact", "wildcard")
+
+    def __init__(self):
+        self.children: Dict[str, "_PatternTrie"] = {}
+        self.exact: List[Callable] = []
+        self.wildcard: List[Callable] = []
+
+    def add(self, pattern: str, callback: Callable):
+        if pattern.endswith(".*"):
+            self._node(pattern[:-2]).wildcard.append(callback)
+        else:
+            self._node(pattern).exact.append(callback)
+
+    def remove(self, pattern: str, callback: Callable):
+        wildcard = pattern.endswith(".*")
+        node = self._node(pattern[:-2] if wildcard else pattern, create=False)
+        if node is None:
+            return
+        bucket = node.wildcard if wildcard else node.exact
+        if callback in bucket:
+            bucket.remove(callback)
+
+    def resolve(self, event_type: str) -> List[Callable]:
+        """Listeners in dispatch order: exact, then "a.*", "a.b.*", ... by depth"""
+        parts = event_type.split(".")
+        wildcards: List[Callable] = []
+        node = self
+        for part in parts:
+            node = node.children.get(part)
+            if node is None:
+                break
+            wildcards.extend(node.wildcard)
+        exact = node.exact if node is not None else []
+        # "x.*" only matched dotted event types in the original dispatch rules
+        if len(parts) == 1:
+            wildcards = []
+        return exact + wildcards
+
+    def _node(self, pattern: str, create: bool = True) -> Optional["_PatternTrie"]:
+        node = self
+        for part in pattern.split("."):
+            child = node.children.get(part)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[part] = _PatternTrie()
+            node = child
+        return node
+
+
 class EventBus:
     """Central event coordination system for swarm agents"""
     
     def __init__(self):
         self.listeners: Dict[str, List[Callable]] = defaultdict(list)
-        self.event_history: List[SwarmEvent] = []
         self.pending_human_input = {}
         self.active = True
-        self._lock = asyncio.Lock()
+        
+        # Precompiled pattern index and per-event-type resolved listeners.
+        # The cache is cleared whenever a listener is added or removed.
+        self._trie = _PatternTrie()
+        self._resolved: Dict[str, Tuple[Tuple[Callable, bool], ...]] = {}
         
         # Thread-safe event deduplication
-        self._processed_events: Set[str] = set()
+        self._processed_events: Set[Any] = set()
         self._deduplication_lock = threading.RLock()
         
-        # Limit event history size to prevent memory leaks
+        # Limit event history size to prevent memory leaks; signatures are
+        # kept alongside so evicted events stop counting as duplicates
         self.max_history_size = 1000
+        self.event_history: Deque[SwarmEvent] = deque(maxlen=self.max_history_size)
+        self._history_signatures: Deque[Any] = deque(maxlen=self.max_history_size)
+    
+    @staticmethod
+    def _signature(event_type: str, data: dict, idempotency_key: Optional[str] = None):
+        """Cheap dedup key: caller idempotency key, else a hash of the data items"""
+        if idempotency_key is not None:
+            return (event_type, idempotency_key)
+        try:
+            return (event_type, hash(tuple(sorted(data.items()))))
+        except TypeError:
+            # Unhashable values (nested dicts/lists) - fall back to their repr
+            return (event_type, hash(str(sorted(data.items()))))
+    
+    def _listeners_for(self, event_type: str) -> Tuple[Tuple[Callable, bool], ...]:
+        resolved = self._resolved.get(event_type)
+        if resolved is None:
+            callbacks = self._trie.resolve(event_type) + self.listeners.get("*", [])
+            resolved = tuple((cb, asyncio.iscoroutinefunction(cb)) for cb in callbacks)
+            self._resolved[event_type] = resolved
+        return resolved
+        
+    async def emit(self, event_type: str, data: dict, source: str = None,
+                   idempotency_key: Optional[str] = None):
+        """Thread-safe emit an event that other agents can react to
         
-    async def emit(self, event_type: str, data: dict, source: str = None):
-        """Thread-safe emit an event that other agents can react to"""
+        idempotency_key, when given, replaces the data-derived dedup key so
+        callers can mark retries of the same logical event cheaply.
+        """
         event = SwarmEvent(
             type=event_type,
             data=data,
@@ -58,50 +146,31 @@ class EventBus:
         
         # Check for duplicate events - but allow agent.needed events to pass through
         # Multiple agents of the same type might be needed
+        signature = None
         with self._deduplication_lock:
             if event_type != "agent.needed" and event_type != "specialist.needed":
-                event_signature = f"{event_type}:{hash(str(sorted(data.items())))}"
-                if event_signature in self._processed_events:
+                signature = self._signature(event_type, data, idempotency_key)
+                if signature in self._processed_events:
                     logger.debug(f"🔄 Duplicate event detected, skipping: {event_type}")
                     return
-                self._processed_events.add(event_signature)
-        
-        async with self._lock:
-            self.event_history.append(event)
+                self._processed_events.add(signature)
             
-            # Limit history size to prevent memory leaks
-            if len(self.event_history) > self.max_history_size:
-                # Remove oldest events
-                removed_events = self.event_history[:len(self.event_history) - self.max_history_size]
-                self.event_history = self.event_history[-self.max_history_size:]
-                
-                # Clean up processed events for removed history
-                with self._deduplication_lock:
-                    for old_event in removed_events:
-                        old_signature = f"{old_event.type}:{hash(str(sorted(old_event.data.items())))}"
-                        self._processed_events.discard(old_signature)
+            # Evict the oldest signature together with the oldest event
+            if len(self.event_history) == self.max_history_size:
+                old_signature = self._history_signatures[0]
+                if old_signature is not None:
+                    self._processed_events.discard(old_signature)
+            self.event_history.append(event)
+            self._history_signatures.append(signature)
             
         logger.info(f"📡 Event emitted: {event_type} from {source}")
-        logger.debug(f"Event data: {json.dumps(data, default=str)[:200]}")
-        
-        # Notify all listeners for this event type
-        listeners = self.listeners.get(event_type, [])
-        
-        # Also check for wildcard listeners
-        if "." in event_type:
-            # Handle patterns like "agent.*" 
-            parts = event_type.split(".")
-            for i in range(len(parts)):
-                pattern = ".".join(parts[:i+1]) + ".*"
-                listeners.extend(self.listeners.get(pattern, []))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Event data: {json.dumps(data, default=str)[:200]}")
         
-        # Always notify "*" listeners (listen to everything)
-        listeners.extend(self.listeners.get("*", []))
-        
-        # Execute all listeners
-        for listener in listeners:
+        # Notify exact, wildcard ("agent.*") and "*" listeners
+        for listener, is_async in self._listeners_for(event_type):
             try:
-                if asyncio.iscoroutinefunction(listener):
+                if is_async:
                     asyncio.create_task(listener(event))
                 else:
                     listener(event)
@@ -117,27 +186,41 @@ class EventBus:
         - "*" - all events
         """
         self.listeners[event_pattern].append(callback)
+        if event_pattern != "*":
+            self._trie.add(event_pattern, callback)
+        self._resolved.clear()
         logger.debug(f"Registered listener for: {event_pattern}")
         return callback  # Allow use as decorator
     
     def once(self, event_pattern: str, callback: Callable):
         """Register a one-time listener"""
+        fired = False
+
         async def wrapper(event):
+            # emit() schedules async listeners as tasks, so a burst can queue
+            # this wrapper several times before the first run unregisters it
+            nonlocal fired
+            if fired:
+                return
+            fired = True
+            self.off(event_pattern, wrapper)
             await callback(event) if asyncio.iscoroutinefunction(callback) else callback(event)
-            self.listeners[event_pattern].remove(wrapper)
-        self.listeners[event_pattern].append(wrapper)
-        return wrapper
+        return self.on(event_pattern, wrapper)
     
     def off(self, event_pattern: str, callback: Callable):
         """Remove a listener"""
         if event_pattern in self.listeners:
             if callback in self.listeners[event_pattern]:
                 self.listeners[event_pattern].remove(callback)
+                if event_pattern != "*":
+                    self._trie.remove(event_pattern, callback)
+                self._resolved.clear()
     
     def get_recent_events(self, count: int = 10, event_type: str = None) -> List[SwarmEvent]:
         """Thread-safe get recent events, optionally filtered by type"""
         with self._deduplication_lock:
-            events = self.event_history[-count:]
+            events = list(islice(reversed(self.event_history), count))
+            events.reverse()
             if event_type:
                 events = [e for e in events if e.type == event_type or e.type.startswith(event_type)]
             return events
@@ -146,6 +229,7 @@ class EventBus:
         """Thread-safe clear event history"""
         with self._deduplication_lock:
             self.event_history.clear()
+            self._history_signatures.clear()
             self._processed_events.clear()
     
     async def wait_for_event(self, event_type: str, timeout: float = None) -> Optional[SwarmEvent]:
@@ -156,7 +240,7 @@ class EventBus:
             if not future.done():
                 future.set_result(event)
         
-        self.once(event_type, handler)
+        listener = self.once(event_type, handler)
         
         try:
             if timeout:
@@ -165,6 +249,9 @@ class EventBus:
                 return await future
         except asyncio.TimeoutError:
             return None
+        finally:
+            # A timed-out wait would otherwise leave its one-time listener behind
+            self.off(event_type, listener)
     
     def get_listeners_count(self) -> Dict[str, int]:
         """Get count of listeners per event pattern"""
@@ -184,11 +271,11 @@ class EventBus:
         with self._deduplication_lock:
             return len(self._processed_events)
     
-    def is_event_processed(self, event_type: str, data: dict) -> bool:
+    def is_event_processed(self, event_type: str, data: dict,
+                           idempotency_key: Optional[str] = None) -> bool:
         """Check if an event has been processed already"""
         with self._deduplication_lock:
-            event_signature = f"{event_type}:{hash(str(sorted(data.items())))}"
-            return event_signature in self._processed_events
+            return self._signature(event_type, data, idempotency_key) in self._processed_events
 
 
 # Global event bus instance
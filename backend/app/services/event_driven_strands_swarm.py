@@ -16,7 +16,9 @@ from app.services.strands_session_service import get_strands_session_service
 from app.services.event_bus import event_bus, SwarmEvent
 from app.services.event_aware_agent import EventAwareAgent, AgentCapabilities
 from app.services.dynamic_agent_factory import DynamicAgentFactory
-from app.services.agent_output_queue import get_output_queue, reset_output_queue
+from app.services.agent_output_queue import get_output_queue, reset_output_queue, release_output_queue
+from app.services.execution_channels import ExecutionChannel, current_execution_id, execution_channels
+from app.services.pending_interactions import get_pending_interactions
 
 # Try to import existing event_system components if available
 try:
@@ -95,6 +97,11 @@ logger = structlog.get_logger()
 # Also get a standard logger for debugging
 std_logger = logging.getLogger(__name__)
 
+# Quiet period after the last agent activity before the idle fallback runs
+IDLE_GRACE_SECONDS = 10.0
+# Give up if agents go idle this long after the start without substantial work
+STALL_TIMEOUT_SECONDS = 60.0
+
 
 class SwarmEventHooks(HookProvider):
     """Event hooks for Strands agents"""
@@ -202,6 +209,10 @@ class EventDrivenStrandsSwarm(StrandsSwarmService):
         """Stop an active execution"""
         if hasattr(self, 'active_executions') and execution_id in self.active_executions:
             self.active_executions[execution_id]["status"] = "stopped"
+            channel = execution_channels.get(execution_id)
+            if channel is not None:
+                channel.stop()
+            get_pending_interactions().cancel_execution(execution_id)
             logger.info(f"🛑 Marked execution {execution_id} for stopping")
             return True
         return False
@@ -326,9 +337,6 @@ class EventDrivenStrandsSwarm(StrandsSwarmService):
         except Exception:
             self.agent_timeouts[execution_id] = 90
         
-        # Clear event history for new execution
-        self.event_bus.clear_history()
-        
         try:
             # Calculate session_id early for consistency
             session_id = getattr(request, 'session_id', None) or execution_id
@@ -434,23 +442,16 @@ Example: [{{"role": "researcher", "reason": "need to gather requirements"}}]"""
         
         # Try to import OpenAI model
         try:
-            from strands.models.openai import OpenAIModel
-            import os
-            from dotenv import load_dotenv
+            from app.services.model_client_factory import get_model, openai_api_key
             
-            # Ensure .env is loaded
-            load_dotenv()
-            
-            api_key = os.getenv("OPENAI_API_KEY")
+            api_key = openai_api_key()
             if not api_key:
                 logger.warning("OPENAI_API_KEY not found in environment")
                 model = None
             else:
                 # Create OpenAI model
-                model = OpenAIModel(
-                    client_args={
-                        "api_key": api_key,
-                    },
+                model = get_model(
+                    api_key=api_key,
                     model_id="gpt-4o-mini",
                     params={
                         "max_tokens": 4000,
@@ -561,16 +562,51 @@ EVENT-DRIVEN COORDINATION:
                 if event_type in ["text_generation", "agent_completed"]:
                     logger.warning(f"⚠️ No callback_handler configured - {event_type} from {agent_name} not forwarded")
         
+        # Route this execution's events to its own channel. Tasks started from
+        # here inherit current_execution_id, so the agents' emits land in it too.
+        channel = execution_channels.open(actual_execution_id, aliases=(execution_id,))
+        scope = current_execution_id.set(actual_execution_id)
+        try:
+            return await self._run_true_event_driven(
+                task=task,
+                execution_id=execution_id,
+                session_id=session_id,
+                actual_execution_id=actual_execution_id,
+                channel=channel,
+                streaming_callback=direct_streaming_callback,
+                callback_handler=callback_handler,
+                max_concurrent_agents=max_concurrent_agents,
+                start_time=start_time
+            )
+        finally:
+            current_execution_id.reset(scope)
+            execution_channels.close(channel)
+            release_output_queue(actual_execution_id)
+    
+    async def _run_true_event_driven(
+        self,
+        task: str,
+        execution_id: str,
+        session_id: str,
+        actual_execution_id: str,
+        channel: ExecutionChannel,
+        streaming_callback: Callable,
+        callback_handler: Optional[Callable],
+        max_concurrent_agents: Optional[int],
+        start_time: float
+    ) -> SwarmExecutionResponse:
+        """Spawn the first agent, then react to the execution's channel until the task completes"""
         # Initialize factory with DIRECT PARALLEL callback and timeout configuration
         logger.info(f"🔍 Creating DynamicAgentFactory with PARALLEL streaming callback")
         base_timeout = self.get_effective_timeout(actual_execution_id)
         factory = DynamicAgentFactory(
             human_loop_enabled=True, 
             execution_id=actual_execution_id, 
-            callback_handler=direct_streaming_callback,
+            callback_handler=streaming_callback,
             agent_timeout=base_timeout,
             timeout_provider=self.get_effective_timeout,
-            max_concurrent_agents=max_concurrent_agents
+            max_concurrent_agents=max_concurrent_agents,
+            channel=channel
         )
         logger.info(f"✅ DynamicAgentFactory created with PARALLEL streaming callback and timeout {base_timeout}s")
         
@@ -605,19 +641,167 @@ EVENT-DRIVEN COORDINATION:
                 except Exception as e:
                     logger.error(f"Callback error in stream_event: {e}")
         
-        # Register event streamer for all events on BOTH buses (prevent split-bus issues)
-        # self.event_bus comes from event_system (global_event_bus) when available
-        try:
-            self.event_bus.on("*", lambda e: asyncio.create_task(stream_event(e)))
-        except Exception:
-            pass
-        # Also listen to app.services.event_bus.event_bus if it's a different instance
-        try:
-            from app.services.event_bus import event_bus as local_bus
-            if local_bus is not self.event_bus:
-                local_bus.on("*", lambda e: asyncio.create_task(stream_event(e)))
-        except Exception:
-            pass
+        # Stream every event of this execution (and no other) from both buses
+        channel.on("*", stream_event)
+        
+        # Execution state, updated by the channel handlers below
+        completed = asyncio.Event()
+        stalled = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        idle_timer = None
+        max_agents = 10  # Limit number of agents to prevent overwhelming
+        agents_spawned = 1  # The first agent is spawned below
+        spawned_roles = set()
+        pending_spawns = 0
+        substantial_outputs = 0
+        sequential_lock = asyncio.Lock()
+        
+        def schedule_idle_check(delay: float = IDLE_GRACE_SECONDS):
+            """(Re)arm the idle check; any agent activity pushes it back"""
+            nonlocal idle_timer
+            if idle_timer is not None:
+                idle_timer.cancel()
+            idle_timer = loop.call_later(delay, lambda: asyncio.ensure_future(check_idle()))
+        
+        async def check_idle():
+            """Fallback for agents that finish without declaring the task complete"""
+            if completed.is_set():
+                return
+            if pending_spawns or not all(agent.state == "idle" for agent in factory.active_agents.values()):
+                return  # the next completion re-arms the check
+            if substantial_outputs:
+                logger.info("All agents idle with completed work and no pending spawn requests - marking task complete")
+                await self.event_bus.emit("task.complete", {
+                    "reason": "all_agents_idle_with_work_no_pending_requests",
+                    "completed_agents": substantial_outputs,
+                    "execution_id": actual_execution_id
+                }, source="system")
+                return
+            elapsed = time.time() - start_time
+            if elapsed >= STALL_TIMEOUT_SECONDS:
+                logger.warning("Agents idle too long without substantial work")
+                stalled.set()
+            else:
+                schedule_idle_check(STALL_TIMEOUT_SECONDS - elapsed)
+        
+        async def on_task_complete(event: SwarmEvent):
+            if not completed.is_set():
+                logger.info("✅ Task marked as complete by agent - stopping immediately")
+                completed.set()
+        
+        async def on_agent_completed(event: SwarmEvent):
+            nonlocal substantial_outputs
+            output = event.data.get("output", "") or ""
+            if len(output) > 50:
+                substantial_outputs += 1
+            
+            # Forward agent completions to streaming callback
+            if callback_handler:
+                agent_name = event.data.get("agent", "unknown")
+                
+                # Don't send the output again - it was already streamed chunk by chunk
+                # Just send the completion signal
+                std_logger.info(f"🔄 STREAMING CALLBACK: Agent {agent_name} completed, sending completion signal only")
+                
+                await callback_handler(
+                    type="agent_completed",
+                    agent=agent_name,
+                    data={
+                        # Don't include output - already streamed
+                        "execution_id": execution_id,
+                        "tokens": len(output.split()) if output else 0,
+                        "completed": True
+                    }
+                )
+                
+                std_logger.info(f"✅ STREAMING CALLBACK: agent_completed signal sent (no duplicate content)")
+            
+            # Check if analyzer explicitly says the ENTIRE SWARM TASK is complete (not just analysis)
+            if (event.source or "").startswith("analyzer") and not completed.is_set():
+                lowered = output.lower()
+                if ("entire task complete" in lowered or 
+                    "project complete" in lowered or
+                    "swarm task complete" in lowered):
+                    logger.info("✅ Entire task completion detected from analyzer output")
+                    await self.event_bus.emit("task.complete", {
+                        "agent": event.source,
+                        "reason": "analyzer_full_completion_detected",
+                        "final_output": output,
+                        "execution_id": actual_execution_id
+                    }, source="system")
+                    return
+            
+            schedule_idle_check()
+        
+        # Create task to spawn and execute agent asynchronously
+        async def execute_agent(role, context):
+            # Get the base timeout for this execution
+            base_timeout = self.get_effective_timeout(actual_execution_id)
+            logger.info(f"⏱️ Using base timeout {base_timeout}s for execution {actual_execution_id}")
+            
+            # Use the same streaming callback as the main factory
+            # This ensures all agents stream directly to the SSE endpoint
+            agent_factory = DynamicAgentFactory(
+                human_loop_enabled=True, 
+                execution_id=actual_execution_id, 
+                callback_handler=streaming_callback,  # Use the SAME callback
+                agent_timeout=base_timeout,
+                timeout_provider=self.get_effective_timeout,  # Pass the method to get agent-specific timeouts
+                channel=channel
+            )
+            agent = await agent_factory.spawn_agent(role, {"context": context})
+            if agent:
+                logger.info(f"🚀 Executing spawned agent: {agent.name}")
+                try:
+                    result = await self._stream_agent_execution(
+                        agent=agent,
+                        task=task,
+                        previous_work=[],
+                        execution_id=actual_execution_id,
+                        callback_handler=callback_handler
+                    )
+                    logger.info(f"✅ Agent {agent.name} completed with output length: {len(result.get('output', ''))}")
+                except Exception as e:
+                    logger.error(f"❌ Agent {agent.name} failed: {e}")
+        
+        async def on_agent_needed(event: SwarmEvent):
+            nonlocal agents_spawned, pending_spawns
+            # Don't spawn anything once the task is complete
+            if completed.is_set():
+                return
+            role = event.data.get("role")
+            # Track processed roles to avoid duplicates
+            role_key = f"{role}:{event.data.get('reason', '')}"
+            if not role or role_key in spawned_roles or agents_spawned >= max_agents:
+                return
+            spawned_roles.add(role_key)
+            agents_spawned += 1
+            logger.info(f"🔧 Spawning requested agent {agents_spawned}/{max_agents}: {role}")
+            
+            # Check if this is a sequential execution that was already handled by the controller
+            if event.data.get("sequential", False):
+                # Sequential controller already handled this - skip duplicate spawning
+                logger.info(f"🔄 Skipping duplicate spawn for sequential agent: {role}")
+                return
+            
+            pending_spawns += 1
+            try:
+                # Each handler runs as its own task, so agents run in parallel
+                # unless sequential execution is enabled for this execution_id
+                if SEQUENTIAL_CONTROLLER_AVAILABLE and actual_execution_id in get_sequential_controller().enabled_executions:
+                    logger.info(f"🔄 Sequential mode: executing agent {role} in turn")
+                    async with sequential_lock:
+                        await execute_agent(role, event.data.get("context", ""))
+                else:
+                    await execute_agent(role, event.data.get("context", ""))
+            finally:
+                pending_spawns -= 1
+                schedule_idle_check()
+        
+        channel.on("task.complete", on_task_complete)
+        channel.on("agent.completed", on_agent_completed)
+        channel.on("agent.needed", on_agent_needed)
+        channel.on("agent.error", lambda event: schedule_idle_check())
         
         # Emit task start event with session_id for human-loop compatibility
         await event_bus.emit(
@@ -681,204 +865,29 @@ EVENT-DRIVEN COORDINATION:
                 total_time=time.time() - start_time
             )
         
-        # Event loop - let agents self-organize
-        logger.info("Starting event-driven execution loop")
-        task_completed = False
-        timeout_counter = 0
-        processed_completions = set()  # Track which agent completions we've already processed
-        max_agents = 10  # Limit number of agents to prevent overwhelming
-        agents_spawned = 1  # Already spawned first agent
+        # No polling: wake on task completion, a stall, or a user stop
+        logger.info("Waiting for execution events")
+        schedule_idle_check()
+        waiters = [
+            asyncio.ensure_future(completed.wait()),
+            asyncio.ensure_future(stalled.wait()),
+            asyncio.ensure_future(channel.wait_stopped()),
+        ]
+        try:
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+            if idle_timer is not None:
+                idle_timer.cancel()
         
-        while not task_completed:
-            await asyncio.sleep(0.2)  # Check every 200ms for faster response
-            timeout_counter += 1
-            
-            # Check if execution was stopped by user
-            if execution_id in self.active_executions:
-                execution_status = self.active_executions[execution_id].get("status")
-                if execution_status == "stopped":
-                    logger.info(f"🛑 Execution {execution_id} stopped by user")
-                    task_completed = True
-                    break
-            
-            # Check if task is complete
-            # Merge recent events from both buses and de-duplicate by event id
-            def _merged_recent_events(limit: int = 50):
-                seen = set()
-                merged = []
-                try:
-                    evs1 = self.event_bus.get_recent_events(limit) if hasattr(self.event_bus, 'get_recent_events') else []
-                except Exception:
-                    evs1 = []
-                try:
-                    from app.services.event_bus import event_bus as local_bus
-                    evs2 = local_bus.get_recent_events(limit) if hasattr(local_bus, 'get_recent_events') else []
-                except Exception:
-                    evs2 = []
-                for e in (evs1 + evs2):
-                    if getattr(e, 'id', None) and e.id in seen:
-                        continue
-                    seen.add(getattr(e, 'id', str(len(seen)+1)))
-                    merged.append(e)
-                return merged
-
-            recent_events = _merged_recent_events(50)
-            
-            # CHECK TASK COMPLETION FIRST before processing any new agent requests
-            for event in recent_events:
-                if event.type == "task.complete":
-                    logger.info("✅ Task marked as complete by agent - stopping immediately")
-                    task_completed = True
-                    break
-            
-            # If task is complete, don't process any more events
-            if task_completed:
-                break
-                
-            for event in recent_events:
-                # Forward agent completions to streaming callback
-                if (event.type == "agent.completed" and 
-                    callback_handler and 
-                    event.id not in processed_completions):
-                    
-                    processed_completions.add(event.id)
-                    output = event.data.get("output", "")
-                    agent_name = event.data.get("agent", "unknown")
-                    
-                    # Don't send the output again - it was already streamed chunk by chunk
-                    # Just send the completion signal
-                    std_logger.info(f"🔄 STREAMING CALLBACK: Agent {agent_name} completed, sending completion signal only")
-                    
-                    await callback_handler(
-                        type="agent_completed",
-                        agent=agent_name,
-                        data={
-                            # Don't include output - already streamed
-                            "execution_id": execution_id,
-                            "tokens": len(output.split()) if output else 0,
-                            "completed": True
-                        }
-                    )
-                    
-                    std_logger.info(f"✅ STREAMING CALLBACK: agent_completed signal sent (no duplicate content)")
-            
-            # Only process agent spawn requests if task is not complete
-            if not task_completed:
-                for event in recent_events:
-                    # Handle agent.needed events directly in the loop
-                    if event.type == "agent.needed" and event.id not in processed_completions:
-                        processed_completions.add(event.id)
-                        role = event.data.get("role")
-                        # Also track processed roles to avoid duplicates
-                        role_key = f"{role}:{event.data.get('reason', '')}"
-                        if role and role_key not in processed_completions and agents_spawned < max_agents:
-                            processed_completions.add(role_key)
-                            agents_spawned += 1
-                            logger.info(f"🔧 Spawning requested agent {agents_spawned}/{max_agents}: {role}")
-                            
-                            # Check if this is a sequential execution that was already handled by the controller
-                            is_sequential = event.data.get("sequential", False)
-                            if is_sequential:
-                                # Sequential controller already handled this - skip duplicate spawning
-                                logger.info(f"🔄 Skipping duplicate spawn for sequential agent: {role}")
-                                continue
-                            
-                            # Create task to spawn and execute agent asynchronously
-                            async def execute_agent(role, context):
-                                # Get the base timeout for this execution
-                                base_timeout = self.get_effective_timeout(actual_execution_id)
-                                logger.info(f"⏱️ Using base timeout {base_timeout}s for execution {actual_execution_id}")
-                                
-                                # Use the same direct_streaming_callback as the main factory
-                                # This ensures all agents stream directly to the SSE endpoint
-                                agent_factory = DynamicAgentFactory(
-                                    human_loop_enabled=True, 
-                                    execution_id=actual_execution_id, 
-                                    callback_handler=direct_streaming_callback,  # Use the SAME callback
-                                    agent_timeout=base_timeout,
-                                    timeout_provider=self.get_effective_timeout  # Pass the method to get agent-specific timeouts
-                                )
-                                agent = await agent_factory.spawn_agent(role, {"context": context})
-                                if agent:
-                                    logger.info(f"🚀 Executing spawned agent: {agent.name}")
-                                    try:
-                                        result = await self._stream_agent_execution(
-                                            agent=agent,
-                                            task=task,
-                                            previous_work=[],
-                                            execution_id=actual_execution_id,
-                                            callback_handler=callback_handler
-                                        )
-                                        logger.info(f"✅ Agent {agent.name} completed with output length: {len(result.get('output', ''))}")
-                                    except Exception as e:
-                                        logger.error(f"❌ Agent {agent.name} failed: {e}")
-                            
-                            # Check if sequential execution is enabled for this execution_id
-                            if SEQUENTIAL_CONTROLLER_AVAILABLE:
-                                controller = get_sequential_controller()
-                                if actual_execution_id in controller.enabled_executions:
-                                    # Sequential mode: execute immediately (controller already queued it)
-                                    logger.info(f"🔄 Sequential mode: executing agent {role} immediately")
-                                    await execute_agent(role, event.data.get("context", ""))
-                                else:
-                                    # Parallel mode: create async task
-                                    asyncio.create_task(execute_agent(role, event.data.get("context", "")))
-                            else:
-                                # No controller available, use parallel mode
-                                asyncio.create_task(execute_agent(role, event.data.get("context", "")))
-                    
-                    # Check if analyzer explicitly says the ENTIRE SWARM TASK is complete (not just analysis)
-                    elif event.type == "agent.completed" and event.source.startswith("analyzer"):
-                        output = event.data.get("output", "")
-                        # Only consider it complete if analyzer explicitly says entire task/project is done
-                        # AND there are no pending agent spawn requests
-                        if ("entire task complete" in output.lower() or 
-                            "project complete" in output.lower() or
-                            "swarm task complete" in output.lower()):
-                            logger.info("✅ Entire task completion detected from analyzer output")
-                            await self.event_bus.emit("task.complete", {
-                                "agent": event.source,
-                                "reason": "analyzer_full_completion_detected",
-                                "final_output": output
-                            }, source="system")
-                            task_completed = True
-                            break
-            
-            if task_completed:
-                break
-            
-            # Check if all agents are idle and we have some work done
-            active_agents = factory.active_agents
-            if len(active_agents) > 0:
-                all_idle = all(agent.state == "idle" for agent in active_agents.values())
-                
-                if all_idle and timeout_counter > 50:  # After 10 seconds of idle (50 * 0.2s)
-                    # Check if we have any completed work AND no pending agent spawn requests
-                    completed_events = [
-                        e for e in recent_events 
-                        if e.type == "agent.completed" and len(e.data.get("output", "")) > 50
-                    ]
-                    
-                    # Check for pending agent spawn requests
-                    spawn_requests = [e for e in recent_events if e.type == "agent.needed"]
-                    
-                    if len(completed_events) > 0 and len(spawn_requests) == 0:
-                        logger.info("All agents idle with completed work and no pending spawn requests - marking task complete")
-                        await self.event_bus.emit("task.complete", {
-                            "reason": "all_agents_idle_with_work_no_pending_requests",
-                            "completed_agents": len(completed_events)
-                        }, source="system")
-                        task_completed = True
-                        break
-                    elif len(spawn_requests) > 0:
-                        logger.info(f"All agents idle but have {len(spawn_requests)} pending spawn requests - continuing execution")
-                    elif timeout_counter > 300:  # After 60 seconds (300 * 0.2s)
-                        logger.warning("Agents idle too long without substantial work")
-                        break
+        if channel.stopped:
+            logger.info(f"🛑 Execution {execution_id} stopped by user")
+        task_completed = completed.is_set() or channel.stopped
         
         if task_completed:
             # Compile results with session isolation
-            final_result = self._compile_event_results(factory, execution_id)
+            final_result = self._compile_event_results(factory, execution_id, events=channel.events)
             logger.info(f"Task completed successfully. Result length: {len(final_result)}")
             
             return SwarmExecutionResponse(
@@ -891,8 +900,8 @@ EVENT-DRIVEN COORDINATION:
             )
         else:
             # Timeout or failure
-            logger.warning(f"Execution ended: timeout_counter={timeout_counter}, elapsed={time.time() - start_time}")
-            partial_result = self._compile_event_results(factory, execution_id)
+            logger.warning(f"Execution ended without completion, elapsed={time.time() - start_time}")
+            partial_result = self._compile_event_results(factory, execution_id, events=channel.events)
             
             return SwarmExecutionResponse(
                 status=ExecutionStatus.FAILED,
@@ -903,15 +912,20 @@ EVENT-DRIVEN COORDINATION:
                 total_time=time.time() - start_time
             )
     
-    def _compile_event_results(self, factory: DynamicAgentFactory, execution_id: str = None) -> str:
+    def _compile_event_results(self, factory: DynamicAgentFactory, execution_id: str = None, events=None) -> str:
         """Compile results from event-driven execution with proper session isolation"""
         results = []
         
-        # Get recent events from the current execution
-        all_events = event_bus.get_recent_events(50)  # Reduced to get more recent events
-        
-        # Filter for agent.completed events and use factory's active agents for session isolation
-        factory_agent_names = set(factory.active_agents.keys()) if factory else set()
+        if events is not None:
+            # An execution channel only holds this execution's events
+            all_events = list(events)
+            factory_agent_names = set()
+        else:
+            # Get recent events from the current execution
+            all_events = event_bus.get_recent_events(50)  # Reduced to get more recent events
+            
+            # Filter for agent.completed events and use factory's active agents for session isolation
+            factory_agent_names = set(factory.active_agents.keys()) if factory else set()
         
         for event in all_events:
             if event.type == "agent.completed":
@@ -944,33 +958,42 @@ EVENT-DRIVEN COORDINATION:
         max_duration = request.execution_timeout or 900
         start_time = time.time()
         
-        # Start with first agent
-        if initial_agents:
-            first_agent = initial_agents[0]
-            agent_sequence.append(first_agent.name)
-            
-            # Execute first agent
-            result = await self._stream_agent_execution(
-                agent=first_agent,
-                task=request.task,
-                previous_work=[],
-                execution_id=execution_id,
-                callback_handler=callback_handler
-            )
-            
-            all_outputs.append({
-                "agent": first_agent.name,
-                "output": result["output"]
-            })
-            all_artifacts.extend(result.get("artifacts", []))
-        
-        # Event-driven execution loop
-        task_complete = False
-        while not task_complete and (time.time() - start_time) < max_duration:
-            # Check recent events
-            recent_events = self.event_bus.get_recent_events(5)
+        # Events of this execution only, handled one at a time in arrival order
+        channel = execution_channels.open(execution_id)
+        scope = current_execution_id.set(execution_id)
+        events = channel.queue("task.complete", "agent.needed", "handoff.requested", "human.input.needed")
+        try:
+            # Start with first agent
+            if initial_agents:
+                first_agent = initial_agents[0]
+                agent_sequence.append(first_agent.name)
+                
+                # Execute first agent
+                result = await self._stream_agent_execution(
+                    agent=first_agent,
+                    task=request.task,
+                    previous_work=[],
+                    execution_id=execution_id,
+                    callback_handler=callback_handler
+                )
+                
+                all_outputs.append({
+                    "agent": first_agent.name,
+                    "output": result["output"]
+                })
+                all_artifacts.extend(result.get("artifacts", []))
             
-            for event in recent_events:
+            # Event-driven execution loop
+            task_complete = False
+            while not task_complete:
+                remaining = max_duration - (time.time() - start_time)
+                if remaining <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(events.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                
                 # Check for task completion
                 if event.type == "task.complete":
                     task_complete = True
@@ -1041,14 +1064,15 @@ EVENT-DRIVEN COORDINATION:
                         "agent": "human",
                         "output": f"Human input: {response}"
                     })
-            
-            # Small delay to prevent busy loop
-            await asyncio.sleep(0.5)
-            
-            # Check if we should continue
-            if len(agent_sequence) >= (request.max_handoffs or 20):
-                logger.info("Max handoffs reached, completing task")
-                task_complete = True
+                
+                # Check if we should continue
+                if len(agent_sequence) >= (request.max_handoffs or 20):
+                    logger.info("Max handoffs reached, completing task")
+                    task_complete = True
+        finally:
+            current_execution_id.reset(scope)
+            execution_channels.close(channel)
+            release_output_queue(execution_id)
         
         # Compile final response
         final_response = self._compile_outputs(all_outputs, all_artifacts)
@@ -1142,12 +1166,9 @@ EVENT-DRIVEN COORDINATION:
             
             # Execute the agent using Strands
             from strands import Agent
-            from strands.models.openai import OpenAIModel
-            import os
-            from dotenv import load_dotenv
+            from app.services.model_client_factory import get_model, openai_api_key
             
-            load_dotenv()
-            api_key = os.getenv("OPENAI_API_KEY")
+            api_key = openai_api_key()
             
             if not api_key:
                 logger.warning("No OpenAI API key - using simulation mode")
@@ -1155,8 +1176,8 @@ EVENT-DRIVEN COORDINATION:
                 result_output = f"{agent.role} processed: {task}"
             else:
                 # Create a real Strands agent to do the work
-                model = OpenAIModel(
-                    client_args={"api_key": api_key},
+                model = get_model(
+                    api_key=api_key,
                     model_id="gpt-4o-mini",
                     params={"max_tokens": 4000, "temperature": 0.7}
                 )
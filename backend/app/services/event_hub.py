@@ -6,12 +6,14 @@ Provides exactly-once semantics with sequence tracking per agent stream
 import json
 import asyncio
 import time
-from typing import Optional, Dict, Any, AsyncIterator, List
+from typing import Optional, Dict, Any, AsyncIterator, List, Set, Tuple
 from dataclasses import dataclass, asdict
 import redis.asyncio as redis
 from enum import Enum
 import logging
 
+from app.services.frame_codec import decode_entry, encode_token_entry
+
 logger = logging.getLogger(__name__)
 
 
@@ -65,15 +67,171 @@ class ControlFrame:
         return asdict(self)
 
 
+def parse_stream_id(msg_id: str) -> Tuple[int, int]:
+    """Redis stream ID "ms-seq" as a comparable tuple"""
+    ms, _, seq = msg_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def next_stream_id(msg_id: str) -> str:
+    """Smallest ID after msg_id, for exclusive XRANGE starts on any Redis version"""
+    ms, seq = parse_stream_id(msg_id)
+    return f"{ms}-{seq + 1}"
+
+
+class StreamSubscription:
+    """One local subscriber's view of a set of stream keys
+    
+    Frames are fanned out by the StreamMultiplexer reader into a bounded
+    queue. If the consumer falls so far behind that the queue fills, the
+    subscription is flagged as lagged and the consumer catches up from Redis
+    with XRANGE from its own cursors instead of losing frames.
+    """
+    
+    def __init__(self, last_ids: Dict[str, str], maxsize: int):
+        # Per-key ID of the last frame handed to the consumer
+        self.last_ids = last_ids
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.lagged = False
+    
+    def deliver(self, key: str, msg_id: str, frame: Dict[str, Any]):
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait((key, msg_id, frame))
+        except asyncio.QueueFull:
+            self.lagged = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            # Wake the consumer so it notices the lag
+            self.queue.put_nowait(None)
+
+
+class StreamMultiplexer:
+    """
+    One XREAD loop per process over every stream key with local subscribers
+    
+    Instead of each subscriber blocking on its own XREAD, a single reader
+    task reads all active keys in one call and fans frames out to the
+    subscriptions registered for each key. The reader exits when nothing is
+    subscribed and restarts on the next registration.
+    """
+    
+    def __init__(self, hub: "EventHub", block_ms: int = 100, read_count: int = 500,
+                 queue_size: int = 10000):
+        self.hub = hub
+        self.block_ms = block_ms
+        self.read_count = read_count
+        self.queue_size = queue_size
+        # Reader position per stream key
+        self._positions: Dict[str, str] = {}
+        self._subscribers: Dict[str, Set[StreamSubscription]] = {}
+        self._reader: Optional[asyncio.Task] = None
+        self.stats = {"xread_calls": 0, "frames_read": 0, "frames_delivered": 0, "lagged": 0}
+    
+    async def _last_id(self, key: str) -> str:
+        last = await self.hub._redis.xrevrange(key, "+", "-", count=1)
+        return last[0][0] if last else "0-0"
+    
+    async def register(self, starts: Dict[str, str]) -> StreamSubscription:
+        """Subscribe to keys; "$" resolves to the key's current last ID"""
+        last_ids = {}
+        for key, start_id in starts.items():
+            if start_id == "$":
+                start_id = await self._last_id(key)
+            elif start_id == "0":
+                start_id = "0-0"
+            last_ids[key] = start_id
+        
+        sub = StreamSubscription(last_ids, self.queue_size)
+        for key, start_id in last_ids.items():
+            if key not in self._positions:
+                # The subscriber's catch-up replays everything up to the key's
+                # current end, so the shared reader starts there rather than
+                # reading the same history again
+                position = start_id if starts[key] == "$" else await self._last_id(key)
+                self._positions.setdefault(key, position)
+            self._subscribers.setdefault(key, set()).add(sub)
+        
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read_loop())
+        return sub
+    
+    def unregister(self, sub: StreamSubscription):
+        for key in sub.last_ids:
+            subs = self._subscribers.get(key)
+            if subs is None:
+                continue
+            subs.discard(sub)
+            if not subs:
+                del self._subscribers[key]
+                self._positions.pop(key, None)
+    
+    async def _read_loop(self):
+        logger.info("EventHub stream reader started")
+        try:
+            while self._positions:
+                try:
+                    messages = await self.hub._redis.xread(
+                        dict(self._positions),
+                        count=self.read_count,
+                        block=self.block_ms
+                    )
+                    self.stats["xread_calls"] += 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Error in stream reader: {e}")
+                    await asyncio.sleep(0.1)
+                    continue
+                
+                for stream_name, stream_messages in messages or []:
+                    if stream_name not in self._positions:
+                        # Everyone unsubscribed while the read was in flight
+                        continue
+                    subs = list(self._subscribers.get(stream_name, ()))
+                    for msg_id, data in stream_messages:
+                        self._positions[stream_name] = msg_id
+                        self.stats["frames_read"] += 1
+                        try:
+                            frame = decode_entry(stream_name, data)
+                        except (ValueError, TypeError):
+                            logger.warning(f"Skipping malformed frame {msg_id} on {stream_name}")
+                            continue
+                        for sub in subs:
+                            was_lagged = sub.lagged
+                            sub.deliver(stream_name, msg_id, frame)
+                            if sub.lagged and not was_lagged:
+                                self.stats["lagged"] += 1
+                        self.stats["frames_delivered"] += len(subs)
+        finally:
+            logger.info("EventHub stream reader stopped")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "reader_running": self._reader is not None and not self._reader.done(),
+            "stream_keys": len(self._positions),
+            "subscriptions": len({sub for subs in self._subscribers.values() for sub in subs}),
+        }
+
+
 class EventHub:
     """
     Central event hub using Redis Streams
     Topics: exec.{id}.token, exec.{id}.control, exec.{id}.metrics
     """
     
-    def __init__(self, redis_url: str = "redis://localhost:6379"):
+    # Entries fetched per XRANGE call when replaying history
+    REPLAY_CHUNK_SIZE = 500
+    
+    def __init__(self, redis_url: str = "redis://localhost:6379", compact_entries: bool = True):
         self.redis_url = redis_url
+        # Store token frames as one positional field instead of a JSON object
+        # plus duplicated agent_id/seq; readers accept both layouts
+        self.compact_entries = compact_entries
         self._redis: Optional[redis.Redis] = None
+        self.multiplexer = StreamMultiplexer(self)
         
     async def connect(self):
         """Connect to Redis"""
@@ -100,11 +258,14 @@ class EventHub:
         # Don't modify the sequence - agents manage their own sequences
         # This prevents duplicate sequence numbers
         stream_key = f"exec.{frame.exec_id}.token"
-        data = {
-            "data": json.dumps(frame.to_dict()),
-            "agent_id": frame.agent_id,
-            "seq": str(frame.seq)
-        }
+        if self.compact_entries:
+            data = encode_token_entry(frame.to_dict())
+        else:
+            data = {
+                "data": json.dumps(frame.to_dict()),
+                "agent_id": frame.agent_id,
+                "seq": str(frame.seq)
+            }
         
         msg_id = await self._redis.xadd(stream_key, data, maxlen=10000)
         logger.debug(f"Published token to {stream_key}: seq={frame.seq}, agent={frame.agent_id}")
@@ -128,6 +289,32 @@ class EventHub:
         logger.info(f"Published control event {frame.type} to {stream_key}")
         return msg_id
     
+    async def last_stream_id(self, stream_key: str) -> str:
+        """ID of the newest entry in a stream ("0-0" when empty)"""
+        await self.connect()
+        return await self.multiplexer._last_id(stream_key)
+    
+    async def replay(
+        self,
+        stream_key: str,
+        after_id: str = "0-0",
+        chunk_size: Optional[int] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Yield (msg_id, frame) for entries after after_id, in XRANGE ... COUNT
+        chunks so long histories are never loaded in one reply
+        """
+        await self.connect()
+        chunk_size = chunk_size or self.REPLAY_CHUNK_SIZE
+        start = next_stream_id(after_id)
+        while True:
+            entries = await self._redis.xrange(stream_key, start, "+", count=chunk_size)
+            for msg_id, data in entries:
+                yield msg_id, decode_entry(stream_key, data)
+            if len(entries) < chunk_size:
+                return
+            start = next_stream_id(entries[-1][0])
+    
     async def subscribe(
         self,
         exec_id: str,
@@ -143,57 +330,83 @@ class EventHub:
             streams: List of stream types to subscribe to
             start_id: Redis stream ID to start from ("$" for new messages, "0" for all)
         """
+        async for _, _, frame in self.subscribe_entries(exec_id, streams, start_id):
+            yield frame
+    
+    async def subscribe_entries(
+        self,
+        exec_id: str,
+        streams: List[str] = ["token", "control"],
+        start_id: str = "$",
+        start_ids: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Like subscribe(), but yields (stream_key, msg_id, frame) so callers
+        can track their own positions per stream
+        
+        Live frames come from the process-wide StreamMultiplexer, so any
+        number of subscribers share one XREAD loop.
+        
+        Args:
+            exec_id: Execution ID
+            streams: List of stream types to subscribe to
+            start_id: Redis stream ID to start from ("$" for new messages, "0" for all)
+            start_ids: Per stream key start IDs, overriding start_id for those keys
+        """
         await self.connect()
         
         # Build stream keys
+        start_ids = start_ids or {}
         stream_keys = {
-            f"exec.{exec_id}.{stream}": start_id
+            f"exec.{exec_id}.{stream}": start_ids.get(f"exec.{exec_id}.{stream}", start_id)
             for stream in streams
         }
         
         logger.info(f"Subscribing to streams: {list(stream_keys.keys())} from position: {start_id}")
         
-        # If starting from beginning, first get all existing messages
-        if start_id == "0" or start_id == "0-0":
-            for stream_name in list(stream_keys.keys()):
-                # Get all existing messages
-                existing = await self._redis.xrange(stream_name, "-", "+")
-                if existing:
-                    for msg_id, data in existing:
-                        frame_data = json.loads(data.get("data", "{}"))
-                        yield frame_data
-                        # Update position to last message
-                        stream_keys[stream_name] = msg_id
-                else:
-                    # No existing messages, set to $ to only get new ones
-                    stream_keys[stream_name] = "$"
-            
-            logger.info(f"Finished reading historical messages, now listening for new ones")
+        # Register first so nothing published during the replay is missed
+        sub = await self.multiplexer.register(stream_keys)
         
-        # Now listen for new messages only
-        while True:
-            try:
-                # Read with 100ms timeout
-                messages = await self._redis.xread(
-                    stream_keys,
-                    block=100
-                )
+        async def catch_up():
+            # Frames after each cursor that are already in Redis, chunked
+            for stream_name in sub.last_ids:
+                async for msg_id, frame in self.replay(stream_name, sub.last_ids[stream_name]):
+                    sub.last_ids[stream_name] = msg_id
+                    yield stream_name, msg_id, frame
+        
+        try:
+            async for entry in catch_up():
+                yield entry
+            
+            if start_id in ("0", "0-0"):
+                logger.info(f"Finished reading historical messages, now listening for new ones")
+            
+            while True:
+                if sub.lagged:
+                    # Queue overflowed: re-read what we missed straight from Redis
+                    sub.lagged = False
+                    async for entry in catch_up():
+                        yield entry
+                    continue
                 
-                for stream_name, stream_messages in messages:
-                    for msg_id, data in stream_messages:
-                        # Update position for next read
-                        stream_keys[stream_name] = msg_id
-                        
-                        # Parse and yield frame
-                        frame_data = json.loads(data.get("data", "{}"))
-                        yield frame_data
-                        
-            except asyncio.CancelledError:
-                logger.info(f"Subscription cancelled for {exec_id}")
-                break
-            except Exception as e:
-                logger.error(f"Error in subscription: {e}")
-                await asyncio.sleep(0.1)
+                item = await sub.queue.get()
+                if item is None:
+                    continue
+                stream_name, msg_id, frame = item
+                # Skip frames already yielded by a replay
+                if parse_stream_id(msg_id) <= parse_stream_id(sub.last_ids[stream_name]):
+                    continue
+                sub.last_ids[stream_name] = msg_id
+                yield stream_name, msg_id, frame
+                
+        except asyncio.CancelledError:
+            logger.info(f"Subscription cancelled for {exec_id}")
+        finally:
+            self.multiplexer.unregister(sub)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Shared reader statistics for this process"""
+        return self.multiplexer.get_stats()
     
     async def reset_execution(self, exec_id: str):
         """
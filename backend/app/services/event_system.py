@@ -5,8 +5,10 @@ import asyncio
 import json
 import time
 import uuid
-from typing import Dict, List, Callable, Any, Optional
-from collections import defaultdict
+from contextvars import ContextVar
+from typing import Deque, Dict, List, Callable, Any, Optional, Tuple
+from collections import defaultdict, deque
+from itertools import islice
 from dataclasses import dataclass, field
 from datetime import datetime
 import structlog
@@ -25,18 +27,81 @@ class SwarmEvent:
     metadata: Dict[str, Any] = field(default_factory=dict)
 
 
+class ListenerStats:
+    """Latency and error counters for one registered listener"""
+    
+    __slots__ = ("pattern", "name", "calls", "errors", "timeouts", "total_latency", "max_latency")
+    
+    def __init__(self, pattern: str, name: str):
+        self.pattern = pattern
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+    
+    def record(self, latency: float):
+        self.calls += 1
+        self.total_latency += latency
+        if latency > self.max_latency:
+            self.max_latency = latency
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "pattern": self.pattern,
+            "listener": self.name,
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "avg_latency_ms": round(self.total_latency / self.calls * 1000, 3) if self.calls else 0.0,
+            "max_latency_ms": round(self.max_latency * 1000, 3),
+        }
+
+
+# Set while a listener runs so nested emits don't wait on slots their caller holds
+_in_listener: ContextVar[bool] = ContextVar("event_system_in_listener", default=False)
+
+
 class EventBus:
-    """Central event coordination system for swarm agents"""
+    """Central event coordination system for swarm agents
+    
+    Listener invocations run through a shared executor: at most
+    ``max_concurrency`` listeners run at once across all emits, and emitters
+    wait for a free slot (backpressure) instead of spawning unbounded tasks.
+    """
     
-    def __init__(self):
+    def __init__(self, max_concurrency: int = 64, listener_timeout: Optional[float] = 30.0,
+                 max_history: int = 1000):
         self.listeners: Dict[str, List[Callable]] = defaultdict(list)
-        self.event_history: List[SwarmEvent] = []
+        self.event_history: Deque[SwarmEvent] = deque(maxlen=max_history)
+        self.total_events = 0  # Monotonic cursor for get_events_since
         self.pending_human_input: Dict[str, asyncio.Future] = {}
         self.active_agents: Dict[str, Any] = {}
         self.execution_context: Dict[str, Any] = {}
         
-    async def emit(self, event_type: str, data: dict, source: str = None):
-        """Emit an event that other agents can react to"""
+        self.max_concurrency = max_concurrency
+        self.listener_timeout = listener_timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        
+        # Wildcard prefixes ("agent" for "agent.*") and the per-event-type
+        # resolved (pattern, listener) lists; cache is cleared on on/off
+        self._wildcards: Dict[str, str] = {}
+        self._resolved: Dict[str, Tuple[Tuple[str, Callable], ...]] = {}
+        self._stats: Dict[Tuple[str, int], ListenerStats] = {}
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so the global instance binds to the running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+        
+    async def emit(self, event_type: str, data: dict, source: str = None, wait: bool = True):
+        """Emit an event that other agents can react to
+        
+        With wait=False the listeners are scheduled and emit returns as soon
+        as each one has an executor slot, without awaiting their completion.
+        """
         event = SwarmEvent(
             type=event_type,
             data=data,
@@ -44,51 +109,99 @@ class EventBus:
         )
         
         self.event_history.append(event)
+        self.total_events += 1
         logger.info(f"📢 Event emitted: {event_type} from {source}", extra={"data": data})
         
-        # Notify all listeners asynchronously
-        tasks = []
-        for listener in self.listeners[event_type]:
-            tasks.append(asyncio.create_task(self._safe_invoke(listener, event)))
+        listeners = self._listeners_for(event_type)
+        if not listeners:
+            return
         
-        # Also check wildcard listeners
-        for pattern, listeners in self.listeners.items():
-            if self._matches_pattern(event_type, pattern):
-                for listener in listeners:
-                    tasks.append(asyncio.create_task(self._safe_invoke(listener, event)))
+        # Nested emits from inside a listener skip the slot wait to avoid
+        # deadlocking on slots held by their own callers
+        semaphore = None if _in_listener.get() else self._get_semaphore()
+        tasks = []
+        for pattern, listener in listeners:
+            if semaphore is not None:
+                await semaphore.acquire()
+            tasks.append(asyncio.create_task(self._safe_invoke(pattern, listener, event, semaphore)))
         
         # Wait for all listeners to process
-        if tasks:
+        if wait:
             await asyncio.gather(*tasks, return_exceptions=True)
     
     def on(self, event_pattern: str, callback: Callable):
         """Register a listener for an event pattern"""
         self.listeners[event_pattern].append(callback)
+        if event_pattern.endswith(".*"):
+            self._wildcards[event_pattern] = event_pattern[:-2]
+        self._resolved.clear()
         logger.debug(f"Registered listener for: {event_pattern}")
     
     def once(self, event_type: str, callback: Callable):
         """Register a one-time listener"""
         async def wrapper(event):
-            await callback(event)
-            self.listeners[event_type].remove(wrapper)
-        self.listeners[event_type].append(wrapper)
+            self.off(event_type, wrapper)
+            if asyncio.iscoroutinefunction(callback):
+                await callback(event)
+            else:
+                callback(event)
+        self.on(event_type, wrapper)
     
     def off(self, event_pattern: str, callback: Callable):
         """Remove a listener for an event pattern"""
         if event_pattern in self.listeners:
             if callback in self.listeners[event_pattern]:
                 self.listeners[event_pattern].remove(callback)
+                if not self.listeners[event_pattern]:
+                    del self.listeners[event_pattern]
+                    self._wildcards.pop(event_pattern, None)
+                self._stats.pop((event_pattern, id(callback)), None)
+                self._resolved.clear()
                 logger.debug(f"Removed listener for: {event_pattern}")
     
-    async def _safe_invoke(self, callback: Callable, event: SwarmEvent):
-        """Safely invoke a callback with error handling"""
+    def _listeners_for(self, event_type: str) -> Tuple[Tuple[str, Callable], ...]:
+        """Exact, wildcard and catch-all listeners for an event type, each once"""
+        resolved = self._resolved.get(event_type)
+        if resolved is None:
+            matched: List[Tuple[str, Callable]] = []
+            matched.extend((event_type, cb) for cb in self.listeners.get(event_type, ()))
+            if event_type != "*":
+                matched.extend(("*", cb) for cb in self.listeners.get("*", ()))
+            for pattern, prefix in self._wildcards.items():
+                if pattern != event_type and event_type.startswith(prefix):
+                    matched.extend((pattern, cb) for cb in self.listeners.get(pattern, ()))
+            resolved = tuple(matched)
+            self._resolved[event_type] = resolved
+        return resolved
+    
+    async def _safe_invoke(self, pattern: str, callback: Callable, event: SwarmEvent,
+                           semaphore: Optional[asyncio.Semaphore] = None):
+        """Safely invoke a callback with timeout, error handling and accounting"""
+        key = (pattern, id(callback))
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = ListenerStats(
+                pattern, getattr(callback, "__qualname__", repr(callback))
+            )
+        
+        token = _in_listener.set(True)
+        start = time.perf_counter()
         try:
             if asyncio.iscoroutinefunction(callback):
-                await callback(event)
+                await asyncio.wait_for(callback(event), self.listener_timeout)
             else:
                 callback(event)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            logger.warning(f"Event listener {stats.name} timed out on {event.type}")
         except Exception as e:
+            stats.errors += 1
             logger.error(f"Error in event listener: {e}", exc_info=True)
+        finally:
+            stats.record(time.perf_counter() - start)
+            _in_listener.reset(token)
+            if semaphore is not None:
+                semaphore.release()
     
     def _matches_pattern(self, event_type: str, pattern: str) -> bool:
         """Check if event type matches pattern (supports wildcards)"""
@@ -101,11 +214,29 @@ class EventBus:
     
     def get_recent_events(self, count: int = 10, event_type: str = None) -> List[SwarmEvent]:
         """Get recent events, optionally filtered by type"""
-        events = self.event_history[-count:]
+        events = list(islice(reversed(self.event_history), count))
+        events.reverse()
         if event_type:
             events = [e for e in events if self._matches_pattern(e.type, event_type)]
         return events
     
+    def get_events_since(self, cursor: int) -> Tuple[List[SwarmEvent], int]:
+        """Events emitted after ``cursor`` (a previous ``total_events`` value)
+        
+        Returns the events still in history and the new cursor. Events that
+        already fell out of the bounded history are skipped.
+        """
+        missed = self.total_events - cursor
+        if missed <= 0:
+            return [], self.total_events
+        events = list(islice(reversed(self.event_history), missed))
+        events.reverse()
+        return events, self.total_events
+    
+    def get_listener_stats(self) -> List[Dict[str, Any]]:
+        """Per-listener call, latency, timeout and error counters"""
+        return [stats.to_dict() for stats in self._stats.values()]
+    
     def clear_history(self):
         """Clear event history (useful for testing)"""
         self.event_history.clear()
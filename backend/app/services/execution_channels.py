@@ -0,0 +1,177 @@
+"""
+Execution-scoped event channels
+
+Swarm agents emit on the process-wide buses (app.services.event_bus and
+event_system.global_event_bus). ExecutionChannelRegistry listens on both and
+routes each event to the channel of the execution it belongs to, so an
+execution subscribes to its own agent.needed / agent.completed /
+task.complete events instead of polling the shared history, and never sees
+another run's events.
+
+An event belongs to an execution when it is emitted while
+current_execution_id is set (asyncio tasks inherit it, so agents spawned by
+an execution carry it automatically), or else when its data names the
+execution or one of its aliases in execution_id / session_id.
+"""
+import asyncio
+import logging
+import threading
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Execution the running task works for; set by the swarm before it spawns agents
+current_execution_id: ContextVar[Optional[str]] = ContextVar("current_execution_id", default=None)
+
+
+def _matches(pattern: str, event_type: str) -> bool:
+    if pattern == "*":
+        return True
+    if pattern.endswith(".*"):
+        return event_type.startswith(pattern[:-2] + ".")
+    return pattern == event_type
+
+
+class ExecutionChannel:
+    """Events of one execution, pushed to its subscribers as they are emitted"""
+
+    def __init__(self, execution_id: str, aliases: Iterable[str] = (), max_history: int = 1000):
+        self.execution_id = execution_id
+        self.aliases = tuple(a for a in aliases if a and a != execution_id)
+        self.events: Deque[Any] = deque(maxlen=max_history)
+        self.closed = False
+        self._handlers: List[Tuple[str, Callable, bool]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped: Optional[asyncio.Event] = None
+
+    def bind(self):
+        """Attach to the running loop; call from the execution's coroutine"""
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+
+    def on(self, pattern: str, callback: Callable) -> Callable:
+        """Subscribe to "type", "prefix.*" or "*" within this execution"""
+        self._handlers.append((pattern, callback, asyncio.iscoroutinefunction(callback)))
+        return callback
+
+    def off(self, pattern: str, callback: Callable):
+        self._handlers = [h for h in self._handlers if not (h[0] == pattern and h[1] is callback)]
+
+    def queue(self, *patterns: str) -> "asyncio.Queue":
+        """Queue that receives every matching event, for sequential consumers"""
+        q: asyncio.Queue = asyncio.Queue()
+        for pattern in patterns:
+            self.on(pattern, q.put_nowait)
+        return q
+
+    def deliver(self, event: Any):
+        """Run matching handlers; async ones become tasks"""
+        if self.closed:
+            return
+        self.events.append(event)
+        for pattern, callback, is_async in list(self._handlers):
+            if not _matches(pattern, event.type):
+                continue
+            try:
+                if is_async:
+                    asyncio.ensure_future(callback(event))
+                else:
+                    callback(event)
+            except Exception as e:
+                logger.error(f"Error in execution channel handler for {event.type}: {e}")
+
+    def stop(self):
+        """Ask the execution to wind down; safe from any thread"""
+        if self._loop is None or self._stopped is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+        except RuntimeError:
+            pass  # loop already closed
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped is not None and self._stopped.is_set()
+
+    async def wait_stopped(self):
+        await self._stopped.wait()
+
+    def events_of(self, event_type: str) -> List[Any]:
+        return [e for e in self.events if e.type == event_type]
+
+
+class ExecutionChannelRegistry:
+    """Routes bus events to per-execution channels"""
+
+    def __init__(self):
+        self._channels: Dict[str, ExecutionChannel] = {}
+        self._lock = threading.Lock()
+        self._attached: set = set()
+        self.routed = 0
+        self.unscoped = 0
+
+    def attach(self, bus):
+        """Listen on a bus (idempotent); uses a sync listener so routing runs in the emitter's context"""
+        with self._lock:
+            if id(bus) in self._attached:
+                return
+            self._attached.add(id(bus))
+        bus.on("*", self.route)
+
+    def attach_default_buses(self):
+        from app.services.event_bus import event_bus
+        self.attach(event_bus)
+        try:
+            from app.services.event_system import global_event_bus
+            self.attach(global_event_bus)
+        except ImportError:
+            pass
+
+    def open(self, execution_id: str, aliases: Iterable[str] = ()) -> ExecutionChannel:
+        """Create and register a channel; call from the execution's coroutine"""
+        self.attach_default_buses()
+        channel = ExecutionChannel(execution_id, aliases)
+        channel.bind()
+        with self._lock:
+            for key in (execution_id, *channel.aliases):
+                self._channels[key] = channel
+        return channel
+
+    def close(self, channel: ExecutionChannel):
+        channel.closed = True
+        with self._lock:
+            for key in (channel.execution_id, *channel.aliases):
+                if self._channels.get(key) is channel:
+                    del self._channels[key]
+
+    def get(self, execution_id: str) -> Optional[ExecutionChannel]:
+        with self._lock:
+            return self._channels.get(execution_id)
+
+    def route(self, event: Any):
+        channel = None
+        scope = current_execution_id.get()
+        with self._lock:
+            if scope is not None:
+                channel = self._channels.get(scope)
+            if channel is None and isinstance(getattr(event, "data", None), dict):
+                for key in ("execution_id", "session_id"):
+                    value = event.data.get(key)
+                    if isinstance(value, str) and value in self._channels:
+                        channel = self._channels[value]
+                        break
+        if channel is None:
+            self.unscoped += 1
+            return
+        self.routed += 1
+        channel.deliver(event)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            open_channels = len({id(c) for c in self._channels.values()})
+        return {"open_channels": open_channels, "routed": self.routed, "unscoped": self.unscoped}
+
+
+execution_channels = ExecutionChannelRegistry()
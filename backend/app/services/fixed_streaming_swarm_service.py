@@ -15,7 +15,7 @@ import queue
 import time
 from strands import Agent, tool
 from strands.multiagent import Swarm
-from strands.models.openai import OpenAIModel
+from app.services.model_client_factory import get_model
 from app.schemas.swarm import SwarmExecutionRequest, SwarmExecutionResponse, ExecutionStatus
 
 logger = structlog.get_logger()
@@ -172,8 +172,8 @@ class FixedStreamingSwarmService:
                 system_prompt = context + system_prompt
             
             # Create OpenAI model
-            model = OpenAIModel(
-                client_args={"api_key": os.getenv("OPENAI_API_KEY")},
+            model = get_model(
+                api_key=os.getenv("OPENAI_API_KEY"),
                 model_id=config.get("model", "gpt-4o-mini"),
                 params={
                     "temperature": config.get("temperature", 0.7),
@@ -0,0 +1,151 @@
+"""
+Compact encodings for EventHub frames
+
+Token frames dominate traffic and usually carry 1-4 characters, so the JSON
+envelope around them costs far more than the text. This module provides:
+
+- a positional Redis entry for token frames (exec_id and frame_type are
+  implied by the stream key)
+- coalescing of adjacent token frames from the same agent
+- a per-connection wire encoder that interns exec/agent IDs, sends
+  millisecond timestamp deltas and packs batches with msgpack when it is
+  installed, falling back to compact JSON arrays otherwise
+"""
+import json
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+# Wire formats a client can ask for
+FORMAT_JSON = "json"  # one JSON object per frame (original format)
+FORMAT_COMPACT = "compact"  # positional records; msgpack if available, else JSON text
+FORMAT_MSGPACK = "msgpack"  # like compact but insists on msgpack when installed
+WIRE_FORMATS = (FORMAT_JSON, FORMAT_COMPACT, FORMAT_MSGPACK)
+
+# Record tags in the compact wire format
+REC_TOKEN = 0  # [0, exec_ref, agent_ref, seq, text, dt_ms, final]
+REC_FRAME = 1  # [1, frame_dict]  (control/metrics/error frames, sent whole)
+REC_INTERN = 2  # [2, ref, string]  defines ref before its first use
+
+_COMPACT_SEPARATORS = (",", ":")
+
+
+def encode_token_entry(frame: Dict[str, Any]) -> Dict[str, str]:
+    """Redis stream fields for a token frame: one positional JSON array"""
+    return {
+        "c": json.dumps(
+            [frame["agent_id"], frame["seq"], frame["text"], frame["ts"], 1 if frame.get("final") else 0],
+            separators=_COMPACT_SEPARATORS
+        )
+    }
+
+
+def decode_entry(stream_key: str, fields: Dict[str, str]) -> Dict[str, Any]:
+    """Frame dict from a Redis stream entry in either the compact or legacy layout"""
+    compact = fields.get("c")
+    if compact is None:
+        return json.loads(fields.get("data", "{}"))
+    agent_id, seq, text, ts, final = json.loads(compact)
+    # exec.{id}.token
+    exec_id = stream_key[len("exec."):stream_key.rindex(".")]
+    return {
+        "exec_id": exec_id,
+        "agent_id": agent_id,
+        "seq": seq,
+        "text": text,
+        "ts": ts,
+        "final": bool(final),
+        "frame_type": "token",
+    }
+
+
+def is_token_frame(frame: Dict[str, Any]) -> bool:
+    return frame.get("frame_type", "token") == "token" and "text" in frame
+
+
+def coalesce_token_frames(frames: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merge runs of consecutive token frames from the same agent into one frame
+
+    The merged frame keeps the last frame's seq/ts/final so per-agent
+    ordering checks still hold; seq_start records the first merged seq.
+    """
+    out: List[Dict[str, Any]] = []
+    for frame in frames:
+        prev = out[-1] if out else None
+        if (
+            prev is not None
+            and is_token_frame(frame)
+            and is_token_frame(prev)
+            and prev.get("agent_id") == frame.get("agent_id")
+            and prev.get("exec_id") == frame.get("exec_id")
+            and not prev.get("final")
+        ):
+            if "seq_start" not in prev:
+                # Copy before mutating; the original may be shared with other viewers
+                prev = out[-1] = {**prev, "seq_start": prev.get("seq")}
+            prev["text"] += frame.get("text", "")
+            prev["seq"] = frame.get("seq")
+            prev["ts"] = frame.get("ts")
+            prev["final"] = frame.get("final", False)
+        else:
+            out.append(frame)
+    return out
+
+
+def negotiate_format(requested: Optional[str]) -> str:
+    """Format actually used for a client's request (JSON when unknown)"""
+    if requested in (FORMAT_COMPACT, FORMAT_MSGPACK):
+        return FORMAT_MSGPACK if MSGPACK_AVAILABLE else FORMAT_COMPACT
+    return FORMAT_JSON
+
+
+class CompactFrameEncoder:
+    """
+    Per-connection encoder for the compact wire format
+
+    Interned IDs and the timestamp baseline are connection state, so one
+    encoder must serve exactly one client, in send order.
+    """
+
+    def __init__(self, use_msgpack: bool = MSGPACK_AVAILABLE):
+        self.use_msgpack = use_msgpack and MSGPACK_AVAILABLE
+        self._refs: Dict[str, int] = {}
+        self._last_ts: float = 0.0
+
+    def _ref(self, value: str, records: List[list]) -> int:
+        ref = self._refs.get(value)
+        if ref is None:
+            ref = self._refs[value] = len(self._refs)
+            records.append([REC_INTERN, ref, value])
+        return ref
+
+    def records(self, frames: List[Dict[str, Any]]) -> List[list]:
+        records: List[list] = []
+        for frame in frames:
+            if not is_token_frame(frame):
+                records.append([REC_FRAME, frame])
+                continue
+            exec_ref = self._ref(frame.get("exec_id", ""), records)
+            agent_ref = self._ref(frame.get("agent_id", ""), records)
+            ts = frame.get("ts") or self._last_ts
+            dt_ms = int(round((ts - self._last_ts) * 1000))
+            # Advance by the rounded delta so the client's running sum stays exact
+            self._last_ts += dt_ms / 1000
+            records.append([
+                REC_TOKEN, exec_ref, agent_ref, frame.get("seq", 0),
+                frame.get("text", ""), dt_ms, 1 if frame.get("final") else 0
+            ])
+        return records
+
+    def encode(self, frames: List[Dict[str, Any]]) -> Union[bytes, str]:
+        """One message for a batch: msgpack bytes, or compact JSON text"""
+        records = self.records(frames)
+        if self.use_msgpack:
+            return msgpack.packb(records, use_bin_type=True, default=str)
+        return json.dumps(records, separators=_COMPACT_SEPARATORS, default=str)
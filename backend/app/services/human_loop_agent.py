@@ -11,6 +11,8 @@ from dataclasses import dataclass, asdict
 
 from app.services.event_bus import event_bus, SwarmEvent
 from app.services.event_aware_agent import EventAwareAgent, AgentCapabilities
+from app.services.approval_classifier import get_approval_classifier
+from app.services.pending_interactions import InteractionCancelled, get_pending_interactions
 
 logger = logging.getLogger(__name__)
 
@@ -263,105 +265,30 @@ class HumanLoopAgent(EventAwareAgent):
         return result
     
     async def _should_ask_human_approval(self, event: SwarmEvent) -> bool:
-        """Use AI to intelligently determine if human approval is needed"""
+        """Decide if human approval is needed; rules first, the model only for ambiguous tasks"""
         task = event.data.get("task", "")
-        
-        # Use AI to make intelligent decisions about when to ask for approval
         try:
-            from strands import Agent
-            from strands.models.openai import OpenAIModel
-            import os
-            from dotenv import load_dotenv
-            
-            load_dotenv()
-            api_key = os.getenv("OPENAI_API_KEY")
-            
-            if not api_key:
-                # Fallback: ask for approval on most tasks for testing
-                return len(task) > 10  # Very low threshold for testing
-            
-            # Create a decision agent to intelligently determine if approval is needed
-            model = OpenAIModel(
-                client_args={"api_key": api_key},
-                model_id="gpt-4o-mini",
-                params={"max_tokens": 100, "temperature": 0.1}
-            )
-            
-            decision_agent = Agent(
-                name="approval_decision_agent",
-                system_prompt="""You are an intelligent decision agent that determines when human approval is needed for CRITICAL tasks only.
-
-ONLY require human approval for HIGH-RISK operations:
-1. Executing system commands or shell scripts
-2. Making network requests or API calls to external services
-3. File system operations (creating, deleting, modifying files)
-4. Database operations or data manipulation
-5. Installing packages or dependencies
-6. Running code or scripts
-7. Making irreversible changes
-
-DO NOT require approval for:
-- Basic text generation (writing documentation, code snippets)
-- Analysis and planning tasks
-- Information processing and formatting
-- Creating text-based content
-- Regular development tasks like writing code
-- Reviewing or analyzing existing content
-
-The human-in-the-loop should be for CRITICAL decisions, not routine tasks.
-
-Respond with ONLY "YES" if human approval is needed for critical operations, or "NO" if the agent can proceed independently.
-
-DEFAULT: When in doubt, answer NO (let agents work autonomously).""",
-                model=model
+            decision = await get_approval_classifier().classify(
+                task,
+                tools=self.capabilities.tools,
+                metadata=event.data,
+                agent_name=self.name,
+                role=self.role,
             )
-            
-            decision_prompt = f"""Task to analyze: "{task}"
-
-Agent context:
-- Agent: {self.name} ({self.role})
-- Previous interactions: {len(self.memory.human_interactions)}
-- Task history: {len(self.memory.conversation_history)}
-
-Should this task require human approval before proceeding? Answer YES or NO."""
-            
-            # Get AI decision
-            try:
-                if hasattr(decision_agent, 'run'):
-                    result = await decision_agent.run(decision_prompt)
-                else:
-                    result = decision_agent(decision_prompt)
-                
-                # Extract decision from result
-                if hasattr(result, 'content'):
-                    decision = result.content.strip().upper()
-                elif hasattr(result, 'output'):
-                    decision = result.output.strip().upper()
-                else:
-                    decision = str(result).strip().upper()
-                
-                needs_approval = "YES" in decision
-                
-                # Record this decision in memory
-                self.record_decision(
-                    decision=f"Human approval {'required' if needs_approval else 'not required'}",
-                    reasoning=f"AI analysis of task: {task[:100]}...",
-                    outcome=f"Decision: {'YES' if needs_approval else 'NO'}"
-                )
-                
-                return needs_approval
-                
-            except Exception as e:
-                logger.error(f"AI decision failed: {e}")
-                # Fallback to always request approval for testing/development
-                logger.info("🔄 AI decision failed, defaulting to requesting human approval")
-                return True
-                
         except Exception as e:
             logger.error(f"Approval decision system failed: {e}")
-            # Conservative fallback - always request approval for testing/development
-            logger.info("🔄 Entire approval decision system failed, defaulting to requesting human approval")
+            # Conservative fallback - request approval
+            logger.info("🔄 Approval decision failed, defaulting to requesting human approval")
             return True
+        
+        logger.info(f"🧭 Approval {'required' if decision.needs_approval else 'not required'} for {self.name} ({decision.tier}: {decision.reason})")
+        # Record this decision in memory
+        self.record_decision(
+            decision=f"Human approval {'required' if decision.needs_approval else 'not required'}",
+            reasoning=f"{decision.reason} ({decision.tier}) for task: {task[:100]}...",
+            outcome=f"Decision: {'YES' if decision.needs_approval else 'NO'}"
+        )
+        return decision.needs_approval
     
     async def _request_human_approval(self, event: SwarmEvent) -> bool:
         """Request human approval using Strands handoff_to_user pattern"""
@@ -369,20 +296,17 @@ Should this task require human approval before proceeding? Answer YES or NO."""
             # Import handoff_to_user tool
             from strands_tools import handoff_to_user
             from strands import Agent
-            from strands.models.openai import OpenAIModel
-            import os
-            from dotenv import load_dotenv
+            from app.services.model_client_factory import get_model, openai_api_key
             
-            load_dotenv()
-            api_key = os.getenv("OPENAI_API_KEY")
+            api_key = openai_api_key()
             
             if not api_key:
                 logger.warning("No OpenAI API key - auto-approving task")
                 return True
             
             # Create agent with handoff tool
-            model = OpenAIModel(
-                client_args={"api_key": api_key},
+            model = get_model(
+                api_key=api_key,
                 model_id="gpt-4o-mini",
                 params={"max_tokens": 1000, "temperature": 0.3}
             )
@@ -424,6 +348,16 @@ Type 'approve' to proceed, 'deny' to cancel, or 'modify: <instructions>' to prov
             effective_execution_id = session_id or self.execution_id
             logger.info(f"🔗 Using execution_id for human approval: {effective_execution_id} (session_id: {session_id}, original: {self.execution_id})")
             
+            # Register before emitting so an instant answer can't be missed
+            interactions = get_pending_interactions()
+            max_wait = 300.0
+            interactions.register(
+                request_id,
+                kind="agent_approval",
+                execution_ids=(effective_execution_id, self.execution_id),
+                ttl=max_wait,
+            )
+            
             # Emit human approval request event
             await event_bus.emit(
                 "human.approval.needed",
@@ -439,25 +373,18 @@ Type 'approve' to proceed, 'deny' to cancel, or 'modify: <instructions>' to prov
                 source=self.name
             )
             
-            # Wait for human response with cooperative stop polling
-            response_event = None
-            total_wait = 0.0
-            interval = 0.25
-            max_wait = 300.0
-            while total_wait < max_wait:
-                if self._is_stopped():
-                    logger.info(f"🛑 HumanLoopAgent {self.name} stop requested during approval wait")
-                    return False
-                response_event = await event_bus.wait_for_event(
-                    f"human.approval.response.{request_id}",
-                    timeout=interval
-                )
-                if response_event:
-                    break
-                total_wait += interval
+            # Wait for the human response; stopping the execution cancels the wait
+            try:
+                response_data = await interactions.wait(request_id, timeout=max_wait)
+            except InteractionCancelled:
+                logger.info(f"🛑 HumanLoopAgent {self.name} stop requested during approval wait")
+                self.pending_human_requests.pop(request_id, None)
+                return False
+            except asyncio.TimeoutError:
+                response_data = None
             
-            if response_event:
-                response = response_event.data.get("response", "").lower()
+            if response_data is not None:
+                response = (response_data.get("response") or "").lower()
                 
                 # Record human interaction
                 interaction = {
@@ -510,6 +437,9 @@ Type 'approve' to proceed, 'deny' to cancel, or 'modify: <instructions>' to prov
             }
         }
         
+        interactions = get_pending_interactions()
+        interactions.register(question_id, kind="question", execution_ids=(self.execution_id,), ttl=300)
+        
         await event_bus.emit(
             "human.question",
             question_data,
@@ -517,14 +447,14 @@ Type 'approve' to proceed, 'deny' to cancel, or 'modify: <instructions>' to prov
         )
         
         # Wait for response
-        response_event = await event_bus.wait_for_event(
-            f"human.response.{question_id}",
-            timeout=300  # 5 minutes
-        )
-        
         response_text = "No response received"
-        if response_event:
-            response_text = response_event.data.get("answer", "No response")
+        try:
+            response_data = await interactions.wait(question_id, timeout=300)  # 5 minutes
+            response_text = (response_data or {}).get("answer", "No response")
+        except InteractionCancelled:
+            response_text = "No response received (execution stopped)"
+        except asyncio.TimeoutError:
+            pass
         
         # Record interaction in memory
         interaction = {
@@ -544,20 +474,17 @@ Type 'approve' to proceed, 'deny' to cancel, or 'modify: <instructions>' to prov
         try:
             from strands_tools import handoff_to_user
             from strands import Agent
-            from strands.models.openai import OpenAIModel
-            import os
-            from dotenv import load_dotenv
+            from app.services.model_client_factory import get_model, openai_api_key
             
-            load_dotenv()
-            api_key = os.getenv("OPENAI_API_KEY")
+            api_key = openai_api_key()
             
             if not api_key:
                 logger.warning("No OpenAI API key - cannot perform handoff")
                 return False
             
             # Create agent with handoff tool
-            model = OpenAIModel(
-                client_args={"api_key": api_key},
+            model = get_model(
+                api_key=api_key,
                 model_id="gpt-4o-mini",
                 params={"max_tokens": 500}
             )
@@ -585,6 +512,9 @@ Memory Summary:
             
             # Emit handoff event
             handoff_id = str(uuid.uuid4())
+            interactions = get_pending_interactions()
+            if not complete_handoff:
+                interactions.register(handoff_id, kind="handoff", execution_ids=(self.execution_id,), ttl=600)
             await event_bus.emit(
                 "human.handoff.requested",
                 {
@@ -603,12 +533,12 @@ Memory Summary:
                 self.state = "handed_off"
                 return True
             else:
-                # Wait for continuation signal
-                continue_event = await event_bus.wait_for_event(
-                    f"human.handoff.continue.{handoff_id}",
-                    timeout=600  # 10 minutes for manual tasks
-                )
-                return continue_event is not None
+                # Wait for continuation signal; a human taking over completely ends the wait too
+                try:
+                    response_data = await interactions.wait(handoff_id, timeout=600)  # 10 minutes for manual tasks
+                except (InteractionCancelled, asyncio.TimeoutError):
+                    return False
+                return bool((response_data or {}).get("continue"))
                 
         except Exception as e:
             logger.error(f"Human handoff failed: {e}")
@@ -724,12 +654,9 @@ Memory Summary:
         """Process the task with context from previous agents"""
         try:
             from strands import Agent
-            from strands.models.openai import OpenAIModel
-            import os
-            from dotenv import load_dotenv
+            from app.services.model_client_factory import get_model, openai_api_key
             
-            load_dotenv()
-            api_key = os.getenv("OPENAI_API_KEY")
+            api_key = openai_api_key()
             
             if not api_key:
                 logger.warning("No OpenAI API key - using simulation mode")
@@ -739,8 +666,8 @@ Memory Summary:
             # Create model
             if self._is_stopped():
                 return "Stopped by user"
-            model = OpenAIModel(
-                client_args={"api_key": api_key},
+            model = get_model(
+                api_key=api_key,
                 model_id="gpt-4o-mini",
                 params={"max_tokens": 2000, "temperature": 0.7}
             )
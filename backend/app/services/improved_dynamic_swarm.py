@@ -16,7 +16,7 @@ import time
 import re
 from strands import Agent, tool
 from strands.multiagent import Swarm
-from strands.models.openai import OpenAIModel
+from app.services.model_client_factory import get_model
 
 logger = structlog.get_logger()
 strands_logger = logging.getLogger("strands")
@@ -66,8 +66,8 @@ class ImprovedDynamicSwarmService:
     def _create_focused_agents(self, task: str, requirements: Dict, stream_queue: queue.Queue) -> List[Agent]:
         """Create a focused set of agents based on requirements"""
         agents = []
-        model = OpenAIModel(
-            client_args={"api_key": os.getenv("OPENAI_API_KEY")},
+        model = get_model(
+            api_key=os.getenv("OPENAI_API_KEY"),
             model_id="gpt-4o-mini",
             params={"temperature": 0.7, "max_tokens": 4000}
         )
@@ -0,0 +1,200 @@
+"""
+Async link checker for research sources
+
+One aiohttp connector pool is shared by every check, with a cap on
+connections per host so a page full of links to one site does not hammer
+it. Each URL is tried with HEAD first and, when servers reject or mishandle
+HEAD, with a GET for just the first byte. Results are cached with a TTL
+across sessions, and concurrent checks of the same URL share one request.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Dict, Iterable, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; ThrivixLinkChecker/1.0)",
+    "Accept": "*/*",
+}
+
+
+@dataclass
+class LinkStatus:
+    """Outcome of checking one URL"""
+    url: str
+    ok: bool
+    status_code: Optional[int] = None
+    method: Optional[str] = None
+    error: Optional[str] = None
+    elapsed_ms: int = 0
+    checked_at: float = 0.0
+    cached: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class LinkChecker:
+    """Pooled, cached, concurrency-bounded URL validation"""
+
+    def __init__(
+        self,
+        max_connections: int = 32,
+        max_per_host: int = 4,
+        timeout: float = 8.0,
+        ok_ttl: float = 3600.0,
+        error_ttl: float = 300.0,
+        cache_size: int = 5000,
+    ):
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout, sock_connect=min(timeout, 5.0))
+        self.ok_ttl = ok_ttl
+        self.error_ttl = error_ttl
+        self.cache_size = cache_size
+
+        # aiohttp sessions are bound to the loop that created them
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()  # url -> (expires_at, LinkStatus)
+        self._cache_lock = threading.Lock()
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+
+        self.requests = 0
+        self.cache_hits = 0
+
+    def _session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_per_host,
+                ttl_dns_cache=300,
+            )
+            session = aiohttp.ClientSession(connector=connector, timeout=self.timeout, headers=_HEADERS)
+            self._sessions[loop] = session
+        return session
+
+    def cached(self, url: str) -> Optional[LinkStatus]:
+        with self._cache_lock:
+            entry = self._cache.get(url)
+            if entry is None:
+                return None
+            expires_at, status = entry
+            if expires_at < time.time():
+                del self._cache[url]
+                return None
+            self._cache.move_to_end(url)
+        self.cache_hits += 1
+        return LinkStatus(**{**asdict(status), "cached": True})
+
+    def _store(self, status: LinkStatus):
+        ttl = self.ok_ttl if status.ok else self.error_ttl
+        with self._cache_lock:
+            self._cache[status.url] = (time.time() + ttl, status)
+            self._cache.move_to_end(status.url)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    async def check(self, url: str) -> LinkStatus:
+        """Status of one URL, from the cache when fresh"""
+        status = self.cached(url)
+        if status is not None:
+            return status
+        loop = asyncio.get_running_loop()
+        key = (loop, url)
+        task = self._inflight.get(key)
+        if task is None:
+            # The probe is its own task: a cancelled caller only stops waiting for it
+            task = self._inflight[key] = asyncio.ensure_future(self._probe(url))
+
+            def _done(fut: asyncio.Future):
+                self._inflight.pop(key, None)
+                if fut.cancelled():
+                    return
+                if fut.exception() is None:
+                    self._store(fut.result())
+
+            task.add_done_callback(_done)
+        return await asyncio.shield(task)
+
+    async def _probe(self, url: str) -> LinkStatus:
+        session = self._session()
+        started = time.monotonic()
+        status_code = None
+        error = None
+        # Many servers reject or mishandle HEAD, so a failed HEAD is confirmed
+        # with a GET for the first byte (the body is never read)
+        for method, headers in (("HEAD", None), ("GET", {"Range": "bytes=0-0"})):
+            self.requests += 1
+            try:
+                async with session.request(method, url, allow_redirects=True, headers=headers) as resp:
+                    status_code = resp.status
+                error = None
+                if status_code < 400:
+                    break
+            except asyncio.TimeoutError:
+                error = "timeout"
+                break
+            except aiohttp.ClientError as e:
+                error = f"{type(e).__name__}: {e}"
+            except ValueError as e:
+                # Malformed URL; GET won't fare better
+                error = str(e)
+                break
+        return LinkStatus(
+            url=url,
+            ok=status_code is not None and 200 <= status_code < 400,
+            status_code=status_code,
+            method=method,
+            error=error,
+            elapsed_ms=int((time.monotonic() - started) * 1000),
+            checked_at=time.time(),
+        )
+
+    async def check_many(self, urls: Iterable[str]) -> AsyncIterator[LinkStatus]:
+        """Check each distinct URL concurrently, yielding one result per URL as soon as it is known"""
+        unique = list(dict.fromkeys(u for u in urls if u))
+        tasks = [asyncio.ensure_future(self.check(url)) for url in unique]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def close(self):
+        """Close the pool owned by the running loop"""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cache_lock:
+            cache_entries = len(self._cache)
+        return {
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "cache_entries": cache_entries,
+            "inflight": len(self._inflight),
+            "max_connections": self.max_connections,
+            "max_per_host": self.max_per_host,
+        }
+
+
+_link_checker: Optional[LinkChecker] = None
+
+
+def get_link_checker() -> LinkChecker:
+    """Get or create the process-wide link checker"""
+    global _link_checker
+    if _link_checker is None:
+        _link_checker = LinkChecker()
+    return _link_checker
@@ -0,0 +1,426 @@
+"""
+Shared LLM model clients
+
+Services used to build a new OpenAIModel - and with it a new AsyncOpenAI
+HTTP client - for every agent or decision, so no connection was ever reused
+and nothing bounded how many requests ran at once. get_model() hands out
+models that share one keep-alive client per API key and base URL instead.
+
+Those clients live on a single long-lived I/O loop (a daemon thread):
+strands runs each synchronous agent call on a fresh event loop, and a
+connection pool cannot outlive the loop it was opened on. A model's request
+runs on the I/O loop and its stream events are relayed to the caller's loop.
+
+Each request takes a slot from a global and a per-model concurrency limit
+and a token from the model's rate bucket; when no token comes within
+MODEL_MAX_RATE_WAIT_SECONDS, or the provider answers 429, strands gets a
+ModelThrottledException and retries with its own backoff. Per-model latency,
+time to first token and token counts are reported by get_stats().
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Callable, Deque, Dict, Optional, Tuple
+
+import httpx
+import openai
+from strands.models.openai import OpenAIModel
+from strands.types.exceptions import ModelThrottledException
+
+from app.services.search_gateway import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_ID = "gpt-4o-mini"
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class _DrainOnClose(httpx.AsyncByteStream):
+    """Response body that reads what is left of itself before closing"""
+
+    max_drain_bytes = 64 * 1024
+
+    def __init__(self, stream: httpx.AsyncByteStream):
+        self._stream = stream
+        self._chunks = None
+
+    async def __aiter__(self):
+        self._chunks = self._stream.__aiter__()
+        async for chunk in self._chunks:
+            yield chunk
+
+    async def _drain(self):
+        drained = 0
+        async for chunk in self._chunks:
+            drained += len(chunk)
+            if drained > self.max_drain_bytes:
+                return
+
+    async def aclose(self):
+        if self._chunks is not None:
+            try:
+                await asyncio.wait_for(self._drain(), 1.0)
+            except Exception:
+                pass  # the connection is just not reused
+        await self._stream.aclose()
+
+
+class _DrainingTransport(httpx.AsyncBaseTransport):
+    """
+    Lets streamed responses hand their connection back to the pool
+
+    openai stops reading a stream at its [DONE] event, just before the end of
+    the HTTP body, and httpcore discards a connection whose response was not
+    read to the end, so without this no streamed request reuses a connection.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self._transport.handle_async_request(request)
+        response.stream = _DrainOnClose(response.stream)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+@dataclass
+class _ModelStats:
+    requests: int = 0
+    errors: int = 0
+    throttled: int = 0
+    in_flight: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=500))
+    ttfts: Deque[float] = field(default_factory=lambda: deque(maxlen=500))
+    queue_waits: Deque[float] = field(default_factory=lambda: deque(maxlen=500))
+
+    def to_dict(self) -> Dict[str, Any]:
+        def summary(values: Deque[float]) -> Dict[str, float]:
+            ordered = sorted(values)
+            if not ordered:
+                return {"avg_ms": 0.0, "p95_ms": 0.0}
+            return {
+                "avg_ms": round(sum(ordered) / len(ordered) * 1000, 1),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+            }
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "in_flight": self.in_flight,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "latency": summary(self.latencies),
+            "ttft": summary(self.ttfts),
+            "queue_wait": summary(self.queue_waits),
+        }
+
+
+class PooledOpenAIModel(OpenAIModel):
+    """OpenAIModel whose requests go through a ModelClientFactory"""
+
+    def __init__(self, factory: "ModelClientFactory", client_key: Tuple[Optional[str], Optional[str]], **model_config: Any):
+        # OpenAIModel.__init__ would open a private AsyncOpenAI client; this one borrows the factory's
+        self.config = dict(model_config)
+        self._factory = factory
+        self._client_key = client_key
+
+    @property
+    def client(self):
+        """Shared client for this model's key; only valid on the factory's I/O loop"""
+        return self._factory._client(self._client_key)
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs) -> AsyncGenerator[Any, None]:
+        events = super().stream(messages, tool_specs, system_prompt, **kwargs)
+        async for event in self._factory.relay(self.config.get("model_id", DEFAULT_MODEL_ID), events):
+            yield event
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs) -> AsyncGenerator[Any, None]:
+        events = super().structured_output(output_model, prompt, system_prompt=system_prompt, **kwargs)
+        async for event in self._factory.relay(self.config.get("model_id", DEFAULT_MODEL_ID), events):
+            yield event
+
+
+class ModelClientFactory:
+    """Keyed, pooled model clients with concurrency limits, rate buckets and metrics"""
+
+    def __init__(
+        self,
+        max_concurrency: int = 32,
+        max_concurrency_per_model: int = 16,
+        requests_per_minute: int = 500,
+        max_rate_wait: float = 30.0,
+        max_connections: int = 64,
+        max_keepalive_connections: int = 32,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_concurrency_per_model = max_concurrency_per_model
+        self.requests_per_minute = requests_per_minute
+        self.max_rate_wait = max_rate_wait
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        # Used only on the I/O loop
+        self._clients: Dict[Tuple[Optional[str], Optional[str]], openai.AsyncOpenAI] = {}
+        self._global_slots: Optional[asyncio.Semaphore] = None
+        self._model_slots: Dict[str, asyncio.Semaphore] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+
+        self._stats: Dict[str, _ModelStats] = {}
+
+    # ------------------------------------------------------------------
+    # Models
+    # ------------------------------------------------------------------
+
+    def get_model(
+        self,
+        model_id: str = DEFAULT_MODEL_ID,
+        params: Optional[Dict[str, Any]] = None,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        **model_config: Any,
+    ) -> PooledOpenAIModel:
+        """
+        A strands model backed by the shared client for api_key and base_url
+
+        api_key and base_url default to OPENAI_API_KEY and OPENAI_BASE_URL.
+        Models are cheap; build one per agent as before.
+        """
+        client_key = (api_key or openai_api_key(), base_url or os.getenv("OPENAI_BASE_URL"))
+        config = {"model_id": model_id, **model_config}
+        if params is not None:
+            config["params"] = params
+        return PooledOpenAIModel(self, client_key, **config)
+
+    # ------------------------------------------------------------------
+    # I/O loop
+    # ------------------------------------------------------------------
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def _run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._loop_thread = threading.Thread(target=_run, name="model-clients", daemon=True)
+                self._loop_thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def _client(self, key: Tuple[Optional[str], Optional[str]]) -> openai.AsyncOpenAI:
+        client = self._clients.get(key)
+        if client is None:
+            api_key, base_url = key
+            transport = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=60.0,
+                ),
+            )
+            http_client = httpx.AsyncClient(
+                transport=_DrainingTransport(transport),
+                timeout=httpx.Timeout(600.0, connect=10.0),
+                follow_redirects=True,
+            )
+            client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+            self._clients[key] = client
+            logger.info(f"Opened shared model client for {base_url or 'api.openai.com'}")
+        return client
+
+    def _slots(self, model_id: str) -> Tuple[asyncio.Semaphore, asyncio.Semaphore, TokenBucket]:
+        if self._global_slots is None:
+            self._global_slots = asyncio.Semaphore(self.max_concurrency)
+        if model_id not in self._model_slots:
+            self._model_slots[model_id] = asyncio.Semaphore(self.max_concurrency_per_model)
+            self._buckets[model_id] = TokenBucket(self.requests_per_minute)
+        return self._global_slots, self._model_slots[model_id], self._buckets[model_id]
+
+    # ------------------------------------------------------------------
+    # Requests
+    # ------------------------------------------------------------------
+
+    async def relay(self, model_id: str, events: AsyncGenerator[Any, None]) -> AsyncGenerator[Any, None]:
+        """Run a model's event generator on the I/O loop, yielding its events here"""
+        caller = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def emit(item: Any):
+            try:
+                caller.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                pass  # caller's loop already closed
+
+        future = asyncio.run_coroutine_threadsafe(self._pump(model_id, events, emit), self._ensure_loop())
+        try:
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            if not future.done():
+                future.cancel()
+
+    async def _pump(self, model_id: str, events: AsyncGenerator[Any, None], emit: Callable[[Any], None]):
+        stats = self._stats.setdefault(model_id, _ModelStats())
+        global_slots, model_slots, bucket = self._slots(model_id)
+        queued_at = time.monotonic()
+        try:
+            # Take the rate token first so a request waiting on it doesn't hold a concurrency slot
+            if not await bucket.acquire(self.max_rate_wait):
+                stats.throttled += 1
+                raise ModelThrottledException(f"Local rate limit for {model_id}: no request slot within {self.max_rate_wait:.0f}s")
+            async with global_slots, model_slots:
+                started = time.monotonic()
+                stats.queue_waits.append(started - queued_at)
+                stats.requests += 1
+                stats.in_flight += 1
+                first_token = False
+                try:
+                    async for event in events:
+                        if not first_token and isinstance(event, dict) and "contentBlockDelta" in event:
+                            first_token = True
+                            stats.ttfts.append(time.monotonic() - started)
+                        usage = event.get("metadata", {}).get("usage") if isinstance(event, dict) else None
+                        if usage:
+                            stats.input_tokens += usage.get("inputTokens", 0) or 0
+                            stats.output_tokens += usage.get("outputTokens", 0) or 0
+                        emit(event)
+                    stats.latencies.append(time.monotonic() - started)
+                except openai.RateLimitError as e:
+                    stats.throttled += 1
+                    bucket.pause(self._retry_after(e))
+                    raise ModelThrottledException(str(e)) from e
+                except Exception:
+                    stats.errors += 1
+                    raise
+                finally:
+                    stats.in_flight -= 1
+            emit(_DONE)
+        except asyncio.CancelledError:
+            await events.aclose()
+            raise
+        except BaseException as e:
+            emit(_Failure(e))
+
+    @staticmethod
+    def _retry_after(error: openai.RateLimitError) -> float:
+        try:
+            return float(error.response.headers.get("retry-after", 5))
+        except (AttributeError, TypeError, ValueError):
+            return 5.0
+
+    # ------------------------------------------------------------------
+    # Lifecycle and metrics
+    # ------------------------------------------------------------------
+
+    def close(self):
+        """Close the pooled clients and stop the I/O loop"""
+        with self._start_lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+
+        async def _close():
+            for client in list(self._clients.values()):
+                try:
+                    await client.close()
+                except Exception:
+                    pass
+            self._clients.clear()
+
+        try:
+            asyncio.run_coroutine_threadsafe(_close(), loop).result(timeout=5)
+        except Exception as e:
+            logger.warning(f"Error closing model clients: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        self._global_slots = None
+        self._model_slots.clear()
+        self._buckets.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "clients": len(self._clients),
+            "max_concurrency": self.max_concurrency,
+            "max_concurrency_per_model": self.max_concurrency_per_model,
+            "requests_per_minute": self.requests_per_minute,
+            "models": {model_id: stats.to_dict() for model_id, stats in list(self._stats.items())},
+        }
+
+
+_factory: Optional[ModelClientFactory] = None
+_factory_lock = threading.Lock()
+
+
+_dotenv_loaded = False
+
+
+def openai_api_key() -> Optional[str]:
+    """OPENAI_API_KEY, with .env loaded once per process instead of at every call site"""
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        _dotenv_loaded = True
+        try:
+            from dotenv import load_dotenv
+            load_dotenv()
+        except ImportError:
+            pass
+    return os.getenv("OPENAI_API_KEY")
+
+
+def get_model_client_factory() -> ModelClientFactory:
+    """Get or create the process-wide model client factory"""
+    global _factory
+    with _factory_lock:
+        if _factory is None:
+            from app.core.config import settings
+            _factory = ModelClientFactory(
+                max_concurrency=settings.MODEL_MAX_CONCURRENCY,
+                max_concurrency_per_model=settings.MODEL_MAX_CONCURRENCY_PER_MODEL,
+                requests_per_minute=settings.MODEL_REQUESTS_PER_MINUTE,
+                max_rate_wait=settings.MODEL_MAX_RATE_WAIT_SECONDS,
+                max_connections=settings.MODEL_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.MODEL_MAX_KEEPALIVE_CONNECTIONS,
+            )
+        return _factory
+
+
+def get_model(model_id: str = DEFAULT_MODEL_ID, params: Optional[Dict[str, Any]] = None, **kwargs: Any) -> PooledOpenAIModel:
+    """Shorthand for get_model_client_factory().get_model(...)"""
+    return get_model_client_factory().get_model(model_id, params, **kwargs)
+
+
+def shutdown_model_clients():
+    global _factory
+    with _factory_lock:
+        factory, _factory = _factory, None
+    if factory is not None:
+        factory.close()
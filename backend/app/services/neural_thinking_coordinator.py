@@ -13,7 +13,7 @@ from enum import Enum
 import random
 
 from strands import Agent, tool
-from strands.models.openai import OpenAIModel
+from app.services.model_client_factory import get_model
 import os
 from strands.session.file_session_manager import FileSessionManager
 
@@ -299,7 +299,7 @@ REFERENCES: [optional: which recent thoughts this builds on]"""
 
         try:
             # Create a thinking agent with unique session
-            openai_model = OpenAIModel(
+            openai_model = get_model(
                 model_id=self.model,
                 temperature=0.7 + (agent.curiosity * 0.2)  # More curious = more creative
             )
@@ -0,0 +1,384 @@
+"""
+Pending human interactions
+
+Tool approvals, agent approvals, questions and handoffs all park an agent
+until a person answers. Each one is registered here under its request id and
+awaited on a future, so the answer wakes the waiter as soon as it arrives
+instead of being found by a polling loop. Entries expire after their TTL and
+are cancelled when their execution is stopped.
+
+With REDIS_URL set, each process announces the requests it registers over
+Redis pub/sub, and answers and cancellations for requests another process
+announced are relayed to it, so a response posted to any API process reaches
+the one whose agent is waiting. Ids no process registered are not relayed.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import redis.asyncio as aioredis
+except Exception:  # redis is optional; answers then stay in-process
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# Interaction states
+PENDING = "pending"
+RESOLVED = "resolved"
+CANCELLED = "cancelled"
+EXPIRED = "expired"
+
+BRIDGE_CHANNEL = "pending_interactions"
+
+
+class InteractionCancelled(Exception):
+    """Raised to a waiter whose interaction was cancelled, e.g. by an execution stop"""
+
+
+@dataclass
+class PendingInteraction:
+    """One request awaiting a human answer"""
+    request_id: str
+    kind: str
+    execution_ids: Tuple[str, ...]
+    expires_at: float
+    created_at: float = field(default_factory=time.time)
+    status: str = PENDING
+    result: Any = None
+    # (loop, future) per waiter; futures are woken on their own loop
+    _waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = field(default_factory=list, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "kind": self.kind,
+            "execution_ids": list(self.execution_ids),
+            "status": self.status,
+            "created_at": self.created_at,
+            "expires_at": self.expires_at,
+            "waiters": len(self._waiters),
+        }
+
+
+class PendingInteractionRegistry:
+    """Future-based registry of interactions waiting for a human"""
+
+    def __init__(self, default_ttl: float = 900.0):
+        self.default_ttl = default_ttl
+        self._entries: Dict[str, PendingInteraction] = {}
+        self._lock = threading.Lock()
+
+        # Redis bridge, owned by the loop that started it
+        self._origin = uuid.uuid4().hex
+        self._bridge_client = None
+        self._bridge_task: Optional[asyncio.Task] = None
+        self._bridge_loop: Optional[asyncio.AbstractEventLoop] = None
+        # request_id -> expires_at of requests pending in other processes
+        self._remote: Dict[str, float] = {}
+
+        self.resolved = 0
+        self.cancelled = 0
+        self.expired = 0
+        self.relayed = 0
+
+    # ------------------------------------------------------------------
+    # Registration and answers
+    # ------------------------------------------------------------------
+
+    def register(
+        self,
+        request_id: str,
+        kind: str = "approval",
+        execution_ids: Iterable[str] = (),
+        ttl: Optional[float] = None,
+    ) -> PendingInteraction:
+        """
+        Start tracking request_id; registering it again returns the same entry
+
+        Without execution_ids the entry belongs to the execution the calling
+        task works for, if any, so stopping that execution cancels it.
+        """
+        ids = tuple(dict.fromkeys(e for e in execution_ids if e))
+        if not ids:
+            from app.services.execution_channels import current_execution_id
+            scope = current_execution_id.get()
+            ids = (scope,) if scope else ()
+        expires_at = time.time() + (ttl if ttl is not None else self.default_ttl)
+        self._sweep()
+        with self._lock:
+            entry = self._entries.get(request_id)
+            if entry is not None:
+                entry.expires_at = max(entry.expires_at, expires_at)
+                entry.execution_ids = tuple(dict.fromkeys(entry.execution_ids + ids))
+            else:
+                entry = PendingInteraction(request_id=request_id, kind=kind, execution_ids=ids, expires_at=expires_at)
+                self._entries[request_id] = entry
+        # Let the other processes know answers for it belong here
+        self._relay({"op": "register", "request_id": request_id, "expires_at": entry.expires_at})
+        return entry
+
+    def resolve(self, request_id: str, result: Any) -> bool:
+        """
+        Answer request_id and wake its waiters; safe from any thread
+
+        Requests pending in another process are relayed to it. Returns False
+        when no process has the request pending.
+        """
+        if self._settle(request_id, RESOLVED, result):
+            return True
+        with self._lock:
+            expires_at = self._remote.pop(request_id, None)
+        if expires_at is None or expires_at <= time.time():
+            return False
+        if not self._relay({"op": "resolve", "request_id": request_id, "result": result}):
+            return False
+        self.relayed += 1
+        return True
+
+    def cancel(self, request_id: str) -> bool:
+        return self._settle(request_id, CANCELLED)
+
+    def cancel_execution(self, execution_id: str) -> int:
+        """Cancel every pending interaction of an execution; returns how many were here"""
+        with self._lock:
+            ids = [
+                entry.request_id for entry in self._entries.values()
+                if entry.status == PENDING and execution_id in entry.execution_ids
+            ]
+        cancelled = sum(1 for request_id in ids if self._settle(request_id, CANCELLED))
+        self._relay({"op": "cancel_execution", "execution_id": execution_id})
+        if cancelled:
+            logger.info(f"Cancelled {cancelled} pending interaction(s) for execution {execution_id}")
+        return cancelled
+
+    async def wait(self, request_id: str, timeout: Optional[float] = None, discard: bool = True) -> Any:
+        """
+        Result of request_id once answered
+
+        Raises asyncio.TimeoutError when timeout or the entry's TTL runs out
+        first and InteractionCancelled when it is cancelled. Unknown ids are
+        registered with the default TTL. The entry is dropped afterwards
+        unless discard is False.
+        """
+        entry = self.get(request_id) or self.register(request_id)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if entry.status == PENDING:
+                entry._waiters.append((loop, future))
+            else:
+                self._set_outcome(future, entry.status, entry.result)
+        remaining = entry.expires_at - time.time()
+        ttl_bound = timeout is None or remaining <= timeout
+        try:
+            return await asyncio.wait_for(future, max(remaining if ttl_bound else timeout, 0))
+        except asyncio.TimeoutError:
+            if ttl_bound:
+                self._settle(request_id, EXPIRED)
+            raise
+        finally:
+            with self._lock:
+                entry._waiters = [w for w in entry._waiters if w[1] is not future]
+                if discard and self._entries.get(request_id) is entry and (entry.status != PENDING or not entry._waiters):
+                    del self._entries[request_id]
+
+    def get(self, request_id: str) -> Optional[PendingInteraction]:
+        with self._lock:
+            return self._entries.get(request_id)
+
+    def discard(self, request_id: str):
+        """Stop tracking request_id, cancelling anyone still waiting"""
+        self._settle(request_id, CANCELLED)
+        with self._lock:
+            self._entries.pop(request_id, None)
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _settle(self, request_id: str, status: str, result: Any = None) -> bool:
+        with self._lock:
+            entry = self._entries.get(request_id)
+            if entry is None or entry.status != PENDING:
+                return False
+            entry.status = status
+            entry.result = result
+            waiters, entry._waiters = entry._waiters, []
+            if status == RESOLVED:
+                self.resolved += 1
+            elif status == CANCELLED:
+                self.cancelled += 1
+            else:
+                self.expired += 1
+        self._relay({"op": "settled", "request_id": request_id})
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(self._set_outcome, future, status, result)
+            except RuntimeError:
+                pass  # waiter's loop already closed
+        return True
+
+    @staticmethod
+    def _set_outcome(future: asyncio.Future, status: str, result: Any):
+        if future.done():
+            return
+        if status == RESOLVED:
+            future.set_result(result)
+        elif status == CANCELLED:
+            future.set_exception(InteractionCancelled())
+        else:
+            future.set_exception(asyncio.TimeoutError())
+
+    def _sweep(self):
+        """Expire entries past their TTL"""
+        now = time.time()
+        with self._lock:
+            stale = [e.request_id for e in self._entries.values() if e.expires_at <= now]
+            for request_id in [r for r, expires_at in self._remote.items() if expires_at <= now]:
+                del self._remote[request_id]
+        for request_id in stale:
+            self._settle(request_id, EXPIRED)
+            with self._lock:
+                entry = self._entries.get(request_id)
+                if entry is not None and entry.expires_at <= now:
+                    del self._entries[request_id]
+
+    # ------------------------------------------------------------------
+    # Redis bridge
+    # ------------------------------------------------------------------
+
+    async def start_bridge(self, redis_url: Optional[str] = None) -> bool:
+        """Subscribe to relayed answers; a no-op without redis or REDIS_URL"""
+        redis_url = redis_url or os.getenv("REDIS_URL")
+        if self._bridge_task is not None or aioredis is None or not redis_url:
+            return self._bridge_task is not None
+        try:
+            client = aioredis.Redis.from_url(redis_url, decode_responses=True)
+            await client.ping()
+            pubsub = client.pubsub()
+            await pubsub.subscribe(BRIDGE_CHANNEL)
+        except Exception as e:
+            logger.warning(f"Pending interaction bridge unavailable, answers stay in-process: {e}")
+            return False
+        self._bridge_client = client
+        self._bridge_loop = asyncio.get_running_loop()
+        self._bridge_task = asyncio.create_task(self._listen(pubsub))
+        # Announce what was registered before the bridge came up
+        with self._lock:
+            pending = [(e.request_id, e.expires_at) for e in self._entries.values() if e.status == PENDING]
+        for request_id, expires_at in pending:
+            self._relay({"op": "register", "request_id": request_id, "expires_at": expires_at})
+        return True
+
+    async def stop_bridge(self):
+        task, client = self._bridge_task, self._bridge_client
+        self._bridge_task = self._bridge_client = self._bridge_loop = None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        if client is not None:
+            try:
+                await client.close()
+            except Exception:
+                pass
+
+    async def _listen(self, pubsub):
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                try:
+                    data = json.loads(message["data"])
+                except (TypeError, ValueError):
+                    continue
+                if data.get("origin") == self._origin:
+                    continue
+                if data.get("op") == "register":
+                    with self._lock:
+                        self._remote[data.get("request_id")] = float(data.get("expires_at") or 0)
+                elif data.get("op") == "settled":
+                    with self._lock:
+                        self._remote.pop(data.get("request_id"), None)
+                elif data.get("op") == "resolve":
+                    self._settle(data.get("request_id"), RESOLVED, data.get("result"))
+                elif data.get("op") == "cancel_execution":
+                    with self._lock:
+                        ids = [
+                            e.request_id for e in self._entries.values()
+                            if e.status == PENDING and data.get("execution_id") in e.execution_ids
+                        ]
+                    for request_id in ids:
+                        self._settle(request_id, CANCELLED)
+        finally:
+            await pubsub.close()
+
+    def _relay(self, message: Dict[str, Any]) -> bool:
+        """Publish to the other processes; True if handed to the bridge"""
+        loop, client = self._bridge_loop, self._bridge_client
+        if loop is None or client is None:
+            return False
+        try:
+            payload = json.dumps({**message, "origin": self._origin}, default=str)
+        except (TypeError, ValueError):
+            return False
+
+        async def publish():
+            try:
+                await client.publish(BRIDGE_CHANNEL, payload)
+            except Exception as e:
+                logger.warning(f"Failed to relay {message.get('op')} over the interaction bridge: {e}")
+
+        try:
+            asyncio.run_coroutine_threadsafe(publish(), loop)
+        except RuntimeError:
+            return False
+        return True
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def pending_count(self, kind: Optional[str] = None) -> int:
+        with self._lock:
+            return sum(1 for e in self._entries.values() if e.status == PENDING and (kind is None or e.kind == kind))
+
+    def get_stats(self) -> Dict[str, Any]:
+        self._sweep()
+        with self._lock:
+            pending_by_kind: Dict[str, int] = {}
+            waiters = 0
+            for entry in self._entries.values():
+                if entry.status == PENDING:
+                    pending_by_kind[entry.kind] = pending_by_kind.get(entry.kind, 0) + 1
+                waiters += len(entry._waiters)
+        return {
+            "pending": sum(pending_by_kind.values()),
+            "pending_by_kind": pending_by_kind,
+            "waiters": waiters,
+            "resolved": self.resolved,
+            "cancelled": self.cancelled,
+            "expired": self.expired,
+            "relayed": self.relayed,
+            "remote_pending": len(self._remote),
+            "bridge": self._bridge_task is not None,
+        }
+
+
+_registry: Optional[PendingInteractionRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_pending_interactions() -> PendingInteractionRegistry:
+    """Get or create the process-wide pending interaction registry"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PendingInteractionRegistry()
+        return _registry
@@ -0,0 +1,597 @@
+"""
+Process-isolated Python REPL pool
+
+Code from the python_repl tool runs in a small pool of pre-started worker
+processes instead of on the API's event loop. Each worker keeps a namespace
+per session, so state persists between calls without copying it around, and
+calls for different sessions run in parallel on different workers.
+
+Limits are enforced from outside the sandboxed code:
+- wall clock: the parent kills a worker that overruns its timeout and starts
+  a replacement (state of the sessions on that worker is lost)
+- memory: workers run under RLIMIT_AS where the platform supports it
+- output: stdout/stderr are streamed back in chunks and capped
+
+Workers are recycled after a number of runs. Picklable values and imported
+modules are carried over to the replacement; functions and classes defined
+by the code are not.
+"""
+import ast
+import asyncio
+import importlib
+import io
+import logging
+import multiprocessing
+import os
+import pickle
+import signal
+import sys
+import threading
+import time
+import traceback
+import types
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+STDOUT_LIMIT = 10000
+STDERR_LIMIT = 5000
+RESULT_LIMIT = 1000
+_CHUNK_SIZE = 1024
+
+SAFE_MODULES = {
+    'math', 'random', 'datetime', 'time', 'json', 're',
+    'collections', 'itertools', 'functools', 'operator',
+    'string', 'textwrap', 'unicodedata', 'decimal',
+    'fractions', 'statistics', 'copy', 'pprint',
+    'enum', 'typing', 'dataclasses', 'abc',
+    'heapq', 'bisect', 'array', 'weakref',
+    'types', 'copyreg', 'hashlib', 'hmac',
+    'secrets', 'uuid', 'html', 'xml',
+    'urllib.parse', 'base64', 'binascii',
+    'zlib', 'gzip', 'bz2', 'lzma'
+}
+
+
+class ReplError(Exception):
+    """Raised when the pool cannot run code (closed, or a worker failed to start)"""
+
+
+# ----------------------------------------------------------------------
+# Worker process side
+# ----------------------------------------------------------------------
+
+def _safe_import(name, *args, **kwargs):
+    """Safe import function that only allows certain modules"""
+    if name.split('.')[0] in SAFE_MODULES:
+        return __import__(name, *args, **kwargs)
+    raise ImportError(f"Import of '{name}' is not allowed for safety reasons")
+
+
+def _safe_builtins() -> Dict[str, Any]:
+    import builtins
+    allowed = (
+        # Basic functions
+        'print', 'len', 'range', 'enumerate', 'zip', 'map', 'filter', 'sorted',
+        'reversed', 'sum', 'min', 'max', 'abs', 'round', 'all', 'any',
+        # Type functions
+        'int', 'float', 'str', 'bool', 'list', 'dict', 'set', 'tuple', 'type', 'isinstance',
+        # Math functions
+        'pow', 'divmod',
+        # Other safe functions
+        'help', 'dir', 'id', 'hash', 'hex', 'bin', 'oct', 'chr', 'ord',
+        # Critical Python internals for class/function creation
+        '__build_class__',
+    )
+    safe = {name: getattr(builtins, name) for name in allowed}
+    safe.update({
+        'True': True,
+        'False': False,
+        'None': None,
+        '__import__': _safe_import,
+        '__name__': '__main__',
+        '__doc__': None,
+    })
+    return safe
+
+
+class _PipeWriter(io.TextIOBase):
+    """stdout/stderr replacement that streams capped chunks to the parent"""
+
+    def __init__(self, conn, stream: str, limit: int):
+        self._conn = conn
+        self._stream = stream
+        self._limit = limit
+        self._sent = 0
+        self._buffer: List[str] = []
+        self._buffered = 0
+        self.written = False
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if not text:
+            return 0
+        self.written = True
+        room = self._limit - self._sent - self._buffered
+        if room > 0:
+            self._buffer.append(text[:room])
+            self._buffered += min(len(text), room)
+            if '\n' in text or self._buffered >= _CHUNK_SIZE:
+                self.flush()
+        return len(text)
+
+    def flush(self):
+        if self._buffer:
+            chunk = "".join(self._buffer)
+            self._buffer, self._buffered = [], 0
+            self._sent += len(chunk)
+            self._conn.send((self._stream, chunk))
+
+
+def _execute(conn, namespaces: "OrderedDict[str, dict]", builtins: Dict[str, Any],
+             session_id: str, code: str, persist: bool, max_sessions: int) -> Dict[str, Any]:
+    if persist:
+        namespace = namespaces.pop(session_id, None) or {}
+        namespaces[session_id] = namespace
+        while len(namespaces) > max_sessions:
+            namespaces.popitem(last=False)
+    else:
+        namespace = {}
+    namespace['__builtins__'] = builtins
+
+    stdout = _PipeWriter(conn, "stdout", STDOUT_LIMIT)
+    stderr = _PipeWriter(conn, "stderr", STDERR_LIMIT)
+    sys.stdout, sys.stderr = stdout, stderr
+    result_value = None
+    try:
+        tree = ast.parse(code, '<repl>')
+        # Like an interactive prompt: a trailing expression is evaluated once for its value
+        last = tree.body.pop() if tree.body and isinstance(tree.body[-1], ast.Expr) else None
+        exec(compile(tree, '<repl>', 'exec'), namespace)
+        if last is not None:
+            result_value = eval(compile(ast.Expression(last.value), '<repl>', 'eval'), namespace)
+    except SyntaxError as e:
+        stderr.write(f"SyntaxError: {e}\n")
+    except MemoryError:
+        stderr.write("MemoryError: memory limit exceeded\n")
+    except (Exception, SystemExit) as e:
+        stderr.write(f"{type(e).__name__}: {e}\n")
+        stderr.write(traceback.format_exc())
+    finally:
+        stdout.flush()
+        stderr.flush()
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+        namespace.pop('__builtins__', None)
+
+    result: Dict[str, Any] = {"errored": stderr.written}
+    if result_value is not None:
+        try:
+            result["result"] = str(result_value)[:RESULT_LIMIT]
+        except Exception:
+            result["result"] = repr(result_value)[:RESULT_LIMIT]
+    if persist:
+        variables = {k: type(v).__name__ for k, v in namespace.items() if not k.startswith('_')}
+        if variables:
+            result["variables"] = variables
+    return result
+
+
+def _export(namespaces: "OrderedDict[str, dict]") -> Dict[str, Any]:
+    """Session state that can cross a process boundary"""
+    state = {}
+    for session_id, namespace in namespaces.items():
+        values, modules = {}, {}
+        for key, value in namespace.items():
+            if isinstance(value, types.ModuleType):
+                modules[key] = value.__name__
+                continue
+            try:
+                pickle.dumps(value)
+            except Exception:
+                continue
+            values[key] = value
+        state[session_id] = (values, modules)
+    return state
+
+
+def _import(namespaces: "OrderedDict[str, dict]", state: Dict[str, Any]):
+    for session_id, (values, modules) in state.items():
+        namespace = namespaces.setdefault(session_id, {})
+        namespace.update(values)
+        for key, module_name in modules.items():
+            try:
+                namespace[key] = importlib.import_module(module_name)
+            except ImportError:
+                pass
+
+
+def _worker_main(conn, memory_limit_mb: int):
+    """Entry point of a worker process"""
+    # Ctrl-C is for the API process; it stops workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if memory_limit_mb and resource is not None:
+        limit = memory_limit_mb * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError):
+            pass
+
+    namespaces: "OrderedDict[str, dict]" = OrderedDict()
+    builtins = _safe_builtins()
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        op = message[0]
+        if op == "exec":
+            conn.send(("result", _execute(conn, namespaces, builtins, *message[1:])))
+        elif op == "import":
+            _import(namespaces, message[1])
+        elif op == "drop":
+            for session_id in message[1]:
+                namespaces.pop(session_id, None)
+        elif op == "export":
+            conn.send(("state", _export(namespaces)))
+            return
+        elif op == "stop":
+            return
+
+
+# ----------------------------------------------------------------------
+# API process side
+# ----------------------------------------------------------------------
+
+class _Worker:
+    def __init__(self, ctx, memory_limit_mb: int, number: int):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, memory_limit_mb),
+            name=f"repl-worker-{number}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.busy = False
+        self.runs = 0
+        self.sessions: set = set()
+        # Namespaces to drop once the run in progress is over
+        self.pending_drops: List[str] = []
+
+    def wait_ready(self, timeout: float):
+        if self.ready:
+            return
+        if not self.conn.poll(timeout):
+            raise ReplError(f"REPL worker did not start within {timeout:.0f}s")
+        self.conn.recv()
+        self.ready = True
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class ReplPool:
+    """Warm pool of REPL worker processes with per-session namespaces"""
+
+    def __init__(
+        self,
+        min_workers: int = 1,
+        max_workers: int = 4,
+        max_runs_per_worker: int = 50,
+        memory_limit_mb: int = 512,
+        max_sessions_per_worker: int = 32,
+        start_timeout: float = 30.0,
+    ):
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.max_runs_per_worker = max_runs_per_worker
+        self.memory_limit_mb = memory_limit_mb
+        self.max_sessions_per_worker = max_sessions_per_worker
+        self.start_timeout = start_timeout
+
+        # Spawn rather than fork: the API process has threads and open sockets
+        self._ctx = multiprocessing.get_context("spawn")
+        self._cond = threading.Condition()
+        self._workers: List[_Worker] = []
+        self._session_owner: Dict[str, _Worker] = {}
+        self._spawned = 0
+        self._closed = False
+        # Callers wait here for a worker instead of tying up the default executor
+        self._executor = ThreadPoolExecutor(max_workers=max_workers * 2, thread_name_prefix="repl")
+
+        # Metrics
+        self.runs = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.recycled = 0
+
+    def start(self):
+        """Start the warm workers ahead of the first call"""
+        with self._cond:
+            while len(self._workers) < self.min_workers and not self._closed:
+                self._spawn_locked()
+
+    def _spawn_locked(self) -> _Worker:
+        self._spawned += 1
+        worker = _Worker(self._ctx, self.memory_limit_mb, self._spawned)
+        self._workers.append(worker)
+        return worker
+
+    async def execute(
+        self,
+        code: str,
+        session_id: str = "default",
+        timeout: float = 10,
+        persist_state: bool = True,
+        on_output: Optional[Callable] = None,
+    ) -> Dict[str, Any]:
+        """
+        Run code in a worker; on_output(stream, chunk) is called on this loop
+        as stdout/stderr arrive and may be a coroutine function
+        """
+        emit = None
+        if on_output is not None:
+            loop = asyncio.get_running_loop()
+
+            def deliver(stream: str, chunk: str):
+                try:
+                    result = on_output(stream, chunk)
+                    if asyncio.iscoroutine(result):
+                        asyncio.ensure_future(result)
+                except Exception as e:
+                    logger.debug(f"REPL output callback failed: {e}")
+
+            def _emit(stream: str, chunk: str):
+                loop.call_soon_threadsafe(deliver, stream, chunk)
+
+            emit = _emit
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.run, code, session_id, timeout, persist_state, emit
+        )
+
+    def run(
+        self,
+        code: str,
+        session_id: str = "default",
+        timeout: float = 10,
+        persist_state: bool = True,
+        emit: Optional[Callable[[str, str], None]] = None,
+    ) -> Dict[str, Any]:
+        """Blocking form of execute(); emit is called from the calling thread"""
+        worker = self._acquire(session_id if persist_state else None)
+        try:
+            worker.wait_ready(self.start_timeout)
+        except (ReplError, EOFError, OSError) as e:
+            self._discard(worker)
+            return {"success": False, "error": str(e), "code": code}
+
+        output = {"stdout": [], "stderr": []}
+        started = time.monotonic()
+        deadline = started + timeout
+
+        def outcome(**extra) -> Dict[str, Any]:
+            stdout = "".join(output["stdout"])
+            stderr = "".join(output["stderr"])
+            return {
+                "success": not stderr and "error" not in extra,
+                "stdout": stdout,
+                "stderr": stderr,
+                "execution_time": round(time.monotonic() - started, 4),
+                "code": code,
+                **extra,
+            }
+
+        try:
+            worker.conn.send(("exec", session_id, code, persist_state, self.max_sessions_per_worker))
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not worker.conn.poll(remaining):
+                    self.timeouts += 1
+                    logger.warning(f"REPL run for session {session_id} exceeded {timeout}s; killing worker")
+                    self._discard(worker)
+                    extra = {"error": f"Execution timed out after {timeout}s", "timed_out": True}
+                    if persist_state:
+                        extra["state_reset"] = True
+                    return outcome(**extra)
+                kind, payload = worker.conn.recv()
+                if kind == "result":
+                    break
+                output[kind].append(payload)
+                if emit is not None:
+                    emit(kind, payload)
+        except (EOFError, OSError) as e:
+            # Usually the memory limit: the allocation killed the process outright
+            self.crashes += 1
+            logger.warning(f"REPL worker died during a run for session {session_id}: {e}")
+            self._discard(worker)
+            extra = {"error": "Execution crashed the interpreter (memory limit exceeded?)"}
+            if persist_state:
+                extra["state_reset"] = True
+            return outcome(**extra)
+
+        self.runs += 1
+        worker.runs += 1
+        payload.pop("errored", None)
+        self._release(worker)
+        return outcome(**payload)
+
+    def _acquire(self, session_id: Optional[str]) -> _Worker:
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise ReplError("REPL pool is closed")
+                owner = self._session_owner.get(session_id) if session_id else None
+                if owner is not None:
+                    # State lives in that worker; wait for it
+                    if not owner.busy:
+                        owner.busy = True
+                        return owner
+                else:
+                    # Sessions sharing a worker share its fate on a timeout,
+                    # so spread them out before doubling up
+                    idle = [w for w in self._workers if not w.busy]
+                    empty = [w for w in idle if not w.sessions]
+                    if empty:
+                        worker = empty[0]
+                    elif len(self._workers) < self.max_workers:
+                        worker = self._spawn_locked()
+                    elif idle:
+                        worker = min(idle, key=lambda w: len(w.sessions))
+                    else:
+                        worker = None
+                    if worker is not None:
+                        worker.busy = True
+                        if session_id:
+                            self._session_owner[session_id] = worker
+                            worker.sessions.add(session_id)
+                        return worker
+                self._cond.wait()
+
+    def _release(self, worker: _Worker):
+        with self._cond:
+            drops, worker.pending_drops = worker.pending_drops, []
+        if drops:
+            try:
+                worker.conn.send(("drop", drops))
+            except (EOFError, OSError):
+                pass
+        if worker.runs >= self.max_runs_per_worker:
+            # Stays busy until its replacement has taken over
+            threading.Thread(target=self._recycle, args=(worker,), name="repl-recycle", daemon=True).start()
+            return
+        with self._cond:
+            worker.busy = False
+            self._cond.notify_all()
+
+    def _recycle(self, worker: _Worker):
+        state = None
+        try:
+            worker.conn.send(("export",))
+            if worker.conn.poll(self.start_timeout):
+                kind, state = worker.conn.recv()
+        except (EOFError, OSError):
+            state = None
+        worker.kill()
+        with self._cond:
+            self._spawned += 1
+            replacement = _Worker(self._ctx, self.memory_limit_mb, self._spawned)
+            # Sessions dropped while the worker was busy don't carry over
+            state = {sid: ns for sid, ns in (state or {}).items() if sid in worker.sessions}
+            if state:
+                replacement.conn.send(("import", state))
+            self._workers[self._workers.index(worker)] = replacement
+            replacement.sessions = worker.sessions
+            for session_id in worker.sessions:
+                self._session_owner[session_id] = replacement
+            self.recycled += 1
+            self._cond.notify_all()
+        logger.info(f"Recycled REPL worker after {worker.runs} runs")
+
+    def _discard(self, worker: _Worker):
+        """Kill a worker whose state can't be trusted and forget its sessions"""
+        worker.kill()
+        with self._cond:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            for session_id in worker.sessions:
+                if self._session_owner.get(session_id) is worker:
+                    del self._session_owner[session_id]
+            if not self._closed:
+                while len(self._workers) < self.min_workers:
+                    self._spawn_locked()
+            self._cond.notify_all()
+
+    def drop_sessions(self, prefix: str) -> int:
+        """
+        Forget every session whose id starts with prefix, e.g. the
+        "<execution_id>:" namespaces of a finished execution; returns how many
+        """
+        with self._cond:
+            dropped = [sid for sid in self._session_owner if sid.startswith(prefix)]
+            for session_id in dropped:
+                worker = self._session_owner.pop(session_id)
+                worker.sessions.discard(session_id)
+                if worker.busy:
+                    # Its pipe belongs to the running call; sent on release
+                    worker.pending_drops.append(session_id)
+                else:
+                    try:
+                        worker.conn.send(("drop", [session_id]))
+                    except (EOFError, OSError):
+                        pass
+        return len(dropped)
+
+    def close(self):
+        """Stop every worker; running calls fail"""
+        with self._cond:
+            self._closed = True
+            workers = list(self._workers)
+            self._workers.clear()
+            self._session_owner.clear()
+            self._cond.notify_all()
+        for worker in workers:
+            try:
+                worker.conn.send(("stop",))
+            except (EOFError, OSError):
+                pass
+            worker.process.join(timeout=1)
+            worker.kill()
+        self._executor.shutdown(wait=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "workers": len(self._workers),
+                "busy_workers": sum(1 for w in self._workers if w.busy),
+                "min_workers": self.min_workers,
+                "max_workers": self.max_workers,
+                "sessions": len(self._session_owner),
+                "runs": self.runs,
+                "timeouts": self.timeouts,
+                "crashes": self.crashes,
+                "recycled": self.recycled,
+            }
+
+
+_repl_pool: Optional[ReplPool] = None
+_repl_pool_lock = threading.Lock()
+
+
+def get_repl_pool() -> ReplPool:
+    """Get or create the process-wide REPL pool"""
+    global _repl_pool
+    with _repl_pool_lock:
+        if _repl_pool is None:
+            from app.core.config import settings
+            _repl_pool = ReplPool(
+                min_workers=settings.REPL_MIN_WORKERS,
+                max_workers=settings.REPL_MAX_WORKERS,
+                max_runs_per_worker=settings.REPL_MAX_RUNS_PER_WORKER,
+                memory_limit_mb=settings.REPL_MEMORY_LIMIT_MB,
+            )
+        return _repl_pool
+
+
+def shutdown_repl_pool():
+    """Stop the pool's workers if it was started"""
+    global _repl_pool
+    with _repl_pool_lock:
+        if _repl_pool is not None:
+            _repl_pool.close()
+            _repl_pool = None
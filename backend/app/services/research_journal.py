@@ -0,0 +1,332 @@
+"""
+Change journal for research sessions
+
+Research sessions are plain dicts mutated from the research thread. Wrapping
+them in JournaledSession makes each mutation of a snapshot field append a
+sequence-numbered delta (JSON Patch style, plus an "append" op for string
+growth) and wake any waiting SSE generators, so streams can send just the
+changes instead of re-serializing the whole session on a timer.
+
+Step dicts are often updated through local aliases (step['status'] = ...),
+which a wrapper cannot see. JournaledSession.refresh() compares steps with
+their last journaled state and records the differences; stream generators
+call it before reading deltas.
+"""
+import asyncio
+import itertools
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Fields sent in snapshots and covered by deltas
+SNAPSHOT_FIELDS = (
+    'status', 'progress', 'steps', 'content', 'sources', 'sources_all',
+    'thoughts', 'timestamp', 'error',
+)
+# Snapshot list fields whose appends become "add" deltas
+LIST_FIELDS = ('steps', 'sources', 'sources_all', 'thoughts')
+# Lists outside the snapshot whose changes only wake waiters
+WAKE_FIELDS = ('events',)
+
+
+class ChangeJournal:
+    """Bounded, sequence-numbered delta log with cross-thread wakeups"""
+
+    def __init__(self, max_deltas: int = 2000):
+        # Held while mutating the session and recording, and while taking a
+        # snapshot, so a snapshot's cursor matches its contents exactly
+        self.lock = threading.RLock()
+        self.seq = 0
+        self.version = 0  # bumps on every delta and on wake-only changes
+        self._base_seq = 0  # seq of the newest delta dropped from the log
+        self._deltas: deque = deque(maxlen=max_deltas)
+        self._waiters: set = set()
+        self._waiters_lock = threading.Lock()
+
+    def record(self, op: str, path: str, value: Any = None):
+        """Append a delta; caller holds self.lock"""
+        self.seq += 1
+        delta = {'seq': self.seq, 'op': op, 'path': path}
+        if op != 'remove':
+            delta['value'] = value
+        if len(self._deltas) == self._deltas.maxlen:
+            self._base_seq = self._deltas[0]['seq']
+        self._deltas.append(delta)
+        self.touch()
+
+    def touch(self):
+        """Wake waiters for a change that carries no delta"""
+        self.version += 1
+        with self._waiters_lock:
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Loop already closed; its generator is gone
+                with self._waiters_lock:
+                    self._waiters.discard((loop, event))
+
+    def since(self, cursor: int) -> Optional[List[Dict[str, Any]]]:
+        """Deltas after cursor, or None when the cursor can't be served (take a snapshot)"""
+        with self.lock:
+            if cursor < self._base_seq or cursor > self.seq:
+                return None
+            return list(itertools.islice(self._deltas, cursor - self._base_seq, None))
+
+    async def wait(self, version: int, timeout: float) -> bool:
+        """Wait until version moves past the given one; returns False on timeout"""
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self._waiters_lock:
+            self._waiters.add(waiter)
+        try:
+            # Checked after registering so a change in between is not missed
+            if self.version != version:
+                return True
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._waiters_lock:
+                self._waiters.discard(waiter)
+
+
+class JournaledList(list):
+    """List field of a JournaledSession; mutations become deltas"""
+
+    def __init__(self, items, journal: ChangeJournal, field: str, track: bool = True):
+        super().__init__(items)
+        self._journal = journal
+        self._path = f"/{field}"
+        self._track = track
+        # Last journaled copy of each step, for refresh()
+        self._shadow: Optional[List[Dict[str, Any]]] = (
+            [dict(item) if isinstance(item, dict) else item for item in self] if field == 'steps' else None
+        )
+
+    def _added(self, index: Any, item: Any):
+        if self._shadow is not None:
+            entry = dict(item) if isinstance(item, dict) else item
+            if index == '-':
+                self._shadow.append(entry)
+            else:
+                self._shadow.insert(index, entry)
+        if self._track:
+            # Copy dicts so later in-place edits don't race the serializer
+            self._journal.record('add', f"{self._path}/{index}", dict(item) if isinstance(item, dict) else item)
+        else:
+            self._journal.touch()
+
+    def _replaced(self):
+        """Fallback for mutations without a cheap delta: resend the whole list"""
+        if self._shadow is not None:
+            self._shadow = [dict(item) if isinstance(item, dict) else item for item in self]
+        if self._track:
+            self._journal.record('replace', self._path, list(self))
+        else:
+            self._journal.touch()
+
+    def append(self, item):
+        with self._journal.lock:
+            super().append(item)
+            self._added('-', item)
+
+    def extend(self, items):
+        with self._journal.lock:
+            for item in items:
+                super().append(item)
+                self._added('-', item)
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def insert(self, index, item):
+        with self._journal.lock:
+            # Normalise to the position the item actually lands at
+            size = len(self)
+            position = max(size + index, 0) if index < 0 else min(index, size)
+            super().insert(index, item)
+            self._added(position, item)
+
+    def __setitem__(self, index, value):
+        with self._journal.lock:
+            super().__setitem__(index, value)
+            if isinstance(index, int):
+                position = index % len(self)
+                if self._shadow is not None:
+                    self._shadow[position] = dict(value) if isinstance(value, dict) else value
+                if self._track:
+                    self._journal.record('replace', f"{self._path}/{position}", dict(value) if isinstance(value, dict) else value)
+                else:
+                    self._journal.touch()
+            else:
+                self._replaced()
+
+    def _mutator(name):
+        def method(self, *args, **kwargs):
+            with self._journal.lock:
+                result = getattr(super(JournaledList, self), name)(*args, **kwargs)
+                self._replaced()
+                return result
+        method.__name__ = name
+        return method
+
+    pop = _mutator('pop')
+    remove = _mutator('remove')
+    clear = _mutator('clear')
+    sort = _mutator('sort')
+    reverse = _mutator('reverse')
+    __delitem__ = _mutator('__delitem__')
+    del _mutator
+
+    def refresh(self):
+        """Record field-level deltas for steps changed through aliases; caller holds the lock"""
+        if self._shadow is None:
+            return
+        for i, item in enumerate(self):
+            if not isinstance(item, dict):
+                continue
+            old = self._shadow[i] if i < len(self._shadow) else None
+            if old == item:
+                continue
+            if not isinstance(old, dict):
+                self._journal.record('replace', f"{self._path}/{i}", dict(item))
+            else:
+                for key, value in item.items():
+                    if key not in old:
+                        # JSON Patch replace requires the target to exist
+                        self._journal.record('add', f"{self._path}/{i}/{key}", value)
+                    elif old[key] != value:
+                        self._journal.record('replace', f"{self._path}/{i}/{key}", value)
+                for key in old.keys() - item.keys():
+                    self._journal.record('remove', f"{self._path}/{i}/{key}")
+            self._shadow[i] = dict(item)
+
+
+class JournaledSession(dict):
+    """Research session dict that journals changes to its snapshot fields"""
+
+    def __init__(self, data: Dict[str, Any], journal: Optional[ChangeJournal] = None):
+        super().__init__()
+        self.journal = journal or ChangeJournal()
+        for key, value in data.items():
+            super().__setitem__(key, self._wrap(key, value))
+
+    def _wrap(self, key: str, value: Any) -> Any:
+        if isinstance(value, JournaledList) and value._journal is self.journal:
+            return value
+        if isinstance(value, list) and (key in LIST_FIELDS or key in WAKE_FIELDS):
+            return JournaledList(value, self.journal, key, track=key in LIST_FIELDS)
+        return value
+
+    def __setitem__(self, key, value):
+        with self.journal.lock:
+            old = self.get(key)
+            if value is old:
+                return
+            value = self._wrap(key, value)
+            super().__setitem__(key, value)
+            if key not in SNAPSHOT_FIELDS:
+                self.journal.touch()
+            elif key == 'content' and isinstance(value, str) and isinstance(old, str) and value.startswith(old):
+                if len(value) > len(old):
+                    self.journal.record('append', '/content', value[len(old):])
+            elif value != old:
+                self.journal.record('replace', f"/{key}", list(value) if isinstance(value, list) else value)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __delitem__(self, key):
+        with self.journal.lock:
+            super().__delitem__(key)
+            if key in SNAPSHOT_FIELDS:
+                self.journal.record('remove', f"/{key}")
+            else:
+                self.journal.touch()
+
+    def refresh(self):
+        """Journal changes made to steps through aliases"""
+        steps = self.get('steps')
+        if isinstance(steps, JournaledList):
+            with self.journal.lock:
+                steps.refresh()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Snapshot fields plus the cursor they correspond to"""
+        with self.journal.lock:
+            self.refresh()
+            data = {}
+            for key in SNAPSHOT_FIELDS:
+                value = self.get(key)
+                if isinstance(value, list):
+                    value = [dict(item) if isinstance(item, dict) else item for item in value]
+                data[key] = value
+            return {'cursor': self.journal.seq, 'data': data}
+
+
+class ResearchSessionRegistry(dict):
+    """
+    session_id -> JournaledSession; plain dicts are wrapped on assignment
+
+    Sessions are added from request handlers and read from research worker
+    threads, so structural changes and pruning go through one lock.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.RLock()
+
+    def __delitem__(self, session_id):
+        with self._lock:
+            super().__delitem__(session_id)
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+
+    def prune(self, max_sessions: int, is_idle) -> List[str]:
+        """Drop the oldest idle sessions until at most max_sessions remain"""
+        removed = []
+        with self._lock:
+            excess = len(self) - max_sessions
+            if excess <= 0:
+                return removed
+            for session_id, session in list(self.items()):
+                if len(removed) >= excess:
+                    break
+                if is_idle(session_id, session):
+                    super().__delitem__(session_id)
+                    removed.append(session_id)
+        if removed:
+            logger.info(f"Pruned {len(removed)} idle research sessions")
+        return removed
+
+    def __setitem__(self, session_id, session):
+        with self._lock:
+            self._set(session_id, session)
+
+    def _set(self, session_id, session):
+        if not isinstance(session, JournaledSession):
+            previous = self.get(session_id)
+            # Keep the journal so open streams see the replacement as deltas
+            journal = previous.journal if isinstance(previous, JournaledSession) else None
+            session = JournaledSession(session, journal)
+            if journal is not None:
+                with journal.lock:
+                    for key in SNAPSHOT_FIELDS:
+                        value = session.get(key)
+                        journal.record('replace', f"/{key}", list(value) if isinstance(value, list) else value)
+        super().__setitem__(session_id, session)
@@ -0,0 +1,369 @@
+"""
+Research job scheduler
+
+Runs research jobs on a bounded pool of worker threads. Each worker owns one
+long-lived event loop, so a job costs neither a new thread nor a new loop.
+
+Queued jobs are ordered by priority (lower runs first) and then fairly across
+users: among equal priorities the user with the fewest running jobs, then the
+one served least recently, goes first, so one user's burst cannot starve
+everybody else. Admission control
+rejects submissions beyond the queue limits, and callers can ask for a
+job's queue position while it waits.
+"""
+import asyncio
+import itertools
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10
+
+
+class AdmissionError(Exception):
+    """Raised when a job is refused because the queue limits are reached"""
+
+
+@dataclass
+class ResearchJob:
+    """A queued or running research job"""
+    job_id: str
+    session_id: str
+    user_id: str
+    priority: int
+    run: Callable[[], Awaitable[Any]]
+    seq: int
+    status: str = QUEUED
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "session_id": self.session_id,
+            "user_id": self.user_id,
+            "priority": self.priority,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class ResearchScheduler:
+    """Bounded worker pool with per-user fair, priority-ordered queues"""
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_queue: int = 50,
+        max_queued_per_user: int = 5,
+        max_running_per_user: int = 2,
+        history_size: int = 200,
+    ):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_queued_per_user = max_queued_per_user
+        self.max_running_per_user = max_running_per_user
+
+        self._cond = threading.Condition()
+        self._queues: "OrderedDict[str, Deque[ResearchJob]]" = OrderedDict()  # user -> FIFO
+        self._running_by_user: Dict[str, int] = {}
+        # Dispatch counter value at each user's last dispatch, for round-robin
+        self._last_served: Dict[str, int] = {}
+        self._dispatches = itertools.count()
+        self._jobs: Dict[str, ResearchJob] = {}  # queued and running
+        self._seq = itertools.count()
+        self._workers: List[threading.Thread] = []
+        self._busy = 0
+        self._shutdown = False
+
+        # Metrics
+        self._started_at = time.time()
+        self._busy_seconds = 0.0
+        self._run_times: Deque[float] = deque(maxlen=history_size)
+        self._wait_times: Deque[float] = deque(maxlen=history_size)
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.cancelled = 0
+
+    # ------------------------------------------------------------------
+    # Submission
+    # ------------------------------------------------------------------
+
+    def admission_error(self, user_id: str) -> Optional[str]:
+        """Why a job for user_id would be refused right now, or None"""
+        with self._cond:
+            return self._admission_error_locked(user_id)
+
+    def _admission_error_locked(self, user_id: str) -> Optional[str]:
+        if self._shutdown:
+            return "Research scheduler is shutting down"
+        depth = sum(len(q) for q in self._queues.values())
+        if depth >= self.max_queue:
+            return f"Research queue is full ({depth} jobs waiting)"
+        if len(self._queues.get(user_id, ())) >= self.max_queued_per_user:
+            return f"Too many queued research jobs for this user (limit {self.max_queued_per_user})"
+        return None
+
+    def submit(
+        self,
+        session_id: str,
+        run: Callable[[], Awaitable[Any]],
+        user_id: str = "anonymous",
+        priority: int = PRIORITY_NORMAL,
+    ) -> ResearchJob:
+        """Queue a coroutine factory; raises AdmissionError when over the limits"""
+        with self._cond:
+            reason = self._admission_error_locked(user_id)
+            if reason:
+                self.rejected += 1
+                raise AdmissionError(reason)
+            job = ResearchJob(
+                job_id=str(uuid.uuid4()),
+                session_id=session_id,
+                user_id=user_id,
+                priority=priority,
+                run=run,
+                seq=next(self._seq),
+            )
+            queue = self._queues.setdefault(user_id, deque())
+            # Keep each user's queue ordered by priority, FIFO within a priority
+            position = next((i for i, queued in enumerate(queue) if queued.priority > priority), len(queue))
+            queue.insert(position, job)
+            self._jobs[job.job_id] = job
+            self.submitted += 1
+            self._ensure_workers()
+            self._cond.notify()
+        logger.info(f"Queued research job {job.job_id} for session {session_id} (user={user_id}, priority={priority})")
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop a job that has not started yet"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return False
+            self._queues[job.user_id].remove(job)
+            if not self._queues[job.user_id]:
+                del self._queues[job.user_id]
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            del self._jobs[job_id]
+            self.cancelled += 1
+            return True
+
+    def job_for_session(self, session_id: str) -> Optional[ResearchJob]:
+        """Most recent queued or running job for a session"""
+        with self._cond:
+            matches = [job for job in self._jobs.values() if job.session_id == session_id]
+            return max(matches, key=lambda job: job.seq) if matches else None
+
+    def position(self, job_id: str) -> Optional[int]:
+        """
+        1-based estimate of where a queued job stands, or None if not queued
+
+        Follows the dispatch order: priority first, then round-robin over
+        users (a job's rank within its user's queue), then submission order.
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return None
+            order = sorted(
+                (
+                    (queued.priority, rank, queued.seq)
+                    for queue in self._queues.values()
+                    for rank, queued in enumerate(queue)
+                )
+            )
+            rank = self._queues[job.user_id].index(job)
+            return order.index((job.priority, rank, job.seq)) + 1
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def _ensure_workers(self):
+        """Start another worker if queued work outnumbers idle ones; caller holds _cond"""
+        alive = [t for t in self._workers if t.is_alive()]
+        self._workers = alive
+        queued = sum(len(q) for q in self._queues.values())
+        if len(alive) < self.max_workers and self._busy + queued > len(alive):
+            worker = threading.Thread(
+                target=self._worker_loop,
+                name=f"research-worker-{len(alive) + 1}",
+                daemon=True,
+            )
+            self._workers.append(worker)
+            worker.start()
+
+    def _next_job_locked(self) -> Optional[ResearchJob]:
+        best_user = None
+        best_key = None
+        for user_id, queue in self._queues.items():
+            running = self._running_by_user.get(user_id, 0)
+            if running >= self.max_running_per_user:
+                continue
+            head = queue[0]
+            key = (head.priority, running, self._last_served.get(user_id, -1), head.seq)
+            if best_key is None or key < best_key:
+                best_user, best_key = user_id, key
+        if best_user is None:
+            return None
+        queue = self._queues[best_user]
+        job = queue.popleft()
+        if not queue:
+            del self._queues[best_user]
+        self._last_served[best_user] = next(self._dispatches)
+        return job
+
+    def _worker_loop(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            while True:
+                with self._cond:
+                    job = self._next_job_locked()
+                    while job is None and not self._shutdown:
+                        self._cond.wait()
+                        job = self._next_job_locked()
+                    if job is None:
+                        return
+                    job.status = RUNNING
+                    job.started_at = time.time()
+                    self._wait_times.append(job.started_at - job.submitted_at)
+                    self._running_by_user[job.user_id] = self._running_by_user.get(job.user_id, 0) + 1
+                    self._busy += 1
+                self._run(loop, job)
+        finally:
+            loop.close()
+
+    def _run(self, loop: asyncio.AbstractEventLoop, job: ResearchJob):
+        try:
+            loop.run_until_complete(job.run())
+            job.status = DONE
+        except asyncio.CancelledError:
+            logger.info(f"Research job {job.job_id} was cancelled while running")
+            job.status = CANCELLED
+        except BaseException as e:
+            # Includes KeyboardInterrupt/SystemExit raised inside a job: the job
+            # fails, the worker thread lives on
+            logger.error(f"Research job {job.job_id} failed: {e!r}", exc_info=True)
+            job.status = FAILED
+            job.error = str(e) or type(e).__name__
+        finally:
+            self._cancel_leftovers(loop)
+            job.finished_at = time.time()
+            run_time = job.finished_at - job.started_at
+            with self._cond:
+                self._busy -= 1
+                self._busy_seconds += run_time
+                self._run_times.append(run_time)
+                if job.status == DONE:
+                    self.completed += 1
+                elif job.status == CANCELLED:
+                    self.cancelled += 1
+                else:
+                    self.failed += 1
+                running = self._running_by_user.get(job.user_id, 1) - 1
+                if running > 0:
+                    self._running_by_user[job.user_id] = running
+                else:
+                    self._running_by_user.pop(job.user_id, None)
+                    if job.user_id not in self._queues:
+                        self._last_served.pop(job.user_id, None)
+                self._jobs.pop(job.job_id, None)
+                # This user may have been capped; let another worker look again
+                self._cond.notify_all()
+            logger.info(f"Research job {job.job_id} {job.status} in {run_time:.1f}s")
+
+    @staticmethod
+    def _cancel_leftovers(loop: asyncio.AbstractEventLoop):
+        """Cancel tasks a job left behind so they don't leak into the next job"""
+        pending = [task for task in asyncio.all_tasks(loop) if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+
+    def shutdown(self, wait: bool = False):
+        """Stop accepting jobs; workers exit once the queue is drained"""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+            workers = list(self._workers)
+        if wait:
+            for worker in workers:
+                worker.join()
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            run_times = sorted(self._run_times)
+            wait_times = list(self._wait_times)
+            elapsed = max(time.time() - self._started_at, 1e-6)
+            # Include the part of running jobs done so far
+            now = time.time()
+            busy_seconds = self._busy_seconds + sum(
+                now - job.started_at for job in self._jobs.values() if job.status == RUNNING
+            )
+            return {
+                "workers": len(self._workers),
+                "max_workers": self.max_workers,
+                "busy_workers": self._busy,
+                "utilization": round(busy_seconds / (elapsed * self.max_workers), 3),
+                "queue_depth": sum(len(q) for q in self._queues.values()),
+                "queued_by_user": {user: len(q) for user, q in self._queues.items()},
+                "running_by_user": dict(self._running_by_user),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "cancelled": self.cancelled,
+                "avg_run_seconds": round(sum(run_times) / len(run_times), 2) if run_times else 0.0,
+                "p95_run_seconds": round(run_times[min(len(run_times) - 1, int(len(run_times) * 0.95))], 2) if run_times else 0.0,
+                "avg_wait_seconds": round(sum(wait_times) / len(wait_times), 2) if wait_times else 0.0,
+            }
+
+
+_scheduler: Optional[ResearchScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_research_scheduler() -> ResearchScheduler:
+    """Get or create the process-wide research scheduler"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            from app.core.config import settings
+            _scheduler = ResearchScheduler(
+                max_workers=settings.RESEARCH_MAX_WORKERS,
+                max_queue=settings.RESEARCH_MAX_QUEUE,
+                max_queued_per_user=settings.RESEARCH_MAX_QUEUED_PER_USER,
+                max_running_per_user=settings.RESEARCH_MAX_RUNNING_PER_USER,
+            )
+        return _scheduler
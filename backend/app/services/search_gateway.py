@@ -1,155 +1,372 @@
 """
-SearchGateway: centralized search provider with cache, simple rate limits, and backoff
-Phase 1: in-memory cache + basic global/session limits. Can swap to Redis later.
+SearchGateway: centralized search provider with cache, rate limits, and request coalescing
+
+All provider calls run on one gateway event loop (a daemon thread), so
+identical queries from parallel agents - whichever thread or loop they come
+from - share a single in-flight request. Lookups go L1 (in-process LRU) then
+L2 (Redis, when REDIS_URL is set) before calling Tavily. Entries past their
+TTL are still served for a grace period while one background refresh runs
+(stale-while-revalidate). A token bucket paces provider calls; a 429 drains
+it and pauses for the provider's Retry-After.
 """
 from __future__ import annotations
-import os
-import time
-import threading
-from typing import Dict, Any, Tuple, Optional
-import requests
+import asyncio
+import copy
 import hashlib
 import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import aiohttp
+
 try:
-    import redis
+    import redis.asyncio as aioredis
 except Exception:  # redis is optional; fallback to memory
-    redis = None
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+TAVILY_SEARCH_URL = "https://api.tavily.com/search"
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Cache key form of a query: case-folded with whitespace collapsed"""
+    return _WHITESPACE.sub(" ", (query or "").strip()).casefold()
+
+
+class TokenBucket:
+    """Token bucket for pacing provider calls; used only from the gateway loop"""
+
+    def __init__(self, rate_per_minute: int, burst: Optional[int] = None):
+        self.rate = max(rate_per_minute, 1) / 60.0
+        self.capacity = float(burst or max(1, min(rate_per_minute, 20)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available (0 when one is available now)"""
+        now = time.monotonic()
+        self._refill(now)
+        pause = max(self.paused_until - now, 0.0)
+        if self.tokens >= 1:
+            return pause
+        return max(pause, (1 - self.tokens) / self.rate)
+
+    async def acquire(self, max_wait: float) -> bool:
+        """Take a token, waiting up to max_wait seconds; False if that is not enough"""
+        while True:
+            wait = self.wait_time()
+            if wait <= 0:
+                self.tokens -= 1
+                return True
+            if wait > max_wait:
+                return False
+            await asyncio.sleep(wait)
+            max_wait -= wait
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for a while, e.g. after a 429"""
+        self.tokens = 0.0
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
 
 
 class _SearchGateway:
     def __init__(self) -> None:
-        self._lock = threading.RLock()
-        self._cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
-        self._global_calls: int = 0
-        self._last_429_ts: float = 0.0
-        self._redis: Optional["redis.Redis"] = None
-        self._init_redis()
-
-    def _init_redis(self):
-        url = os.getenv("REDIS_URL")
-        if url and redis is not None:
-            try:
-                self._redis = redis.Redis.from_url(url, decode_responses=True)
-                # simple ping to validate
-                self._redis.ping()
-            except Exception:
-                self._redis = None
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()  # key -> (fetched_at, data)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._http: Optional[aiohttp.ClientSession] = None
+        self._redis = None
+        self._bucket: Optional[TokenBucket] = None
+
+        # Counters
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.provider_calls = 0
+        self.provider_errors = 0
+        self.rate_limited = 0
+        self._latencies: Deque[float] = deque(maxlen=500)
 
     # Config
     @property
     def cache_ttl(self) -> int:
         return int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300"))
 
+    @property
+    def stale_ttl(self) -> int:
+        """How long past cache_ttl an entry may still be served while it refreshes"""
+        return int(os.getenv("SEARCH_STALE_TTL_SECONDS", "600"))
+
+    @property
+    def l1_max_entries(self) -> int:
+        return int(os.getenv("SEARCH_L1_MAX_ENTRIES", "1024"))
+
     @property
     def max_calls_per_minute(self) -> int:
         return int(os.getenv("SEARCH_MAX_CALLS_PER_MINUTE", "600"))
 
+    @property
+    def max_rate_wait(self) -> float:
+        """Longest a caller waits for a rate-limit token before getting an error"""
+        return float(os.getenv("SEARCH_MAX_RATE_WAIT_SECONDS", "5"))
+
     @property
     def backoff_seconds(self) -> int:
+        """Pause after a 429 when the provider sends no Retry-After"""
         return int(os.getenv("TAVILY_BACKOFF_SECONDS", "20"))
 
-    def _hash_key(self, provider: str, query: str) -> str:
-        h = hashlib.sha256(f"{provider}|{query}".encode()).hexdigest()
-        return h
+    def _hash_key(self, provider: str, query: str, **params: Any) -> str:
+        extra = "|".join(f"{k}={params[k]}" for k in sorted(params))
+        return hashlib.sha256(f"{provider}|{normalize_query(query)}|{extra}".encode()).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Gateway loop
+    # ------------------------------------------------------------------
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
 
-    def _check_rate_limit(self) -> bool:
-        # Basic global backoff if we recently saw a 429
-        now = time.time()
-        if self._redis is not None:
+                def _run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._loop_thread = threading.Thread(target=_run, name="search-gateway", daemon=True)
+                self._loop_thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def _on_gateway_loop(self) -> bool:
+        return threading.current_thread() is self._loop_thread
+
+    async def _init_clients(self):
+        """Create the HTTP pool, Redis client and bucket on the gateway loop"""
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=30),
+                headers={"Content-Type": "application/json"},
+            )
+        if self._bucket is None:
+            self._bucket = TokenBucket(self.max_calls_per_minute)
+        if self._redis is None and aioredis is not None and os.getenv("REDIS_URL"):
             try:
-                ts = self._redis.get("search:last_429_ts")
-                if ts is not None:
-                    last = float(ts)
-                    if (now - last) < self.backoff_seconds:
-                        return False
+                client = aioredis.Redis.from_url(os.getenv("REDIS_URL"), decode_responses=True)
+                await client.ping()
+                self._redis = client
             except Exception:
-                pass
+                self._redis = False  # don't retry on every call
+        return self._http
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def search(self, query: str, search_depth: str = "basic", max_results: int = 5) -> Dict[str, Any]:
+        """Blocking search for sync callers (Strands tools run in worker threads)"""
+        if self._on_gateway_loop():
+            raise RuntimeError("search() would deadlock on the gateway loop; await asearch() instead")
+        future = asyncio.run_coroutine_threadsafe(
+            self._search(query, search_depth, max_results), self._ensure_loop()
+        )
+        return future.result()
+
+    async def asearch(self, query: str, search_depth: str = "basic", max_results: int = 5) -> Dict[str, Any]:
+        """Search from any event loop without blocking it"""
+        if self._on_gateway_loop():
+            return await self._search(query, search_depth, max_results)
+        future = asyncio.run_coroutine_threadsafe(
+            self._search(query, search_depth, max_results), self._ensure_loop()
+        )
+        return await asyncio.wrap_future(future)
+
+    def get_stats(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+        lookups = self.l1_hits + self.l2_hits + self.stale_hits + self.misses
+        return {
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round((lookups - self.misses) / lookups, 3) if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "provider_calls": self.provider_calls,
+            "provider_errors": self.provider_errors,
+            "rate_limited": self.rate_limited,
+            "inflight": len(self._inflight),
+            "l1_entries": len(self._cache),
+            "l2": bool(self._redis),
+            "avg_latency_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+            "p95_latency_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1) if latencies else 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # Everything below runs on the gateway loop
+    # ------------------------------------------------------------------
+
+    async def _search(self, query: str, search_depth: str, max_results: int) -> Dict[str, Any]:
+        # Cached and coalesced results are shared; each caller gets its own copy to modify
+        return copy.deepcopy(await self._lookup(query, search_depth, max_results))
+
+    async def _lookup(self, query: str, search_depth: str, max_results: int) -> Dict[str, Any]:
+        await self._init_clients()
+        key = self._hash_key("tavily", query, depth=search_depth, n=max_results)
+
+        entry = self._l1_get(key)
+        source = "l1"
+        if entry is None:
+            entry = await self._l2_get(key)
+            source = "l2"
+        if entry is not None:
+            fetched_at, data = entry
+            age = time.time() - fetched_at
+            if age < self.cache_ttl:
+                if source == "l1":
+                    self.l1_hits += 1
+                else:
+                    self.l2_hits += 1
+                    self._l1_put(key, fetched_at, data)
+                return data
+            if age < self.cache_ttl + self.stale_ttl:
+                self.stale_hits += 1
+                # Serve stale now, refresh once in the background
+                if key not in self._inflight:
+                    self._start_fetch(key, query, search_depth, max_results)
+                return data
+
+        self.misses += 1
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
         else:
-            if self._last_429_ts and (now - self._last_429_ts) < self.backoff_seconds:
-                return False
-        return True
-
-    def search(self, query: str) -> Dict[str, Any]:
-        provider = "tavily"
-        key = self._hash_key(provider, query)
-        now = time.time()
-        with self._lock:
-            # Cache hit (redis preferred)
-            if self._redis is not None:
-                try:
-                    cached = self._redis.get(f"search:cache:{key}")
-                    if cached:
-                        return json.loads(cached)
-                except Exception:
-                    pass
-            else:
-                if key in self._cache:
-                    ts, data = self._cache[key]
-                    if now - ts < self.cache_ttl:
-                        return data
-
-            # Global backoff
-            if not self._check_rate_limit():
-                wait_left = self.backoff_seconds
-                if self._redis is None and self._last_429_ts:
-                    wait_left = int(self.backoff_seconds - (now - self._last_429_ts))
-                return {
-                    "answer": None,
-                    "results": [],
-                    "error": f"rate_limited_wait_{max(wait_left,0)}"
-                }
-
-        # Call Tavily
+            future = self._start_fetch(key, query, search_depth, max_results)
+        return await asyncio.shield(future)
+
+    def _start_fetch(self, key: str, query: str, search_depth: str, max_results: int) -> asyncio.Future:
+        future = asyncio.ensure_future(self._fetch(query, search_depth, max_results))
+        self._inflight[key] = future
+
+        def _done(fut: asyncio.Future):
+            self._inflight.pop(key, None)
+            if fut.cancelled() or fut.exception() is not None:
+                return
+            out = fut.result()
+            if out.get("error") is None:
+                fetched_at = time.time()
+                self._l1_put(key, fetched_at, out)
+                asyncio.ensure_future(self._l2_put(key, fetched_at, out))
+
+        future.add_done_callback(_done)
+        return future
+
+    def _l1_get(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        entry = self._cache.get(key)
+        if entry is not None:
+            self._cache.move_to_end(key)
+        return entry
+
+    def _l1_put(self, key: str, fetched_at: float, data: Dict[str, Any]):
+        self._cache[key] = (fetched_at, data)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.l1_max_entries:
+            self._cache.popitem(last=False)
+
+    async def _l2_get(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        if not self._redis:
+            return None
+        try:
+            cached = await self._redis.get(f"search:cache:{key}")
+            if not cached:
+                return None
+            payload = json.loads(cached)
+            if "data" in payload and "fetched_at" in payload:
+                return payload["fetched_at"], payload["data"]
+            # Entry written before fetch times were stored; its TTL kept it fresh
+            return time.time(), payload
+        except Exception:
+            return None
+
+    async def _l2_put(self, key: str, fetched_at: float, data: Dict[str, Any]):
+        if not self._redis:
+            return
+        try:
+            await self._redis.setex(
+                f"search:cache:{key}",
+                self.cache_ttl + self.stale_ttl,
+                json.dumps({"fetched_at": fetched_at, "data": data}),
+            )
+        except Exception:
+            pass
+
+    async def _fetch(self, query: str, search_depth: str, max_results: int) -> Dict[str, Any]:
+        """One provider call; never raises"""
         api_key = os.getenv("TAVILY_API_KEY")
         if not api_key:
             return {"answer": None, "results": [], "error": "missing_api_key"}
 
+        if not await self._bucket.acquire(self.max_rate_wait):
+            self.rate_limited += 1
+            wait_left = int(self._bucket.wait_time()) + 1
+            return {"answer": None, "results": [], "error": f"rate_limited_wait_{wait_left}"}
+
+        self.provider_calls += 1
+        started = time.monotonic()
         try:
-            resp = requests.post(
-                "https://api.tavily.com/search",
+            async with self._http.post(
+                TAVILY_SEARCH_URL,
                 json={
                     "api_key": api_key,
                     "query": query,
-                    "search_depth": "basic",
-                    "max_results": 5,
+                    "search_depth": search_depth,
+                    "max_results": max_results,
                     "include_answer": True,
                     "include_raw_content": False,
-                "include_images": True,
+                    "include_images": True,
                 },
-                headers={"Content-Type": "application/json"},
-                timeout=30,
-            )
-            if resp.status_code == 429:
-                with self._lock:
-                    self._last_429_ts = time.time()
-                    if self._redis is not None:
-                        try:
-                            self._redis.setex("search:last_429_ts", self.backoff_seconds, str(self._last_429_ts))
-                        except Exception:
-                            pass
-                return {"answer": None, "results": [], "error": "rate_limited"}
-            if resp.status_code != 200:
-                return {"answer": None, "results": [], "error": f"http_{resp.status_code}"}
-            data = resp.json()
+            ) as resp:
+                if resp.status == 429:
+                    self.rate_limited += 1
+                    retry_after = resp.headers.get("Retry-After", "")
+                    self._bucket.pause(float(retry_after) if retry_after.isdigit() else self.backoff_seconds)
+                    logger.warning("Tavily rate limited; pausing searches")
+                    return {"answer": None, "results": [], "error": "rate_limited"}
+                if resp.status != 200:
+                    self.provider_errors += 1
+                    return {"answer": None, "results": [], "error": f"http_{resp.status}"}
+                data = await resp.json(content_type=None)
             # Normalize
-            out = {
+            return {
                 "answer": data.get("answer"),
                 "results": data.get("results", []),
                 "error": None,
             }
-            with self._lock:
-                if self._redis is not None:
-                    try:
-                        self._redis.setex(f"search:cache:{key}", self.cache_ttl, json.dumps(out))
-                    except Exception:
-                        pass
-                else:
-                    self._cache[key] = (time.time(), out)
-            return out
-        except requests.exceptions.Timeout:
+        except asyncio.TimeoutError:
+            self.provider_errors += 1
             return {"answer": None, "results": [], "error": "timeout"}
         except Exception as e:
+            self.provider_errors += 1
             return {"answer": None, "results": [], "error": f"exception:{e}"}
+        finally:
+            self._latencies.append(time.monotonic() - started)
 
 
 search_gateway = _SearchGateway()
@@ -0,0 +1,508 @@
+"""
+Metadata stores for StrandsSessionService
+Holds per-session context, virtual filesystem, agent configs and shared state
+
+JsonMetadataStore keeps the original session_<id>/metadata.json layout.
+SQLiteMetadataStore keeps one row per context key, VFS file, agent and
+message in a WAL-mode database, so partial updates touch only what changed
+and concurrent agents in a session no longer race on a single JSON file.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import structlog
+
+logger = structlog.get_logger()
+
+# Top-level metadata.json keys with dedicated storage in SQLiteMetadataStore
+CONTEXT_KEY = "context"
+VFS_KEY = "virtual_filesystem"
+AGENTS_KEY = "agents_config"
+METADATA_DB_NAME = "metadata.db"
+
+# metadata.json path -> lock, see JsonMetadataStore._session_lock
+_json_file_locks: Dict[str, threading.RLock] = {}
+_json_locks_guard = threading.Lock()
+
+
+class SessionMetadataStore:
+    """Interface for session metadata persistence"""
+
+    def get_metadata(self, session_id: str) -> Dict[str, Any]:
+        """Full metadata document in the metadata.json shape"""
+        raise NotImplementedError
+
+    def get_field(self, session_id: str, key: str, default: Any = None) -> Any:
+        """One top-level metadata field"""
+        raise NotImplementedError
+
+    def update_fields(self, session_id: str, fields: Dict[str, Any]):
+        """Set top-level metadata fields (shared_state, namespaces, ...)"""
+        raise NotImplementedError
+
+    def get_context(self, session_id: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def get_context_value(self, session_id: str, key: str, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    def save_context_fields(self, session_id: str, fields: Dict[str, Any]):
+        """Replace the given context keys, leaving the others untouched"""
+        raise NotImplementedError
+
+    def get_messages(self, session_id: str, offset: int = 0, limit: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """Slice of context["messages"], or None when the session has none"""
+        raise NotImplementedError
+
+    def get_virtual_filesystem(self, session_id: str) -> Optional[Dict[str, str]]:
+        raise NotImplementedError
+
+    def save_virtual_filesystem(self, session_id: str, filesystem: Dict[str, str]):
+        raise NotImplementedError
+
+    def get_agents(self, session_id: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def save_agents(self, session_id: str, agents: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    def list_sessions(self) -> List[str]:
+        raise NotImplementedError
+
+    def delete_session(self, session_id: str):
+        raise NotImplementedError
+
+
+class JsonMetadataStore(SessionMetadataStore):
+    """metadata.json per session directory (original layout)"""
+
+    def __init__(self, storage_dir: Path):
+        self.storage_dir = Path(storage_dir)
+
+    def _session_lock(self, session_id: str) -> threading.RLock:
+        """
+        Lock serializing read-modify-write of a session's metadata.json
+
+        Shared by every store on the same file: the shared-state flusher
+        thread and the event loop, and the several StrandsSessionService
+        instances over one storage directory, all write it.
+        """
+        key = str(self._path(session_id).resolve())
+        with _json_locks_guard:
+            lock = _json_file_locks.get(key)
+            if lock is None:
+                lock = _json_file_locks[key] = threading.RLock()
+            return lock
+
+    def _path(self, session_id: str) -> Path:
+        return self.storage_dir / f"session_{session_id}" / "metadata.json"
+
+    def get_metadata(self, session_id: str) -> Dict[str, Any]:
+        path = self._path(session_id)
+        if not path.exists():
+            return {}
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def _write(self, session_id: str, metadata: Dict[str, Any]):
+        path = self._path(session_id)
+        path.parent.mkdir(exist_ok=True, parents=True)
+        metadata["updated_at"] = datetime.utcnow().isoformat()
+        # Temp file + rename so readers never see a half-written document
+        fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=".metadata-", suffix=".json")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(metadata, f, indent=2)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def get_field(self, session_id: str, key: str, default: Any = None) -> Any:
+        return self.get_metadata(session_id).get(key, default)
+
+    def update_fields(self, session_id: str, fields: Dict[str, Any]):
+        with self._session_lock(session_id):
+            metadata = self.get_metadata(session_id)
+            metadata.update(fields)
+            self._write(session_id, metadata)
+
+    def get_context(self, session_id: str) -> Dict[str, Any]:
+        return self.get_metadata(session_id).get(CONTEXT_KEY, {})
+
+    def get_context_value(self, session_id: str, key: str, default: Any = None) -> Any:
+        return self.get_context(session_id).get(key, default)
+
+    def save_context_fields(self, session_id: str, fields: Dict[str, Any]):
+        with self._session_lock(session_id):
+            metadata = self.get_metadata(session_id)
+            metadata.setdefault(CONTEXT_KEY, {}).update(fields)
+            self._write(session_id, metadata)
+
+    def get_messages(self, session_id: str, offset: int = 0, limit: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        messages = self.get_context(session_id).get("messages")
+        if messages is None:
+            return None
+        return messages[offset:offset + limit if limit is not None else None]
+
+    def get_virtual_filesystem(self, session_id: str) -> Optional[Dict[str, str]]:
+        return self.get_metadata(session_id).get(VFS_KEY)
+
+    def save_virtual_filesystem(self, session_id: str, filesystem: Dict[str, str]):
+        self.update_fields(session_id, {VFS_KEY: filesystem})
+
+    def get_agents(self, session_id: str) -> List[Dict[str, Any]]:
+        return self.get_metadata(session_id).get(AGENTS_KEY, [])
+
+    def save_agents(self, session_id: str, agents: List[Dict[str, Any]]):
+        self.update_fields(session_id, {AGENTS_KEY: agents})
+
+    def list_sessions(self) -> List[str]:
+        return [p.parent.name.replace("session_", "", 1)
+                for p in self.storage_dir.glob("session_*/metadata.json")]
+
+    def delete_session(self, session_id: str):
+        with self._session_lock(session_id):
+            path = self._path(session_id)
+            if path.exists():
+                path.unlink()
+        with _json_locks_guard:
+            _json_file_locks.pop(str(self._path(session_id).resolve()), None)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS session_fields (
+    session_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (session_id, key)
+);
+CREATE TABLE IF NOT EXISTS context_fields (
+    session_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (session_id, key)
+);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+);
+CREATE TABLE IF NOT EXISTS vfs_files (
+    session_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (session_id, path)
+);
+CREATE TABLE IF NOT EXISTS agents (
+    session_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    config TEXT NOT NULL,
+    PRIMARY KEY (session_id, position)
+);
+"""
+
+# Per-session tables, in delete order
+SESSION_TABLES = ("session_fields", "context_fields", "messages", "vfs_files", "agents", "sessions")
+
+
+class SQLiteMetadataStore(SessionMetadataStore):
+    """SQLite (WAL) store with per-key rows and indexed message retrieval
+
+    The service API is synchronous, so this talks to sqlite3 directly (the
+    same engine aiosqlite wraps) through one shared connection guarded by a
+    lock. WAL lets readers proceed while a writer commits, and busy_timeout
+    covers writers in other worker processes.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = str(db_path)
+        Path(self.db_path).parent.mkdir(exist_ok=True, parents=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(SCHEMA)
+        logger.info(f"SQLiteMetadataStore opened at {self.db_path}")
+
+    def _transaction(self):
+        return _Transaction(self._conn, self._lock)
+
+    @staticmethod
+    def _touch(cur: sqlite3.Cursor, session_id: str):
+        cur.execute(
+            "INSERT INTO sessions (session_id, updated_at) VALUES (?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET updated_at = excluded.updated_at",
+            (session_id, datetime.utcnow().isoformat())
+        )
+
+    def _query(self, sql: str, params: tuple) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    # ----- top-level fields -----
+
+    def get_metadata(self, session_id: str) -> Dict[str, Any]:
+        metadata: Dict[str, Any] = {}
+        for key, value in self._query("SELECT key, value FROM session_fields WHERE session_id = ?", (session_id,)):
+            metadata[key] = json.loads(value)
+        context = self.get_context(session_id)
+        if context:
+            metadata[CONTEXT_KEY] = context
+        filesystem = self.get_virtual_filesystem(session_id)
+        if filesystem is not None:
+            metadata[VFS_KEY] = filesystem
+        agents = self._query("SELECT 1 FROM agents WHERE session_id = ? LIMIT 1", (session_id,))
+        if agents:
+            metadata[AGENTS_KEY] = self.get_agents(session_id)
+        updated = self._query("SELECT updated_at FROM sessions WHERE session_id = ?", (session_id,))
+        if updated:
+            metadata["updated_at"] = updated[0][0]
+        return metadata
+
+    def get_field(self, session_id: str, key: str, default: Any = None) -> Any:
+        if key == CONTEXT_KEY:
+            return self.get_context(session_id) or default
+        if key == VFS_KEY:
+            filesystem = self.get_virtual_filesystem(session_id)
+            return default if filesystem is None else filesystem
+        if key == AGENTS_KEY:
+            return self.get_agents(session_id) or default
+        rows = self._query("SELECT value FROM session_fields WHERE session_id = ? AND key = ?", (session_id, key))
+        return json.loads(rows[0][0]) if rows else default
+
+    def update_fields(self, session_id: str, fields: Dict[str, Any]):
+        with self._transaction() as cur:
+            for key, value in fields.items():
+                if key == CONTEXT_KEY:
+                    self._save_context_fields(cur, session_id, value)
+                elif key == VFS_KEY:
+                    self._save_virtual_filesystem(cur, session_id, value)
+                elif key == AGENTS_KEY:
+                    self._save_agents(cur, session_id, value)
+                elif key != "updated_at":
+                    cur.execute(
+                        "INSERT OR REPLACE INTO session_fields (session_id, key, value) VALUES (?, ?, ?)",
+                        (session_id, key, json.dumps(value))
+                    )
+            self._touch(cur, session_id)
+
+    # ----- context -----
+
+    def get_context(self, session_id: str) -> Dict[str, Any]:
+        context = {
+            key: json.loads(value)
+            for key, value in self._query("SELECT key, value FROM context_fields WHERE session_id = ?", (session_id,))
+        }
+        messages = self.get_messages(session_id)
+        if messages is not None:
+            context["messages"] = messages
+        return context
+
+    def get_context_value(self, session_id: str, key: str, default: Any = None) -> Any:
+        if key == "messages":
+            messages = self.get_messages(session_id)
+            return default if messages is None else messages
+        rows = self._query("SELECT value FROM context_fields WHERE session_id = ? AND key = ?", (session_id, key))
+        return json.loads(rows[0][0]) if rows else default
+
+    def save_context_fields(self, session_id: str, fields: Dict[str, Any]):
+        with self._transaction() as cur:
+            self._save_context_fields(cur, session_id, fields)
+            self._touch(cur, session_id)
+
+    def _save_context_fields(self, cur: sqlite3.Cursor, session_id: str, fields: Dict[str, Any]):
+        for key, value in fields.items():
+            if key == "messages" and isinstance(value, list):
+                self._save_messages(cur, session_id, value)
+                continue
+            cur.execute(
+                "INSERT OR REPLACE INTO context_fields (session_id, key, value) VALUES (?, ?, ?)",
+                (session_id, key, json.dumps(value))
+            )
+
+    def _save_messages(self, cur: sqlite3.Cursor, session_id: str, messages: List[Dict[str, Any]]):
+        """Store the complete messages array, writing only the new tail when possible"""
+        row = cur.execute(
+            "SELECT seq, message FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT 1",
+            (session_id,)
+        ).fetchone()
+        start = 0
+        if row is not None:
+            stored_count = row[0] + 1
+            # Callers resend the whole history; if the stored tail still
+            # matches, everything before it is unchanged and only the
+            # messages after it need inserting
+            if len(messages) >= stored_count and json.dumps(messages[stored_count - 1]) == row[1]:
+                start = stored_count
+            else:
+                cur.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+        cur.executemany(
+            "INSERT INTO messages (session_id, seq, message) VALUES (?, ?, ?)",
+            [(session_id, seq, json.dumps(message)) for seq, message in enumerate(messages[start:], start)]
+        )
+        if not messages:
+            # Keep an explicit empty history distinguishable from "no messages key"
+            cur.execute(
+                "INSERT OR REPLACE INTO context_fields (session_id, key, value) VALUES (?, 'messages', '[]')",
+                (session_id,)
+            )
+        else:
+            cur.execute("DELETE FROM context_fields WHERE session_id = ? AND key = 'messages'", (session_id,))
+
+    def get_messages(self, session_id: str, offset: int = 0, limit: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        rows = self._query(
+            "SELECT message FROM messages WHERE session_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+            (session_id, offset, -1 if limit is None else limit)
+        )
+        if rows:
+            return [json.loads(r[0]) for r in rows]
+        empty = self._query(
+            "SELECT value FROM context_fields WHERE session_id = ? AND key = 'messages'", (session_id,)
+        )
+        if empty or self._query("SELECT 1 FROM messages WHERE session_id = ? LIMIT 1", (session_id,)):
+            return []
+        return None
+
+    # ----- virtual filesystem -----
+
+    def get_virtual_filesystem(self, session_id: str) -> Optional[Dict[str, str]]:
+        rows = self._query("SELECT path, content FROM vfs_files WHERE session_id = ?", (session_id,))
+        if rows:
+            return {path: content for path, content in rows}
+        marker = self._query(
+            "SELECT 1 FROM session_fields WHERE session_id = ? AND key = ?", (session_id, VFS_KEY)
+        )
+        return {} if marker else None
+
+    def save_virtual_filesystem(self, session_id: str, filesystem: Dict[str, str]):
+        with self._transaction() as cur:
+            self._save_virtual_filesystem(cur, session_id, filesystem)
+            self._touch(cur, session_id)
+
+    def _save_virtual_filesystem(self, cur: sqlite3.Cursor, session_id: str, filesystem: Dict[str, str]):
+        existing = dict(cur.execute(
+            "SELECT path, content FROM vfs_files WHERE session_id = ?", (session_id,)
+        ).fetchall())
+        removed = [(session_id, path) for path in existing if path not in filesystem]
+        changed = [(session_id, path, content) for path, content in filesystem.items()
+                   if existing.get(path) != content]
+        if removed:
+            cur.executemany("DELETE FROM vfs_files WHERE session_id = ? AND path = ?", removed)
+        if changed:
+            cur.executemany("INSERT OR REPLACE INTO vfs_files (session_id, path, content) VALUES (?, ?, ?)", changed)
+        # Marks that a (possibly empty) filesystem was saved
+        cur.execute(
+            "INSERT OR REPLACE INTO session_fields (session_id, key, value) VALUES (?, ?, 'true')",
+            (session_id, VFS_KEY)
+        )
+
+    # ----- agents -----
+
+    def get_agents(self, session_id: str) -> List[Dict[str, Any]]:
+        rows = self._query("SELECT config FROM agents WHERE session_id = ? ORDER BY position", (session_id,))
+        return [json.loads(r[0]) for r in rows]
+
+    def save_agents(self, session_id: str, agents: List[Dict[str, Any]]):
+        with self._transaction() as cur:
+            self._save_agents(cur, session_id, agents)
+            self._touch(cur, session_id)
+
+    def _save_agents(self, cur: sqlite3.Cursor, session_id: str, agents: List[Dict[str, Any]]):
+        cur.execute("DELETE FROM agents WHERE session_id = ? AND position >= ?", (session_id, len(agents)))
+        cur.executemany(
+            "INSERT OR REPLACE INTO agents (session_id, position, config) VALUES (?, ?, ?)",
+            [(session_id, i, json.dumps(agent)) for i, agent in enumerate(agents)]
+        )
+
+    # ----- sessions -----
+
+    def list_sessions(self) -> List[str]:
+        return [r[0] for r in self._query("SELECT session_id FROM sessions", ())]
+
+    def delete_session(self, session_id: str):
+        with self._transaction() as cur:
+            for table in SESSION_TABLES:
+                cur.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,))
+
+    def import_metadata(self, session_id: str, metadata: Dict[str, Any]):
+        """Replace a session's rows with the contents of a metadata.json document"""
+        with self._transaction() as cur:
+            for table in SESSION_TABLES:
+                cur.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,))
+            for key, value in metadata.items():
+                if key == CONTEXT_KEY:
+                    self._save_context_fields(cur, session_id, value or {})
+                elif key == VFS_KEY:
+                    self._save_virtual_filesystem(cur, session_id, value or {})
+                elif key == AGENTS_KEY:
+                    self._save_agents(cur, session_id, value or [])
+                elif key != "updated_at":
+                    cur.execute(
+                        "INSERT INTO session_fields (session_id, key, value) VALUES (?, ?, ?)",
+                        (session_id, key, json.dumps(value))
+                    )
+            cur.execute(
+                "INSERT INTO sessions (session_id, updated_at) VALUES (?, ?)",
+                (session_id, metadata.get("updated_at") or datetime.utcnow().isoformat())
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK under the store lock"""
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.RLock):
+        self._conn = conn
+        self._lock = lock
+
+    def __enter__(self) -> sqlite3.Cursor:
+        self._lock.acquire()
+        try:
+            self._cur = self._conn.cursor()
+            self._cur.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self._lock.release()
+            raise
+        return self._cur
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self._cur.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self._lock.release()
+        return False
+
+
+def create_metadata_store(storage_dir: Path, backend: Optional[str] = None) -> SessionMetadataStore:
+    """Build the store selected by STRANDS_METADATA_BACKEND (json | sqlite)
+
+    The SQLite database lives at <storage_dir>/metadata.db so services with
+    different storage directories keep separate stores.
+    """
+    if backend is None:
+        try:
+            from app.config import settings
+            backend = settings.STRANDS_METADATA_BACKEND
+        except Exception:
+            backend = "json"
+    if backend == "sqlite":
+        return SQLiteMetadataStore(str(Path(storage_dir) / METADATA_DB_NAME))
+    if backend != "json":
+        logger.warning(f"Unknown metadata backend '{backend}', using json")
+    return JsonMetadataStore(storage_dir)
@@ -1,129 +1,460 @@
 """
 Session persistence service for conversation sessions
 Stores sessions in JSON files to survive server restarts
+
+Sessions are loaded lazily through a small index file and kept in a bounded
+LRU cache. Saves are coalesced by a write-behind flusher thread, which
+serializes the enqueued snapshots under the session lock and writes them
+atomically (temp file + rename) outside it. The optional "journal" format appends only
+the changed fields of update_session() to a per-session .jsonl file and
+compacts it periodically.
 """
+import atexit
 import json
 import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import logging
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Runtime-only fields that are never written to disk
+NON_PERSISTED_FIELDS = ('agent', 'thread', 'lock')
+INDEX_FILE = "_index.json"
+
+
 class SessionPersistence:
-    def __init__(self, storage_dir: str = "./conversation_sessions"):
+    def __init__(
+        self,
+        storage_dir: str = "./conversation_sessions",
+        max_cached: int = 256,
+        flush_delay: float = 1.0,
+        storage_format: str = "json",
+        journal_compact_after: int = 100
+    ):
+        if storage_format not in ("json", "journal"):
+            raise ValueError(f"Unsupported storage format: {storage_format}")
         self.storage_dir = Path(storage_dir)
         self.storage_dir.mkdir(exist_ok=True)
-        self._in_memory_cache: Dict[str, Dict[str, Any]] = {}
-        logger.info(f"SessionPersistence initialized with storage at {self.storage_dir}")
-        
-        # Load existing sessions on startup
-        self._load_all_sessions()
-    
-    def _load_all_sessions(self):
-        """Load all existing sessions from disk into memory cache"""
+        self.max_cached = max_cached
+        self.flush_delay = flush_delay
+        self.storage_format = storage_format
+        self.journal_compact_after = journal_compact_after
+
+        self._lock = threading.RLock()
+        self._flush_cond = threading.Condition(self._lock)
+        self._in_memory_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Pending write-behind operations per session: ("set", data) / ("update", fields)
+        self._pending: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+        self._due: Dict[str, float] = {}
+        # Disk writes happen under _io_lock only, so callers of _lock never wait on fsync
+        self._io_lock = threading.Lock()
+        self._writing: Dict[str, int] = {}
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = False
+
+        # Only the index is read at startup; session files load on first access
+        self._index: Dict[str, Dict[str, Any]] = self._load_index()
+        atexit.register(self.close)
+        logger.info(f"SessionPersistence initialized with storage at {self.storage_dir} "
+                    f"({len(self._index)} sessions indexed)")
+
+    # ------------------------------------------------------------------ index
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        """Read the session index, adding session files it doesn't list yet"""
+        index: Dict[str, Dict[str, Any]] = {}
+        index_path = self.storage_dir / INDEX_FILE
+        if index_path.exists():
+            try:
+                with open(index_path, 'r') as f:
+                    index = json.load(f)
+            except Exception as e:
+                logger.error(f"Failed to read session index, rebuilding: {e}")
+
+        # A crash between writing a session file and the index leaves the file unlisted
+        added = 0
         try:
-            for session_file in self.storage_dir.glob("*.json"):
-                session_id = session_file.stem
-                try:
-                    with open(session_file, 'r') as f:
-                        session_data = json.load(f)
-                        # Don't reload agents or other non-serializable objects
-                        if 'agent' in session_data:
-                            session_data['agent'] = None
-                        self._in_memory_cache[session_id] = session_data
-                        logger.info(f"Loaded session {session_id} from disk")
-                except Exception as e:
-                    logger.error(f"Failed to load session {session_id}: {e}")
+            for session_file in self.storage_dir.iterdir():
+                if session_file.name == INDEX_FILE or session_file.name.startswith("."):
+                    continue
+                if session_file.stem in index:
+                    continue
+                entry = self._index_entry_for(session_file)
+                if entry is not None:
+                    index[session_file.stem] = entry
+                    added += 1
         except Exception as e:
-            logger.error(f"Failed to load sessions: {e}")
-    
-    def _get_session_path(self, session_id: str) -> Path:
-        return self.storage_dir / f"{session_id}.json"
-    
-    def save_session(self, session_id: str, session_data: Dict[str, Any]):
-        """Save session to disk and memory"""
+            logger.error(f"Failed to scan sessions: {e}")
+        if added:
+            self._write_index(index)
+        return index
+
+    @staticmethod
+    def _index_entry_for(session_file: Path) -> Optional[Dict[str, Any]]:
+        if session_file.suffix == ".json":
+            fmt = "json"
+        elif session_file.suffix == ".jsonl":
+            fmt = "journal"
+        else:
+            return None
+        return {
+            "format": fmt,
+            "last_updated": datetime.fromtimestamp(session_file.stat().st_mtime).isoformat(),
+            "records": 0
+        }
+
+    def _find_unindexed(self, session_id: str) -> bool:
+        """Index a session file that exists on disk but not in the index (lock held)"""
+        for fmt in ("json", "journal"):
+            session_path = self._get_session_path(session_id, fmt)
+            if session_path.exists():
+                try:
+                    entry = self._index_entry_for(session_path)
+                except OSError:
+                    continue
+                self._index[session_id] = entry
+                logger.warning(f"Session {session_id} was missing from the index; re-indexed")
+                return True
+        return False
+
+    def _write_index(self, index: Optional[Dict[str, Dict[str, Any]]] = None):
+        self._atomic_write(self.storage_dir / INDEX_FILE, json.dumps(index if index is not None else self._index))
+
+    # ------------------------------------------------------------ file access
+
+    def _get_session_path(self, session_id: str, storage_format: Optional[str] = None) -> Path:
+        suffix = ".jsonl" if (storage_format or self.storage_format) == "journal" else ".json"
+        return self.storage_dir / f"{session_id}{suffix}"
+
+    def _atomic_write(self, path: Path, content: str):
+        """Write via a temp file in the same directory and rename over the target"""
+        fd, tmp_path = tempfile.mkstemp(dir=str(self.storage_dir), prefix=".tmp-", suffix=path.suffix)
         try:
-            # Create a serializable copy
-            serializable_data = {}
-            for key, value in session_data.items():
-                # Skip non-serializable objects
-                if key in ['agent', 'thread', 'lock']:
+            with os.fdopen(fd, 'w') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _read_session_file(self, session_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._index.get(session_id)
+        fmt = entry.get("format", "json") if entry else self.storage_format
+        session_path = self._get_session_path(session_id, fmt)
+        if not session_path.exists():
+            return None
+
+        if fmt == "json":
+            with open(session_path, 'r') as f:
+                return json.load(f)
+
+        # Journal: replay set/update records in order
+        session_data: Dict[str, Any] = {}
+        with open(session_path, 'r') as f:
+            for line in f:
+                if not line.strip():
                     continue
                 try:
-                    # Test if serializable
-                    json.dumps(value)
-                    serializable_data[key] = value
-                except (TypeError, ValueError):
-                    # Skip non-serializable values
-                    logger.debug(f"Skipping non-serializable field: {key}")
-            
-            # Add metadata
-            serializable_data['last_updated'] = datetime.now().isoformat()
-            
-            # Save to disk
-            session_path = self._get_session_path(session_id)
-            with open(session_path, 'w') as f:
-                json.dump(serializable_data, f, indent=2)
-            
-            # Update memory cache
-            self._in_memory_cache[session_id] = session_data
-            
-            logger.debug(f"Saved session {session_id}")
-        except Exception as e:
-            logger.error(f"Failed to save session {session_id}: {e}")
-    
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-append
+                    logger.warning(f"Ignoring corrupt journal record in {session_path.name}")
+                    continue
+                if record.get("op") == "set":
+                    session_data = record.get("data", {})
+                else:
+                    session_data.update(record.get("data", {}))
+        return session_data
+
+    @staticmethod
+    def _serializable(session_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of the persistable fields, dropping values JSON can't encode"""
+        data = {k: v for k, v in session_data.items() if k not in NON_PERSISTED_FIELDS}
+        try:
+            json.dumps(data)
+            return data
+        except (TypeError, ValueError):
+            pass
+        serializable_data = {}
+        for key, value in data.items():
+            try:
+                json.dumps(value)
+                serializable_data[key] = value
+            except (TypeError, ValueError):
+                logger.debug(f"Skipping non-serializable field: {key}")
+        return serializable_data
+
+    def _prepare_ops(self, session_id: str, ops: List[Tuple[str, Dict[str, Any]]]) -> Tuple[Path, str, str]:
+        """
+        Serialize coalesced operations for one session (lock held)
+
+        Returns (path, mode, content) for _perform_writes; only enqueued
+        snapshots are serialized, never the live cached dict, except when a
+        journal is compacted (done here, under the lock its writers hold).
+        """
+        now = datetime.now().isoformat()
+        entry = self._index.get(session_id) or {"format": self.storage_format, "records": 0}
+        session_path = self._get_session_path(session_id, entry["format"])
+
+        if entry["format"] == "json":
+            # Only the final state matters for whole-file JSON
+            if ops[0][0] == "set":
+                data = dict(ops[0][1])
+            else:
+                # Updates only (journal storage over a legacy JSON file): start from the cached state
+                data = dict(self._in_memory_cache.get(session_id) or self._read_session_file(session_id) or {})
+            for _, fields in ops[1:] if ops[0][0] == "set" else ops:
+                data.update(fields)
+            data = self._serializable(data)
+            data['last_updated'] = now
+            mode, content = "replace", json.dumps(data)
+            entry["records"] = 1
+        elif entry["records"] + len(ops) > self.journal_compact_after and session_id in self._in_memory_cache:
+            # Compact the journal into a single snapshot record
+            data = self._serializable(self._in_memory_cache[session_id])
+            data['last_updated'] = now
+            mode, content = "replace", json.dumps({"op": "set", "data": data}) + "\n"
+            entry["records"] = 1
+        else:
+            lines = []
+            for op, data in ops:
+                data = self._serializable(data)
+                data['last_updated'] = now
+                lines.append(json.dumps({"op": op, "data": data}) + "\n")
+            mode, content = "append", "".join(lines)
+            entry["records"] += len(ops)
+
+        entry["last_updated"] = now
+        self._index[session_id] = entry
+        return session_path, mode, content
+
+    def _perform_writes(self, writes: List[Tuple[str, Path, str, str]], index_content: Optional[str]):
+        """Write prepared session files, then the index (_io_lock held, _lock not needed)"""
+        for session_id, session_path, mode, content in writes:
+            try:
+                if mode == "replace":
+                    self._atomic_write(session_path, content)
+                else:
+                    with open(session_path, 'a') as f:
+                        f.write(content)
+                        f.flush()
+                        os.fsync(f.fileno())
+                logger.debug(f"Saved session {session_id}")
+            except Exception as e:
+                logger.error(f"Failed to save session {session_id}: {e}")
+        if index_content is not None:
+            try:
+                self._atomic_write(self.storage_dir / INDEX_FILE, index_content)
+            except Exception as e:
+                logger.error(f"Failed to write session index: {e}")
+
+    # ------------------------------------------------------------ write-behind
+
+    def _enqueue(self, session_id: str, op: str, data: Dict[str, Any]):
+        """Queue an operation, coalescing with anything not yet flushed (lock held)"""
+        ops = self._pending.setdefault(session_id, [])
+        if op == "set":
+            ops.clear()
+            ops.append((op, data))
+        elif ops and ops[-1][0] == "update":
+            ops[-1][1].update(data)
+        else:
+            ops.append((op, dict(data)))
+
+        # Debounce: the first pending write sets the deadline, later ones ride along
+        self._due.setdefault(session_id, time.monotonic() + self.flush_delay)
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._flush_loop, name="session-persistence-flusher", daemon=True)
+            self._flusher.start()
+        self._flush_cond.notify()
+
+    def _flush_loop(self):
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                if not self._due:
+                    self._flush_cond.wait()
+                    continue
+                now = time.monotonic()
+                due_now = [sid for sid, due in self._due.items() if due <= now]
+                if not due_now:
+                    self._flush_cond.wait(min(self._due.values()) - now)
+                    continue
+                batch = self._take_batch(due_now)
+            self._write_batch(batch)
+
+    def _take_batch(self, session_ids: List[str]) -> Tuple[List[Tuple[str, Path, str, str]], Optional[str]]:
+        """
+        Take pending operations for the given sessions and serialize them (lock held)
+
+        The I/O lock is acquired before returning, so batches reach disk in
+        the order they were taken; _write_batch releases it.
+        """
+        writes = []
+        for session_id in session_ids:
+            self._due.pop(session_id, None)
+            ops = self._pending.pop(session_id, None)
+            if not ops:
+                continue
+            try:
+                session_path, mode, content = self._prepare_ops(session_id, ops)
+            except Exception as e:
+                logger.error(f"Failed to save session {session_id}: {e}")
+                continue
+            writes.append((session_id, session_path, mode, content))
+            self._writing[session_id] = self._writing.get(session_id, 0) + 1
+        index_content = json.dumps(self._index) if writes else None
+        self._io_lock.acquire()
+        return writes, index_content
+
+    def _write_batch(self, batch: Tuple[List[Tuple[str, Path, str, str]], Optional[str]]):
+        """Write a batch from _take_batch without holding the session lock"""
+        writes, index_content = batch
+        try:
+            self._perform_writes(writes, index_content)
+        finally:
+            self._io_lock.release()
+        if writes:
+            with self._lock:
+                for session_id, *_ in writes:
+                    remaining = self._writing.get(session_id, 0) - 1
+                    if remaining > 0:
+                        self._writing[session_id] = remaining
+                    else:
+                        self._writing.pop(session_id, None)
+
+    def flush(self):
+        """Write every pending session change to disk now"""
+        with self._lock:
+            batch = self._take_batch(list(self._pending.keys()))
+        self._write_batch(batch)
+
+    def close(self):
+        """Flush pending writes and stop the flusher thread"""
+        with self._lock:
+            batch = self._take_batch(list(self._pending.keys()))
+            self._closed = True
+            self._flush_cond.notify_all()
+        self._write_batch(batch)
+
+    # ------------------------------------------------------------------ cache
+
+    def _cache_put(self, session_id: str, session_data: Dict[str, Any]):
+        """
+        Insert into the LRU cache, evicting the oldest entries (lock held)
+
+        Sessions with changes not yet on disk stay cached until the flusher
+        has written them, so eviction never does I/O on the caller's thread.
+        """
+        self._in_memory_cache[session_id] = session_data
+        self._in_memory_cache.move_to_end(session_id)
+        excess = len(self._in_memory_cache) - self.max_cached
+        if excess <= 0:
+            return
+        evictable = [
+            sid for sid in self._in_memory_cache
+            if sid != session_id and sid not in self._pending and sid not in self._writing
+        ][:excess]
+        for sid in evictable:
+            del self._in_memory_cache[sid]
+
+    # ------------------------------------------------------------- public API
+
+    def save_session(self, session_id: str, session_data: Dict[str, Any]):
+        """Save session to memory now and to disk shortly after (coalesced)"""
+        with self._lock:
+            self._cache_put(session_id, session_data)
+            # Shallow snapshot so later caller mutations don't race the flusher
+            self._enqueue(session_id, "set", dict(session_data))
+
     def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get session from memory or disk"""
-        # Check memory first
-        if session_id in self._in_memory_cache:
-            return self._in_memory_cache[session_id]
-        
-        # Try loading from disk
-        session_path = self._get_session_path(session_id)
-        if session_path.exists():
+        with self._lock:
+            # Check memory first
+            session = self._in_memory_cache.get(session_id)
+            if session is not None:
+                self._in_memory_cache.move_to_end(session_id)
+                return session
+
+            if session_id not in self._index and not self._find_unindexed(session_id):
+                return None
+
+            # Load from disk on first access
             try:
-                with open(session_path, 'r') as f:
-                    session_data = json.load(f)
-                    # Don't reload agents
-                    if 'agent' in session_data:
-                        session_data['agent'] = None
-                    self._in_memory_cache[session_id] = session_data
-                    return session_data
+                session_data = self._read_session_file(session_id)
             except Exception as e:
                 logger.error(f"Failed to load session {session_id}: {e}")
-        
-        return None
-    
+                return None
+            if session_data is None:
+                return None
+            # Don't reload agents
+            if 'agent' in session_data:
+                session_data['agent'] = None
+            self._cache_put(session_id, session_data)
+            return session_data
+
     def delete_session(self, session_id: str):
         """Delete session from disk and memory"""
         try:
-            # Remove from memory
-            if session_id in self._in_memory_cache:
-                del self._in_memory_cache[session_id]
-            
-            # Remove from disk
-            session_path = self._get_session_path(session_id)
-            if session_path.exists():
-                session_path.unlink()
-            
+            with self._lock:
+                # Remove from memory and drop unwritten changes
+                self._in_memory_cache.pop(session_id, None)
+                self._pending.pop(session_id, None)
+                self._due.pop(session_id, None)
+
+                # Remove from disk, after any write of it already under way
+                entry = self._index.pop(session_id, None)
+                with self._io_lock:
+                    for fmt in {entry.get("format") if entry else None, "json", "journal"} - {None}:
+                        session_path = self._get_session_path(session_id, fmt)
+                        if session_path.exists():
+                            session_path.unlink()
+                    self._write_index()
+
             logger.info(f"Deleted session {session_id}")
         except Exception as e:
             logger.error(f"Failed to delete session {session_id}: {e}")
-    
+
+    def list_session_ids(self) -> List[str]:
+        """IDs of every persisted or cached session, without loading them"""
+        with self._lock:
+            return list(self._index.keys() | self._in_memory_cache.keys())
+
     def list_sessions(self) -> Dict[str, Dict[str, Any]]:
-        """Get all sessions"""
-        return dict(self._in_memory_cache)
-    
+        """Get all sessions (loads each one; prefer list_session_ids for large stores)"""
+        sessions = {}
+        for session_id in self.list_session_ids():
+            session = self.get_session(session_id)
+            if session is not None:
+                sessions[session_id] = session
+        return sessions
+
     def update_session(self, session_id: str, updates: Dict[str, Any]):
         """Update specific fields in a session"""
-        session = self.get_session(session_id)
-        if session:
+        with self._lock:
+            session = self.get_session(session_id)
+            if session is None:
+                return False
             session.update(updates)
-            self.save_session(session_id, session)
+            if self.storage_format == "journal" and session_id in self._index:
+                # Append just the changed fields
+                self._enqueue(session_id, "update", updates)
+            else:
+                self._enqueue(session_id, "set", dict(session))
             return True
-        return False
+
 
 # Global instance
 _session_persistence = None
@@ -132,4 +463,4 @@ def get_session_persistence() -> SessionPersistence:
     global _session_persistence
     if _session_persistence is None:
         _session_persistence = SessionPersistence()
-    return _session_persistence
\ No newline at end of file
+    return _session_persistence
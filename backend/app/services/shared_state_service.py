@@ -1,13 +1,21 @@
 """
 Shared State Service built on Strands agent.state
 Provides per-session shared_context and simple namespace reads/writes
+
+State is served from an in-process, per-session cache shared by every
+SharedStateService instance. Each change bumps a version number, marks the
+session dirty for a batched background flush to the metadata store, and is
+pushed to any subscribers (e.g. the shared-state SSE stream).
 """
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+import asyncio
+import atexit
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-import json
-from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
 import structlog
 
 from app.services.strands_session_service import get_strands_session_service
@@ -22,143 +30,339 @@ DEFAULT_SHARED_CONTEXT = {
 }
 
 
-class SharedStateService:
-    def __init__(self) -> None:
-        self.strands = get_strands_session_service()
+def _copy_context(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a context one level deep so callers can't mutate the cached one"""
+    return {
+        k: dict(v) if isinstance(v, dict) else list(v) if isinstance(v, list) else v
+        for k, v in ctx.items()
+    }
 
-    def _metadata_path(self, session_id: str) -> Path:
-        base = Path(self.strands.storage_dir) / f"session_{session_id}"
-        base.mkdir(parents=True, exist_ok=True)
-        return base / "metadata.json"
 
-    def _load_metadata(self, session_id: str) -> Dict[str, Any]:
-        path = self._metadata_path(session_id)
-        if path.exists():
-            try:
-                return json.loads(path.read_text())
-            except Exception:
-                return {}
-        return {}
+class SharedStateSubscription:
+    """Change feed for one session; changes arrive as dicts on an asyncio queue"""
+
+    def __init__(self, cache: "SharedStateCache", session_id: str, maxsize: int = 256):
+        self.cache = cache
+        self.session_id = session_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def _push(self, change: Dict[str, Any]):
+        # A consumer that falls behind loses the oldest changes, not the newest;
+        # the version numbers let it notice the gap and re-read a snapshot
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(change)
 
-    def _save_metadata(self, session_id: str, data: Dict[str, Any]) -> None:
-        path = self._metadata_path(session_id)
-        data["updated_at"] = datetime.utcnow().isoformat()
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
         try:
-            path.write_text(json.dumps(data, indent=2))
-        except Exception as e:
-            logger.error(f"Failed saving metadata for shared state: {e}")
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
 
-    def _get_any_agent(self, session_id: str):
-        agents = self.strands.get_all_agents(session_id)
-        if agents:
-            return next(iter(agents.values()))
-        return None
+    def close(self):
+        self.cache.unsubscribe(self)
+
+    async def __aenter__(self) -> "SharedStateSubscription":
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+
+class _SessionEntry:
+    __slots__ = ("shared_state", "namespaces", "version", "dirty", "due", "agent_id")
+
+    def __init__(self, shared_state: Dict[str, Any], namespaces: Dict[str, Any]):
+        # Full metadata "shared_state" field; shared_context lives inside it
+        self.shared_state = shared_state
+        self.namespaces = namespaces
+        self.version = shared_state.get("version", 0)
+        self.dirty: Set[str] = set()
+        self.due = 0.0
+        # id() of the agent whose state was last synced
+        self.agent_id: Optional[int] = None
+
+    @property
+    def shared_context(self) -> Dict[str, Any]:
+        return self.shared_state["shared_context"]
+
+
+class SharedStateCache:
+    """Per-session shared state held in memory with write-behind persistence"""
+
+    def __init__(self, flush_delay: float = 0.5, max_sessions: int = 512):
+        self.flush_delay = flush_delay
+        self.max_sessions = max_sessions
+        self._lock = threading.RLock()
+        self._flush_cond = threading.Condition(self._lock)
+        self._entries: "OrderedDict[str, _SessionEntry]" = OrderedDict()
+        self._subscribers: Dict[str, List[SharedStateSubscription]] = {}
+        self._flusher: Optional[threading.Thread] = None
+        atexit.register(self.flush)
+
+    @property
+    def strands(self):
+        return get_strands_session_service()
+
+    @property
+    def lock(self) -> threading.RLock:
+        """Held around read-modify-write updates of a session's state"""
+        return self._lock
+
+    def entry(self, session_id: str, agent: Any = None) -> _SessionEntry:
+        """Cached entry, loaded from agent.state or metadata on first access"""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                self._entries.move_to_end(session_id)
+                return entry
+
+        # Load outside the lock; store reads may touch disk
+        store = self.strands.metadata_store
+        try:
+            shared_state = store.get_field(session_id, "shared_state") or {}
+            namespaces = store.get_field(session_id, "namespaces") or {}
+        except Exception:
+            shared_state, namespaces = {}, {}
 
-    # ----- Shared Context -----
-    def ensure_initialized(self, session_id: str) -> Dict[str, Any]:
-        """Ensure shared_context exists; return current context."""
-        agent = self._get_any_agent(session_id)
         shared = None
         if agent:
             try:
                 shared = agent.state.get("shared_context")
             except Exception:
                 shared = None
-
         if not shared:
             # Try metadata fallback
-            meta = self._load_metadata(session_id)
-            shared = (meta.get("shared_state", {}).get("shared_context")
-                      if meta.get("shared_state") else None)
-
+            shared = shared_state.get("shared_context")
+        needs_write = not shared
         if not shared:
-            shared = DEFAULT_SHARED_CONTEXT.copy()
+            shared = _copy_context(DEFAULT_SHARED_CONTEXT)
+        shared_state["shared_context"] = shared
 
-        # Write back to agent.state for canonical storage
-        if agent:
+        with self._lock:
+            # Another thread may have loaded it meanwhile
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                return entry
+            entry = _SessionEntry(shared_state, namespaces)
+            self._entries[session_id] = entry
+            if needs_write:
+                self._mark_dirty(session_id, entry, "shared_state")
+            self._evict()
+            return entry
+
+    def _evict(self):
+        """Drop least recently used sessions that have nothing left to flush"""
+        if len(self._entries) <= self.max_sessions:
+            return
+        for session_id in list(self._entries.keys()):
+            if len(self._entries) <= self.max_sessions:
+                break
+            entry = self._entries[session_id]
+            if not entry.dirty and not self._subscribers.get(session_id):
+                del self._entries[session_id]
+
+    def sync_agent(self, session_id: str, entry: _SessionEntry, agent: Any, force: bool = False):
+        """Write shared_context to agent.state when it changed or a new agent appeared"""
+        if agent is None or (not force and entry.agent_id == id(agent)):
+            return
+        try:
+            agent.state.set("shared_context", entry.shared_context)
+            entry.agent_id = id(agent)
+        except Exception as e:
+            logger.warning(f"Could not set shared_context on agent.state: {e}")
+
+    # ----- writes -----
+
+    def update(self, session_id: str, entry: _SessionEntry, field: str, change: Dict[str, Any]) -> int:
+        """Record a change already applied to entry: bump version, flush later, notify"""
+        with self._lock:
+            # Re-attach if evicted while the caller held it
+            self._entries.setdefault(session_id, entry)
+            entry.version += 1
+            entry.shared_state["version"] = entry.version
+            self._mark_dirty(session_id, entry, field)
+            change = {"session_id": session_id, "version": entry.version, **change}
+            subscribers = list(self._subscribers.get(session_id, ()))
+        for sub in subscribers:
             try:
-                agent.state.set("shared_context", shared)
-            except Exception as e:
-                logger.warning(f"Could not set shared_context on agent.state: {e}")
+                sub.loop.call_soon_threadsafe(sub._push, change)
+            except RuntimeError:
+                # Subscriber's loop is gone
+                self.unsubscribe(sub)
+        return entry.version
 
-        # Also mirror in metadata for robustness
-        meta = self._load_metadata(session_id)
-        if "shared_state" not in meta:
-            meta["shared_state"] = {}
-        meta["shared_state"]["shared_context"] = shared
-        self._save_metadata(session_id, meta)
-        return shared
+    def _mark_dirty(self, session_id: str, entry: _SessionEntry, field: str):
+        if not entry.dirty:
+            entry.due = time.monotonic() + self.flush_delay
+        entry.dirty.add(field)
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._flush_loop, name="shared-state-flusher", daemon=True)
+            self._flusher.start()
+        self._flush_cond.notify()
 
-    def get_shared_context(self, session_id: str) -> Dict[str, Any]:
-        return self.ensure_initialized(session_id)
+    def _flush_loop(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                dirty = [(sid, e) for sid, e in self._entries.items() if e.dirty]
+                if not dirty:
+                    self._flush_cond.wait()
+                    continue
+                due = [sid for sid, e in dirty if e.due <= now]
+                if not due:
+                    self._flush_cond.wait(min(e.due for _, e in dirty) - now)
+                    continue
+            self.flush(due)
 
-    def set_shared_context(self, session_id: str, updates: Dict[str, Any], merge: bool = True) -> Dict[str, Any]:
-        ctx = self.ensure_initialized(session_id)
-        if merge:
-            ctx = {**ctx, **updates}
-        else:
-            ctx = updates
+    def flush(self, session_ids: Optional[List[str]] = None):
+        """Write dirty fields for the given sessions (default: all) to the metadata store"""
+        with self._lock:
+            if session_ids is None:
+                session_ids = list(self._entries.keys())
+            batch = []
+            for session_id in session_ids:
+                entry = self._entries.get(session_id)
+                if entry is None or not entry.dirty:
+                    continue
+                fields = {}
+                if "shared_state" in entry.dirty:
+                    fields["shared_state"] = {**entry.shared_state, "shared_context": _copy_context(entry.shared_context)}
+                if "namespaces" in entry.dirty:
+                    fields["namespaces"] = dict(entry.namespaces)
+                entry.dirty.clear()
+                batch.append((session_id, entry, fields))
 
-        agent = self._get_any_agent(session_id)
-        if agent:
+        for session_id, entry, fields in batch:
             try:
-                agent.state.set("shared_context", ctx)
+                self.strands.metadata_store.update_fields(session_id, fields)
             except Exception as e:
-                logger.warning(f"Failed to update shared_context on agent.state: {e}")
+                logger.error(f"Failed saving metadata for shared state: {e}")
+                with self._lock:
+                    # Retry on the next flush
+                    for field in fields:
+                        self._mark_dirty(session_id, entry, field)
+
+    # ----- subscriptions -----
+
+    def subscribe(self, session_id: str) -> SharedStateSubscription:
+        sub = SharedStateSubscription(self, session_id)
+        with self._lock:
+            self._subscribers.setdefault(session_id, []).append(sub)
+        return sub
+
+    def unsubscribe(self, sub: SharedStateSubscription):
+        with self._lock:
+            subs = self._subscribers.get(sub.session_id)
+            if subs and sub in subs:
+                subs.remove(sub)
+                if not subs:
+                    del self._subscribers[sub.session_id]
+
+
+# Shared by every SharedStateService instance in the process
+_cache = SharedStateCache()
+
+
+class SharedStateService:
+    def __init__(self) -> None:
+        self.strands = get_strands_session_service()
+        self.cache = _cache
+
+    def _get_any_agent(self, session_id: str):
+        agents = self.strands.get_all_agents(session_id)
+        if agents:
+            return next(iter(agents.values()))
+        return None
+
+    def _entry(self, session_id: str):
+        agent = self._get_any_agent(session_id)
+        entry = self.cache.entry(session_id, agent)
+        # Write back to agent.state for canonical storage
+        self.cache.sync_agent(session_id, entry, agent)
+        return entry, agent
+
+    # ----- Shared Context -----
+    def ensure_initialized(self, session_id: str) -> Dict[str, Any]:
+        """Ensure shared_context exists; return current context."""
+        entry, _ = self._entry(session_id)
+        return _copy_context(entry.shared_context)
+
+    def get_shared_context(self, session_id: str) -> Dict[str, Any]:
+        return self.ensure_initialized(session_id)
+
+    def get_version(self, session_id: str) -> int:
+        """Version of the session's shared state; bumps on every change"""
+        entry, _ = self._entry(session_id)
+        return entry.version
 
-        meta = self._load_metadata(session_id)
-        if "shared_state" not in meta:
-            meta["shared_state"] = {}
-        meta["shared_state"]["shared_context"] = ctx
-        self._save_metadata(session_id, meta)
-        return ctx
+    def set_shared_context(self, session_id: str, updates: Dict[str, Any], merge: bool = True) -> Dict[str, Any]:
+        entry, agent = self._entry(session_id)
+        with self.cache.lock:
+            if merge:
+                ctx = {**entry.shared_context, **updates}
+            else:
+                ctx = updates
+            entry.shared_state["shared_context"] = _copy_context(ctx)
+            self.cache.sync_agent(session_id, entry, agent, force=True)
+            self.cache.update(session_id, entry, "shared_state", {
+                "type": "shared_context",
+                "updates": _copy_context(updates),
+                "replace": not merge
+            })
+            return _copy_context(entry.shared_context)
 
     # ----- Convenience helpers -----
     def append_task_history(self, session_id: str, task: str) -> None:
-        ctx = self.ensure_initialized(session_id)
-        history = list(ctx.get("task_history", []))
-        history.append({"task": task, "timestamp": datetime.utcnow().isoformat()})
-        self.set_shared_context(session_id, {"task_history": history})
+        entry, _ = self._entry(session_id)
+        # Read-modify-write under the cache lock so concurrent agents don't drop entries
+        with self.cache.lock:
+            history = list(entry.shared_context.get("task_history", []))
+            history.append({"task": task, "timestamp": datetime.utcnow().isoformat()})
+            self.set_shared_context(session_id, {"task_history": history})
 
     def set_current_goal(self, session_id: str, goal: str) -> None:
         self.set_shared_context(session_id, {"current_goal": goal})
 
     def set_agent_output(self, session_id: str, agent_name: str, output: str) -> None:
-        ctx = self.ensure_initialized(session_id)
-        outputs = dict(ctx.get("agent_outputs", {}))
-        outputs[agent_name] = output
-        self.set_shared_context(session_id, {"agent_outputs": outputs})
+        entry, _ = self._entry(session_id)
+        with self.cache.lock:
+            outputs = dict(entry.shared_context.get("agent_outputs", {}))
+            outputs[agent_name] = output
+            self.set_shared_context(session_id, {"agent_outputs": outputs})
 
     def get_agent_outputs(self, session_id: str) -> Dict[str, str]:
-        ctx = self.ensure_initialized(session_id)
-        return dict(ctx.get("agent_outputs", {}))
+        entry, _ = self._entry(session_id)
+        return dict(entry.shared_context.get("agent_outputs", {}))
 
     def get_all(self, session_id: str) -> Dict[str, Any]:
         """Return a snapshot of shared state and known namespaces (metadata)."""
-        ctx = self.ensure_initialized(session_id)
-        meta = self._load_metadata(session_id)
+        entry, _ = self._entry(session_id)
         return {
-            "shared_context": ctx,
-            "namespaces": meta.get("namespaces", {})
+            "shared_context": _copy_context(entry.shared_context),
+            "namespaces": dict(entry.namespaces),
+            "version": entry.version
         }
 
     # ----- Namespaces (arbitrary keys on agent.state) -----
     def set_namespace(self, session_id: str, key: str, value: Any) -> None:
-        agent = self._get_any_agent(session_id)
+        entry, agent = self._entry(session_id)
         if agent:
             try:
                 agent.state.set(key, value)
             except Exception as e:
                 logger.warning(f"Failed to set namespace {key} on agent.state: {e}")
         # Mirror to metadata
-        meta = self._load_metadata(session_id)
-        if "namespaces" not in meta:
-            meta["namespaces"] = {}
-        meta["namespaces"][key] = value
-        self._save_metadata(session_id, meta)
+        entry.namespaces[key] = value
+        self.cache.update(session_id, entry, "namespaces", {
+            "type": "namespace",
+            "key": key,
+            "value": value
+        })
 
     def get_namespace(self, session_id: str, key: str, default: Optional[Any] = None) -> Any:
-        agent = self._get_any_agent(session_id)
+        entry, agent = self._entry(session_id)
         if agent:
             try:
                 val = agent.state.get(key)
@@ -166,5 +370,13 @@ class SharedStateService:
                     return val
             except Exception:
                 pass
-        meta = self._load_metadata(session_id)
-        return meta.get("namespaces", {}).get(key, default)
+        return entry.namespaces.get(key, default)
+
+    # ----- Change notifications / persistence -----
+    def subscribe(self, session_id: str) -> SharedStateSubscription:
+        """Subscribe to changes for a session (call from a running event loop)"""
+        return self.cache.subscribe(session_id)
+
+    def flush(self, session_id: Optional[str] = None) -> None:
+        """Persist pending changes now instead of waiting for the batched flush"""
+        self.cache.flush([session_id] if session_id else None)
@@ -0,0 +1,258 @@
+"""
+SSE Broadcaster: per-execution ring buffer with independent subscriber cursors
+Every viewer of an execution reads the same bounded buffer at its own pace, so
+multiple tabs each receive the full stream without duplicating work upstream.
+Slow viewers get their token frames coalesced (or dropped when far behind);
+control frames are never dropped.
+"""
+
+import asyncio
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+# Event types that carry incremental model output and may be coalesced/dropped
+TOKEN_EVENT_TYPES = {"text_generation", "token", "text_chunk", "agent_token"}
+
+Entry = Tuple[int, Dict[str, Any]]
+
+
+def _payload(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the inner event for swarm_event envelopes, else the event itself"""
+    inner = event.get("event")
+    if event.get("type") == "swarm_event" and isinstance(inner, dict):
+        return inner
+    return event
+
+
+def is_token_event(event: Dict[str, Any]) -> bool:
+    """Token frames can be merged or dropped for slow consumers"""
+    return _payload(event).get("type") in TOKEN_EVENT_TYPES
+
+
+def coalesce_token_events(first: Dict[str, Any], second: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Merge two adjacent token frames from the same agent into a new frame.
+
+    Returns None when the frames cannot be merged. Inputs are never mutated
+    since they are shared between all subscribers of the ring.
+    """
+    a, b = _payload(first), _payload(second)
+    if a.get("type") != b.get("type") or a.get("agent") != b.get("agent"):
+        return None
+    a_data, b_data = a.get("data"), b.get("data")
+    if not isinstance(a_data, dict) or not isinstance(b_data, dict):
+        return None
+    if not isinstance(a_data.get("text"), str) or not isinstance(b_data.get("text"), str):
+        return None
+
+    data = dict(b_data)
+    data["text"] = a_data["text"] + b_data["text"]
+    if isinstance(a_data.get("chunk"), str) and isinstance(b_data.get("chunk"), str):
+        data["chunk"] = a_data["chunk"] + b_data["chunk"]
+
+    inner = dict(b)
+    inner["data"] = data
+    if b is second:
+        return inner
+    merged = dict(second)
+    merged["event"] = inner
+    return merged
+
+
+class Subscriber:
+    """A single viewer of an execution stream with its own read cursor"""
+
+    def __init__(self, stream: "ExecutionStream", cursor: int, max_spilled_tokens: int):
+        self.stream = stream
+        self.cursor = cursor  # next sequence number to read from the ring
+        self.max_spilled_tokens = max_spilled_tokens
+        # Frames evicted from the ring before this subscriber read them
+        self.spilled: Deque[Entry] = deque()
+        self._spilled_tokens = 0
+        self.wakeup = asyncio.Event()
+        self.delivered = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.closed = False
+
+    @property
+    def lag(self) -> int:
+        """Number of frames published but not yet delivered"""
+        return len(self.spilled) + max(0, self.stream.next_seq - self.cursor)
+
+    @property
+    def is_slow(self) -> bool:
+        return bool(self.spilled) or self.lag >= self.stream.slow_threshold
+
+    def _spill(self, seq: int, event: Dict[str, Any]):
+        """Keep a frame the ring is evicting before we read it"""
+        if is_token_event(event):
+            if self.spilled and is_token_event(self.spilled[-1][1]):
+                merged = coalesce_token_events(self.spilled[-1][1], event)
+                if merged is not None:
+                    self.spilled[-1] = (seq, merged)
+                    self.coalesced += 1
+                    return
+            if self._spilled_tokens >= self.max_spilled_tokens:
+                self.dropped += 1
+                return
+            self._spilled_tokens += 1
+        self.spilled.append((seq, event))
+
+    def drain(self) -> List[Entry]:
+        """Take every pending frame (spilled first, then the ring) in order"""
+        slow = self.is_slow
+        batch: List[Entry] = list(self.spilled)
+        self.spilled.clear()
+        self._spilled_tokens = 0
+        batch.extend(self.stream.read_from(self.cursor))
+        if batch:
+            self.cursor = batch[-1][0] + 1
+        if slow and len(batch) > 1:
+            batch = self._coalesce(batch)
+        self.delivered += len(batch)
+        return batch
+
+    def _coalesce(self, batch: List[Entry]) -> List[Entry]:
+        """Merge adjacent token frames so a lagging reader catches up faster"""
+        out: List[Entry] = []
+        for seq, event in batch:
+            if out and is_token_event(event) and is_token_event(out[-1][1]):
+                merged = coalesce_token_events(out[-1][1], event)
+                if merged is not None:
+                    out[-1] = (seq, merged)
+                    self.coalesced += 1
+                    continue
+            out.append((seq, event))
+        return out
+
+    async def next_batch(self, timeout: Optional[float] = None) -> List[Entry]:
+        """Wait until frames are available (or timeout) and return them"""
+        while not self.closed:
+            self.wakeup.clear()
+            batch = self.drain()
+            if batch:
+                return batch
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        return []
+
+    def close(self):
+        self.closed = True
+        self.wakeup.set()
+        self.stream.subscribers.discard(self)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cursor": self.cursor,
+            "lag": self.lag,
+            "slow": self.is_slow,
+            "delivered": self.delivered,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+        }
+
+
+class ExecutionStream:
+    """Bounded ring buffer of events for one execution"""
+
+    def __init__(self, execution_id: str, capacity: int, start_seq: int = 0):
+        self.execution_id = execution_id
+        self.capacity = max(1, capacity)
+        self.slow_threshold = max(1, (self.capacity * 3) // 4)
+        self.ring: Deque[Entry] = deque()
+        self.next_seq = start_seq
+        self.subscribers: Set[Subscriber] = set()
+        self.last_publish = time.time()
+
+    @property
+    def first_seq(self) -> int:
+        """Oldest sequence number still held in the ring"""
+        return self.ring[0][0] if self.ring else self.next_seq
+
+    def publish(self, event: Dict[str, Any]) -> int:
+        seq = self.next_seq
+        self.next_seq += 1
+        if len(self.ring) >= self.capacity:
+            old_seq, old_event = self.ring.popleft()
+            for sub in self.subscribers:
+                if sub.cursor <= old_seq:
+                    sub._spill(old_seq, old_event)
+                    sub.cursor = old_seq + 1
+        self.ring.append((seq, event))
+        self.last_publish = time.time()
+        for sub in self.subscribers:
+            sub.wakeup.set()
+        return seq
+
+    def read_from(self, cursor: int) -> List[Entry]:
+        if not self.ring or cursor >= self.next_seq:
+            return []
+        start = max(0, cursor - self.first_seq)
+        return list(islice(self.ring, start, None))
+
+    def subscribe(self, cursor: int, max_spilled_tokens: int) -> Subscriber:
+        cursor = min(max(cursor, self.first_seq), self.next_seq)
+        sub = Subscriber(self, cursor, max_spilled_tokens)
+        self.subscribers.add(sub)
+        return sub
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "execution_id": self.execution_id,
+            "buffered": len(self.ring),
+            "capacity": self.capacity,
+            "first_seq": self.first_seq,
+            "next_seq": self.next_seq,
+            "subscribers": [sub.stats() for sub in self.subscribers],
+        }
+
+
+class SSEBroadcaster:
+    """Registry of execution streams shared by all SSE connections"""
+
+    def __init__(self, capacity: int = 2000, max_spilled_tokens: int = 200):
+        self.capacity = capacity
+        self.max_spilled_tokens = max_spilled_tokens
+        self.streams: Dict[str, ExecutionStream] = {}
+
+    def get_stream(self, execution_id: str) -> Optional[ExecutionStream]:
+        return self.streams.get(execution_id)
+
+    def ensure_stream(self, execution_id: str, start_seq: int = 0) -> ExecutionStream:
+        stream = self.streams.get(execution_id)
+        if stream is None:
+            stream = ExecutionStream(execution_id, self.capacity, start_seq)
+            self.streams[execution_id] = stream
+        return stream
+
+    def publish(self, execution_id: str, event: Dict[str, Any]) -> int:
+        return self.ensure_stream(execution_id).publish(event)
+
+    def subscribe(self, execution_id: str, last_event_id: Optional[int] = None) -> Tuple[Subscriber, int]:
+        """Attach a subscriber and return it with the first seq it will read.
+
+        Without a Last-Event-ID the subscriber starts at the oldest buffered
+        frame. Callers replay anything older than the returned seq from the
+        persistent cache.
+        """
+        stream = self.ensure_stream(execution_id)
+        if last_event_id is not None and 0 <= last_event_id < stream.next_seq:
+            cursor = last_event_id + 1
+        else:
+            cursor = stream.first_seq
+        sub = stream.subscribe(cursor, self.max_spilled_tokens)
+        return sub, sub.cursor
+
+    def remove_stream(self, execution_id: str) -> bool:
+        stream = self.streams.get(execution_id)
+        if stream is None or stream.subscribers:
+            return False
+        del self.streams[execution_id]
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {exec_id: stream.stats() for exec_id, stream in self.streams.items()}
@@ -72,11 +72,11 @@ class StrandsAgentRuntime(AgentRuntime):
             
             # Create the Strands agent - Agent class doesn't take temperature directly
             # Temperature is set on the model
-            from strands.models.openai import OpenAIModel
+            from app.services.model_client_factory import get_model
             
             # Create model with temperature
             # The model_id is required by strands event loop
-            model_instance = OpenAIModel(
+            model_instance = get_model(
                 model=self.config.model,
                 model_id=self.config.model,  # Add model_id for strands compatibility
                 temperature=self.config.temperature,
@@ -13,17 +13,25 @@ import structlog
 from strands import Agent
 from strands.session.file_session_manager import FileSessionManager
 from strands.agent.conversation_manager import SlidingWindowConversationManager
-from strands.models.openai import OpenAIModel
+from app.services.model_client_factory import get_model
+
+from app.services.session_metadata_store import SessionMetadataStore, create_metadata_store
 
 logger = structlog.get_logger()
 
 class StrandsSessionService:
     """Service for managing Strands agent sessions with PROPER persistence according to Strands docs"""
     
-    def __init__(self, storage_dir: str = "./strands_sessions"):
-        """Initialize the session service with storage directory"""
+    def __init__(self, storage_dir: str = "./strands_sessions", metadata_backend: Optional[str] = None):
+        """Initialize the session service with storage directory
+        
+        metadata_backend selects where context/VFS/agent metadata lives
+        ("json" or "sqlite"); defaults to settings.STRANDS_METADATA_BACKEND.
+        """
         self.storage_dir = Path(storage_dir)
         self.storage_dir.mkdir(exist_ok=True, parents=True)
+        # Context, virtual filesystem, agent configs and shared state
+        self.metadata_store: SessionMetadataStore = create_metadata_store(self.storage_dir, metadata_backend)
         # Store session managers that are SHARED across agents
         self.session_managers: Dict[str, FileSessionManager] = {}
         # Store agents by session_id -> agent_name -> agent
@@ -142,7 +150,7 @@ class StrandsSessionService:
             
             # Configure model
             if model_config:
-                model = OpenAIModel(
+                model = get_model(
                     model_id=model_config.get("model_id", "gpt-4o-mini"),
                     max_tokens=model_config.get("max_tokens", 4000),
                     params={
@@ -150,7 +158,7 @@ class StrandsSessionService:
                     }
                 )
             else:
-                model = OpenAIModel(model_id="gpt-4o-mini")
+                model = get_model(model_id="gpt-4o-mini")
             
             # COORDINATOR PATTERN: Use session_id as agent_id for coordinator
             if agent_name == "coordinator":
@@ -230,21 +238,8 @@ class StrandsSessionService:
                 agent.state.set("virtual_filesystem", filesystem)
                 logger.info(f"Saved virtual filesystem for session {session_id}")
             else:
-                # If no agent exists, store in a session metadata file
-                metadata_path = self.storage_dir / f"session_{session_id}" / "metadata.json"
-                metadata_path.parent.mkdir(exist_ok=True, parents=True)
-                
-                metadata = {}
-                if metadata_path.exists():
-                    with open(metadata_path, 'r') as f:
-                        metadata = json.load(f)
-                
-                metadata["virtual_filesystem"] = filesystem
-                metadata["updated_at"] = datetime.utcnow().isoformat()
-                
-                with open(metadata_path, 'w') as f:
-                    json.dump(metadata, f, indent=2)
-                
+                # If no agent exists, store in session metadata
+                self.metadata_store.save_virtual_filesystem(session_id, filesystem)
                 logger.info(f"Saved virtual filesystem to metadata for session {session_id}")
                 
         except Exception as e:
@@ -263,14 +258,11 @@ class StrandsSessionService:
                     logger.info(f"Retrieved virtual filesystem from agent state for session {session_id}")
                     return filesystem
             
-            # Try to load from metadata file
-            metadata_path = self.storage_dir / f"session_{session_id}" / "metadata.json"
-            if metadata_path.exists():
-                with open(metadata_path, 'r') as f:
-                    metadata = json.load(f)
-                    filesystem = metadata.get("virtual_filesystem", {})
-                    logger.info(f"Retrieved virtual filesystem from metadata for session {session_id}")
-                    return filesystem
+            # Try to load from metadata
+            filesystem = self.metadata_store.get_virtual_filesystem(session_id)
+            if filesystem is not None:
+                logger.info(f"Retrieved virtual filesystem from metadata for session {session_id}")
+                return filesystem
             
             logger.info(f"No virtual filesystem found for session {session_id}")
             return {}
@@ -282,42 +274,23 @@ class StrandsSessionService:
     def save_context(self, session_id: str, context: Dict[str, Any]):
         """Save additional context to session - MERGES with existing context"""
         try:
-            # Get or create metadata file
-            metadata_path = self.storage_dir / f"session_{session_id}" / "metadata.json"
-            metadata_path.parent.mkdir(exist_ok=True, parents=True)
-            
-            metadata = {}
-            if metadata_path.exists():
-                with open(metadata_path, 'r') as f:
-                    metadata = json.load(f)
-            
             # CRITICAL FIX: Merge context instead of replacing it
-            # This is especially important for messages array
-            if "context" not in metadata:
-                metadata["context"] = {}
-            
-            # Merge each field intelligently
-            for key, value in context.items():
-                if key == "messages" and "messages" in metadata["context"]:
-                    # For messages, we want to preserve ALL messages
-                    # The new context should contain the complete history
-                    # So we just use the new messages array as it should be complete
-                    metadata["context"][key] = value
-                elif key == "task_history" and "task_history" in metadata["context"]:
-                    # For task history, append new tasks if not already present
-                    existing_tasks = metadata["context"][key]
-                    for task in value:
+            # Only the keys being saved are written; the store keeps the rest
+            updates = dict(context)
+            
+            # For messages, the new context should contain the complete history,
+            # so the new array replaces the stored one (the store only writes
+            # the appended tail when the history just grew)
+            if "task_history" in updates:
+                # For task history, append new tasks if not already present
+                existing_tasks = self.metadata_store.get_context_value(session_id, "task_history")
+                if existing_tasks is not None:
+                    for task in updates["task_history"]:
                         if task not in existing_tasks:
                             existing_tasks.append(task)
-                    metadata["context"][key] = existing_tasks
-                else:
-                    # For other fields, just update with new value
-                    metadata["context"][key] = value
-            
-            metadata["updated_at"] = datetime.utcnow().isoformat()
+                    updates["task_history"] = existing_tasks
             
-            with open(metadata_path, 'w') as f:
-                json.dump(metadata, f, indent=2)
+            self.metadata_store.save_context_fields(session_id, updates)
             
             logger.info(f"Saved context for session {session_id}")
             
@@ -327,12 +300,7 @@ class StrandsSessionService:
     def get_context(self, session_id: str) -> Dict[str, Any]:
         """Get context from session"""
         try:
-            metadata_path = self.storage_dir / f"session_{session_id}" / "metadata.json"
-            if metadata_path.exists():
-                with open(metadata_path, 'r') as f:
-                    metadata = json.load(f)
-                    return metadata.get("context", {})
-            return {}
+            return self.metadata_store.get_context(session_id)
         except Exception as e:
             logger.error(f"Failed to get context: {e}")
             return {}
@@ -340,21 +308,8 @@ class StrandsSessionService:
     def save_agents(self, session_id: str, agents: List[Dict[str, Any]]):
         """Save agent configurations to session metadata"""
         try:
-            metadata_path = self.storage_dir / f"session_{session_id}" / "metadata.json"
-            metadata_path.parent.mkdir(exist_ok=True, parents=True)
-            
-            metadata = {}
-            if metadata_path.exists():
-                with open(metadata_path, 'r') as f:
-                    metadata = json.load(f)
-            
             # Save agents configuration
-            metadata["agents_config"] = agents
-            metadata["updated_at"] = datetime.utcnow().isoformat()
-            
-            with open(metadata_path, 'w') as f:
-                json.dump(metadata, f, indent=2)
-            
+            self.metadata_store.save_agents(session_id, agents)
             logger.info(f"💾 Saved {len(agents)} agents configuration for session {session_id}")
             
         except Exception as e:
@@ -363,15 +318,10 @@ class StrandsSessionService:
     def get_agents(self, session_id: str) -> List[Dict[str, Any]]:
         """Get agent configurations from session metadata"""
         try:
-            metadata_path = self.storage_dir / f"session_{session_id}" / "metadata.json"
-            if metadata_path.exists():
-                with open(metadata_path, 'r') as f:
-                    metadata = json.load(f)
-                    agents = metadata.get("agents_config", [])
-                    if agents:
-                        logger.info(f"📋 Retrieved {len(agents)} agents from persistent storage for session {session_id}")
-                    return agents
-            return []
+            agents = self.metadata_store.get_agents(session_id)
+            if agents:
+                logger.info(f"📋 Retrieved {len(agents)} agents from persistent storage for session {session_id}")
+            return agents
         except Exception as e:
             logger.error(f"Failed to get agents: {e}")
             return []
@@ -384,6 +334,9 @@ class StrandsSessionService:
                 if session_dir.is_dir():
                     session_id = session_dir.name.replace("session_", "")
                     sessions.append(session_id)
+            # Sessions whose metadata lives only in the database
+            known = set(sessions)
+            sessions.extend(s for s in self.metadata_store.list_sessions() if s not in known)
         except Exception as e:
             logger.error(f"Failed to list sessions: {e}")
         return sessions
@@ -403,12 +356,12 @@ class StrandsSessionService:
             if session_id in self.conversation_managers:
                 del self.conversation_managers[session_id]
             
-            # Remove from disk
+            # Remove metadata and the session directory
+            self.metadata_store.delete_session(session_id)
             session_path = self.storage_dir / f"session_{session_id}"
             if session_path.exists():
-                import shutil
                 shutil.rmtree(session_path)
-                logger.info(f"Deleted session {session_id}")
+            logger.info(f"Deleted session {session_id}")
         except Exception as e:
             logger.error(f"Failed to delete session: {e}")
     
@@ -435,16 +388,16 @@ class StrandsSessionService:
                 "has_context": False
             }
 
-    def get_session_messages(self, session_id: str) -> List[Dict[str, Any]]:
-        """Get message history from session"""
+    def get_session_messages(self, session_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get message history from session, optionally a window of it"""
         try:
             # Try multiple approaches to get messages
             
-            # 1. Check context in metadata
-            context = self.get_context(session_id)
-            if context and 'messages' in context:
-                logger.info(f"Retrieved {len(context['messages'])} messages from context for session {session_id}")
-                return context['messages']
+            # 1. Check context in metadata (indexed by position in the SQLite store)
+            messages = self.metadata_store.get_messages(session_id, offset, limit)
+            if messages is not None:
+                logger.info(f"Retrieved {len(messages)} messages from context for session {session_id}")
+                return messages
             
             # 2. Check agent conversation logs
             agents_dir = self.storage_dir / f"session_{session_id}" / "agents"
@@ -465,7 +418,7 @@ class StrandsSessionService:
                             })
                         if messages:
                             logger.info(f"Retrieved {len(messages)} messages from coordinator log for session {session_id}")
-                            return messages
+                            return messages[offset:offset + limit if limit is not None else None]
                 
                 # Try any agent's conversation log
                 for agent_dir in agents_dir.iterdir():
@@ -485,7 +438,7 @@ class StrandsSessionService:
                                     })
                                 if messages:
                                     logger.info(f"Retrieved {len(messages)} messages from {agent_dir.name} log for session {session_id}")
-                                    return messages
+                                    return messages[offset:offset + limit if limit is not None else None]
             
             logger.info(f"No messages found for session {session_id}")
             return []
@@ -0,0 +1,249 @@
+"""
+Token Coalescer
+
+Sits between agent callback handlers and stream storage
+(SessionStorage.append_chunk, EventHub.publish_token). Tokens are buffered
+per agent and handed to a sink as one batch when the first buffered token is
+older than the latency target, or the buffer reaches its size limits.
+
+Ordering: batches for one agent reach the sink in the order their tokens were
+added, and a flush of one agent never waits on another agent's sink call.
+Callers that need a strict boundary (agent done, tool call, end of run) call
+flush() before writing their own event.
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Flush reasons, reported in the metrics
+FLUSH_LATENCY = "latency"
+FLUSH_SIZE = "size"
+FLUSH_TAG = "tag"
+FLUSH_EXPLICIT = "explicit"
+
+
+@dataclass
+class CoalescePolicy:
+    """When a buffered agent's tokens must be handed to the sink"""
+    max_latency: float = 0.03  # seconds the oldest buffered token may wait
+    max_tokens: int = 64
+    max_chars: int = 1024
+
+    @classmethod
+    def from_latency_ms(cls, latency_ms: float, **kwargs) -> "CoalescePolicy":
+        return cls(max_latency=max(latency_ms, 0) / 1000, **kwargs)
+
+
+@dataclass
+class TokenBatch:
+    """Coalesced run of tokens from one agent"""
+    agent: str
+    text: str
+    count: int
+    tag: Any = None
+    first_meta: Dict[str, Any] = field(default_factory=dict)
+    last_meta: Dict[str, Any] = field(default_factory=dict)
+    started_at: float = 0.0  # monotonic time the first token was buffered
+
+
+class TokenBuffer:
+    """Pending tokens for one agent; not thread-safe, owned by its coalescer"""
+
+    __slots__ = ("agent", "parts", "chars", "tag", "first_meta", "last_meta", "started_at")
+
+    def __init__(self, agent: str):
+        self.agent = agent
+        self.parts: List[str] = []
+        self.chars = 0
+        self.tag: Any = None
+        self.first_meta: Dict[str, Any] = {}
+        self.last_meta: Dict[str, Any] = {}
+        self.started_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self.parts)
+
+    def add(self, text: str, meta: Optional[Dict[str, Any]] = None, tag: Any = None):
+        if not self.parts:
+            self.started_at = time.monotonic()
+            self.first_meta = meta or {}
+            self.tag = tag
+        self.parts.append(text)
+        self.chars += len(text)
+        self.last_meta = meta or {}
+
+    def full(self, policy: CoalescePolicy) -> bool:
+        return len(self.parts) >= policy.max_tokens or self.chars >= policy.max_chars
+
+    def take(self) -> TokenBatch:
+        batch = TokenBatch(
+            agent=self.agent,
+            text="".join(self.parts),
+            count=len(self.parts),
+            tag=self.tag,
+            first_meta=self.first_meta,
+            last_meta=self.last_meta,
+            started_at=self.started_at,
+        )
+        self.parts = []
+        self.chars = 0
+        self.tag = None
+        self.first_meta = {}
+        self.last_meta = {}
+        return batch
+
+
+class TokenCoalescer:
+    """
+    Per-agent, time- and size-bounded token batching in front of an async sink
+
+    The sink is called with one TokenBatch at a time per agent. Sink errors
+    are logged and counted, never raised into the producing callback.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[TokenBatch], Awaitable[None]],
+        policy: Optional[CoalescePolicy] = None,
+        name: str = "",
+    ):
+        self.sink = sink
+        self.policy = policy or CoalescePolicy()
+        self.name = name
+        self._buffers: Dict[str, TokenBuffer] = {}
+        # Held across take() and the sink call so an agent's batches stay ordered
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._timer_tasks: set = set()
+        self._closed = False
+
+        self.tokens_in = 0
+        self.chars_in = 0
+        self.batches_out = 0
+        self.sink_errors = 0
+        self.flush_reasons: Dict[str, int] = defaultdict(int)
+        self.max_delay = 0.0  # seconds, first buffered token to sink call
+
+    def _lock(self, agent: str) -> asyncio.Lock:
+        lock = self._locks.get(agent)
+        if lock is None:
+            lock = self._locks[agent] = asyncio.Lock()
+        return lock
+
+    async def add(self, agent: str, text: str, meta: Optional[Dict[str, Any]] = None, tag: Any = None):
+        """
+        Buffer a token for an agent
+
+        Tokens with a different tag (e.g. tool output vs. model text) are never
+        merged; a tag change flushes what is buffered first.
+        """
+        if not text:
+            return
+        if self._closed:
+            # Late tokens after close go straight through, unbatched
+            buffer = TokenBuffer(agent)
+            buffer.add(text, meta, tag)
+            await self._emit(buffer.take(), FLUSH_EXPLICIT)
+            return
+
+        self.tokens_in += 1
+        self.chars_in += len(text)
+        async with self._lock(agent):
+            buffer = self._buffers.get(agent)
+            if buffer is None:
+                buffer = self._buffers[agent] = TokenBuffer(agent)
+            if buffer.parts and buffer.tag != tag:
+                await self._flush_locked(buffer, FLUSH_TAG)
+            first = not buffer.parts
+            buffer.add(text, meta, tag)
+            if buffer.full(self.policy):
+                await self._flush_locked(buffer, FLUSH_SIZE)
+            elif first:
+                self._arm_timer(agent)
+
+    async def flush(self, agent: Optional[str] = None):
+        """Hand buffered tokens to the sink now, for one agent or all of them"""
+        agents = [agent] if agent is not None else list(self._buffers)
+        for name in agents:
+            buffer = self._buffers.get(name)
+            if buffer is None:
+                continue
+            async with self._lock(name):
+                await self._flush_locked(buffer, FLUSH_EXPLICIT)
+
+    async def close(self):
+        """Flush everything and stop the latency timers"""
+        self._closed = True
+        await self.flush()
+        for handle in self._timers.values():
+            handle.cancel()
+        self._timers.clear()
+        for task in list(self._timer_tasks):
+            task.cancel()
+
+    def pending(self, agent: Optional[str] = None) -> int:
+        """Number of buffered tokens, for one agent or all of them"""
+        if agent is not None:
+            buffer = self._buffers.get(agent)
+            return len(buffer) if buffer else 0
+        return sum(len(b) for b in self._buffers.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "max_latency_ms": round(self.policy.max_latency * 1000, 1),
+            "tokens_in": self.tokens_in,
+            "chars_in": self.chars_in,
+            "batches_out": self.batches_out,
+            "avg_batch": round(self.tokens_in / self.batches_out, 2) if self.batches_out else 0.0,
+            "max_delay_ms": round(self.max_delay * 1000, 1),
+            "pending": self.pending(),
+            "flush_reasons": dict(self.flush_reasons),
+            "sink_errors": self.sink_errors,
+        }
+
+    def _arm_timer(self, agent: str):
+        old = self._timers.pop(agent, None)
+        if old is not None:
+            old.cancel()
+        loop = asyncio.get_running_loop()
+        self._timers[agent] = loop.call_later(self.policy.max_latency, self._on_timer, agent)
+
+    def _on_timer(self, agent: str):
+        self._timers.pop(agent, None)
+        task = asyncio.ensure_future(self._flush_due(agent))
+        self._timer_tasks.add(task)
+        task.add_done_callback(self._timer_tasks.discard)
+
+    async def _flush_due(self, agent: str):
+        buffer = self._buffers.get(agent)
+        if buffer is None:
+            return
+        async with self._lock(agent):
+            # A size/tag/explicit flush may have emptied it while we waited
+            await self._flush_locked(buffer, FLUSH_LATENCY)
+
+    async def _flush_locked(self, buffer: TokenBuffer, reason: str):
+        if not buffer.parts:
+            return
+        timer = self._timers.pop(buffer.agent, None)
+        if timer is not None:
+            timer.cancel()
+        await self._emit(buffer.take(), reason)
+
+    async def _emit(self, batch: TokenBatch, reason: str):
+        self.batches_out += 1
+        self.flush_reasons[reason] += 1
+        delay = time.monotonic() - batch.started_at
+        if delay > self.max_delay:
+            self.max_delay = delay
+        try:
+            await self.sink(batch)
+        except Exception as e:
+            self.sink_errors += 1
+            logger.error(f"Token coalescer {self.name or ''} sink failed for {batch.agent}: {e}")
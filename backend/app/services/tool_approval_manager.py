@@ -11,6 +11,8 @@ import structlog
 import os
 from threading import Lock
 
+from app.services.pending_interactions import InteractionCancelled, get_pending_interactions
+
 logger = structlog.get_logger()
 
 class GlobalApprovalManager:
@@ -133,6 +135,7 @@ class GlobalApprovalManager:
             'name': tool_name,
             'input': tool_input
         }
+        get_pending_interactions().register(approval_id, kind="tool_approval")
         
         logger.info(f"📋 Created NEW approval request {approval_id} for {tool_name}")
         return approval_id
@@ -149,53 +152,54 @@ class GlobalApprovalManager:
         logger.info(f"📋 Current pending approvals: {list(self.pending_approvals.keys())}")
         logger.info(f"📋 Current approval responses: {list(self.approval_responses.keys())}")
         
-        if approval_id not in self.pending_approvals:
-            logger.warning(f"❌ Approval ID not found in pending: {approval_id}")
-            logger.warning(f"Available IDs: {list(self.pending_approvals.keys())}")
-            return False
-        
-        self.approval_responses[approval_id] = {
+        response = {
             'approved': approved,
             'modified_params': modified_params,
             'reason': reason,
             'timestamp': datetime.utcnow().isoformat()
         }
         
+        if approval_id not in self.pending_approvals:
+            # May belong to an agent waiting in another API process
+            if get_pending_interactions().resolve(approval_id, response):
+                logger.info(f"📡 Relayed approval response for {approval_id} to other processes")
+                return True
+            logger.warning(f"❌ Approval ID not found in pending: {approval_id}")
+            logger.warning(f"Available IDs: {list(self.pending_approvals.keys())}")
+            return False
+        
+        self.approval_responses[approval_id] = response
         self.pending_approvals[approval_id]['status'] = 'approved' if approved else 'rejected'
+        get_pending_interactions().resolve(approval_id, response)
         
         logger.info(f"{'✅ APPROVAL SET' if approved else '❌ REJECTION SET'} for tool execution: {approval_id}")
-        logger.info(f"📋 Approval responses after setting: {list(self.approval_responses.keys())}")
         return True
     
     async def wait_for_approval(self, approval_id: str, timeout: int = 60) -> Dict[str, Any]:
-        """Wait for approval response"""
+        """Wait for approval response; wakes as soon as it is set"""
         logger.info(f"⏳ Starting to wait for approval: {approval_id}")
-        start_time = datetime.utcnow()
-        poll_interval = 0.5
-        check_count = 0
-        
-        while (datetime.utcnow() - start_time).seconds < timeout:
-            check_count += 1
-            if check_count % 10 == 0:  # Log every 5 seconds
-                logger.info(f"⏳ Still waiting for {approval_id}, checked {check_count} times")
-                logger.info(f"📋 Current approval responses: {list(self.approval_responses.keys())}")
-            
-            if approval_id in self.approval_responses:
-                logger.info(f"✅ Found approval response for {approval_id}!")
-                response = self.approval_responses.pop(approval_id)
-                self.pending_approvals.pop(approval_id, None)
-                logger.info(f"📤 Returning approval response: {response}")
-                return response
-            
-            await asyncio.sleep(poll_interval)
-        
-        # Timeout - auto-reject
-        logger.warning(f"⏱️ Approval timeout for {approval_id} after {timeout} seconds")
-        self.pending_approvals.pop(approval_id, None)
-        return {
-            'approved': False,
-            'reason': 'Timeout - no response received'
-        }
+        try:
+            response = self.approval_responses.get(approval_id)
+            if response is None:
+                response = await get_pending_interactions().wait(approval_id, timeout=timeout)
+            logger.info(f"📤 Returning approval response for {approval_id}: {response}")
+            return response
+        except InteractionCancelled:
+            logger.info(f"🛑 Approval {approval_id} cancelled, execution stopped")
+            return {
+                'approved': False,
+                'reason': 'Cancelled - execution stopped'
+            }
+        except asyncio.TimeoutError:
+            # Timeout - auto-reject
+            logger.warning(f"⏱️ Approval timeout for {approval_id} after {timeout} seconds")
+            return {
+                'approved': False,
+                'reason': 'Timeout - no response received'
+            }
+        finally:
+            self.approval_responses.pop(approval_id, None)
+            self.pending_approvals.pop(approval_id, None)
     
     def get_original_tool(self, approval_id: str) -> Optional[Dict[str, Any]]:
         """Get the original tool for an approval request"""
@@ -0,0 +1,299 @@
+"""
+Tool catalog for DynamicToolWrapper
+
+Maps a tool name to what calling it takes: the resolved callable, its schema
+and the signature built from it, whether it is async, and whether it takes a
+Strands ToolUse (first parameter named "tool") or plain keyword arguments.
+Names are resolved once, in the same order DynamicToolWrapper always used
+(Strands dynamic registry, local tools, app.tools modules, strands_tools),
+and misses are remembered too, so wrapping a tool no longer re-imports a
+dozen modules or spins up an event loop to reach the registry.
+
+The catalog is filled at startup (build) and cleared when tool settings
+change or the registry gains a tool. It also keeps the Strands-visible
+wrappers it has built, per tool and agent, so state machines that create a
+wrapper for every tool_call state reuse them. Cached wrappers hold no
+callback handler: callers bind their own, so a finished execution's
+handler isn't kept alive by the cache.
+"""
+import asyncio
+import importlib
+import inspect
+import logging
+import threading
+import time
+import types
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# app.tools implementations, preferred over strands_tools for their stable call signatures
+APP_TOOL_MODULES = (
+    "app.tools.python_repl_tool",
+    "app.tools.file_tools",
+    "app.tools.web_tools",
+    "app.tools.system_tools",
+    "app.tools.strands_tavily_search",
+    "app.tools.tavily_search_tool",
+)
+
+# Tools strands_tools is known to provide; resolved up front by build()
+STRANDS_TOOL_NAMES = (
+    "file_read", "file_write", "editor", "http_request", "python_repl", "shell",
+    "calculator", "current_time", "sleep", "environment", "system_info", "journal",
+    "handoff_to_user", "stop", "think", "batch", "workflow", "use_llm", "memory",
+    "mem0_memory", "generate_image", "image_reader", "speak", "diagram", "use_aws",
+    "retrieve", "task_planner", "agent_todo", "recursive_executor",
+)
+
+
+def _get_tool_schema(tool_name: str) -> Optional[Dict[str, Any]]:
+    try:
+        from app.services.strands_tool_definitions import get_tool_schema
+    except ImportError:
+        return None
+    return get_tool_schema(tool_name)
+
+
+def signature_from_schema(schema: Optional[Dict[str, Any]]) -> Optional[inspect.Signature]:
+    """Function signature matching a tool schema's parameters; None without a schema"""
+    if not schema:
+        return None
+    params = schema.get("parameters", {})
+    required = params.get("required", [])
+    sig_params = []
+    for param_name, param_info in params.get("properties", {}).items():
+        if param_name in required:
+            param = inspect.Parameter(param_name, inspect.Parameter.POSITIONAL_OR_KEYWORD, annotation=str)
+        else:
+            param = inspect.Parameter(
+                param_name,
+                inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                default=param_info.get("default", None),
+                annotation=str,
+            )
+        sig_params.append(param)
+    return inspect.Signature(sig_params)
+
+
+@dataclass(frozen=True)
+class ToolEntry:
+    """A resolved tool and how to call it"""
+    name: str
+    func: Callable
+    call_target: Callable
+    is_async: bool
+    tool_use_api: bool
+    schema: Optional[Dict[str, Any]]
+    signature: Optional[inspect.Signature]
+    source: str
+
+    @classmethod
+    def compile(cls, name: str, func: Callable, source: str = "direct") -> "ToolEntry":
+        """Work out once what _execute_tool used to inspect on every call"""
+        call_target = func
+        is_async = asyncio.iscoroutinefunction(call_target)
+        if not is_async and hasattr(func, "__call__"):
+            call_target = func.__call__
+            is_async = asyncio.iscoroutinefunction(call_target)
+        try:
+            params = list(inspect.signature(call_target).parameters.values())
+        except Exception:
+            params = []
+        schema = _get_tool_schema(name)
+        return cls(
+            name=name,
+            func=func,
+            call_target=call_target,
+            is_async=is_async,
+            tool_use_api=bool(params) and params[0].name == "tool",
+            schema=schema,
+            signature=signature_from_schema(schema),
+            source=source,
+        )
+
+
+class ToolCatalog:
+    """Process-wide name -> ToolEntry index plus a cache of built wrappers"""
+
+    def __init__(self, max_wrappers: int = 512):
+        self.max_wrappers = max_wrappers
+        self._entries: Dict[str, Optional[ToolEntry]] = {}  # None marks a known miss
+        self._wrappers: "OrderedDict[Tuple[str, str], Callable]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Whether entries were resolved with the dynamic registry available
+        self._registry_ready = False
+
+        self.hits = 0
+        self.resolutions = 0
+        self.wrapper_hits = 0
+        self.wrapper_builds = 0
+        self.invalidations = 0
+        self.last_build_ms = 0.0
+
+    # ------------------------------------------------------------------
+    # Resolution
+    # ------------------------------------------------------------------
+
+    def resolve(self, tool_name: str) -> Optional[ToolEntry]:
+        """Entry for tool_name, resolving it on first use; None if no module provides it"""
+        registry = self._registry()
+        if registry is not None and not self._registry_ready and self._entries:
+            # The registry came up after entries were resolved without it
+            self.invalidate()
+        with self._lock:
+            self._registry_ready = registry is not None
+            if tool_name in self._entries:
+                self.hits += 1
+                return self._entries[tool_name]
+
+        entry = self._resolve_uncached(tool_name, registry)
+        with self._lock:
+            self.resolutions += 1
+            self._entries.setdefault(tool_name, entry)
+            return self._entries[tool_name]
+
+    def build(self, tool_names: Iterable[str] = ()) -> int:
+        """Resolve every known tool up front; returns how many resolved"""
+        started = time.monotonic()
+        registry = self._registry()
+        names = list(dict.fromkeys([
+            *(registry.tools.keys() if registry is not None else ()),
+            *STRANDS_TOOL_NAMES,
+            *tool_names,
+        ]))
+        resolved = sum(1 for name in names if self.resolve(name) is not None)
+        self.last_build_ms = round((time.monotonic() - started) * 1000, 1)
+        logger.info(f"Tool catalog built: {resolved}/{len(names)} tools resolved in {self.last_build_ms}ms")
+        return resolved
+
+    def invalidate(self, tool_name: Optional[str] = None):
+        """Forget one tool, or everything; entries are resolved again on next use"""
+        with self._lock:
+            self.invalidations += 1
+            if tool_name is None:
+                self._entries.clear()
+                self._wrappers.clear()
+                self._registry_ready = False
+                return
+            self._entries.pop(tool_name, None)
+            for key in [k for k in self._wrappers if k[0] == tool_name]:
+                del self._wrappers[key]
+
+    @staticmethod
+    def _registry():
+        """The Strands dynamic registry once initialized, else None"""
+        try:
+            from app.tools.strands_tool_registry import strands_tool_registry, get_dynamic_tools
+        except Exception:
+            return None
+        if not strands_tool_registry._initialized:
+            try:
+                asyncio.get_running_loop()
+                return None  # can't block the running loop on it; startup initializes it
+            except RuntimeError:
+                pass
+            try:
+                asyncio.run(get_dynamic_tools())
+            except Exception as e:
+                logger.debug(f"Could not initialize strands registry: {e}")
+                return None
+        return strands_tool_registry
+
+    def _resolve_uncached(self, tool_name: str, registry) -> Optional[ToolEntry]:
+        if registry is not None:
+            tool_obj = registry.tools.get(tool_name)
+            if tool_obj is not None and hasattr(tool_obj, "handler"):
+                return self._compiled(tool_name, tool_obj.handler, "strands registry")
+
+        if tool_name == "tavily_search":
+            try:
+                from tools.tavily_search_tool import tavily_search
+                return self._compiled(tool_name, tavily_search, "tools.tavily_search_tool")
+            except ImportError:
+                pass
+
+        for module_name in APP_TOOL_MODULES:
+            try:
+                module = importlib.import_module(module_name)
+            except ImportError:
+                continue
+            if hasattr(module, tool_name):
+                return self._compiled(tool_name, getattr(module, tool_name), module_name)
+
+        try:
+            module = importlib.import_module("strands_tools")
+        except ImportError:
+            module = None
+        if module is not None and hasattr(module, tool_name):
+            obj = getattr(module, tool_name)
+            # Some distributions expose a submodule named after the tool
+            if isinstance(obj, types.ModuleType) and hasattr(obj, tool_name):
+                obj = getattr(obj, tool_name)
+            if callable(obj):
+                return self._compiled(tool_name, obj, "strands_tools")
+
+        logger.debug(f"Tool {tool_name} not found in available modules")
+        return None
+
+    @staticmethod
+    def _compiled(tool_name: str, func: Callable, source: str) -> ToolEntry:
+        logger.info(f"Resolved tool {tool_name} from {source}")
+        return ToolEntry.compile(tool_name, func, source)
+
+    # ------------------------------------------------------------------
+    # Wrappers
+    # ------------------------------------------------------------------
+
+    def get_wrapper(self, tool_name: str, agent_name: str) -> Optional[Callable]:
+        key = (tool_name, agent_name)
+        with self._lock:
+            wrapped = self._wrappers.get(key)
+            if wrapped is not None:
+                self._wrappers.move_to_end(key)
+                self.wrapper_hits += 1
+            return wrapped
+
+    def put_wrapper(self, tool_name: str, agent_name: str, wrapped: Callable):
+        key = (tool_name, agent_name)
+        with self._lock:
+            self.wrapper_builds += 1
+            self._wrappers[key] = wrapped
+            self._wrappers.move_to_end(key)
+            while len(self._wrappers) > self.max_wrappers:
+                self._wrappers.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            resolved = sum(1 for e in self._entries.values() if e is not None)
+            return {
+                "tools": resolved,
+                "misses": len(self._entries) - resolved,
+                "hits": self.hits,
+                "resolutions": self.resolutions,
+                "wrappers": len(self._wrappers),
+                "wrapper_hits": self.wrapper_hits,
+                "wrapper_builds": self.wrapper_builds,
+                "invalidations": self.invalidations,
+                "registry_ready": self._registry_ready,
+                "last_build_ms": self.last_build_ms,
+            }
+
+
+_catalog: Optional[ToolCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_tool_catalog() -> ToolCatalog:
+    """Get or create the process-wide tool catalog"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = ToolCatalog()
+        return _catalog
@@ -406,6 +406,10 @@ class ToolConfigService:
             # This would update the actual tool registry
             # For now, we'll log the sync
             logger.info(f"Synced {len(enabled_tools)} enabled tools with registry")
+
+            # Tools resolve and wrap afresh after a settings change
+            from app.services.tool_catalog import get_tool_catalog
+            get_tool_catalog().invalidate()
         except Exception as e:
             logger.error(f"Failed to sync with registry: {e}")
     
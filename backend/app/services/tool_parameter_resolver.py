@@ -101,11 +101,11 @@ class ToolParameterResolver:
                 logger.warning("No API key, using defaults")
                 return self._generate_default_parameters(state_machine, tool_schemas)
 
-            from strands.models.openai import OpenAIModel
+            from app.services.model_client_factory import get_model
             from strands import Agent
 
-            model = OpenAIModel(
-                client_args={"api_key": api_key},
+            model = get_model(
+                api_key=api_key,
                 model_id="gpt-4o-mini",
                 params={"temperature": 0.2, "max_tokens": 2000}
             )
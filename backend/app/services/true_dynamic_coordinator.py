@@ -12,7 +12,7 @@ from typing import AsyncIterator, Dict, Any, Optional, List, Union, Set
 from dataclasses import dataclass, field
 
 from strands import Agent, tool
-from strands.models.openai import OpenAIModel
+from app.services.model_client_factory import get_model
 import os
 from strands.session.file_session_manager import FileSessionManager
 
@@ -265,7 +265,7 @@ class TrueDynamicCoordinator(AgentRuntime):
             return json.dumps(self.available_tools_catalog, indent=2)
         
         # Create the main coordinator with optimal temperature for tool use
-        openai_model = OpenAIModel(
+        openai_model = get_model(
             model_id=self.model,
             temperature=0.0  # Lower temperature for more deterministic tool calling
         )
@@ -382,7 +382,7 @@ AVAILABLE TOOLS
             full_prompt = f"Context from previous agents:{context_text}\n\n{full_prompt}"
         
         # Create the agent with temperature
-        openai_model = OpenAIModel(
+        openai_model = get_model(
             model_id=planned.model,
             temperature=planned.temperature
         )
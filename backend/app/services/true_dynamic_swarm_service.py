@@ -18,13 +18,13 @@ from app.services.dynamic_agent_factory import DynamicAgentFactory
 # Import Strands SDK for real agent execution (following documentation)
 try:
     from strands import Agent
-    from strands.models.openai import OpenAIModel
+    from app.services.model_client_factory import get_model
     from strands.session.file_session_manager import FileSessionManager
     STRANDS_AVAILABLE = True
 except ImportError:
     STRANDS_AVAILABLE = False
     Agent = None
-    OpenAIModel = None
+    get_model = None
     FileSessionManager = None
 
 logger = structlog.get_logger()
@@ -695,12 +695,9 @@ When complete, clearly state your results and any follow-up agents needed.
             return None
             
         # Import required classes
-        from strands.models.openai import OpenAIModel
-        import os
-        from dotenv import load_dotenv
+        from app.services.model_client_factory import get_model, openai_api_key
         
-        load_dotenv()
-        api_key = os.getenv("OPENAI_API_KEY")
+        api_key = openai_api_key()
         
         if not api_key:
             logger.error("❌ OpenAI API key not found in environment")
@@ -715,8 +712,8 @@ When complete, clearly state your results and any follow-up agents needed.
         session_manager = session_data["session_manager"]
         
         # Create OpenAI model
-        model = OpenAIModel(
-            client_args={"api_key": api_key},
+        model = get_model(
+            api_key=api_key,
             model_id="gpt-4o-mini",
             params={"max_tokens": 4000, "temperature": 0.7}
         )
@@ -808,12 +805,9 @@ WHEN TO ANSWER DIRECTLY: For simple questions, just provide the answer."""
         
         try:
             # Import OpenAI model (same as event-driven swarm)
-            from strands.models.openai import OpenAIModel
-            import os
-            from dotenv import load_dotenv
+            from app.services.model_client_factory import get_model, openai_api_key
             
-            load_dotenv()
-            api_key = os.getenv("OPENAI_API_KEY")
+            api_key = openai_api_key()
             
             if not api_key:
                 logger.warning("No OpenAI API key - using simulation mode")
@@ -833,8 +827,8 @@ WHEN TO ANSWER DIRECTLY: For simple questions, just provide the answer."""
                 return
             
             # Create OpenAI model (same configuration as event-driven swarm)
-            model = OpenAIModel(
-                client_args={"api_key": api_key},
+            model = get_model(
+                api_key=api_key,
                 model_id="gpt-4o-mini",
                 params={"max_tokens": 4000, "temperature": 0.7}
             )
@@ -1053,18 +1047,15 @@ WHEN TO ANSWER DIRECTLY: For simple questions, just provide the answer."""
             session_manager = session_data["session_manager"]
             
             # Load environment
-            import os
-            from dotenv import load_dotenv
-            load_dotenv()
-            
-            api_key = os.getenv("OPENAI_API_KEY")
+            from app.services.model_client_factory import openai_api_key
+            api_key = openai_api_key()
             if not api_key:
                 logger.error("❌ OpenAI API key not found")
                 return
             
             # Create OpenAI model
-            model = OpenAIModel(
-                client_args={"api_key": api_key},
+            model = get_model(
+                api_key=api_key,
                 model_id="gpt-4o-mini",
                 params={"max_tokens": 4000, "temperature": 0.7}
             )
@@ -11,7 +11,7 @@ import structlog
 import os
 from strands import Agent
 from strands.multiagent import Swarm
-from strands.models.openai import OpenAIModel
+from app.services.model_client_factory import get_model
 from app.schemas.swarm import SwarmExecutionRequest, SwarmExecutionResponse, ExecutionStatus
 from app.services.unified_tool_service import get_unified_tools
 from app.tools.strands_tool_registry import get_dynamic_tools
@@ -193,8 +193,8 @@ class TrueSwarmService:
                         logger.warning(f"Tool {tool_name} not found in registry")
             
             # Create OpenAI model for the agent
-            model = OpenAIModel(
-                client_args={"api_key": os.getenv("OPENAI_API_KEY")},
+            model = get_model(
+                api_key=os.getenv("OPENAI_API_KEY"),
                 model_id=config.get("model", "gpt-4o-mini"),
                 params={
                     "temperature": config.get("temperature", 0.7),
@@ -2,14 +2,11 @@
 Python REPL Tool for Strands Agents
 Execute Python code in a sandboxed environment
 """
-import sys
-import io
-import traceback
 from typing import Dict, Any, Optional
 import structlog
 import ast
-import contextlib
-import time
+
+from app.services.repl_pool import get_repl_pool
 
 logger = structlog.get_logger()
 
@@ -49,93 +46,6 @@ class PythonReplTool:
         self.name = "python_repl"
         self.description = PYTHON_REPL_SPEC["description"]
         self.input_schema = PYTHON_REPL_SPEC["input_schema"]
-        
-        # Persistent state between executions
-        self.global_state = {}
-        
-        # Safe built-ins
-        self.safe_builtins = {
-            # Basic functions
-            'print': print,
-            'len': len,
-            'range': range,
-            'enumerate': enumerate,
-            'zip': zip,
-            'map': map,
-            'filter': filter,
-            'sorted': sorted,
-            'reversed': reversed,
-            'sum': sum,
-            'min': min,
-            'max': max,
-            'abs': abs,
-            'round': round,
-            'all': all,
-            'any': any,
-            
-            # Type functions
-            'int': int,
-            'float': float,
-            'str': str,
-            'bool': bool,
-            'list': list,
-            'dict': dict,
-            'set': set,
-            'tuple': tuple,
-            'type': type,
-            'isinstance': isinstance,
-            
-            # Math functions
-            'pow': pow,
-            'divmod': divmod,
-            
-            # Other safe functions
-            'help': help,
-            'dir': dir,
-            'id': id,
-            'hash': hash,
-            'hex': hex,
-            'bin': bin,
-            'oct': oct,
-            'chr': chr,
-            'ord': ord,
-            
-            # Constants
-            'True': True,
-            'False': False,
-            'None': None,
-            
-            # Allow safe imports
-            '__import__': self._safe_import,
-
-            # Critical Python internals for class/function creation
-            '__build_class__': __builtins__['__build_class__'],
-            '__name__': '__main__',
-            '__doc__': None,
-        }
-
-    def _safe_import(self, name, *args, **kwargs):
-        """Safe import function that only allows certain modules"""
-        # Whitelist of safe modules
-        safe_modules = [
-            'math', 'random', 'datetime', 'time', 'json', 're',
-            'collections', 'itertools', 'functools', 'operator',
-            'string', 'textwrap', 'unicodedata', 'decimal',
-            'fractions', 'statistics', 'copy', 'pprint',
-            'enum', 'typing', 'dataclasses', 'abc',
-            'heapq', 'bisect', 'array', 'weakref',
-            'types', 'copyreg', 'hashlib', 'hmac',
-            'secrets', 'uuid', 'html', 'xml',
-            'urllib.parse', 'base64', 'binascii',
-            'zlib', 'gzip', 'bz2', 'lzma'
-        ]
-        
-        # Check if module is in whitelist
-        module_name = name.split('.')[0]
-        if module_name in safe_modules:
-            return __import__(name, *args, **kwargs)
-        else:
-            raise ImportError(f"Import of '{name}' is not allowed for safety reasons")
 
     def _is_safe_code(self, code: str) -> bool:
         """Check if code is safe to execute"""
@@ -170,10 +80,17 @@ class PythonReplTool:
             return False
     
     async def __call__(self, **kwargs):
-        """Execute Python code"""
+        """
+        Execute Python code in the REPL worker pool
+
+        session_id selects the namespace that persists between calls, and
+        on_output(stream, chunk) receives stdout/stderr while the code runs.
+        """
         code = kwargs.get("code")
         timeout = kwargs.get("timeout", 10)
         persist_state = kwargs.get("persist_state", True)
+        session_id = kwargs.get("session_id") or "default"
+        on_output = kwargs.get("on_output")
         
         if not code:
             return {"success": False, "error": "Code is required"}
@@ -191,87 +108,15 @@ class PythonReplTool:
                     "hint": "Avoid using __import__, exec, eval, open, file operations, or system calls"
                 }
             
-            # Prepare execution environment
-            if persist_state:
-                exec_globals = self.global_state.copy()
-            else:
-                exec_globals = {}
-            
-            # Add safe builtins
-            exec_globals['__builtins__'] = self.safe_builtins
-            
-            # Capture output
-            stdout_buffer = io.StringIO()
-            stderr_buffer = io.StringIO()
-            
-            # Execute code with output capture
-            start_time = time.time()
-            result_value = None
-            
-            with contextlib.redirect_stdout(stdout_buffer), \
-                 contextlib.redirect_stderr(stderr_buffer):
-                try:
-                    # Try to compile and execute
-                    compiled = compile(code, '<repl>', 'exec')
-                    exec(compiled, exec_globals)
-                    
-                    # Try to get the last expression value
-                    try:
-                        # Check if last line is an expression
-                        lines = code.strip().split('\n')
-                        if lines:
-                            last_line = lines[-1].strip()
-                            if last_line and not last_line.startswith(('print', 'return', 'raise')):
-                                try:
-                                    ast_node = ast.parse(last_line, mode='eval')
-                                    result_value = eval(last_line, exec_globals)
-                                except:
-                                    pass
-                    except:
-                        pass
-                    
-                except SyntaxError as e:
-                    stderr_buffer.write(f"SyntaxError: {e}\n")
-                except Exception as e:
-                    stderr_buffer.write(f"{type(e).__name__}: {e}\n")
-                    stderr_buffer.write(traceback.format_exc())
-            
-            execution_time = time.time() - start_time
-            
-            # Get output
-            stdout = stdout_buffer.getvalue()
-            stderr = stderr_buffer.getvalue()
-            
-            # Update persistent state if enabled
-            if persist_state:
-                # Remove builtins before saving
-                exec_globals.pop('__builtins__', None)
-                self.global_state.update(exec_globals)
-            
-            # Prepare result
-            result = {
-                "success": not stderr,
-                "stdout": stdout[:10000],  # Limit output
-                "stderr": stderr[:5000],   # Limit errors
-                "execution_time": round(execution_time, 4),
-                "code": code
-            }
-            
-            # Add result value if exists
-            if result_value is not None:
-                try:
-                    result["result"] = str(result_value)[:1000]
-                except:
-                    result["result"] = repr(result_value)[:1000]
-            
-            # Add variables in state
-            if persist_state:
-                variables = {k: type(v).__name__ for k, v in self.global_state.items() 
-                           if not k.startswith('_')}
-                if variables:
-                    result["variables"] = variables
-            
-            return result
+            # Runs in a worker process so a runaway snippet can be killed
+            # without touching the event loop
+            return await get_repl_pool().execute(
+                code,
+                session_id=session_id,
+                timeout=timeout,
+                persist_state=persist_state,
+                on_output=on_output,
+            )
             
         except Exception as e:
             logger.error(f"Python REPL error: {e}")
@@ -1315,6 +1315,11 @@ class StrandsToolRegistry:
 
         logger.info(f"Registered tool: {tool.name} with capabilities: {[c.value for c in tool.capabilities]}")
 
+        if self._initialized:
+            # A tool added after startup replaces whatever the catalog resolved for its name
+            from app.services.tool_catalog import get_tool_catalog
+            get_tool_catalog().invalidate(tool.name)
+
     def get_available_tools(self,
                            capabilities: Optional[List[ToolCapability]] = None,
                            enabled_only: bool = True) -> Dict[str, StrandsTool]:
@@ -4,7 +4,6 @@ Following the official Strands documentation pattern
 """
 import os
 import requests
-import time
 from app.services.search_gateway import search_gateway
 from typing import Dict, Any
 from strands import tool
@@ -33,14 +32,6 @@ def tavily_search(query: str) -> str:
         return "Error: TAVILY_API_KEY environment variable is not set"
     
     try:
-        # Short-circuit if we recently saw rate limiting
-        global _last_rate_limit_ts
-        now = time.time()
-        if _last_rate_limit_ts and (now - _last_rate_limit_ts) < _rate_limit_backoff_window():
-            wait_left = int(_rate_limit_backoff_window() - (now - _last_rate_limit_ts))
-            logger.warn("Tavily rate limited recently; short-circuiting search", wait_seconds=wait_left)
-            return f"Search temporarily rate-limited. Please wait ~{wait_left}s and try again."
-
         logger.info(f"🔍 Tavily search for: {query}")
 
         # Initialize budget window on first call this run
@@ -58,13 +49,15 @@ def tavily_search(query: str) -> str:
             )
         
         # Make API request to Tavily
-        # Use the gateway to benefit from cache and backoff
+        # Use the gateway to benefit from cache, coalescing and rate limiting
         gw = search_gateway.search(query)
         if gw.get("error"):
             err = gw["error"]
             logger.error("SearchGateway error", error=err)
-            if err.startswith("rate_limited"):
-                _last_rate_limit_ts = time.time()
+            if err.startswith("rate_limited_wait_"):
+                wait_left = err.rsplit("_", 1)[-1]
+                return f"Search temporarily rate-limited. Please wait ~{wait_left}s and try again."
+            elif err.startswith("rate_limited"):
                 return "Search rate-limited. Please wait and retry."
             elif err.startswith("missing_api_key"):
                 return "Error: TAVILY_API_KEY environment variable is not set"
@@ -114,7 +107,6 @@ def tavily_search(query: str) -> str:
 # Global variable to store structured results
 _last_search_results = []
 _all_search_results = []  # Accumulate all search results
-_last_rate_limit_ts = 0.0  # Track last 429 to dampen retries
 _search_calls_count = 0     # Simple per-run budget to avoid runaway loops
 _search_window_started = False
 
@@ -138,10 +130,6 @@ def clear_search_results():
     _search_calls_count = 0
     _search_window_started = False
 
-def _rate_limit_backoff_window() -> float:
-    """Seconds to back off after a 429 to prevent flood."""
-    return float(os.getenv("TAVILY_BACKOFF_SECONDS", 20))
-
 def _max_search_calls_per_run() -> int:
     """Maximum Tavily calls allowed per research run before returning guidance."""
     return int(os.getenv("TAVILY_MAX_CALLS_PER_RUN", 12))
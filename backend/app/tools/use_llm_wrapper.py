@@ -5,8 +5,7 @@ import logging
 from typing import Any, Dict
 from datetime import datetime
 from strands import Agent
-from strands.models.openai import OpenAIModel
-import os
+from app.services.model_client_factory import get_model
 import json
 
 logger = logging.getLogger(__name__)
@@ -19,10 +18,7 @@ async def use_llm_with_model_async(prompt: str, system_prompt: str = None, sessi
     """
     try:
         # Create OpenAI model configuration
-        openai_model = OpenAIModel(
-            client_args={
-                "api_key": os.getenv("OPENAI_API_KEY"),
-            },
+        openai_model = get_model(
             model_id="gpt-4o-mini",
             params={
                 "max_tokens": 4000,
@@ -156,10 +152,7 @@ def use_llm_with_model(prompt: str, system_prompt: str = None, **kwargs) -> str:
             return "I need a specific prompt to analyze. Please provide more details."
         
         # Create OpenAI model configuration
-        openai_model = OpenAIModel(
-            client_args={
-                "api_key": os.getenv("OPENAI_API_KEY"),
-            },
+        openai_model = get_model(
             model_id="gpt-4o-mini",
             params={
                 "max_tokens": 4000,
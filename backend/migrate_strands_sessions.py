@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Import session_<id>/metadata.json files into the SQLite metadata store
+
+Run once before switching STRANDS_METADATA_BACKEND to "sqlite". Re-running
+replaces each imported session's rows with the JSON contents again, so it is
+safe to repeat. The JSON files are left in place unless --remove-json is given.
+
+Usage: python migrate_strands_sessions.py [--storage-dir ./strands_sessions] [--dry-run]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Add the app directory to the path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.session_metadata_store import METADATA_DB_NAME, SQLiteMetadataStore
+
+
+def migrate(storage_dir: Path, db_path: Path, dry_run: bool, remove_json: bool) -> int:
+    metadata_files = sorted(storage_dir.glob("session_*/metadata.json"))
+    print(f"Found {len(metadata_files)} sessions with metadata.json in {storage_dir}")
+    if dry_run:
+        for path in metadata_files:
+            print(f"  would import {path.parent.name}")
+        return 0
+
+    store = SQLiteMetadataStore(str(db_path))
+    failed = 0
+    try:
+        for path in metadata_files:
+            session_id = path.parent.name.replace("session_", "", 1)
+            try:
+                with open(path, 'r') as f:
+                    metadata = json.load(f)
+                store.import_metadata(session_id, metadata)
+                messages = len(metadata.get("context", {}).get("messages", []) or [])
+                files = len(metadata.get("virtual_filesystem", {}) or {})
+                print(f"  imported {session_id}: {messages} messages, {files} files")
+                if remove_json:
+                    path.unlink()
+            except Exception as e:
+                failed += 1
+                print(f"  FAILED {session_id}: {e}")
+    finally:
+        store.close()
+
+    print(f"Imported {len(metadata_files) - failed} sessions into {db_path} ({failed} failed)")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--storage-dir", default="./strands_sessions")
+    parser.add_argument("--db", help=f"Database path (default: <storage-dir>/{METADATA_DB_NAME})")
+    parser.add_argument("--dry-run", action="store_true", help="List sessions without importing")
+    parser.add_argument("--remove-json", action="store_true", help="Delete metadata.json after a successful import")
+    args = parser.parse_args()
+
+    storage_dir = Path(args.storage_dir)
+    if not storage_dir.is_dir():
+        parser.error(f"{storage_dir} is not a directory")
+    db_path = Path(args.db) if args.db else storage_dir / METADATA_DB_NAME
+    sys.exit(migrate(storage_dir, db_path, args.dry_run, args.remove_json))
+
+
+if __name__ == "__main__":
+    main()